@@ -1,56 +1,101 @@
 import os
 import sys
+import pwd
 import json
 import logging
-from flask import Flask
+import threading
 from pathlib import Path
-from dotenv import load_dotenv
-from flask_login import LoginManager
-from flask_sqlalchemy import SQLAlchemy
-from logging.config import dictConfig
-from flask.logging import default_handler
 
-# Prevent creation of __pycache__. Cache messes up auth.
-sys.dont_write_bytecode = True
 
-db = SQLAlchemy()
-DB_NAME = "database.db"
+def pycache_dir():
+    """
+    Per user bytecode cache dir, outside of the repo. The ansible connector
+    runs as root, so a shared __pycache__ would end up with root owned files
+    the app user can't replace, and root would be loading bytecode the app
+    user wrote. Keeping a cache per uid avoids both.
+
+    Returns:
+        str: Path to cache dir for current user.
+    """
+    home = pwd.getpwuid(os.getuid()).pw_dir
+    return os.path.join(home, ".cache/web-lgsm/pycache")
+
 
-env_path = Path(".") / ".secret"
-load_dotenv(dotenv_path=env_path)
-SECRET_KEY = os.environ["SECRET_KEY"]
-
-
-def main():
-    # Setup logging.
-    log_level_map = {
-        "info": logging.INFO,        # General operational info.
-        "warning": logging.WARNING,  # Warnings and above.
-        "debug": logging.DEBUG,      # Most verbose, debug info.
-    }
-
-    if "DEBUG" in os.environ:
-        # Get log_level from env var, default to info if none set.
-        log_level_str = os.getenv("LOG_LEVEL", "info").lower()
-        log_level = log_level_map.get(log_level_str, logging.INFO)
-        dictConfig(
-            {
-                "version": 1,
-                "formatters": {
-                    "default": {
-                        "format": "[%(asctime)s] %(levelname)s in %(module)s: %(message)s",
-                    }
-                },
-                "handlers": {
-                    "wsgi": {
-                        "class": "logging.StreamHandler",
-                        "stream": "ext://flask.logging.wsgi_errors_stream",
-                        "formatter": "default",
-                    }
-                },
-                "root": {"level": log_level, "handlers": ["wsgi"]},
-            }
-        )
+# Entry points set this before importing app, this catches everything else.
+if sys.pycache_prefix == None:
+    sys.pycache_prefix = pycache_dir()
+
+DB_NAME = "database.db"
+_db_lock = threading.Lock()
+
+
+def __getattr__(name):
+    """
+    Makes the Flask-SQLAlchemy db on first use of app.db. Flask isn't
+    imported until then, so the ansible connector can use app.schema & the
+    other Flask free modules without paying for it.
+    """
+    global db
+    if name != "db":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    with _db_lock:
+        if "db" not in globals():
+            from flask_sqlalchemy import SQLAlchemy
+            from .schema import Base
+
+            db = SQLAlchemy(model_class=Base)
+    return db
+
+
+def main(serve=False, workers=1):
+    """
+    Creates the app.
+
+    Args:
+        serve (bool): Also start the background services (request timing,
+                      status watcher, scheduler & resumed deletions). Only the
+                      web server wants these, one off cli runs must not claim
+                      schedules or deletions they'll be killed part way through.
+        workers (int): Gunicorn workers serving the app. Only a lone server
+                       process rotates log_file itself. With more workers,
+                       or for cli runs next to a running server, the log is
+                       shared & rotated by web-lgsm.py when it starts gunicorn.
+
+    Returns:
+        Flask: The app.
+    """
+    from flask import Flask
+    from dotenv import load_dotenv
+    from flask_login import LoginManager
+    from flask.logging import default_handler
+    from . import db
+
+    env_path = Path(".") / ".secret"
+    load_dotenv(dotenv_path=env_path)
+
+    # Setup logging. Records are queued & written by a listener thread. Also
+    # logs to stderr in debug mode, only to log_file otherwise.
+    from .utils import read_config
+    from .log_config import setup_logging
+
+    log_options = read_config("logging")
+    try:
+        max_bytes = int(log_options["log_max_bytes"])
+        backups = int(log_options["log_backups"])
+    except ValueError:
+        max_bytes = 10485760
+        backups = 5
+
+    setup_logging(
+        level=os.getenv("LOG_LEVEL", log_options["log_level"]),
+        log_file=log_options["log_file"],
+        log_format=log_options["log_format"],
+        max_bytes=max_bytes,
+        backups=backups,
+        stream=sys.stderr if "DEBUG" in os.environ else None,
+        shared=not serve or workers > 1,
+    )
 
     current_log_level = logging.getLogger().getEffectiveLevel()
 
@@ -59,9 +104,11 @@ def main():
 
     # Initialize app.
     app = Flask(__name__)
-    app.config["SECRET_KEY"] = SECRET_KEY
+    app.config["SECRET_KEY"] = os.environ["SECRET_KEY"]
     app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{app.root_path}/{DB_NAME}"
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Per process state, ex. /metrics latencies, is per worker past one.
+    app.config["WORKERS"] = workers
     db.init_app(app)
     app.logger.removeHandler(default_handler)
 
@@ -82,6 +129,9 @@ def main():
         db.create_all()
         print(" * Database Loaded!")
 
+    if serve:
+        start_services(app)
+
     # Setup LoginManager.
     login_manager = LoginManager()
 
@@ -95,9 +145,48 @@ def main():
     def load_user(id):
         return db.session.get(User, int(id))
 
+    # Hashed & precompressed static bundles, see asset_tags().
+    from .assets import load_assets, asset_tags
+
+    load_assets()
+    app.jinja_env.globals["asset_tags"] = asset_tags
+
     # Filter for jinja2 json parsing for user permissions.
     @app.template_filter("from_json")
     def from_json_filter(s):
         return json.loads(s)
 
     return app
+
+
+def start_services(app):
+    """
+    Starts the background services for a serving app, see main().
+
+    Args:
+        app (Flask): App being served.
+    """
+    # Time requests & hot paths, see /api/perf.
+    from .utils import start_perf
+
+    if start_perf(app):
+        print(" * Request Timing Enabled!")
+
+    # Start optional inotify game server status watcher.
+    from .utils import start_status_watcher
+
+    if start_status_watcher():
+        print(" * Status Watcher Started!")
+
+    # Start scheduler for recurring game server commands.
+    from .utils import start_scheduler
+
+    if start_scheduler(app):
+        print(" * Scheduler Started!")
+
+    # Pick back up deletions cut short by a restart.
+    from .utils import resume_deletions
+
+    resumed = resume_deletions(app)
+    if resumed:
+        print(f" * Resumed {resumed} Deletion(s)!")
@@ -0,0 +1,102 @@
+import json
+import gzip
+import hashlib
+
+# Smaller bodies don't shrink enough to be worth the cpu & headers.
+MIN_COMPRESS_BYTES = 1024
+# Level 6 is most of level 9's ratio at a fraction of the cost, these bodies
+# are compressed per request.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+def compact_json(obj):
+    """
+    Serializes obj for the api, without the whitespace of indent=4.
+
+    Args:
+        obj (dict|list): Response data.
+
+    Returns:
+        str: JSON text.
+    """
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def _brotli():
+    """Returns the optional brotli module, None if it's not installed."""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def not_modified(etag):
+    """
+    Empty 304 response, for routes that can tell nothing changed before
+    building their body.
+
+    Args:
+        etag (str): Weak etag the client already has.
+
+    Returns:
+        Response: 304 response.
+    """
+    from flask import Response
+
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def finalize_api_response(response):
+    """
+    After request hook for /api/* json responses. Adds a weak etag if the route
+    didn't set one, answers 304 if the client already has it & compresses
+    bodies big enough to bother with. Other responses pass through untouched.
+
+    Args:
+        response (Response): Response from the route.
+
+    Returns:
+        Response: Same response, or a 304.
+    """
+    from flask import request
+
+    if (
+        response.status_code != 200
+        or response.mimetype != "application/json"
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    body = response.get_data()
+    if response.get_etag()[0] == None:
+        response.set_etag(hashlib.sha1(body).hexdigest(), weak=True)
+    # Polled responses, clients must always check back with the etag.
+    response.headers["Cache-Control"] = "private, no-cache"
+
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if len(body) < MIN_COMPRESS_BYTES:
+        return response
+
+    brotli = _brotli()
+    if brotli and request.accept_encodings["br"]:
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+        response.headers["Content-Encoding"] = "br"
+    elif request.accept_encodings["gzip"]:
+        body = gzip.compress(body, GZIP_LEVEL, mtime=0)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        return response
+
+    response.set_data(body)
+    return response
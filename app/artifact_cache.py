@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+INDEX_FILE = "index.json"
+OBJECTS_DIR = "objects"
+
+
+def sha256_file(path):
+    """
+    Hashes file contents.
+
+    Args:
+        path (str): File to hash.
+
+    Returns:
+        str: Hex sha256 digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Class used to create objects that keep versioned, content hashed copies of
+    downloaded & generated scripts (linuxgsm.sh, game server scripts). Each
+    version is stored once under objects/<sha256>, and an index tracks the
+    current version of each artifact along with the ETag & Last-Modified
+    headers needed to refresh it with a conditional request. Anything already
+    cached can be used with no network at all.
+    """
+
+    def __init__(self, cache_dir, keep=3):
+        """
+        Args:
+            cache_dir (str): Dir to keep artifacts & index in.
+            keep (int): Versions of each artifact to keep.
+        """
+        self.cache_dir = cache_dir
+        self.keep = max(1, keep)
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, OBJECTS_DIR), exist_ok=True)
+
+    def _object_path(self, sha):
+        return os.path.join(self.cache_dir, OBJECTS_DIR, sha)
+
+    def _fix_owner(self, path):
+        """Keeps files root writes (ex. from the connector) owned by the app."""
+        if os.geteuid() != 0:
+            return
+        stat = os.stat(self.cache_dir)
+        os.chown(path, stat.st_uid, stat.st_gid)
+
+    def _read_index(self):
+        index_file = os.path.join(self.cache_dir, INDEX_FILE)
+        if not os.path.isfile(index_file):
+            return dict()
+
+        try:
+            with open(index_file, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return dict()
+
+    def _write_index(self, index):
+        index_file = os.path.join(self.cache_dir, INDEX_FILE)
+        tmp_file = f"{index_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(index, f, indent=4)
+        self._fix_owner(tmp_file)
+        os.replace(tmp_file, index_file)
+
+    def info(self, name):
+        """
+        Gets index entry for an artifact.
+
+        Returns:
+            dict: Current sha, source, etag, last_modified, checked time &
+                  versions list. None if not cached.
+        """
+        return self._read_index().get(name)
+
+    def get(self, name, source=None):
+        """
+        Gets path to current version of an artifact, checking its hash.
+
+        Args:
+            name (str): Artifact name.
+            source (str): If set, only return the artifact if it was made from
+                          this source (ex. linuxgsm.sh sha for game scripts).
+
+        Returns:
+            str: Path to cached copy, None if not cached or corrupt.
+        """
+        entry = self.info(name)
+        if entry == None:
+            return None
+        if source != None and entry.get("source") != source:
+            return None
+
+        path = self._object_path(entry["sha"])
+        if not os.path.isfile(path) or sha256_file(path) != entry["sha"]:
+            return None
+
+        return path
+
+    def put(self, name, content, etag=None, last_modified=None, source=None):
+        """
+        Stores a new version of an artifact & makes it current.
+
+        Args:
+            name (str): Artifact name.
+            content (bytes): Artifact contents.
+            etag (str): ETag header it was fetched with.
+            last_modified (str): Last-Modified header it was fetched with.
+            source (str): What it was made from, for generated artifacts.
+
+        Returns:
+            str: Sha256 of content.
+        """
+        sha = hashlib.sha256(content).hexdigest()
+        path = self._object_path(sha)
+        if not os.path.isfile(path):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            self._fix_owner(tmp_path)
+            os.replace(tmp_path, path)
+
+        with self.lock:
+            index = self._read_index()
+            entry = index.get(name, {"versions": []})
+            versions = [v for v in entry["versions"] if v["sha"] != sha]
+            versions.insert(0, {"sha": sha, "stored": time.time()})
+
+            # Drop old versions no other artifact still points at.
+            for old in versions[self.keep :]:
+                in_use = any(
+                    old["sha"] in [v["sha"] for v in other["versions"]]
+                    for other_name, other in index.items()
+                    if other_name != name
+                )
+                if not in_use and os.path.isfile(self._object_path(old["sha"])):
+                    os.remove(self._object_path(old["sha"]))
+
+            entry.update(
+                {
+                    "sha": sha,
+                    "source": source,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "checked": time.time(),
+                    "versions": versions[: self.keep],
+                }
+            )
+            index[name] = entry
+            self._write_index(index)
+
+        return sha
+
+    def touch(self, name):
+        """Marks artifact as checked upstream just now."""
+        with self.lock:
+            index = self._read_index()
+            if name in index:
+                index[name]["checked"] = time.time()
+                self._write_index(index)
+
+    def is_stale(self, name, max_age):
+        """Checks if artifact is missing or last checked over max_age secs ago."""
+        entry = self.info(name)
+        if entry == None or self.get(name) == None:
+            return True
+        return time.time() - entry.get("checked", 0) > max_age
+
+    def refresh(self, name, url, headers=None, timeout=30):
+        """
+        Fetches artifact from url, using If-None-Match & If-Modified-Since so
+        unchanged artifacts cost a 304 rather than a full download.
+
+        Args:
+            name (str): Artifact name.
+            url (str): Where to fetch it from.
+            headers (dict): Extra request headers.
+            timeout (float): Request timeout in secs.
+
+        Returns:
+            bool: True if a new version was stored.
+
+        Raises:
+            requests.RequestException: If fetch fails.
+        """
+        import requests
+
+        headers = dict(headers or {})
+        entry = self.info(name)
+        if entry and self.get(name):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = requests.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            self.touch(name)
+            return False
+
+        response.raise_for_status()
+        if entry and entry["sha"] == hashlib.sha256(response.content).hexdigest():
+            self.touch(name)
+            return False
+
+        self.put(
+            name,
+            response.content,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        return True
+
+    def install(self, name, dest, mode=0o755, source=None):
+        """
+        Copies current version of artifact to dest, if dest differs.
+
+        Args:
+            name (str): Artifact name.
+            dest (str): Path to copy to.
+            mode (int): File mode for dest.
+            source (str): Same as get().
+
+        Returns:
+            bool: True if dest now holds the current version.
+        """
+        path = self.get(name, source)
+        if path == None:
+            return False
+
+        sha = os.path.basename(path)
+        if os.path.isfile(dest) and sha256_file(dest) == sha:
+            return True
+
+        tmp_dest = f"{dest}.{os.getpid()}.tmp"
+        with open(path, "rb") as src, open(tmp_dest, "wb") as f:
+            f.write(src.read())
+        os.chmod(tmp_dest, mode)
+        os.replace(tmp_dest, dest)
+        return True
+
+    def __str__(self):
+        return f"ArtifactCache(cache_dir='{self.cache_dir}')"
+
+    def __repr__(self):
+        return f"ArtifactCache(cache_dir='{self.cache_dir}')"
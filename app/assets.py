@@ -0,0 +1,384 @@
+import os
+import re
+import json
+import gzip
+import glob
+import shutil
+import hashlib
+import tempfile
+import mimetypes
+import subprocess
+
+from markupsafe import Markup, escape
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+# Built assets, relative to STATIC_DIR.
+DIST = "dist"
+MANIFEST = "manifest.json"
+# Vendor libs installed by npm, see static/js/package.json.
+NODE_MODULES = "js/node_modules"
+# Built file names change with their content, so they can be cached forever.
+IMMUTABLE_MAX_AGE = 31536000
+
+# Bundle name -> source files in load order. Each source is a path under
+# STATIC_DIR, the url to load it from if it isn't installed & the CDN file's
+# subresource integrity hash. A None url means serve the file from /static as
+# is, a None hash means the CDN url is loaded without an integrity check.
+BUNDLES = {
+    "base.css": [
+        (
+            f"{NODE_MODULES}/bootstrap/dist/css/bootstrap.min.css",
+            "https://cdn.jsdelivr.net/npm/bootstrap@5.1.0/dist/css/bootstrap.min.css",
+            "sha384-KyZXEAg3QhqLMpG8r+8fhAXLRk2vvoC2f3B09zVXn8CA5QIVfZOJ3BCsw2P0p/We",
+        ),
+        ("css/main.css", None, None),
+        (f"{NODE_MODULES}/@xterm/xterm/css/xterm.css", None, None),
+    ],
+    "base.js": [
+        (
+            f"{NODE_MODULES}/jquery/dist/jquery.min.js",
+            "https://ajax.googleapis.com/ajax/libs/jquery/3.6.4/jquery.min.js",
+            None,
+        ),
+        (f"{NODE_MODULES}/@xterm/xterm/lib/xterm.js", None, None),
+        (f"{NODE_MODULES}/@xterm/addon-fit/lib/addon-fit.js", None, None),
+    ],
+    "bootstrap.js": [
+        (
+            f"{NODE_MODULES}/bootstrap/dist/js/bootstrap.bundle.min.js",
+            "https://cdn.jsdelivr.net/npm/bootstrap@5.1.0/dist/js/bootstrap.bundle.min.js",
+            "sha384-U1DAWAznBHeqEIlVSCgzq+c9gqGAJn5c/t99JyeKa9xxaYpSvHU5awsuZVVFIhvj",
+        ),
+    ],
+    "charts.js": [
+        (
+            f"{NODE_MODULES}/chart.js/dist/chart.min.js",
+            "https://cdnjs.cloudflare.com/ajax/libs/Chart.js/3.7.0/chart.min.js",
+            None,
+        ),
+        (
+            f"{NODE_MODULES}/chartjs-adapter-date-fns/dist/chartjs-adapter-date-fns.bundle.min.js",
+            "https://cdn.jsdelivr.net/npm/chartjs-adapter-date-fns@3.0.0",
+            None,
+        ),
+        (
+            f"{NODE_MODULES}/chartjs-plugin-streaming/dist/chartjs-plugin-streaming.min.js",
+            "https://cdn.jsdelivr.net/npm/chartjs-plugin-streaming@2.0.0",
+            None,
+        ),
+    ],
+    "editor.js": [
+        (
+            f"{NODE_MODULES}/codemirror/lib/codemirror.js",
+            "https://cdnjs.cloudflare.com/ajax/libs/codemirror/6.65.7/codemirror.min.js",
+            None,
+        ),
+        (
+            f"{NODE_MODULES}/codemirror/mode/perl/perl.js",
+            "https://cdnjs.cloudflare.com/ajax/libs/codemirror/6.65.7/mode/perl/perl.min.js",
+            None,
+        ),
+    ],
+    "editor.css": [
+        (
+            f"{NODE_MODULES}/codemirror/lib/codemirror.css",
+            "https://cdnjs.cloudflare.com/ajax/libs/codemirror/6.65.7/codemirror.min.css",
+            None,
+        ),
+        (
+            f"{NODE_MODULES}/codemirror/theme/cobalt.css",
+            "https://cdnjs.cloudflare.com/ajax/libs/codemirror/6.65.7/theme/cobalt.css",
+            None,
+        ),
+    ],
+}
+
+# Bundle name -> built file name, see build_assets().
+manifest = dict()
+
+
+def page_bundles(static_dir=STATIC_DIR):
+    """
+    Each of our own page scripts is its own bundle, ex. 'update-xterm.js'.
+
+    Args:
+        static_dir (str): Path to static dir.
+
+    Returns:
+        dict: Bundle name -> sources, same as BUNDLES.
+    """
+    bundles = dict()
+    for path in sorted(glob.glob(os.path.join(static_dir, "js/*.js"))):
+        name = os.path.basename(path)
+        bundles[name] = [(f"js/{name}", None, None)]
+    return bundles
+
+
+def minify_css(css):
+    """
+    Strips comments & extra whitespace from css. Not a full minifier, but
+    safe for ours.
+
+    Args:
+        css (str): Stylesheet text.
+
+    Returns:
+        str: Smaller stylesheet text.
+    """
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    # Not before a colon, 'a :hover' & 'a:hover' aren't the same selector.
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def minify_js(js, static_dir=STATIC_DIR):
+    """
+    Minifies js with terser, if npm installed it. Returns js untouched
+    otherwise, or if terser fails.
+
+    Args:
+        js (str): Script text.
+        static_dir (str): Path to static dir.
+
+    Returns:
+        str: Minified script text.
+    """
+    terser = os.path.join(static_dir, NODE_MODULES, ".bin/terser")
+    if not os.access(terser, os.X_OK):
+        return js
+
+    proc = subprocess.run(
+        [terser, "--compress", "--mangle"],
+        input=js,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0 or not proc.stdout:
+        return js
+    return proc.stdout
+
+
+def write_atomic(path, data):
+    """Writes bytes to path via a temp file, so readers never see half."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def build_bundle(name, sources, static_dir=STATIC_DIR):
+    """
+    Concatenates, minifies & precompresses one bundle into the dist dir,
+    named after a hash of its sources. Already built bundles aren't rebuilt.
+
+    Args:
+        name (str): Bundle name, ex. 'base.js'.
+        sources (list): Source files, see BUNDLES.
+        static_dir (str): Path to static dir.
+
+    Returns:
+        str: Built file name, None if any source isn't installed.
+    """
+    paths = [os.path.join(static_dir, path) for path, _, _ in sources]
+    if not all(os.path.isfile(path) for path in paths):
+        return None
+
+    texts = []
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            texts.append(f.read())
+        digest.update(texts[-1].encode("utf-8"))
+
+    stem, ext = os.path.splitext(name)
+    built = f"{stem}.{digest.hexdigest()[:12]}{ext}"
+    dist_dir = os.path.join(static_dir, DIST)
+    built_path = os.path.join(dist_dir, built)
+    if os.path.isfile(built_path) and os.path.isfile(built_path + ".gz"):
+        return built
+
+    # Vendor .min files are left as they are.
+    for i, path in enumerate(paths):
+        if ".min." in os.path.basename(path):
+            continue
+        if ext == ".css":
+            texts[i] = minify_css(texts[i])
+        else:
+            texts[i] = minify_js(texts[i], static_dir)
+    sep = ";\n" if ext == ".js" else "\n"
+    data = sep.join(texts).encode("utf-8")
+
+    # Compressed copies first, the plain file marks the bundle as built.
+    write_atomic(built_path + ".gz", gzip.compress(data, 9, mtime=0))
+    brotli = shutil.which("brotli")
+    if brotli:
+        proc = subprocess.run(
+            [brotli, "--best", "--stdout"], input=data, capture_output=True
+        )
+        if proc.returncode == 0:
+            write_atomic(built_path + ".br", proc.stdout)
+    write_atomic(built_path, data)
+    return built
+
+
+def build_assets(static_dir=STATIC_DIR):
+    """
+    Builds every bundle that has all its sources installed, writes the
+    manifest & removes old builds. Cheap when nothing changed, so it's run on
+    every app start.
+
+    Args:
+        static_dir (str): Path to static dir.
+
+    Returns:
+        dict: Bundle name -> built file name.
+    """
+    dist_dir = os.path.join(static_dir, DIST)
+    os.makedirs(dist_dir, exist_ok=True)
+
+    built = dict()
+    bundles = dict(BUNDLES)
+    bundles.update(page_bundles(static_dir))
+    for name, sources in bundles.items():
+        built_name = build_bundle(name, sources, static_dir)
+        if built_name:
+            built[name] = built_name
+
+    write_atomic(
+        os.path.join(dist_dir, MANIFEST), json.dumps(built, indent=4).encode()
+    )
+
+    keep = set(built.values())
+    for path in glob.glob(os.path.join(dist_dir, "*")):
+        filename = os.path.basename(path)
+        if filename == MANIFEST or filename.startswith("tmp"):
+            continue
+        if re.sub(r"\.(gz|br)$", "", filename) not in keep:
+            os.remove(path)
+
+    return built
+
+
+def load_assets(static_dir=STATIC_DIR):
+    """
+    Builds assets & loads the manifest for asset_tags(). Falls back to an
+    already built manifest if static_dir isn't writable.
+
+    Args:
+        static_dir (str): Path to static dir.
+
+    Returns:
+        dict: Bundle name -> built file name.
+    """
+    global manifest
+
+    try:
+        manifest = build_assets(static_dir)
+    except OSError:
+        try:
+            with open(os.path.join(static_dir, DIST, MANIFEST)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = dict()
+    return manifest
+
+
+def asset_sources(name):
+    """
+    Where to load a bundle from. The built file if there is one, otherwise
+    each of its sources from /static or its CDN.
+
+    Args:
+        name (str): Bundle name, ex. 'base.js'.
+
+    Returns:
+        list: (url, integrity hash or None) pairs, in load order.
+    """
+    if name in manifest:
+        return [(f"/static/{DIST}/{manifest[name]}", None)]
+
+    sources = BUNDLES.get(name, [(f"js/{name}", None, None)])
+    urls = []
+    for path, cdn_url, integrity in sources:
+        if cdn_url and not os.path.isfile(os.path.join(STATIC_DIR, path)):
+            urls.append((cdn_url, integrity))
+        else:
+            urls.append((f"/static/{path}", None))
+    return urls
+
+
+def asset_urls(name):
+    """
+    Urls to load a bundle from, see asset_sources().
+
+    Args:
+        name (str): Bundle name, ex. 'base.js'.
+
+    Returns:
+        list: Urls, in load order.
+    """
+    return [url for url, _ in asset_sources(name)]
+
+
+def asset_tags(name):
+    """
+    Jinja global, renders script or stylesheet tags for a bundle. For
+    example, `{{ asset_tags('base.js') }}`. CDN tags carry their integrity
+    hash, so a tampered CDN file isn't run.
+
+    Args:
+        name (str): Bundle name, ex. 'base.js'.
+
+    Returns:
+        Markup: Html tags.
+    """
+    tags = []
+    for url, integrity in asset_sources(name):
+        sri = ""
+        if integrity:
+            sri = f' integrity="{escape(integrity)}" crossorigin="anonymous"'
+        if name.endswith(".css"):
+            tags.append(f'<link rel="stylesheet" href="{escape(url)}"{sri} />')
+        else:
+            tags.append(f'<script src="{escape(url)}"{sri}></script>')
+    return Markup("\n".join(tags))
+
+
+def send_asset(filename, static_dir=STATIC_DIR):
+    """
+    Serves a built asset, precompressed if the client takes it, with
+    immutable cache headers.
+
+    Args:
+        filename (str): Built file name, ex. 'base.1a2b3c4d5e6f.js'.
+        static_dir (str): Path to static dir.
+
+    Returns:
+        Response: File response, 404 if no such asset.
+    """
+    from flask import abort, request, send_file
+    from werkzeug.security import safe_join
+
+    path = safe_join(os.path.join(static_dir, DIST), filename)
+    if path == None or filename == MANIFEST or not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    encoding = None
+    for name, ext in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[name] and os.path.isfile(path + ext):
+            encoding = name
+            path += ext
+            break
+
+    response = send_file(path, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = (
+        f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    )
+    return response
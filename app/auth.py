@@ -3,7 +3,7 @@ import json
 from . import db
 from pathlib import Path
 from datetime import timedelta
-from .models import User, GameServer
+from .models import User, GameServer, Tag
 from .utils import check_require_auth_setup_fields, valid_password
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import (
@@ -150,6 +150,7 @@ def edit_users():
 
     installed_servers = GameServer.query.all()
     all_server_names = [server.install_name for server in installed_servers]
+    all_tags = [tag.name for tag in Tag.query.order_by(Tag.name).all()]
     all_controls = [
         "start",
         "stop",
@@ -207,6 +208,7 @@ def edit_users():
             "edit_users.html",
             user=current_user,
             installed_servers=installed_servers,
+            tags=all_tags,
             controls=all_controls,
             all_users=all_users,
             selected_user=selected_user,
@@ -232,6 +234,7 @@ def edit_users():
         delete_server = request.form.get("delete_server")
         controls = request.form.getlist("controls")
         servers = request.form.getlist("servers")
+        tags = request.form.getlist("tags")
 
         if selected_user == "newuser" or change_user_pass == "true":
             if not check_require_auth_setup_fields(username, password1, password2):
@@ -303,6 +306,15 @@ def edit_users():
                     return redirect(url_for("auth.edit_users"))
             permissions["servers"] = servers
 
+        # Access to every game server with these tags, now or later.
+        permissions["tags"] = []
+        if tags:
+            for tag in tags:
+                if tag not in all_tags:
+                    flash("Invalid Tag Supplied!", category="error")
+                    return redirect(url_for("auth.edit_users"))
+            permissions["tags"] = tags
+
         # Only explicitly set admin if supplied.
         if is_admin != None:
             if is_admin == "true":
@@ -0,0 +1,466 @@
+import os
+import re
+import json
+import time
+import shutil
+import fnmatch
+import tarfile
+import subprocess
+
+from datetime import datetime
+
+# Compression options, auto picks the first available of zstd, pigz, gzip.
+COMPRESSIONS = ("auto", "zstd", "pigz", "gzip")
+EXTENSIONS = {"zstd": "zst", "pigz": "gz", "gzip": "gz"}
+
+# Ex. 'Minecraft.20250101-043000-123.full.tar.zst'
+ARCHIVE_NAME = re.compile(
+    r"^(?P<name>.+)\.(?P<stamp>\d{8}-\d{6}-\d{3})\.(?P<kind>full|incr)\.tar\.(?P<ext>zst|gz)$"
+)
+
+# Steamcmd download caches, logs & LinuxGSM's own backups aren't worth keeping.
+DEFAULT_EXCLUDES = [
+    "backups/*",
+    "log/*",
+    "lgsm/tmp/*",
+    "serverfiles/steamapps/downloading/*",
+    "serverfiles/steamapps/temp/*",
+    "serverfiles/steamapps/shadercache/*",
+]
+
+
+class BackupError(Exception):
+    """Raised when a backup or restore can't be done."""
+
+
+class PaddedReader:
+    """
+    Class used to create objects that read exactly size bytes from a file,
+    padding with zeros if the file shrinks mid read. A streamed tar header
+    can't be taken back once written, so a file a running game server
+    truncates under us must still fill out its entry.
+    """
+
+    def __init__(self, f, size):
+        """
+        Args:
+            f (file): File opened for binary reading.
+            size (int): Bytes promised in the tar header.
+        """
+        self.f = f
+        self.remaining = size
+        self.short = False
+
+    def read(self, n=-1):
+        if n < 0 or n > self.remaining:
+            n = self.remaining
+        data = self.f.read(n)
+        if len(data) < n:
+            self.short = True
+            data += b"\0" * (n - len(data))
+        self.remaining -= n
+        return data
+
+    def __str__(self):
+        return f"PaddedReader(remaining='{self.remaining}', short='{self.short}')"
+
+    def __repr__(self):
+        return f"PaddedReader(remaining='{self.remaining}', short='{self.short}')"
+
+
+def pick_compression(compression="auto"):
+    """
+    Resolves compression setting to a usable compressor.
+
+    Args:
+        compression (str): One of COMPRESSIONS.
+
+    Returns:
+        str: zstd, pigz, or gzip.
+
+    Raises:
+        BackupError: If compression is unknown or its binary isn't installed.
+    """
+    if compression not in COMPRESSIONS:
+        raise BackupError(f"Unknown compression '{compression}'")
+
+    if compression == "auto":
+        for candidate in ("zstd", "pigz"):
+            if shutil.which(candidate):
+                return candidate
+        return "gzip"
+
+    if compression != "gzip" and not shutil.which(compression):
+        raise BackupError(f"{compression} is not installed")
+
+    return compression
+
+
+def is_excluded(rel_path, excludes):
+    """Checks relative path against fnmatch style exclude patterns."""
+    for pattern in excludes:
+        if fnmatch.fnmatch(rel_path, pattern):
+            return True
+        # 'dir/*' also drops the dir entry itself.
+        if pattern.endswith("/*") and rel_path == pattern[:-2]:
+            return True
+    return False
+
+
+def walk_error_handler(src):
+    """
+    Makes an os.walk onerror handler for src. Dirs removed mid walk are just
+    gone, any other error raises, rather than silently leaving a subtree out.
+
+    Args:
+        src (str): Dir being walked.
+
+    Returns:
+        function: Handler raising BackupError.
+    """
+
+    def onerror(e):
+        if isinstance(e, FileNotFoundError) and e.filename != src:
+            return
+        raise BackupError(f"Can't read '{e.filename}': {e.strerror}") from e
+
+    return onerror
+
+
+def scan_tree(src, excludes=()):
+    """
+    Walks src & records size & mtime of everything not excluded.
+
+    Args:
+        src (str): Dir to scan.
+        excludes (list): Exclude patterns, relative to src.
+
+    Returns:
+        dict: Relative path -> [size, mtime_ns, is_dir].
+
+    Raises:
+        BackupError: If a dir can't be read.
+    """
+    manifest = dict()
+    for root, dirs, files in os.walk(src, onerror=walk_error_handler(src)):
+        rel_root = os.path.relpath(root, src)
+        if rel_root == ".":
+            rel_root = ""
+
+        kept = []
+        for name in dirs:
+            rel_path = os.path.join(rel_root, name)
+            if is_excluded(rel_path, excludes):
+                continue
+            path = os.path.join(root, name)
+            stat = os.lstat(path)
+            # Symlinked dirs are stored as links, not descended into.
+            if os.path.islink(path):
+                manifest[rel_path] = [0, stat.st_mtime_ns, False]
+                continue
+            manifest[rel_path] = [0, stat.st_mtime_ns, True]
+            kept.append(name)
+        dirs[:] = kept
+
+        for name in files:
+            rel_path = os.path.join(rel_root, name)
+            if is_excluded(rel_path, excludes):
+                continue
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            manifest[rel_path] = [stat.st_size, stat.st_mtime_ns, False]
+
+    return manifest
+
+
+def list_backups(dest_dir, name):
+    """
+    Lists a server's backups, oldest first.
+
+    Args:
+        dest_dir (str): Dir backups are kept in.
+        name (str): Backup name, ex. game server install name.
+
+    Returns:
+        list: Dicts with archive, path, stamp, kind (full/incr) & size.
+    """
+    if not os.path.isdir(dest_dir):
+        return []
+
+    backups = []
+    for archive in os.listdir(dest_dir):
+        match = ARCHIVE_NAME.match(archive)
+        if not match or match.group("name") != name:
+            continue
+        path = os.path.join(dest_dir, archive)
+        backups.append(
+            {
+                "archive": archive,
+                "path": path,
+                "stamp": match.group("stamp"),
+                "kind": match.group("kind"),
+                "size": os.path.getsize(path),
+            }
+        )
+
+    return sorted(backups, key=lambda backup: backup["stamp"])
+
+
+def manifest_path(archive_path):
+    """Path of the manifest kept next to an archive."""
+    return re.sub(r"\.tar\.(zst|gz)$", ".manifest.json", archive_path)
+
+
+def read_manifest(archive_path):
+    with open(manifest_path(archive_path), "r") as f:
+        return json.load(f)
+
+
+def _open_writer(path, compression, threads):
+    """
+    Opens a streaming tar writer into a compressed file.
+
+    Returns:
+        tuple: (TarFile, output file, compressor Popen or None).
+    """
+    out = open(path, "wb")
+    if compression == "gzip":
+        return tarfile.open(fileobj=out, mode="w|gz"), out, None
+
+    if compression == "zstd":
+        cmd = ["zstd", "-q", "-c", f"-T{threads}"]
+    else:
+        cmd = ["pigz", "-c"] + (["-p", str(threads)] if threads else [])
+
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=out)
+    return tarfile.open(fileobj=proc.stdin, mode="w|"), out, proc
+
+
+def create_backup(
+    src,
+    dest_dir,
+    name,
+    excludes=DEFAULT_EXCLUDES,
+    compression="auto",
+    threads=0,
+    incremental=False,
+):
+    """
+    Streams src straight into a compressed tar archive, no intermediate copy.
+    Incremental backups only hold files whose size or mtime changed since
+    the last backup, plus a list of files deleted since.
+
+    Args:
+        src (str): Dir to back up.
+        dest_dir (str): Dir to write archive & manifest to.
+        name (str): Backup name, ex. game server install name.
+        excludes (list): Exclude patterns, relative to src.
+        compression (str): One of COMPRESSIONS.
+        threads (int): Compressor threads, 0 for one per cpu (zstd & pigz).
+        incremental (bool): Only back up changes since last backup. Falls back
+                            to a full backup if there isn't one yet.
+
+    Returns:
+        dict: Archive path, kind, files & bytes stored, archive size & secs.
+
+    Raises:
+        BackupError: If src is missing or unreadable, or compression
+                     unavailable.
+    """
+    if not os.path.isdir(src):
+        raise BackupError(f"Directory '{src}' does not exist")
+
+    compression = pick_compression(compression)
+    os.makedirs(dest_dir, exist_ok=True)
+    start = time.monotonic()
+
+    previous = None
+    backups = list_backups(dest_dir, name)
+    if incremental and backups:
+        try:
+            previous = read_manifest(backups[-1]["path"])
+        except (OSError, json.JSONDecodeError):
+            previous = None
+
+    kind = "incr" if previous else "full"
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3]
+    archive = f"{name}.{stamp}.{kind}.tar.{EXTENSIONS[compression]}"
+    archive_path = os.path.join(dest_dir, archive)
+    tmp_path = archive_path + ".tmp"
+
+    current = scan_tree(src, excludes)
+    old_files = previous["files"] if previous else dict()
+    changed = [
+        rel_path
+        for rel_path, entry in current.items()
+        if old_files.get(rel_path) != entry and not entry[2]
+    ]
+    deleted = sorted(set(old_files) - set(current))
+
+    stored_files = 0
+    stored_bytes = 0
+    skipped = []
+    failed = False
+    tar, out, proc = _open_writer(tmp_path, compression, threads)
+    try:
+        # Full backups carry the dir entries too, for perms & empty dirs.
+        entries = changed
+        if kind == "full":
+            entries = sorted(current)
+
+        for rel_path in entries:
+            path = os.path.join(src, rel_path)
+            try:
+                tarinfo = tar.gettarinfo(path, arcname=rel_path)
+                if not tarinfo.isreg():
+                    tar.addfile(tarinfo)
+                    continue
+                f = open(path, "rb")
+            except OSError:
+                # Vanished or unreadable, nothing written for it yet.
+                skipped.append(rel_path)
+                current.pop(rel_path, None)
+                continue
+
+            with f:
+                reader = PaddedReader(f, tarinfo.size)
+                tar.addfile(tarinfo, reader)
+
+            if reader.short:
+                # Changed mid backup, make sure the next one picks it up.
+                skipped.append(rel_path)
+                current.pop(rel_path, None)
+            else:
+                stored_files += 1
+                stored_bytes += tarinfo.size
+        tar.close()
+    except BaseException:
+        failed = True
+        # Close it now, or it tries flushing into the closed file when freed.
+        try:
+            tar.close()
+        except Exception:
+            pass
+        raise
+    finally:
+        if proc:
+            proc.stdin.close()
+            proc.wait()
+        out.close()
+        # Don't leave a half written archive behind.
+        if failed:
+            os.remove(tmp_path)
+
+    if proc and proc.returncode != 0:
+        os.remove(tmp_path)
+        raise BackupError(f"{compression} exited with status {proc.returncode}")
+
+    os.rename(tmp_path, archive_path)
+    with open(manifest_path(archive_path), "w") as f:
+        json.dump(
+            {
+                "name": name,
+                "kind": kind,
+                "base": backups[-1]["archive"] if previous else None,
+                "files": current,
+                "deleted": deleted,
+            },
+            f,
+        )
+
+    return {
+        "archive": archive_path,
+        "kind": kind,
+        "files": stored_files,
+        "deleted": len(deleted),
+        "skipped": skipped,
+        "bytes": stored_bytes,
+        "archive_size": os.path.getsize(archive_path),
+        "seconds": round(time.monotonic() - start, 2),
+    }
+
+
+def _open_reader(path):
+    """Opens a streaming tar reader on a compressed archive."""
+    if path.endswith(".gz"):
+        return tarfile.open(path, mode="r|gz"), None
+
+    proc = subprocess.Popen(["zstd", "-q", "-d", "-c", path], stdout=subprocess.PIPE)
+    return tarfile.open(fileobj=proc.stdout, mode="r|"), proc
+
+
+def restore_backup(dest_dir, name, target, stamp=None):
+    """
+    Restores a backup into target, applying the last full backup & every
+    incremental after it, up to & including stamp.
+
+    Args:
+        dest_dir (str): Dir backups are kept in.
+        name (str): Backup name.
+        target (str): Dir to restore into.
+        stamp (str): Backup stamp to restore to, newest if None.
+
+    Returns:
+        list: Archives applied, in order.
+
+    Raises:
+        BackupError: If no matching backup exists.
+    """
+    backups = list_backups(dest_dir, name)
+    if stamp:
+        backups = [backup for backup in backups if backup["stamp"] <= stamp]
+
+    fulls = [i for i, backup in enumerate(backups) if backup["kind"] == "full"]
+    if not fulls:
+        raise BackupError(f"No full backup found for '{name}'")
+
+    chain = backups[fulls[-1] :]
+    os.makedirs(target, exist_ok=True)
+    for backup in chain:
+        tar, proc = _open_reader(backup["path"])
+        with tar:
+            tar.extractall(target, filter="data")
+        if proc:
+            proc.wait()
+
+        for rel_path in read_manifest(backup["path"]).get("deleted", []):
+            path = os.path.join(target, rel_path)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            elif os.path.lexists(path):
+                os.remove(path)
+
+    return [backup["archive"] for backup in chain]
+
+
+def prune_backups(dest_dir, name, keep):
+    """
+    Enforces retention. Keeps the newest keep full backups & the incrementals
+    that build on them, removes everything older.
+
+    Args:
+        dest_dir (str): Dir backups are kept in.
+        name (str): Backup name.
+        keep (int): Full backups to keep.
+
+    Returns:
+        list: Archives removed.
+    """
+    backups = list_backups(dest_dir, name)
+    fulls = [backup for backup in backups if backup["kind"] == "full"]
+    if len(fulls) <= keep or keep < 1:
+        return []
+
+    cutoff = fulls[-keep]["stamp"]
+    removed = []
+    for backup in backups:
+        if backup["stamp"] >= cutoff:
+            break
+        os.remove(backup["path"])
+        if os.path.isfile(manifest_path(backup["path"])):
+            os.remove(manifest_path(backup["path"]))
+        removed.append(backup["archive"])
+
+    return removed
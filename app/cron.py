@@ -0,0 +1,174 @@
+from datetime import timedelta
+
+# Shorthand aliases, same as most crons.
+ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+MONTH_NAMES = [
+    "jan",
+    "feb",
+    "mar",
+    "apr",
+    "may",
+    "jun",
+    "jul",
+    "aug",
+    "sep",
+    "oct",
+    "nov",
+    "dec",
+]
+DAY_NAMES = ["sun", "mon", "tue", "wed", "thu", "fri", "sat"]
+
+# Field name, min, max, names (index + min = value).
+FIELDS = [
+    ("minute", 0, 59, None),
+    ("hour", 0, 23, None),
+    ("day", 1, 31, None),
+    ("month", 1, 12, MONTH_NAMES),
+    ("weekday", 0, 6, DAY_NAMES),
+]
+
+
+class CronExpr:
+    """
+    Class used to create objects that parse standard five field cron
+    expressions (minute hour day month weekday) and work out when they next
+    fire. Supports *, lists, ranges, steps, month & day names, and the usual
+    @daily style aliases. Like cron, if both day & weekday are restricted a
+    time matches when either one does.
+    """
+
+    def __init__(self, expr):
+        """
+        Args:
+            expr (str): Cron expression, ex. '30 4 * * mon-fri'.
+
+        Raises:
+            ValueError: If expression is invalid.
+        """
+        self.expr = expr.strip()
+        fields = ALIASES.get(self.expr.lower(), self.expr).split()
+        if len(fields) != 5:
+            raise ValueError(f"Expected 5 fields, got {len(fields)}")
+
+        self.values = dict()
+        for field, (name, low, high, names) in zip(fields, FIELDS):
+            self.values[name] = self._parse_field(field, low, high, names)
+
+        # Cron allows 7 for Sunday too.
+        if 7 in self.values["weekday"]:
+            self.values["weekday"].discard(7)
+            self.values["weekday"].add(0)
+
+        self.day_star = fields[2] == "*"
+        self.weekday_star = fields[4] == "*"
+
+    def _parse_value(self, value, low, high, names):
+        """Parses single number or name into an int."""
+        if names and value.lower() in names:
+            return names.index(value.lower()) + low
+
+        number = int(value)
+        # Weekday 7 is Sunday, let through & fixed up in __init__.
+        if number < low or number > high + (1 if names == DAY_NAMES else 0):
+            raise ValueError(f"Value {number} out of range {low}-{high}")
+        return number
+
+    def _parse_field(self, field, low, high, names):
+        """Parses a single cron field into a set of allowed values."""
+        allowed = set()
+
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step = part.split("/", 1)
+                step = int(step)
+                if step < 1:
+                    raise ValueError(f"Invalid step {step}")
+
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start, end = part.split("-", 1)
+                start = self._parse_value(start, low, high, names)
+                end = self._parse_value(end, low, high, names)
+                if start > end:
+                    raise ValueError(f"Invalid range {part}")
+            else:
+                start = self._parse_value(part, low, high, names)
+                # Plain 'n/step' means n through max.
+                end = high if step > 1 else start
+
+            allowed.update(range(start, end + 1, step))
+
+        return allowed
+
+    def _day_matches(self, dt):
+        """Checks day of month & day of week, using cron's either/or rule."""
+        day_ok = dt.day in self.values["day"]
+        # Python Monday=0, cron Sunday=0.
+        weekday_ok = (dt.weekday() + 1) % 7 in self.values["weekday"]
+
+        if self.day_star and self.weekday_star:
+            return True
+        if self.day_star:
+            return weekday_ok
+        if self.weekday_star:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, dt):
+        """
+        Works out the next time after dt the expression fires.
+
+        Args:
+            dt (datetime): Time to search from (exclusive).
+
+        Returns:
+            datetime: Next fire time, with dt's tzinfo.
+
+        Raises:
+            ValueError: If expression never fires (ex. Feb 30th).
+        """
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Five years covers every leap year & weekday combination.
+        limit = dt + timedelta(days=366 * 5)
+
+        while dt < limit:
+            if dt.month not in self.values["month"]:
+                # Jump to start of next month.
+                if dt.month == 12:
+                    dt = dt.replace(year=dt.year + 1, month=1, day=1, hour=0, minute=0)
+                else:
+                    dt = dt.replace(month=dt.month + 1, day=1, hour=0, minute=0)
+                continue
+
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+
+            if dt.hour not in self.values["hour"]:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+
+            if dt.minute not in self.values["minute"]:
+                dt += timedelta(minutes=1)
+                continue
+
+            return dt
+
+        raise ValueError(f"Cron expression '{self.expr}' never fires")
+
+    def __str__(self):
+        return f"CronExpr(expr='{self.expr}')"
+
+    def __repr__(self):
+        return f"CronExpr(expr='{self.expr}')"
@@ -0,0 +1,645 @@
+import os
+import stat
+import time
+import zlib
+import fcntl
+import sqlite3
+import hashlib
+
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from .backups import BackupError, is_excluded, walk_error_handler
+
+# Content defined chunking sizes. Cut points come from the data itself, so an
+# edit only changes the chunks around it & the rest of the file dedups.
+MIN_CHUNK = 16 * 1024
+AVG_CHUNK = 64 * 1024
+MAX_CHUNK = 256 * 1024
+
+# Gear hash shifts left one bit per byte, so its high bits cover the most
+# bytes. Stricter mask below avg size, looser above, keeps sizes near avg.
+MASK64 = (1 << 64) - 1
+MASK_S = ((1 << 18) - 1) << 46
+MASK_L = ((1 << 14) - 1) << 50
+
+# Fixed, so cut points are stable between runs & versions.
+GEAR = [
+    int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], "big")
+    for i in range(256)
+]
+
+# Roll over to a new pack file past this size.
+PACK_SIZE = 64 * 1024 * 1024
+# Rewrite packs that are less than this fraction live during gc.
+REPACK_RATIO = 0.5
+READ_SIZE = 4 * MAX_CHUNK
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS packs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    size INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    hash BLOB PRIMARY KEY,
+    pack INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contents (
+    id BLOB PRIMARY KEY,
+    size INTEGER NOT NULL,
+    chunks BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    created REAL NOT NULL,
+    files INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    new_chunks INTEGER NOT NULL,
+    new_bytes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    snapshot INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    type TEXT NOT NULL,
+    mode INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    content BLOB,
+    target TEXT,
+    PRIMARY KEY (snapshot, path)
+);
+CREATE INDEX IF NOT EXISTS snapshots_name ON snapshots (name);
+CREATE INDEX IF NOT EXISTS files_content ON files (content);
+"""
+
+
+def find_cut(data, start, end):
+    """
+    Finds the end of the chunk starting at start, FastCDC style.
+
+    Args:
+        data (bytes): Buffer to chunk.
+        start (int): Chunk start offset.
+        end (int): End of data available. Must be at least start + MAX_CHUNK
+                   unless it's the end of the file.
+
+    Returns:
+        int: Offset the chunk ends at.
+    """
+    size = end - start
+    if size <= MIN_CHUNK:
+        return end
+
+    limit = start + min(size, MAX_CHUNK)
+    normal = start + min(size, AVG_CHUNK)
+    gear = GEAR
+    h = 0
+    # No hashing below min size, cuts there aren't allowed anyway.
+    i = start + MIN_CHUNK
+    for byte in data[i:normal]:
+        h = ((h << 1) + gear[byte]) & MASK64
+        i += 1
+        if not h & MASK_S:
+            return i
+    for byte in data[normal:limit]:
+        h = ((h << 1) + gear[byte]) & MASK64
+        i += 1
+        if not h & MASK_L:
+            return i
+    return limit
+
+
+def iter_chunks(f):
+    """
+    Splits a file into content defined chunks.
+
+    Args:
+        f (file): File opened for binary reading.
+
+    Yields:
+        bytes: Chunk data.
+    """
+    buf = b""
+    eof = False
+    while True:
+        if not eof and len(buf) < MAX_CHUNK:
+            data = f.read(READ_SIZE)
+            if data:
+                buf += data
+                continue
+            eof = True
+
+        if not buf:
+            return
+
+        pos = 0
+        # Only cut with a full max chunk in hand, so read sizes can't move
+        # cut points.
+        while pos < len(buf) and (eof or len(buf) - pos >= MAX_CHUNK):
+            cut = find_cut(buf, pos, len(buf))
+            yield buf[pos:cut]
+            pos = cut
+        buf = buf[pos:]
+
+
+def _safe_rel_path(rel_path):
+    """Rejects paths that would land outside the restore target."""
+    parts = rel_path.split(os.sep)
+    if os.path.isabs(rel_path) or ".." in parts or not rel_path:
+        raise BackupError(f"Refusing unsafe path '{rel_path}' in snapshot")
+    return rel_path
+
+
+class DedupStore:
+    """
+    Class used to create objects that keep deduplicated snapshots of game
+    server installs. Files are cut into content defined chunks, each unique
+    chunk is stored once, zlib compressed, in append only pack files & a
+    SQLite index maps chunk hashes to pack offsets. A snapshot only stores a
+    file list pointing at chunks, so an hourly snapshot of a big world with a
+    few changed regions only costs the changed chunks. Files whose size &
+    mtime haven't changed since the last snapshot aren't even read.
+    """
+
+    def __init__(self, store_dir, level=6):
+        """
+        Args:
+            store_dir (str): Dir to keep packs & index in.
+            level (int): Zlib compression level for chunks.
+        """
+        self.store_dir = store_dir
+        self.level = level
+        self.pack_dir = os.path.join(store_dir, "packs")
+        self.index_file = os.path.join(store_dir, "index.db")
+        os.makedirs(self.pack_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Index connection, committed on success & always closed."""
+        conn = sqlite3.connect(self.index_file, timeout=60)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _locked(self):
+        """Store wide lock, so snapshots & gc from app & cli don't overlap."""
+        with open(os.path.join(self.store_dir, "lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _pack_path(self, pack_id):
+        return os.path.join(self.pack_dir, f"{pack_id:08d}.pack")
+
+    def _new_pack(self, conn):
+        pack_id = conn.execute("INSERT INTO packs (size) VALUES (0)").lastrowid
+        return pack_id, open(self._pack_path(pack_id), "ab")
+
+    def _close_pack(self, conn, pack_id, pack):
+        pack.flush()
+        os.fsync(pack.fileno())
+        conn.execute(
+            "UPDATE packs SET size = ? WHERE id = ?", (pack.tell(), pack_id)
+        )
+        pack.close()
+
+    def _previous_files(self, conn, name):
+        """Size, mtime & content of regular files in name's last snapshot."""
+        row = conn.execute(
+            "SELECT id FROM snapshots WHERE name = ? ORDER BY id DESC LIMIT 1",
+            (name,),
+        ).fetchone()
+        if row == None:
+            return dict()
+
+        previous = dict()
+        for file_row in conn.execute(
+            "SELECT path, size, mtime_ns, content FROM files "
+            "WHERE snapshot = ? AND type = 'f'",
+            (row["id"],),
+        ):
+            previous[file_row["path"]] = (
+                file_row["size"],
+                file_row["mtime_ns"],
+                file_row["content"],
+            )
+        return previous
+
+    def snapshot(self, src, name, excludes=()):
+        """
+        Takes a snapshot of src.
+
+        Args:
+            src (str): Dir to snapshot.
+            name (str): Snapshot name, ex. game server install name.
+            excludes (list): Exclude patterns, relative to src.
+
+        Returns:
+            dict: Snapshot id, files, logical size, new chunks & bytes
+                  written to packs, files reused unread & secs.
+
+        Raises:
+            BackupError: If src doesn't exist or a dir in it can't be read.
+                         Nothing is recorded for a failed snapshot.
+        """
+        if not os.path.isdir(src):
+            raise BackupError(f"Directory '{src}' does not exist")
+
+        start = time.monotonic()
+        with self._locked(), self._connect() as conn:
+            previous = self._previous_files(conn, name)
+            pack_id, pack = self._new_pack(conn)
+            pack_ids = [pack_id]
+            entries = []
+            totals = {"size": 0, "new_chunks": 0, "new_bytes": 0, "reused": 0}
+
+            def store_chunk(data):
+                nonlocal pack_id, pack
+                digest = hashlib.sha256(data).digest()
+                if conn.execute(
+                    "SELECT 1 FROM chunks WHERE hash = ?", (digest,)
+                ).fetchone():
+                    return digest
+
+                if pack.tell() >= PACK_SIZE:
+                    self._close_pack(conn, pack_id, pack)
+                    pack_id, pack = self._new_pack(conn)
+                    pack_ids.append(pack_id)
+
+                packed = zlib.compress(data, self.level)
+                offset = pack.tell()
+                pack.write(packed)
+                conn.execute(
+                    "INSERT INTO chunks (hash, pack, offset, length, size) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (digest, pack_id, offset, len(packed), len(data)),
+                )
+                totals["new_chunks"] += 1
+                totals["new_bytes"] += len(packed)
+                return digest
+
+            def store_file(path, rel_path, st):
+                old = previous.get(rel_path)
+                if old and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+                    totals["reused"] += 1
+                    return st.st_size, st.st_mtime_ns, old[2]
+
+                digests = []
+                size = 0
+                with open(path, "rb") as f:
+                    for data in iter_chunks(f):
+                        digests.append(store_chunk(data))
+                        size += len(data)
+
+                mtime_ns = st.st_mtime_ns
+                after = os.lstat(path)
+                if after.st_mtime_ns != mtime_ns or after.st_size != size:
+                    # Written to mid read, make sure next snapshot rereads it.
+                    mtime_ns = 0
+
+                chunk_list = b"".join(digests)
+                content = hashlib.sha256(chunk_list).digest()
+                conn.execute(
+                    "INSERT OR IGNORE INTO contents (id, size, chunks) "
+                    "VALUES (?, ?, ?)",
+                    (content, size, chunk_list),
+                )
+                return size, mtime_ns, content
+
+            try:
+                for root, dirs, files in os.walk(
+                    src, onerror=walk_error_handler(src)
+                ):
+                    rel_root = os.path.relpath(root, src)
+                    if rel_root == ".":
+                        rel_root = ""
+                    dirs[:] = [
+                        d
+                        for d in dirs
+                        if not is_excluded(os.path.join(rel_root, d), excludes)
+                    ]
+
+                    for entry_name in sorted(dirs) + sorted(files):
+                        rel_path = os.path.join(rel_root, entry_name)
+                        if is_excluded(rel_path, excludes):
+                            continue
+                        path = os.path.join(root, entry_name)
+                        try:
+                            st = os.lstat(path)
+                            if stat.S_ISLNK(st.st_mode):
+                                entry = ("l", 0, st.st_mtime_ns, None, os.readlink(path))
+                            elif stat.S_ISDIR(st.st_mode):
+                                entry = ("d", 0, st.st_mtime_ns, None, None)
+                            elif stat.S_ISREG(st.st_mode):
+                                size, mtime_ns, content = store_file(path, rel_path, st)
+                                entry = ("f", size, mtime_ns, content, None)
+                            else:
+                                continue
+                        except FileNotFoundError:
+                            # Deleted while we walked, nothing to keep.
+                            continue
+
+                        kind, size, mtime_ns, content, target = entry
+                        totals["size"] += size
+                        entries.append(
+                            (
+                                rel_path,
+                                kind,
+                                stat.S_IMODE(st.st_mode),
+                                mtime_ns,
+                                size,
+                                content,
+                                target,
+                            )
+                        )
+            except BaseException:
+                # Index changes roll back, so the packs written are orphans.
+                pack.close()
+                for orphan_id in pack_ids:
+                    os.remove(self._pack_path(orphan_id))
+                raise
+            self._close_pack(conn, pack_id, pack)
+
+            snapshot_id = conn.execute(
+                "INSERT INTO snapshots "
+                "(name, created, files, size, new_chunks, new_bytes) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    name,
+                    time.time(),
+                    len(entries),
+                    totals["size"],
+                    totals["new_chunks"],
+                    totals["new_bytes"],
+                ),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO files "
+                "(snapshot, path, type, mode, mtime_ns, size, content, target) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(snapshot_id,) + entry for entry in entries],
+            )
+
+        return {
+            "id": snapshot_id,
+            "name": name,
+            "files": len(entries),
+            "size": totals["size"],
+            "new_chunks": totals["new_chunks"],
+            "new_bytes": totals["new_bytes"],
+            "reused": totals["reused"],
+            "seconds": round(time.monotonic() - start, 2),
+        }
+
+    def snapshots(self, name=None):
+        """
+        Lists snapshots, newest first.
+
+        Args:
+            name (str): Only list snapshots with this name.
+
+        Returns:
+            list: Snapshot dicts (id, name, created, files, size, new_chunks,
+                  new_bytes).
+        """
+        query = "SELECT * FROM snapshots"
+        params = ()
+        if name != None:
+            query += " WHERE name = ?"
+            params = (name,)
+
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY id DESC", params).fetchall()
+
+        snapshots = []
+        for row in rows:
+            snapshot = dict(row)
+            snapshot["created"] = datetime.fromtimestamp(
+                row["created"], timezone.utc
+            ).isoformat()
+            snapshots.append(snapshot)
+        return snapshots
+
+    def restore(self, snapshot_id, target):
+        """
+        Restores a snapshot into target, checking every chunk's hash.
+
+        Args:
+            snapshot_id (int): Snapshot to restore.
+            target (str): Dir to restore into.
+
+        Returns:
+            int: Files restored.
+
+        Raises:
+            BackupError: If snapshot is missing or a chunk is damaged.
+        """
+        with self._connect() as conn:
+            if conn.execute(
+                "SELECT 1 FROM snapshots WHERE id = ?", (snapshot_id,)
+            ).fetchone() == None:
+                raise BackupError(f"No snapshot with id {snapshot_id}")
+
+            rows = conn.execute(
+                "SELECT * FROM files WHERE snapshot = ? ORDER BY path",
+                (snapshot_id,),
+            ).fetchall()
+
+            os.makedirs(target, exist_ok=True)
+            packs = dict()
+            restored = 0
+            try:
+                for row in rows:
+                    path = os.path.join(target, _safe_rel_path(row["path"]))
+                    if row["type"] == "d":
+                        os.makedirs(path, exist_ok=True)
+                        continue
+
+                    if os.path.lexists(path):
+                        os.remove(path)
+                    if row["type"] == "l":
+                        os.symlink(row["target"], path)
+                        continue
+
+                    self._restore_file(conn, packs, row, path)
+                    restored += 1
+            finally:
+                for pack in packs.values():
+                    pack.close()
+
+        # Dirs last, writing files into them bumps their mtime.
+        for row in reversed(rows):
+            path = os.path.join(target, row["path"])
+            if row["type"] == "l":
+                os.utime(path, ns=(row["mtime_ns"],) * 2, follow_symlinks=False)
+                continue
+            os.chmod(path, row["mode"])
+            os.utime(path, ns=(row["mtime_ns"],) * 2)
+
+        return restored
+
+    def _restore_file(self, conn, packs, row, path):
+        content = conn.execute(
+            "SELECT chunks FROM contents WHERE id = ?", (row["content"],)
+        ).fetchone()
+        if content == None:
+            raise BackupError(f"Missing content for '{row['path']}'")
+
+        chunk_list = content["chunks"]
+        with open(path, "wb") as f:
+            for i in range(0, len(chunk_list), 32):
+                digest = chunk_list[i : i + 32]
+                chunk = conn.execute(
+                    "SELECT pack, offset, length FROM chunks WHERE hash = ?",
+                    (digest,),
+                ).fetchone()
+                if chunk == None:
+                    raise BackupError(f"Missing chunk for '{row['path']}'")
+
+                if chunk["pack"] not in packs:
+                    packs[chunk["pack"]] = open(self._pack_path(chunk["pack"]), "rb")
+                pack = packs[chunk["pack"]]
+                pack.seek(chunk["offset"])
+                try:
+                    data = zlib.decompress(pack.read(chunk["length"]))
+                except zlib.error:
+                    data = b""
+                if hashlib.sha256(data).digest() != digest:
+                    raise BackupError(f"Damaged chunk in '{row['path']}'")
+                f.write(data)
+
+    def forget(self, snapshot_id):
+        """Drops a snapshot. Its chunks stay until the next gc()."""
+        with self._locked(), self._connect() as conn:
+            conn.execute("DELETE FROM files WHERE snapshot = ?", (snapshot_id,))
+            conn.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+
+    def prune(self, name, keep):
+        """
+        Drops all but the newest keep snapshots of name.
+
+        Returns:
+            list: Ids of snapshots dropped.
+        """
+        if keep < 1:
+            return []
+
+        dropped = [snapshot["id"] for snapshot in self.snapshots(name)[keep:]]
+        for snapshot_id in dropped:
+            self.forget(snapshot_id)
+        return dropped
+
+    def gc(self):
+        """
+        Removes chunks no snapshot uses any more. Packs left with no live
+        chunks are deleted, mostly dead packs are rewritten with just their
+        live chunks.
+
+        Returns:
+            dict: Chunks removed, packs removed & rewritten, bytes freed.
+        """
+        result = {"chunks": 0, "packs_removed": 0, "packs_rewritten": 0, "bytes": 0}
+        with self._locked(), self._connect() as conn:
+            conn.execute(
+                "DELETE FROM contents WHERE id NOT IN "
+                "(SELECT content FROM files WHERE content IS NOT NULL)"
+            )
+            live = set()
+            for row in conn.execute("SELECT chunks FROM contents"):
+                chunk_list = row["chunks"]
+                for i in range(0, len(chunk_list), 32):
+                    live.add(chunk_list[i : i + 32])
+
+            dead = [
+                row["hash"]
+                for row in conn.execute("SELECT hash FROM chunks")
+                if row["hash"] not in live
+            ]
+            conn.executemany(
+                "DELETE FROM chunks WHERE hash = ?", [(digest,) for digest in dead]
+            )
+            result["chunks"] = len(dead)
+
+            for pack_row in conn.execute("SELECT id, size FROM packs").fetchall():
+                pack_id = pack_row["id"]
+                live_bytes = conn.execute(
+                    "SELECT COALESCE(SUM(length), 0) FROM chunks WHERE pack = ?",
+                    (pack_id,),
+                ).fetchone()[0]
+                if live_bytes == 0:
+                    conn.execute("DELETE FROM packs WHERE id = ?", (pack_id,))
+                    result["packs_removed"] += 1
+                elif live_bytes < pack_row["size"] * REPACK_RATIO:
+                    self._repack(conn, pack_id)
+                    result["packs_rewritten"] += 1
+                else:
+                    continue
+                result["bytes"] += pack_row["size"] - live_bytes
+
+            conn.commit()
+            # Only unlink once the index no longer points into them. Also
+            # clears packs left by snapshots that died before committing.
+            known = {row["id"] for row in conn.execute("SELECT id FROM packs")}
+            for pack_file in os.listdir(self.pack_dir):
+                pack_id, ext = os.path.splitext(pack_file)
+                if ext == ".pack" and int(pack_id) not in known:
+                    os.remove(os.path.join(self.pack_dir, pack_file))
+
+        return result
+
+    def _repack(self, conn, old_id):
+        new_id, new_pack = self._new_pack(conn)
+        rows = conn.execute(
+            "SELECT hash, offset, length FROM chunks WHERE pack = ? ORDER BY offset",
+            (old_id,),
+        ).fetchall()
+        with open(self._pack_path(old_id), "rb") as old_pack:
+            for row in rows:
+                old_pack.seek(row["offset"])
+                offset = new_pack.tell()
+                new_pack.write(old_pack.read(row["length"]))
+                conn.execute(
+                    "UPDATE chunks SET pack = ?, offset = ? WHERE hash = ?",
+                    (new_id, offset, row["hash"]),
+                )
+        self._close_pack(conn, new_id, new_pack)
+        conn.execute("DELETE FROM packs WHERE id = ?", (old_id,))
+
+    def stats(self):
+        """
+        Gets store totals.
+
+        Returns:
+            dict: Snapshots, unique chunks, stored (compressed) & logical
+                  (uncompressed) chunk bytes.
+        """
+        with self._connect() as conn:
+            snapshots = conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+            row = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0), COALESCE(SUM(size), 0) "
+                "FROM chunks"
+            ).fetchone()
+        return {
+            "snapshots": snapshots,
+            "chunks": row[0],
+            "stored_bytes": row[1],
+            "logical_bytes": row[2],
+        }
+
+    def __str__(self):
+        return f"DedupStore(store_dir='{self.store_dir}')"
+
+    def __repr__(self):
+        return f"DedupStore(store_dir='{self.store_dir}')"
@@ -0,0 +1,261 @@
+import os
+import re
+import json
+import shutil
+import subprocess
+
+# Ex. '	"buildid"		"14567890"'
+ACF_BUILDID = re.compile(r'"buildid"\s+"(\d+)"')
+# Ex. 'appid="896660"'
+CFG_APPID = re.compile(r'^appid="?(\d+)"?', re.M)
+
+# How cached files are put in place.
+#   auto: Reflink (copy on write) where the filesystem supports it, else copy.
+#   reflink: Reflink only, fail if the filesystem can't.
+#   copy: Plain copy.
+# Never hardlinks, installs & cache must not share inodes since seeds are
+# owned by the game server's user & the cache by root.
+LINK_MODES = ("auto", "reflink", "copy")
+INDEX_FILE = "index.json"
+CP = "/usr/bin/cp"
+
+
+def read_app_id(install_path, script_name):
+    """
+    Gets steam app id from a LinuxGSM install's _default.cfg.
+
+    Args:
+        install_path (str): Game server install dir.
+        script_name (str): LinuxGSM script name, ex. 'mcserver'.
+
+    Returns:
+        str: App id, None if not a steamcmd game or not installed yet.
+    """
+    default_cfg = os.path.join(
+        install_path, "lgsm/config-lgsm", script_name, "_default.cfg"
+    )
+    if not os.path.isfile(default_cfg):
+        return None
+
+    with open(default_cfg, "r") as f:
+        match = CFG_APPID.search(f.read())
+
+    return match.group(1) if match else None
+
+
+def read_build_id(serverfiles, app_id):
+    """
+    Gets installed build id from steamcmd's app manifest.
+
+    Args:
+        serverfiles (str): Dir steamcmd installed app into.
+        app_id (str): Steam app id.
+
+    Returns:
+        str: Build id, None if no manifest.
+    """
+    manifest = os.path.join(serverfiles, "steamapps", f"appmanifest_{app_id}.acf")
+    if not os.path.isfile(manifest):
+        return None
+
+    with open(manifest, "r") as f:
+        match = ACF_BUILDID.search(f.read())
+
+    return match.group(1) if match else None
+
+
+class DepotCache:
+    """
+    Class used to create objects that manage the shared steamcmd download
+    cache. Finished installs are stored under <cache_dir>/<app id>/<build id>,
+    and later installs of the same game are seeded from the newest build
+    before steamcmd runs. Steamcmd's validate pass then only fetches what
+    changed since that build.
+    """
+
+    def __init__(self, cache_dir, link_mode="auto", keep=1):
+        """
+        Args:
+            cache_dir (str): Dir to keep cached builds in.
+            link_mode (str): One of LINK_MODES.
+            keep (int): Builds to keep per app id, older ones are pruned.
+        """
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"Invalid link mode '{link_mode}'")
+
+        self.cache_dir = cache_dir
+        self.link_mode = link_mode
+        self.keep = max(1, keep)
+
+    def _read_index(self):
+        """Reads script name to app id index."""
+        index_file = os.path.join(self.cache_dir, INDEX_FILE)
+        if not os.path.isfile(index_file):
+            return dict()
+
+        try:
+            with open(index_file, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return dict()
+
+    def _write_index(self, index):
+        """Writes script name to app id index, atomically."""
+        index_file = os.path.join(self.cache_dir, INDEX_FILE)
+        tmp_file = index_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(index, f, indent=4)
+        os.replace(tmp_file, index_file)
+
+    def app_id_for(self, script_name):
+        """App id of a previously cached script, None if unknown."""
+        return self._read_index().get(script_name)
+
+    def builds(self, app_id):
+        """
+        Lists cached builds of an app, newest first.
+
+        Args:
+            app_id (str): Steam app id.
+
+        Returns:
+            list: Build ids.
+        """
+        app_dir = os.path.join(self.cache_dir, str(app_id))
+        if not os.path.isdir(app_dir):
+            return []
+
+        # Dot dirs are stores still in progress.
+        builds = [
+            name
+            for name in os.listdir(app_dir)
+            if not name.startswith(".") and os.path.isdir(os.path.join(app_dir, name))
+        ]
+        return sorted(
+            builds,
+            key=lambda name: os.path.getmtime(os.path.join(app_dir, name)),
+            reverse=True,
+        )
+
+    def _copy_tree(self, src, dest, link_mode):
+        """
+        Copies src dir to dest (which must not exist) using link_mode.
+
+        Raises:
+            OSError: If copy fails.
+        """
+        if link_mode in ("auto", "reflink"):
+            proc = subprocess.run(
+                [CP, "-a", "--reflink=always", src, dest],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            if proc.returncode == 0:
+                return
+
+            shutil.rmtree(dest, ignore_errors=True)
+            if link_mode == "reflink":
+                raise OSError(f"Reflink copy failed: {proc.stderr.strip()}")
+
+        shutil.copytree(src, dest, symlinks=True)
+
+    def _chown_tree(self, path, uid, gid):
+        """Recursively chowns path & everything in it."""
+        for root, dirs, names in os.walk(path):
+            os.chown(root, uid, gid)
+            for name in names:
+                os.chown(os.path.join(root, name), uid, gid, follow_symlinks=False)
+
+    def seed(self, script_name, serverfiles, owner=None):
+        """
+        Seeds a new install's serverfiles dir from the newest cached build.
+
+        Args:
+            script_name (str): LinuxGSM script name, ex. 'vhserver'.
+            serverfiles (str): Dir steamcmd will install into. Left alone if
+                               it already has files in it.
+            owner (tuple): (uid, gid) to give seeded files to.
+
+        Returns:
+            str: Build id seeded from, None if nothing cached.
+        """
+        app_id = self.app_id_for(script_name)
+        if app_id == None:
+            return None
+
+        builds = self.builds(app_id)
+        if not builds:
+            return None
+
+        if os.path.isdir(serverfiles) and os.listdir(serverfiles):
+            return None
+
+        if os.path.isdir(serverfiles):
+            os.rmdir(serverfiles)
+
+        build_id = builds[0]
+        self._copy_tree(
+            os.path.join(self.cache_dir, app_id, build_id), serverfiles, self.link_mode
+        )
+
+        if owner:
+            self._chown_tree(serverfiles, *owner)
+
+        return build_id
+
+    def store(self, script_name, app_id, serverfiles):
+        """
+        Stores a finished install's serverfiles in the cache, keyed by app id
+        & the build id steamcmd installed.
+
+        Args:
+            script_name (str): LinuxGSM script name, ex. 'vhserver'.
+            app_id (str): Steam app id.
+            serverfiles (str): Dir steamcmd installed into.
+
+        Returns:
+            str: Build id stored, None if no build id could be found.
+        """
+        build_id = read_build_id(serverfiles, app_id)
+        if build_id == None:
+            return None
+
+        app_dir = os.path.join(self.cache_dir, app_id)
+        build_dir = os.path.join(app_dir, build_id)
+        os.makedirs(app_dir, exist_ok=True)
+
+        if not os.path.isdir(build_dir):
+            tmp_dir = os.path.join(app_dir, f".{build_id}.tmp")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            self._copy_tree(serverfiles, tmp_dir, self.link_mode)
+            os.rename(tmp_dir, build_dir)
+            self._chown_tree(build_dir, os.getuid(), os.getgid())
+        else:
+            # Mark as newest.
+            os.utime(build_dir)
+
+        index = self._read_index()
+        index[script_name] = app_id
+        self._write_index(index)
+
+        self.prune(app_id)
+        return build_id
+
+    def prune(self, app_id):
+        """
+        Removes all but the newest keep builds of an app.
+
+        Returns:
+            list: Build ids removed.
+        """
+        removed = self.builds(app_id)[self.keep :]
+        for build_id in removed:
+            shutil.rmtree(os.path.join(self.cache_dir, app_id, build_id))
+        return removed
+
+    def __str__(self):
+        return f"DepotCache(cache_dir='{self.cache_dir}', link_mode='{self.link_mode}')"
+
+    def __repr__(self):
+        return f"DepotCache(cache_dir='{self.cache_dir}', link_mode='{self.link_mode}')"
@@ -0,0 +1,142 @@
+import re
+import time
+
+from collections import deque
+
+# Ex. ' Update state (0x61) downloading, progress: 43.12 (4521984000 / 10487365632)'
+STEAMCMD_PROGRESS = re.compile(
+    r"Update state \((0x[0-9a-fA-F]+)\) ([a-z ]+), progress: ([\d.]+)"
+    r"(?: \((\d+) / (\d+)\))?"
+)
+# Ex. "Success! App '896660' fully installed."
+STEAMCMD_SUCCESS = re.compile(r"Success! App '(\d+)' fully installed")
+
+# Only look this far back through the output for the latest progress line.
+MAX_LINES_SCANNED = 200
+
+
+def parse_progress_line(line):
+    """
+    Parses a single line of steamcmd output into structured progress.
+
+    Args:
+        line (str): Line of install output.
+
+    Returns:
+        dict: Stage, percent, bytes_done & bytes_total, None if line isn't a
+              progress line.
+    """
+    match = STEAMCMD_PROGRESS.search(line)
+    if match:
+        state, stage, percent, done, total = match.groups()
+        return {
+            "stage": stage.strip(),
+            "percent": float(percent),
+            "bytes_done": int(done) if done else None,
+            "bytes_total": int(total) if total else None,
+        }
+
+    if STEAMCMD_SUCCESS.search(line):
+        return {
+            "stage": "installed",
+            "percent": 100.0,
+            "bytes_done": None,
+            "bytes_total": None,
+        }
+
+    return None
+
+
+class InstallProgress:
+    """
+    Class used to create objects that turn raw install output into progress
+    bar friendly fields (stage, percent, bytes, rate, eta). Fed the install's
+    output lines on each poll, keeps a short window of samples to work out
+    download rate & time remaining.
+    """
+
+    def __init__(self, window=30):
+        """
+        Args:
+            window (float): Seconds of samples used to work out rate.
+        """
+        self.window = window
+        self.samples = deque()
+        self.progress = None
+
+    def update(self, lines, now=None):
+        """
+        Picks the latest progress line out of lines & records a sample.
+
+        Args:
+            lines (list): Install output lines, oldest first.
+            now (float): Current time, for tests.
+
+        Returns:
+            dict: Same as to_dict().
+        """
+        if now == None:
+            now = time.monotonic()
+
+        for line in reversed(lines[-MAX_LINES_SCANNED:]):
+            progress = parse_progress_line(line)
+            if progress:
+                break
+        else:
+            return self.to_dict()
+
+        # New stage, old samples say nothing about this one's rate.
+        if self.progress and self.progress["stage"] != progress["stage"]:
+            self.samples.clear()
+
+        self.progress = progress
+        if progress["bytes_done"] != None:
+            if not self.samples or self.samples[-1][1] != progress["bytes_done"]:
+                self.samples.append((now, progress["bytes_done"]))
+
+        while self.samples and now - self.samples[0][0] > self.window:
+            self.samples.popleft()
+
+        return self.to_dict()
+
+    def rate(self):
+        """Bytes per second over the sample window, None if unknown."""
+        if len(self.samples) < 2:
+            return None
+
+        (start, start_bytes), (end, end_bytes) = self.samples[0], self.samples[-1]
+        if end <= start or end_bytes < start_bytes:
+            return None
+
+        return (end_bytes - start_bytes) / (end - start)
+
+    def to_dict(self):
+        """
+        Returns current progress.
+
+        Returns:
+            dict: Stage, percent, bytes_done, bytes_total, rate (bytes/sec) &
+                  eta (secs). Fields are None until known.
+        """
+        progress = self.progress or {
+            "stage": None,
+            "percent": None,
+            "bytes_done": None,
+            "bytes_total": None,
+        }
+        progress = dict(progress)
+
+        rate = self.rate()
+        eta = None
+        if rate and progress["bytes_total"] != None:
+            eta = int((progress["bytes_total"] - progress["bytes_done"]) / rate)
+
+        progress["rate"] = round(rate) if rate else None
+        progress["eta"] = eta
+        return progress
+
+    def __str__(self):
+        return f"InstallProgress(progress='{self.progress}')"
+
+    def __repr__(self):
+        return f"InstallProgress(progress='{self.progress}')"
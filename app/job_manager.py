@@ -0,0 +1,479 @@
+import os
+import time
+import shlex
+import threading
+
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+from . import db
+from .models import Job, GameServer
+from .proc_store import pid_alive
+from .perf import perf_stats
+from .log_config import log_fields
+
+# Job statuses that mean the job hasn't finished yet.
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+class JobManager:
+    """
+    Class used to create objects that run commands (control buttons, installs,
+    restarts, etc.) on a bounded thread pool instead of a bare thread each.
+
+    Jobs are queued and dispatched in order, subject to:
+        - max_jobs: Total jobs running at once.
+        - max_jobs_per_host: Jobs running at once against any one host.
+        - Per server serialization: One job at a time per game server, so no
+          two updates race on one install. Also honored across gunicorn
+          workers, jobs are claimed with a conditional update of the jobs
+          table before they start.
+        - Batch limits: Jobs submitted together by a bulk action can carry
+          their own lower concurrency & per host limits.
+        - Gates: Jobs can carry an admission check (ex. installs wait on free
+          disk & cpu) that has to pass before they start.
+
+    Job metadata & exit status are persisted in the jobs table so they survive
+    worker restarts. Jobs left active by a dead worker are marked interrupted.
+    """
+
+    def __init__(self, app, max_jobs=8, max_jobs_per_host=4):
+        """
+        Args:
+            app (Flask): App to push contexts for in job threads.
+            max_jobs (int): Max jobs running at once.
+            max_jobs_per_host (int): Max jobs running at once per host.
+        """
+        self.app = app
+        self.max_jobs = max(1, max_jobs)
+        self.max_jobs_per_host = max(1, max_jobs_per_host)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_jobs, thread_name_prefix="Job"
+        )
+        self.cond = threading.Condition()
+        # Job dicts waiting to run, in submit order.
+        self.pending = []
+        # Job id -> job dict, for jobs currently running in this process.
+        self.running = dict()
+        self.dispatcher = None
+
+        self.recover()
+
+    def recover(self):
+        """Marks jobs left active by dead workers as interrupted."""
+        with self.app.app_context():
+            stale = Job.query.filter(Job.status.in_(ACTIVE_STATUSES)).all()
+            for job in stale:
+                if not pid_alive(job.worker_pid):
+                    job.status = "interrupted"
+                    job.date_finished = utc_now()
+            db.session.commit()
+
+    def submit(
+        self,
+        name,
+        target,
+        args=(),
+        proc_info=None,
+        server_name=None,
+        install_host=None,
+        cmd=None,
+        batch_id=None,
+        batch_limit=None,
+        host_limit=None,
+        schedule_id=None,
+        gate=None,
+    ):
+        """
+        Queues a job to be run.
+
+        Args:
+            name (str): Job name. For example, 'Install_Minecraft' or 'Command'.
+            target (callable): Function to run, ex. run_cmd_popen.
+            args (tuple): Args for target.
+            proc_info (ProcInfoVessel): Vessel target fills out, used to
+                                        record exit status.
+            server_name (str): Install name of game server job is for.
+            install_host (str): Host job runs against.
+            cmd (list): Command being run, just for the job record.
+            batch_id (str): Optional id grouping jobs from one bulk action.
+            batch_limit (int): Max jobs from batch_id running at once.
+            host_limit (int): Max jobs from batch_id running at once per host.
+                              Can only tighten max_jobs_per_host.
+            schedule_id (int): Optional id of schedule that started the job.
+            gate (callable): Optional admission check. Called in an app context
+                             with this process's running job dicts, job waits
+                             in the queue until it returns True.
+
+        Returns:
+            int: Id of new job.
+        """
+        with self.app.app_context():
+            job = Job(
+                name=name,
+                server_name=server_name,
+                install_host=install_host,
+                command=shlex.join(cmd) if cmd else None,
+                status="queued",
+                worker_pid=os.getpid(),
+                batch_id=batch_id,
+                schedule_id=schedule_id,
+            )
+            db.session.add(job)
+            db.session.commit()
+            job_id = job.id
+
+        with self.cond:
+            self.pending.append(
+                {
+                    "id": job_id,
+                    "name": name,
+                    "server_name": server_name,
+                    "install_host": install_host,
+                    "target": target,
+                    "args": args,
+                    "proc_info": proc_info,
+                    "batch_id": batch_id,
+                    "batch_limit": batch_limit,
+                    "host_limit": host_limit,
+                    "gate": gate,
+                }
+            )
+            self._start_dispatcher()
+            self.cond.notify_all()
+
+        return job_id
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued job. Running jobs have to be killed the normal way
+        (aka cancel_install()).
+
+        Args:
+            job_id (int): Id of job to cancel.
+
+        Returns:
+            bool: True if job was queued & is now canceled, False otherwise.
+        """
+        with self.cond:
+            for entry in self.pending:
+                if entry["id"] == job_id:
+                    self.pending.remove(entry)
+                    break
+            else:
+                return False
+
+        self._update(job_id, status="canceled", date_finished=utc_now())
+        return True
+
+    def active_jobs(self, name_prefix=None, server_name=None):
+        """
+        Gets queued & running jobs owned by live workers.
+
+        Args:
+            name_prefix (str): Optional job name prefix to filter on.
+            server_name (str): Optional game server install name to filter on.
+
+        Returns:
+            list: Active Job objects.
+        """
+        query = Job.query.filter(Job.status.in_(ACTIVE_STATUSES))
+        if name_prefix:
+            query = query.filter(Job.name.startswith(name_prefix))
+        if server_name:
+            query = query.filter_by(server_name=server_name)
+
+        return [job for job in query.all() if pid_alive(job.worker_pid)]
+
+    def list_jobs(self, server_names=None, status=None, limit=50):
+        """
+        Gets most recent jobs for the /api/jobs route.
+
+        Args:
+            server_names (list): Optional install names to limit results to.
+            status (str): Optional job status to filter on.
+            limit (int): Max number of jobs to return.
+
+        Returns:
+            list: Job objects, newest first.
+        """
+        query = Job.query
+        if server_names != None:
+            query = query.filter(Job.server_name.in_(server_names))
+        if status:
+            query = query.filter_by(status=status)
+
+        return query.order_by(Job.id.desc()).limit(limit).all()
+
+    def queue_position(self, job_id):
+        """
+        Gets a queued job's place in line.
+
+        Args:
+            job_id (int): Id of job.
+
+        Returns:
+            int: 1 based position in queue, None if not queued in this process.
+        """
+        with self.cond:
+            for position, entry in enumerate(self.pending, start=1):
+                if entry["id"] == job_id:
+                    return position
+        return None
+
+    def batch_jobs(self, batch_id):
+        """
+        Gets all jobs started by a bulk action.
+
+        Args:
+            batch_id (str): Id of bulk action batch.
+
+        Returns:
+            list: Job objects, in submit order.
+        """
+        return Job.query.filter_by(batch_id=batch_id).order_by(Job.id).all()
+
+    def _update(self, job_id, **fields):
+        """Updates job row with fields."""
+        with self.app.app_context():
+            job = db.session.get(Job, job_id)
+            if job == None:
+                return
+            for field, value in fields.items():
+                setattr(job, field, value)
+            db.session.commit()
+
+    def _start_dispatcher(self):
+        """Starts dispatcher thread if not already running. Holds cond."""
+        if self.dispatcher and self.dispatcher.is_alive():
+            return
+
+        self.dispatcher = threading.Thread(
+            target=self._dispatch_loop, daemon=True, name="JobDispatcher"
+        )
+        self.dispatcher.start()
+
+    def _busy_elsewhere(self):
+        """Game servers with a job running in another live worker."""
+        with self.app.app_context():
+            jobs = Job.query.filter_by(status="running").all()
+            return {
+                job.server_name
+                for job in jobs
+                if job.server_name
+                and job.worker_pid != os.getpid()
+                and pid_alive(job.worker_pid)
+            }
+
+    def _claim(self, entry):
+        """
+        Marks entry's job running, if it's still queued & no other worker has
+        a job running for the same game server. The check & the update are one
+        statement, so two workers can't both claim jobs for one server.
+
+        Returns:
+            bool: True if this worker now owns the job.
+        """
+        with self.app.app_context():
+            claim = db.update(Job).where(Job.id == entry["id"], Job.status == "queued")
+            if entry["server_name"]:
+                other = db.aliased(Job)
+                claim = claim.where(
+                    ~db.exists().where(
+                        other.server_name == entry["server_name"],
+                        other.status == "running",
+                    )
+                )
+            result = db.session.execute(
+                claim.values(
+                    status="running", worker_pid=os.getpid(), date_started=utc_now()
+                )
+            )
+            db.session.commit()
+            return result.rowcount == 1
+
+    def _start(self, entry):
+        """
+        Claims entry's job & hands it to the pool. Not run under cond, since
+        claiming is a db write. Jobs that lose the claim to another worker go
+        back in the queue.
+        """
+        if self._claim(entry):
+            self.executor.submit(self._run, entry)
+            return
+
+        with self.app.app_context():
+            job = db.session.get(Job, entry["id"])
+            queued = job != None and job.status == "queued"
+
+        if queued:
+            # Could be a job left running by a dead worker that hasn't been
+            # cleaned up yet, rather than a live one.
+            self.recover()
+
+        with self.cond:
+            self.running.pop(entry["id"], None)
+            if queued:
+                # Back in its place, pending is in submit (aka id) order.
+                position = len(self.pending)
+                for i, pending in enumerate(self.pending):
+                    if pending["id"] > entry["id"]:
+                        position = i
+                        break
+                self.pending.insert(position, entry)
+            self.cond.notify_all()
+
+    def _dispatch(self, busy_elsewhere):
+        """
+        Picks every pending job that's allowed to run & moves it to running.
+        Holds cond.
+
+        Args:
+            busy_elsewhere (set): Snapshot of _busy_elsewhere(), taken before
+                                  cond so no db query runs under it.
+
+        Returns:
+            list: Job dicts picked, for _start() to claim once cond is let go.
+        """
+        picked = []
+        if not self.pending or len(self.running) >= self.max_jobs:
+            return picked
+
+        busy_servers = {entry["server_name"] for entry in self.running.values()}
+        busy_servers |= busy_elsewhere
+        host_counts = dict()
+        batch_counts = dict()
+        batch_host_counts = dict()
+        for entry in self.running.values():
+            host = entry["install_host"]
+            batch_id = entry["batch_id"]
+            host_counts[host] = host_counts.get(host, 0) + 1
+            batch_counts[batch_id] = batch_counts.get(batch_id, 0) + 1
+            key = (batch_id, host)
+            batch_host_counts[key] = batch_host_counts.get(key, 0) + 1
+
+        for entry in list(self.pending):
+            if len(self.running) >= self.max_jobs:
+                break
+
+            server_name = entry["server_name"]
+            host = entry["install_host"]
+            batch_id = entry["batch_id"]
+
+            # Keep per server order, later jobs wait behind earlier ones.
+            if server_name and server_name in busy_servers:
+                continue
+            if server_name:
+                busy_servers.add(server_name)
+
+            if host and host_counts.get(host, 0) >= self.max_jobs_per_host:
+                continue
+
+            if batch_id:
+                limit = entry["batch_limit"]
+                if limit and batch_counts.get(batch_id, 0) >= limit:
+                    continue
+                limit = entry["host_limit"]
+                if limit and batch_host_counts.get((batch_id, host), 0) >= limit:
+                    continue
+
+            if entry["gate"] and not self._gate_open(entry):
+                continue
+
+            self.pending.remove(entry)
+            self.running[entry["id"]] = entry
+            host_counts[host] = host_counts.get(host, 0) + 1
+            batch_counts[batch_id] = batch_counts.get(batch_id, 0) + 1
+            key = (batch_id, host)
+            batch_host_counts[key] = batch_host_counts.get(key, 0) + 1
+            picked.append(entry)
+
+        return picked
+
+    def _gate_open(self, entry):
+        """Runs entry's admission check. Holds cond."""
+        try:
+            with self.app.app_context():
+                return entry["gate"](list(self.running.values()))
+        except Exception as e:
+            with self.app.app_context():
+                self.app.logger.info(f"Job {entry['id']} gate failed: {e}")
+            return False
+
+    def _dispatch_loop(self):
+        """Dispatcher thread main loop."""
+        while True:
+            # A db query, so it's run before taking cond. Submitting & jobs
+            # finishing never wait on it.
+            busy_elsewhere = self._busy_elsewhere() if self.pending else None
+            with self.cond:
+                if self.pending and busy_elsewhere == None:
+                    # Submitted while the snapshot was skipped, take one now.
+                    continue
+                picked = self._dispatch(busy_elsewhere)
+                if not picked:
+                    # Re-check once a second while jobs wait on other workers.
+                    self.cond.wait(timeout=1 if self.pending else 30)
+
+            for entry in picked:
+                self._start(entry)
+
+    def _run(self, entry):
+        """Runs a single job in a pool thread & records how it went."""
+        job_id = entry["id"]
+        status = "failed"
+        exit_status = None
+        start = time.monotonic()
+
+        try:
+            # Already marked running by _claim().
+            with self.app.app_context():
+                server = None
+                if entry["server_name"]:
+                    server = GameServer.query.filter_by(
+                        install_name=entry["server_name"]
+                    ).first()
+
+                # Tag everything the job logs, for json logs.
+                with log_fields(
+                    job_id=job_id,
+                    server_id=server.id if server else None,
+                    server=entry["server_name"],
+                ):
+                    entry["target"](*entry["args"])
+
+            if entry["proc_info"] != None:
+                exit_status = entry["proc_info"].exit_status
+            else:
+                exit_status = 0
+
+            if exit_status == 0:
+                status = "finished"
+
+        except Exception as e:
+            with self.app.app_context():
+                self.app.logger.info(f"Job {job_id} failed: {e}")
+
+        finally:
+            self._update(
+                job_id,
+                status=status,
+                exit_status=exit_status,
+                date_finished=utc_now(),
+            )
+            # Kind is the name up to the first '_', ex. Install_Minecraft.
+            kind = entry["name"].split("_")[0]
+            perf_stats.record_job(kind, status, time.monotonic() - start)
+            with self.cond:
+                self.running.pop(job_id, None)
+                self.cond.notify_all()
+
+    def __str__(self):
+        return f"JobManager(max_jobs='{self.max_jobs}', max_jobs_per_host='{self.max_jobs_per_host}', pending='{len(self.pending)}', running='{len(self.running)}')"
+
+    def __repr__(self):
+        return f"JobManager(max_jobs='{self.max_jobs}', max_jobs_per_host='{self.max_jobs_per_host}', pending='{len(self.pending)}', running='{len(self.running)}')"
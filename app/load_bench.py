@@ -0,0 +1,361 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import threading
+
+from .perf import percentile
+
+# Endpoint name -> (method, path, polls per sec per client). Rates match what
+# an open controls page polls at.
+ENDPOINTS = {
+    "cmd-output": ("GET", "/api/cmd-output", 2.0),
+    "system-usage": ("GET", "/api/system-usage", 1.0),
+    "update-console": ("POST", "/api/update-console", 0.2),
+}
+
+# Stand in game server for test client runs.
+STUB_SERVER = "LoadBenchServer"
+STUB_SCRIPT = "mcserver"
+STUB_USER = "weblgsm_load_bench"
+SCROLLBACK_LINES = 2000
+
+
+class EndpointStats:
+    """
+    Class used to create objects that tally request latencies & errors for
+    one endpoint across all clients.
+    """
+
+    def __init__(self, name):
+        """
+        Args:
+            name (str): Endpoint name.
+        """
+        self.name = name
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+        self.statuses = dict()
+
+    def record(self, seconds, status):
+        """
+        Records one request. Anything but a 200 counts as an error.
+
+        Args:
+            seconds (float): Request latency.
+            status (int|str): Http status, or exception name if it never
+                              got one.
+        """
+        with self.lock:
+            self.latencies.append(seconds)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status != 200:
+                self.errors += 1
+
+    def summary(self, duration):
+        """
+        Args:
+            duration (float): Seconds the run lasted.
+
+        Returns:
+            dict: Requests, req/sec, error rate & latency percentiles (ms).
+        """
+        with self.lock:
+            samples = sorted(self.latencies)
+            summary = {
+                "requests": len(samples),
+                "rps": round(len(samples) / max(duration, 1e-9), 2),
+                "errors": self.errors,
+                "error_rate": round(self.errors / max(1, len(samples)), 4),
+                "statuses": {str(k): v for k, v in self.statuses.items()},
+            }
+            for pct in (50, 95, 99):
+                value = percentile(samples, pct)
+                summary[f"p{pct}_ms"] = (
+                    None if value == None else round(value * 1000, 2)
+                )
+            summary["max_ms"] = round(samples[-1] * 1000, 2) if samples else None
+            return summary
+
+    def __str__(self):
+        return f"EndpointStats(name='{self.name}', requests='{len(self.latencies)}', errors='{self.errors}')"
+
+    def __repr__(self):
+        return f"EndpointStats(name='{self.name}', requests='{len(self.latencies)}', errors='{self.errors}')"
+
+
+class HttpTarget:
+    """
+    Class used to create objects that send bench requests to a running
+    web-lgsm over http, each client logged in with its own session.
+    """
+
+    def __init__(self, base_url, username, password, server_name):
+        """
+        Args:
+            base_url (str): Ex. 'http://127.0.0.1:12357'.
+            username (str): Web-lgsm user to log in as.
+            password (str): Password for user.
+            server_name (str): Installed game server to poll output of.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.server_name = server_name
+
+    def client(self):
+        """
+        Logs in a new session.
+
+        Returns:
+            callable: send(method, path, data) -> http status.
+
+        Raises:
+            RuntimeError: If login fails.
+        """
+        import requests
+
+        session = requests.Session()
+        response = session.post(
+            self.base_url + "/login",
+            data={"username": self.username, "password": self.password},
+            allow_redirects=False,
+            timeout=30,
+        )
+        if response.status_code != 302:
+            raise RuntimeError(f"Login failed with status {response.status_code}")
+
+        def send(method, path, data):
+            response = session.request(
+                method, self.base_url + path, data=data, timeout=30
+            )
+            return response.status_code
+
+        return send
+
+    def close(self):
+        pass
+
+    def __str__(self):
+        return f"HttpTarget(base_url='{self.base_url}', username='{self.username}')"
+
+    def __repr__(self):
+        return f"HttpTarget(base_url='{self.base_url}', username='{self.username}')"
+
+
+class LocalTarget:
+    """
+    Class used to create objects that send bench requests through the Flask
+    test client, no gunicorn needed. Adds a throw away admin user & a stub
+    local game server whose tmux is a script printing a fake scrollback, and
+    removes both on close().
+    """
+
+    def __init__(self, app, scrollback_lines=SCROLLBACK_LINES):
+        """
+        Args:
+            app (Flask): App to bench.
+            scrollback_lines (int): Lines the stub tmux prints per console
+                                    refresh.
+        """
+        from . import db, utils, views
+        from .models import User, GameServer
+
+        self.app = app
+        self.server_name = STUB_SERVER
+        self.stub_dir = tempfile.mkdtemp(prefix="weblgsm-load-bench-")
+        # Views keeps its own copy of the paths.
+        self.paths = (utils.PATHS, views.PATHS)
+        self.old_tmux = utils.PATHS["tmux"]
+
+        install_path = os.path.join(self.stub_dir, STUB_SERVER)
+        os.makedirs(os.path.join(install_path, "lgsm/data"))
+        uid_file = os.path.join(install_path, f"lgsm/data/{STUB_SCRIPT}.uid")
+        with open(uid_file, "w") as f:
+            f.write("10ad6e\n")
+
+        tmux = os.path.join(self.stub_dir, "tmux")
+        with open(tmux, "w") as f:
+            f.write(
+                f"""#!{sys.executable}
+import sys
+sys.stdout.write("".join(
+    f"[Server thread/INFO]: Player{{i % 50}} moved wrongly! {{i}}\\n"
+    for i in range({scrollback_lines})
+))
+"""
+            )
+        os.chmod(tmux, 0o755)
+        for paths in self.paths:
+            paths["tmux"] = tmux
+
+        with app.app_context():
+            user = User(
+                username=STUB_USER,
+                password="!",
+                role="admin",
+                permissions=json.dumps({"servers": []}),
+            )
+            server = GameServer(
+                install_name=STUB_SERVER,
+                install_path=install_path,
+                script_name=STUB_SCRIPT,
+                username=utils.USER,
+                is_container=False,
+                install_type="local",
+                install_host="127.0.0.1",
+                install_finished=True,
+            )
+            db.session.add_all([user, server])
+            db.session.commit()
+            self.user_id = user.id
+            self.server_id = server.id
+            utils.get_proc_store().get_or_create(STUB_SERVER)
+
+    def client(self):
+        """
+        Returns:
+            callable: send(method, path, data) -> http status.
+        """
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(self.user_id)
+            session["_fresh"] = True
+
+        def send(method, path, data):
+            return client.open(path, method=method, data=data).status_code
+
+        return send
+
+    def close(self):
+        """Removes the stub user, game server & tmux."""
+        from . import db, utils
+        from .models import User, GameServer
+
+        for paths in self.paths:
+            paths["tmux"] = self.old_tmux
+        with self.app.app_context():
+            db.session.delete(db.session.get(User, self.user_id))
+            db.session.get(GameServer, self.server_id).delete()
+            utils.get_proc_store().delete(STUB_SERVER)
+            utils.status_cache.remove(self.server_id)
+        shutil.rmtree(self.stub_dir, ignore_errors=True)
+
+    def __str__(self):
+        return f"LocalTarget(server_name='{self.server_name}', stub_dir='{self.stub_dir}')"
+
+    def __repr__(self):
+        return f"LocalTarget(server_name='{self.server_name}', stub_dir='{self.stub_dir}')"
+
+
+def _request(endpoint, server_name):
+    """Path & form data for an endpoint."""
+    method, path, _ = ENDPOINTS[endpoint]
+    if method == "POST":
+        return method, path, {"server": server_name}
+    return method, f"{path}?server={server_name}", None
+
+
+def _client_loop(send, server_name, endpoints, stats, stop):
+    """
+    One simulated controls page. Polls each endpoint at its own rate, like the
+    page's timers do, until stop is set.
+    """
+    now = time.monotonic()
+    # Spread clients out, so they don't all fire on the same tick.
+    due = {name: now + random.random() / ENDPOINTS[name][2] for name in endpoints}
+
+    while not stop.is_set():
+        name = min(due, key=due.get)
+        wait = due[name] - time.monotonic()
+        if wait > 0 and stop.wait(wait):
+            break
+
+        method, path, data = _request(name, server_name)
+        start = time.perf_counter()
+        try:
+            status = send(method, path, data)
+        except Exception as e:
+            status = type(e).__name__
+        stats[name].record(time.perf_counter() - start, status)
+
+        # Fixed rate, not fixed delay. A slow response eats into the wait.
+        due[name] = max(due[name] + 1 / ENDPOINTS[name][2], time.monotonic())
+
+
+def run_load_bench(target, clients=10, duration=30, endpoints=None):
+    """
+    Simulates clients open controls pages polling target for duration secs.
+
+    Args:
+        target (HttpTarget|LocalTarget): Where to send requests.
+        clients (int): Concurrent simulated pages.
+        duration (float): Seconds to run for.
+        endpoints (list): Endpoint names to poll, defaults to all ENDPOINTS.
+
+    Returns:
+        dict: Run settings & per endpoint summaries.
+    """
+    endpoints = endpoints or list(ENDPOINTS)
+    stats = {name: EndpointStats(name) for name in endpoints}
+    stop = threading.Event()
+
+    senders = [target.client() for _ in range(clients)]
+    threads = [
+        threading.Thread(
+            target=_client_loop,
+            args=(send, target.server_name, endpoints, stats, stop),
+            daemon=True,
+        )
+        for send in senders
+    ]
+
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    summaries = {name: stats[name].summary(elapsed) for name in endpoints}
+    total = sum(s["requests"] for s in summaries.values())
+    return {
+        "target": str(target),
+        "clients": clients,
+        "duration": round(elapsed, 2),
+        "requests": total,
+        "rps": round(total / elapsed, 2),
+        "endpoints": summaries,
+    }
+
+
+def format_report(report):
+    """
+    Formats run_load_bench() results as a table.
+
+    Args:
+        report (dict): Results from run_load_bench().
+
+    Returns:
+        str: Report text.
+    """
+    lines = [
+        f" [*] {report['clients']} clients for {report['duration']}s, "
+        f"{report['requests']} requests, {report['rps']} req/s",
+        f"     {'endpoint':<16}{'reqs':>7}{'req/s':>9}{'p50ms':>9}"
+        f"{'p95ms':>9}{'p99ms':>9}{'maxms':>9}{'errors':>8}",
+    ]
+    for name, summary in report["endpoints"].items():
+        cols = [summary[k] for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms")]
+        cols = "".join(f"{'-' if c == None else c:>9}" for c in cols)
+        lines.append(
+            f"     {name:<16}{summary['requests']:>7}{summary['rps']:>9}{cols}"
+            f"{summary['errors']:>8}"
+        )
+    return "\n".join(lines)
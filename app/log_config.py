@@ -0,0 +1,213 @@
+import os
+import json
+import queue
+import atexit
+import logging
+import contextvars
+
+from contextlib import contextmanager
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    WatchedFileHandler,
+)
+
+TEXT_FORMAT = "[%(asctime)s] %(levelname)s in %(module)s: %(message)s"
+
+# Extra fields added to JSON log lines when set, see log_fields().
+LOG_FIELDS = ("job_id", "server_id", "server")
+
+LOG_LEVELS = {
+    "info": logging.INFO,  # General operational info.
+    "warning": logging.WARNING,  # Warnings and above.
+    "debug": logging.DEBUG,  # Most verbose, debug info.
+}
+
+# Fields for records logged from the current thread / context.
+_context = contextvars.ContextVar("log_fields", default=dict())
+
+# Listener for this process, so setup_logging() can be called again.
+_listener = None
+
+
+@contextmanager
+def log_fields(**fields):
+    """
+    Tags everything logged in the with block with fields. For example,
+    `with log_fields(job_id=5, server="Minecraft"):`.
+
+    Args:
+        **fields: Values for LOG_FIELDS. None values are left out.
+    """
+    merged = dict(_context.get())
+    merged.update({k: v for k, v in fields.items() if v != None})
+    token = _context.set(merged)
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """
+    Class used to create objects that copy log_fields() values onto records.
+    Goes on the queue handler, so it runs in the thread doing the logging.
+    The context is gone by the time the listener thread sees the record.
+    """
+
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Class used to create objects that format log records as one JSON object
+    per line, with any LOG_FIELDS set on the record.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "msg": record.getMessage(),
+        }
+        for key in LOG_FIELDS:
+            value = getattr(record, key, None)
+            if value != None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class LocalQueueHandler(QueueHandler):
+    """
+    Class used to create objects that hand records to the queue listener
+    without formatting them first. QueueHandler renders the message up front
+    so records can be pickled to another process. This queue never leaves
+    the process, so the formatting is left to the listener thread.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def rotate_log(path, max_bytes, backups):
+    """
+    Rolls path over to path.1, path.1 to path.2 & so on, if it's grown past
+    max_bytes. For logs written by something else, ex. gunicorn's access &
+    error logs or the app log shared by gunicorn workers, so call it before
+    that something starts.
+
+    Args:
+        path (str): Log file.
+        max_bytes (int): Size to rotate at, 0 to never rotate.
+        backups (int): Rotated copies to keep.
+
+    Returns:
+        bool: True if rotated, False otherwise.
+    """
+    try:
+        if max_bytes <= 0 or os.path.getsize(path) < max_bytes:
+            return False
+    except OSError:
+        return False
+
+    if backups <= 0:
+        os.remove(path)
+        return True
+
+    for i in range(backups - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
+    return True
+
+
+def setup_logging(
+    level="info",
+    log_file=None,
+    log_format="text",
+    max_bytes=0,
+    backups=0,
+    stream=None,
+    shared=False,
+):
+    """
+    Sets up the root logger. Records go onto a queue & a listener thread does
+    the formatting & writing, so slow disk never stalls the threads reading
+    command output. Safe to call again, the old listener is stopped first.
+
+    Args:
+        level (str): Name of log level, see LOG_LEVELS.
+        log_file (str): Optional file to log to, rotated by size.
+        log_format (str): Can be either text or json.
+        max_bytes (int): Size to rotate log_file at, 0 to never rotate.
+        backups (int): Rotated copies of log_file to keep.
+        stream (file): Optional stream to also log to, ex. sys.stderr.
+        shared (bool): Other processes write log_file too, ex. gunicorn
+                       workers. Each rotating on its own would clobber the
+                       others' files, so log_file is never rotated here &
+                       just reopened once something else has rotated it,
+                       see rotate_log().
+
+    Returns:
+        QueueListener: Running listener, None if no file or stream given.
+    """
+    global _listener
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, LocalQueueHandler):
+            root.removeHandler(handler)
+    if _listener:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+    root.setLevel(LOG_LEVELS.get(level.lower(), logging.INFO))
+
+    if log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
+    handlers = []
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        if shared:
+            handlers.append(WatchedFileHandler(log_file))
+        else:
+            handlers.append(
+                RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backups)
+            )
+    if stream:
+        handlers.append(logging.StreamHandler(stream))
+    if not handlers:
+        return None
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LocalQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    root.addHandler(queue_handler)
+
+    _listener = QueueListener(log_queue, *handlers)
+    _listener.start()
+    return _listener
+
+
+@atexit.register
+def _stop_listener():
+    """Flushes whatever is still queued on exit."""
+    if _listener:
+        _listener.stop()
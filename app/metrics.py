@@ -0,0 +1,234 @@
+from .perf import BUCKETS
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "weblgsm"
+
+
+def escape_label(value):
+    """Escapes a label value per the Prometheus text format."""
+    return (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    )
+
+
+def format_value(value):
+    """Full precision sample value, ints without a trailing .0."""
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in labels.items()]
+    return "{" + ",".join(pairs) + "}"
+
+
+class MetricsBuilder:
+    """
+    Class used to create objects that collect metric samples & render them in
+    the Prometheus text exposition format. Samples are grouped into families,
+    so HELP & TYPE lines are written once per metric no matter what order
+    samples were added in.
+    """
+
+    def __init__(self, prefix=PREFIX):
+        """
+        Args:
+            prefix (str): Prepended to every metric name.
+        """
+        self.prefix = prefix
+        # Metric name -> (type, help, sample lines), in insert order.
+        self.families = dict()
+
+    def _family(self, name, metric_type, help_text):
+        name = f"{self.prefix}_{name}"
+        if name not in self.families:
+            self.families[name] = (metric_type, help_text, [])
+        return name, self.families[name][2]
+
+    def gauge(self, name, help_text, value, labels=None):
+        """Adds a gauge sample. None values are skipped."""
+        if value == None:
+            return
+        name, lines = self._family(name, "gauge", help_text)
+        lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+
+    def counter(self, name, help_text, value, labels=None):
+        """Adds a counter sample. Name should end in _total."""
+        name, lines = self._family(name, "counter", help_text)
+        lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+
+    def histogram(self, name, help_text, histogram, labels=None):
+        """
+        Adds a histogram from PerfStats.histograms() state, converting ms
+        buckets to cumulative seconds buckets.
+
+        Args:
+            name (str): Metric name, should end in _seconds.
+            help_text (str): Metric help.
+            histogram (dict): Count, total_ms & per bucket counts.
+            labels (dict): Extra labels.
+        """
+        name, lines = self._family(name, "histogram", help_text)
+        labels = labels or dict()
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS, histogram["buckets"]):
+            cumulative += bucket_count
+            bucket_labels = dict(labels, le=f"{bound / 1000:g}")
+            lines.append(f"{name}_bucket{format_labels(bucket_labels)} {cumulative}")
+        inf_labels = dict(labels, le="+Inf")
+        lines.append(f"{name}_bucket{format_labels(inf_labels)} {histogram['count']}")
+        total = format_value(histogram["total_ms"] / 1000)
+        lines.append(f"{name}_sum{format_labels(labels)} {total}")
+        lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+
+    def render(self):
+        """
+        Renders every family.
+
+        Returns:
+            str: Prometheus text format metrics.
+        """
+        output = []
+        for name, (metric_type, help_text, lines) in self.families.items():
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {metric_type}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+    def __str__(self):
+        return f"MetricsBuilder(prefix='{self.prefix}', families='{len(self.families)}')"
+
+    def __repr__(self):
+        return f"MetricsBuilder(prefix='{self.prefix}', families='{len(self.families)}')"
+
+
+def render_metrics(host_stats, net_io, servers, job_counts, perf_stats, worker=None):
+    """
+    Renders all web-lgsm metrics. Everything comes from already collected
+    state, nothing here touches ssh, docker or tmux.
+
+    Args:
+        host_stats (dict): Disk, cpu & mem stats from get_server_stats().
+        net_io (snetio): psutil.net_io_counters() result.
+        servers (list): Dicts with name, host, type, status (True/False/None)
+                        & age (secs since status was checked).
+        job_counts (dict): Job status -> number of jobs in the jobs table.
+        perf_stats (PerfStats): Request, span, ssh & job latency stats.
+        worker (int): Pid of the gunicorn worker serving the scrape, when
+                      there's more than one. Status cache & perf stats only
+                      cover this worker, so their series get a worker label.
+
+    Returns:
+        str: Prometheus text format metrics.
+    """
+    metrics = MetricsBuilder()
+
+    def per_worker(labels):
+        """Adds the worker label to labels of per process metrics."""
+        if worker == None:
+            return labels
+        return dict(labels, worker=worker)
+
+    # Host.
+    cpu = host_stats["cpu"]
+    for load in ("load1", "load5", "load15"):
+        metrics.gauge(f"host_{load}", f"Host {load} load average.", cpu[load])
+    metrics.gauge(
+        "host_cpu_usage_percent", "Host 1m load as percent of cpus.", cpu["cpu_usage"]
+    )
+    for stat in ("total", "used", "free"):
+        metrics.gauge(
+            f"host_memory_{stat}_bytes", f"Host memory {stat}.", host_stats["mem"][stat]
+        )
+        metrics.gauge(
+            f"host_disk_{stat}_bytes", f"Root fs disk {stat}.", host_stats["disk"][stat]
+        )
+    metrics.counter(
+        "host_network_sent_bytes_total", "Host network bytes sent.", net_io.bytes_sent
+    )
+    metrics.counter(
+        "host_network_received_bytes_total",
+        "Host network bytes received.",
+        net_io.bytes_recv,
+    )
+
+    # Game servers, from the status cache only.
+    for server in servers:
+        labels = per_worker(
+            {
+                "server": server["name"],
+                "host": server["host"],
+                "type": server["type"],
+            }
+        )
+        metrics.gauge(
+            "game_server_up",
+            "Game server running (1) or not (0), as of last status check.",
+            None if server["status"] == None else int(server["status"]),
+            labels,
+        )
+        metrics.gauge(
+            "game_server_status_age_seconds",
+            "Seconds since game server status was last checked.",
+            server["age"],
+            labels,
+        )
+
+    # Jobs.
+    for status, count in sorted(job_counts.items()):
+        metrics.gauge(
+            "jobs", "Jobs in the jobs table by status.", count, {"status": status}
+        )
+    for kind, histogram in sorted(perf_stats.histograms("jobs").items()):
+        metrics.histogram(
+            "job_duration_seconds",
+            "Job run time, since app start.",
+            histogram,
+            per_worker({"kind": kind}),
+        )
+        for status, count in sorted(histogram["statuses"].items()):
+            metrics.counter(
+                "jobs_completed_total",
+                "Jobs completed since app start, by kind & how they ended.",
+                count,
+                per_worker({"kind": kind, "status": status}),
+            )
+
+    # Ssh.
+    for host, histogram in sorted(perf_stats.histograms("ssh").items()):
+        metrics.histogram(
+            "ssh_connect_duration_seconds",
+            "Successful ssh connect time.",
+            histogram,
+            per_worker({"host": host}),
+        )
+        metrics.counter(
+            "ssh_connect_failures_total",
+            "Failed ssh connects.",
+            histogram["failures"],
+            per_worker({"host": host}),
+        )
+
+    # Http & hot path spans.
+    for route, histogram in sorted(perf_stats.histograms("routes").items()):
+        method, _, rule = route.partition(" ")
+        metrics.histogram(
+            "http_request_duration_seconds",
+            "Http request latency by route.",
+            histogram,
+            per_worker({"method": method, "route": rule}),
+        )
+    for span_name, histogram in sorted(perf_stats.histograms("spans").items()):
+        metrics.histogram(
+            "span_duration_seconds",
+            "Time spent in hot path functions.",
+            histogram,
+            per_worker({"span": span_name}),
+        )
+
+    return metrics.render()
@@ -0,0 +1,356 @@
+import os
+import time
+import bisect
+import cProfile
+import functools
+import threading
+
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from flask import g, request, has_request_context
+from sqlalchemy import event
+
+from . import db
+
+# Histogram bucket upper bounds, in ms.
+BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_samples, pct):
+    """
+    Nearest rank percentile.
+
+    Args:
+        sorted_samples (list): Samples, sorted ascending.
+        pct (float): Percentile, 0-100.
+
+    Returns:
+        float: Sample at pct, None if there are no samples.
+    """
+    if not sorted_samples:
+        return None
+    rank = max(1, -(-len(sorted_samples) * pct // 100))
+    return sorted_samples[int(rank) - 1]
+
+
+class PerfStats:
+    """
+    Class used to create objects that collect request, span, ssh connect &
+    job latencies. Keeps running counts & a fixed bucket histogram for
+    everything seen, plus a window of recent samples to work out percentiles
+    from. For each route it also keeps the span breakdown of its slowest
+    request, so a slow page load can be pinned on ssh, the db or a dir walk.
+    """
+
+    def __init__(self, window=1000):
+        """
+        Args:
+            window (int): Recent samples kept per route/span for percentiles.
+        """
+        self.window = window
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clears all collected stats."""
+        with self.lock:
+            self.routes = dict()
+            self.spans = dict()
+            # Keyed by host & job kind respectively.
+            self.ssh = dict()
+            self.jobs = dict()
+            self.since = time.time()
+
+    def _entry(self, table, name):
+        entry = table.get(name)
+        if entry == None:
+            entry = {
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "buckets": [0] * (len(BUCKETS) + 1),
+                "samples": deque(maxlen=self.window),
+            }
+            table[name] = entry
+        return entry
+
+    def _record(self, table, name, ms):
+        entry = self._entry(table, name)
+        entry["count"] += 1
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+        entry["buckets"][bisect.bisect_left(BUCKETS, ms)] += 1
+        entry["samples"].append(ms)
+        return entry
+
+    def record_route(self, route, seconds, spans=None):
+        """
+        Records a request's latency.
+
+        Args:
+            route (str): Method & url rule, ex. 'GET /controls'.
+            seconds (float): Request duration.
+            spans (dict): Span name -> ms spent in it during the request.
+        """
+        ms = seconds * 1000
+        with self.lock:
+            entry = self._record(self.routes, route, ms)
+            if ms >= entry["max_ms"]:
+                entry["slowest"] = {"ms": round(ms, 2), "spans": spans or dict()}
+
+    def record_span(self, name, seconds):
+        """Records time spent in a named span."""
+        with self.lock:
+            self._record(self.spans, name, seconds * 1000)
+
+    def record_ssh_connect(self, host, seconds, ok=True):
+        """
+        Records an ssh connect attempt. Only successful connects count
+        towards latency, failures are just counted.
+
+        Args:
+            host (str): Host connected to.
+            seconds (float): Time connect took.
+            ok (bool): False if connect failed.
+        """
+        with self.lock:
+            if ok:
+                entry = self._record(self.ssh, host, seconds * 1000)
+            else:
+                entry = self._entry(self.ssh, host)
+            entry.setdefault("failures", 0)
+            if not ok:
+                entry["failures"] += 1
+
+    def record_job(self, kind, status, seconds):
+        """
+        Records how long a finished job ran.
+
+        Args:
+            kind (str): Job kind, ex. 'Install' or 'Command'.
+            status (str): How it ended, ex. 'finished' or 'failed'.
+            seconds (float): Time job ran for.
+        """
+        with self.lock:
+            entry = self._record(self.jobs, kind, seconds * 1000)
+            statuses = entry.setdefault("statuses", dict())
+            statuses[status] = statuses.get(status, 0) + 1
+
+    def _summarize(self, entry):
+        samples = sorted(entry["samples"])
+        summary = {
+            "count": entry["count"],
+            "mean_ms": round(entry["total_ms"] / max(1, entry["count"]), 2),
+            "max_ms": round(entry["max_ms"], 2),
+        }
+        for pct in PERCENTILES:
+            value = percentile(samples, pct)
+            summary[f"p{pct}_ms"] = None if value == None else round(value, 2)
+
+        labels = [f"le_{bound}ms" for bound in BUCKETS] + ["le_inf"]
+        summary["histogram"] = dict(zip(labels, entry["buckets"]))
+        for extra in ("slowest", "failures", "statuses"):
+            if extra in entry:
+                summary[extra] = entry[extra]
+        return summary
+
+    def histograms(self, table):
+        """
+        Gets raw histogram state, for exporting elsewhere (ex. /metrics).
+
+        Args:
+            table (str): One of routes, spans, ssh or jobs.
+
+        Returns:
+            dict: Name -> count, total_ms, buckets (per BUCKETS, non
+                  cumulative, last is overflow) & failures/statuses if kept.
+        """
+        with self.lock:
+            return {
+                name: {
+                    "count": entry["count"],
+                    "total_ms": entry["total_ms"],
+                    "buckets": list(entry["buckets"]),
+                    "failures": entry.get("failures", 0),
+                    "statuses": dict(entry.get("statuses", dict())),
+                }
+                for name, entry in getattr(self, table).items()
+            }
+
+    def summary(self):
+        """
+        Gets stats for every route, span, ssh host & job kind seen.
+
+        Returns:
+            dict: Since (iso time), routes, spans, ssh & jobs. Each has count,
+                  mean, max, percentiles & histogram.
+        """
+        with self.lock:
+            summary = {
+                "since": datetime.fromtimestamp(self.since, timezone.utc).isoformat()
+            }
+            for table in ("routes", "spans", "ssh", "jobs"):
+                summary[table] = {
+                    name: self._summarize(entry)
+                    for name, entry in sorted(getattr(self, table).items())
+                }
+            return summary
+
+    def __str__(self):
+        return f"PerfStats(routes='{len(self.routes)}', spans='{len(self.spans)}')"
+
+    def __repr__(self):
+        return f"PerfStats(routes='{len(self.routes)}', spans='{len(self.spans)}')"
+
+
+# App wide stats, fed by the request hooks & spans below.
+perf_stats = PerfStats()
+
+
+def record_span(name, seconds):
+    """Records span time app wide & against the current request, if any."""
+    perf_stats.record_span(name, seconds)
+    if has_request_context() and "perf_spans" in g:
+        g.perf_spans[name] = round(g.perf_spans.get(name, 0) + seconds * 1000, 2)
+
+
+@contextmanager
+def span(name):
+    """
+    Times a block of code as a named span. Inside a request, the time also
+    counts towards that request's span breakdown.
+
+    Args:
+        name (str): Span name.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def timed(name=None):
+    """
+    Decorator that times every call to a function as a span.
+
+    Args:
+        name (str): Span name, defaults to the function's name.
+    """
+
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def list_profiles(profile_dir):
+    """Lists saved profile dumps, newest first."""
+    if not os.path.isdir(profile_dir):
+        return []
+    profiles = [name for name in os.listdir(profile_dir) if name.endswith(".prof")]
+    return sorted(profiles, reverse=True)
+
+
+def init_perf(app, profile_every=0, profile_dir="profiles", profile_keep=20):
+    """
+    Registers request timing hooks & db query spans on the app. Optionally
+    profiles one in every profile_every requests with cProfile, dumping
+    pstats files to profile_dir.
+
+    Args:
+        app (Flask): App to time.
+        profile_every (int): Profile every Nth request, 0 to never profile.
+        profile_dir (str): Dir to dump .prof files to.
+        profile_keep (int): Profile dumps to keep.
+    """
+    counter = {"requests": 0}
+    counter_lock = threading.Lock()
+    # Only one request can be profiled at a time.
+    profile_lock = threading.Lock()
+
+    @app.before_request
+    def perf_start():
+        g.perf_start = time.perf_counter()
+        g.perf_spans = dict()
+
+        if profile_every < 1:
+            return
+        with counter_lock:
+            counter["requests"] += 1
+            due = counter["requests"] % profile_every == 0
+        if due and profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler already running in this thread.
+                profile_lock.release()
+                return
+            g.perf_profiler = profiler
+
+    @app.teardown_request
+    def perf_stop(exc):
+        if "perf_start" not in g:
+            return
+        seconds = time.perf_counter() - g.perf_start
+        rule = request.url_rule.rule if request.url_rule else "unmatched"
+        route = f"{request.method} {rule}"
+        perf_stats.record_route(route, seconds, g.perf_spans)
+
+        profiler = g.pop("perf_profiler", None)
+        if profiler == None:
+            return
+        try:
+            profiler.disable()
+            dump_profile(profiler, profile_dir, route, seconds, profile_keep)
+        except OSError as e:
+            app.logger.warning(f"Couldn't save profile: {e}")
+        finally:
+            profile_lock.release()
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def query_start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("perf_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def query_stop(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["perf_query_start"].pop()
+        record_span("db_query", time.perf_counter() - start)
+
+
+def dump_profile(profiler, profile_dir, route, seconds, keep=20):
+    """
+    Saves a request's profile as a pstats file, keeping only the newest keep.
+
+    Args:
+        profiler (cProfile.Profile): Stopped profiler.
+        profile_dir (str): Dir to save to.
+        route (str): Route that was profiled.
+        seconds (float): How long the request took.
+        keep (int): Profile dumps to keep.
+
+    Returns:
+        str: Path of saved profile.
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    slug = "".join(c if c.isalnum() else "_" for c in route).strip("_")
+    path = os.path.join(profile_dir, f"{stamp}-{slug}-{seconds * 1000:.0f}ms.prof")
+    profiler.dump_stats(path)
+
+    for old in list_profiles(profile_dir)[keep:]:
+        os.remove(os.path.join(profile_dir, old))
+    return path
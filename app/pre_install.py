@@ -0,0 +1,210 @@
+import os
+import grp
+import pwd
+import yaml
+import shutil
+import subprocess
+
+from .artifact_cache import sha256_file
+
+# Same binaries the ansible user & group modules use.
+USERADD = "/usr/sbin/useradd"
+USERMOD = "/usr/sbin/usermod"
+GROUPADD = "/usr/sbin/groupadd"
+SUDO = "/usr/bin/sudo"
+
+
+class PreInstallError(Exception):
+    """Raised when the native pre-install rejects its input."""
+
+
+def load_accepted_usernames(vars_file):
+    """
+    Loads the accepted usernames list from the playbook vars file.
+
+    Args:
+        vars_file (str): Path to playbooks/vars/accepted_usernames.yml.
+
+    Returns:
+        list: Accepted usernames.
+    """
+    with open(vars_file, "r") as f:
+        data = yaml.safe_load(f)
+
+    return data.get("accepted_usernames", [])
+
+
+def load_web_lgsm_user(vars_file):
+    """
+    Loads the web-lgsm user's name from the playbook vars file.
+
+    Args:
+        vars_file (str): Path to playbooks/vars/web_lgsm_user.yml.
+
+    Returns:
+        str: Name of the user the web-lgsm app runs as.
+    """
+    with open(vars_file, "r") as f:
+        data = yaml.safe_load(f)
+
+    return str(data.get("web_lgsm_user"))
+
+
+def run(cmd, cwd=None):
+    """Runs cmd, raising CalledProcessError if it fails."""
+    print(f" [*] Running: {' '.join(cmd)}", flush=True)
+    subprocess.run(cmd, cwd=cwd, check=True)
+
+
+class NativePreInstall:
+    """
+    Class used to create objects that do the install_new_game_server.yml
+    pre-install steps directly in Python: validate the username, create the
+    user & group, make the install dir, and fetch the game server's LinuxGSM
+    script into it. Same steps & checks as the playbook, minus the ansible
+    startup cost. The playbook stays as the fallback.
+    """
+
+    def __init__(
+        self, playbook_dir, runner=run, home_root="/home", artifact_cache=None
+    ):
+        """
+        Args:
+            playbook_dir (str): Path to the playbooks dir, for vars files &
+                                the scripts dir next to it.
+            runner (callable): Called with (cmd, cwd) to run commands.
+            home_root (str): Dir user home dirs live in.
+            artifact_cache (ArtifactCache): Cache of generated game scripts,
+                                            optional.
+        """
+        self.playbook_dir = playbook_dir
+        self.home_root = home_root
+        self.artifact_cache = artifact_cache
+        self.scripts_dir = os.path.join(playbook_dir, "..", "scripts")
+        self.runner = runner
+        self.accepted_usernames = load_accepted_usernames(
+            os.path.join(playbook_dir, "vars/accepted_usernames.yml")
+        )
+        self.web_lgsm_user = load_web_lgsm_user(
+            os.path.join(playbook_dir, "vars/web_lgsm_user.yml")
+        )
+
+    def validate_username(self, username):
+        """
+        Checks username is an accepted LinuxGSM username.
+
+        Raises:
+            PreInstallError: If username is not accepted.
+        """
+        if username not in self.accepted_usernames:
+            raise PreInstallError(f"The user {username} is not an accepted user.")
+
+    def create_user(self, username):
+        """Creates user & matching group, if they don't already exist."""
+        try:
+            grp.getgrnam(username)
+        except KeyError:
+            self.runner([GROUPADD, username])
+
+        try:
+            pwd.getpwnam(username)
+        except KeyError:
+            # Group exists by now, so give it as the primary group like
+            # ansible's user module does. Otherwise useradd refuses where
+            # USERGROUPS_ENAB is on, since it wants to make the group itself.
+            self.runner(
+                [
+                    USERADD,
+                    "--create-home",
+                    "--shell",
+                    "/bin/bash",
+                    "-g",
+                    username,
+                    username,
+                ]
+            )
+
+    def set_primary_group(self, username):
+        """Makes user's own group its primary group."""
+        self.runner([USERMOD, "-g", username, username])
+
+    def make_dir(self, path, owner, mode):
+        """Creates dir (& parents) & sets its owner & mode."""
+        os.makedirs(path, exist_ok=True)
+        self._set_perms(path, owner, mode)
+
+    def _set_perms(self, path, owner, mode):
+        """Sets path's owner (user & group of same name) & mode."""
+        user = pwd.getpwnam(owner)
+        gid = grp.getgrnam(owner).gr_gid
+        os.chown(path, user.pw_uid, gid)
+        os.chmod(path, mode)
+
+    def fetch_script(self, username, install_path, script_name):
+        """
+        Uses linuxgsm.sh to fetch game server script, then moves it into the
+        install dir. Game scripts only depend on the linuxgsm.sh version, so
+        one already generated by the same linuxgsm.sh is reused from the
+        artifact cache instead.
+        """
+        src = os.path.join(self.scripts_dir, script_name)
+        name = f"scripts/{script_name}"
+        lgsmsh_sha = None
+        if self.artifact_cache:
+            lgsmsh_sha = sha256_file(os.path.join(self.scripts_dir, "linuxgsm.sh"))
+
+        if lgsmsh_sha and self.artifact_cache.install(name, src, source=lgsmsh_sha):
+            print(f" [*] Using cached {script_name} script", flush=True)
+        else:
+            self.runner(
+                [SUDO, "-n", "-u", self.web_lgsm_user, "./linuxgsm.sh", script_name],
+                self.scripts_dir,
+            )
+            if lgsmsh_sha:
+                with open(src, "rb") as f:
+                    self.artifact_cache.put(name, f.read(), source=lgsmsh_sha)
+
+        dest = os.path.join(install_path, script_name)
+        shutil.copyfile(src, dest)
+        self._set_perms(dest, username, 0o750)
+        os.remove(src)
+
+    def setup_ssh_dir(self, username):
+        """Creates user's ~/.ssh & authorized_keys with ssh friendly perms."""
+        ssh_dir = os.path.join(self.home_root, username, ".ssh")
+        self.make_dir(ssh_dir, username, 0o700)
+
+        authorized_keys = os.path.join(ssh_dir, "authorized_keys")
+        with open(authorized_keys, "a"):
+            os.utime(authorized_keys)
+        self._set_perms(authorized_keys, username, 0o600)
+
+    def run(self, username, install_path, script_name):
+        """
+        Runs all the pre-install steps, in playbook order.
+
+        Args:
+            username (str): User to install game server as.
+            install_path (str): Dir to install game server into.
+            script_name (str): LinuxGSM script name, ex. 'vhserver'.
+
+        Raises:
+            PreInstallError: If username is not accepted.
+            OSError, CalledProcessError: If a step fails.
+        """
+        same_user = username == self.web_lgsm_user
+
+        self.validate_username(username)
+        if not same_user:
+            self.create_user(username)
+        self.set_primary_group(username)
+
+        self.make_dir(install_path, username, 0o755)
+        self.fetch_script(username, install_path, script_name)
+        self.setup_ssh_dir(username)
+
+    def __str__(self):
+        return f"NativePreInstall(playbook_dir='{self.playbook_dir}')"
+
+    def __repr__(self):
+        return f"NativePreInstall(playbook_dir='{self.playbook_dir}')"
@@ -1,4 +1,59 @@
 import json
+import time
+import itertools
+
+# Shared by every vessel, so a recreated vessel never repeats an old version.
+# Seeded from the clock in microseconds, so a restarted worker doesn't hand
+# out versions a client still has cached & get a stale 304.
+_versions = itertools.count(time.time_ns() // 1000)
+
+
+class OutputLines(list):
+    """
+    List of output lines that bumps its vessel's version on every change, so
+    /api/cmd-output can tell a client nothing changed without serializing.
+    """
+
+    def __init__(self, vessel, lines=()):
+        super().__init__(lines)
+        self.vessel = vessel
+
+    def append(self, line):
+        super().append(line)
+        self.vessel.bump()
+
+    def extend(self, lines):
+        super().extend(lines)
+        self.vessel.bump()
+
+    def insert(self, index, line):
+        super().insert(index, line)
+        self.vessel.bump()
+
+    def pop(self, index=-1):
+        line = super().pop(index)
+        self.vessel.bump()
+        return line
+
+    def remove(self, line):
+        super().remove(line)
+        self.vessel.bump()
+
+    def clear(self):
+        super().clear()
+        self.vessel.bump()
+
+    def __setitem__(self, index, line):
+        super().__setitem__(index, line)
+        self.vessel.bump()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self.vessel.bump()
+
+    def __iadd__(self, lines):
+        self.extend(lines)
+        return self
 
 
 class ProcInfoVessel:
@@ -16,6 +71,7 @@ class ProcInfoVessel:
                                  running and output is being appended.
             pid (int): Process id.
             exit_status (int): Exit status of cmd in Popen call.
+            version (int): Changes whenever any of the above do.
         """
         self.stdout = []
         self.stderr = []
@@ -23,8 +79,28 @@ class ProcInfoVessel:
         self.pid = None
         self.exit_status = None
 
+    def __setattr__(self, attr, value):
+        if attr in ("stdout", "stderr"):
+            value = OutputLines(self, value)
+        object.__setattr__(self, attr, value)
+        self.bump()
+
+    def bump(self):
+        """Moves version on, called on every change."""
+        object.__setattr__(self, "version", next(_versions))
+
     def toJSON(self):
-        return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True, indent=4)
+        return json.dumps(
+            {
+                "stdout": self.stdout,
+                "stderr": self.stderr,
+                "process_lock": self.process_lock,
+                "pid": self.pid,
+                "exit_status": self.exit_status,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+        )
 
     def __str__(self):
         return f"ProcInfoVessel(stdout='{self.stdout}', stderr='{self.stderr}', process_lock='{self.process_lock}', pid='{self.pid}', exit_status='{self.exit_status}')"
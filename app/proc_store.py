@@ -0,0 +1,434 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from .proc_info_vessel import ProcInfoVessel
+
+
+def pid_alive(pid):
+    """
+    Checks if a local process id is still alive.
+
+    Args:
+        pid (int): Process id to check.
+
+    Returns:
+        bool: True if process exists, False otherwise.
+    """
+    if not pid:
+        return False
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, just owned by someone else.
+        return True
+
+    return True
+
+
+class ProcInfoStore:
+    """
+    Class used to create objects that hold the ProcInfoVessel objects for
+    commands run by the app, keyed by game server name. Default in-memory
+    backend. Only visible to the gunicorn worker process that created it, so
+    only safe with a single worker. See SqliteProcInfoStore for multi-worker.
+    """
+
+    def __init__(self):
+        """
+        Args:
+            vessels (dict): Game server names to ProcInfoVessel objects.
+        """
+        self.vessels = dict()
+
+    def create(self, name):
+        """
+        Creates a fresh ProcInfoVessel for name, clobbering any old one.
+
+        Args:
+            name (str): Game server install name.
+
+        Returns:
+            ProcInfoVessel: New empty vessel.
+        """
+        self.vessels[name] = ProcInfoVessel()
+        return self.vessels[name]
+
+    def get(self, name):
+        """Returns vessel for name, None if never seen."""
+        return self.vessels.get(name)
+
+    def get_or_create(self, name):
+        """Returns existing vessel for name or creates one."""
+        if name not in self.vessels:
+            return self.create(name)
+
+        return self.vessels[name]
+
+    def delete(self, name):
+        """Forgets everything about name."""
+        self.vessels.pop(name, None)
+
+    def to_json(self, name):
+        """Returns json for /api/cmd-output, None if name never seen."""
+        proc_info = self.get(name)
+        if proc_info == None:
+            return None
+
+        return proc_info.toJSON()
+
+    def version(self, name):
+        """
+        Returns:
+            str: Changes whenever name's output or state does, None if name
+                 never seen.
+        """
+        proc_info = self.get(name)
+        if proc_info == None:
+            return None
+
+        # Each worker has its own vessels, so versions only mean something
+        # paired with the worker they came from.
+        return f"{os.getpid()}-{proc_info.version}"
+
+    def __contains__(self, name):
+        return name in self.vessels
+
+    def __str__(self):
+        return f"ProcInfoStore(vessels='{self.vessels}')"
+
+    def __repr__(self):
+        return f"ProcInfoStore(vessels='{self.vessels}')"
+
+
+class SharedOutput(list):
+    """
+    List of output lines that also writes appends & clears through to a
+    SqliteProcInfoStore, so other gunicorn workers can see them.
+
+    Appends are written in batches, one commit per BATCH_LINES lines, or
+    whatever's left after the store's FLUSH_INTERVAL. An install prints tens
+    of thousands of lines, a commit (aka WAL fsync) each would be the slowest
+    part of it.
+    """
+
+    BATCH_LINES = 100
+
+    def __init__(self, store, name, stream, lines=()):
+        super().__init__(lines)
+        self.store = store
+        self.name = name
+        self.stream = stream
+        # Lines appended but not written to the store yet.
+        self.pending = []
+        self.lock = threading.Lock()
+
+    def append(self, line):
+        super().append(line)
+        with self.lock:
+            self.pending.append(line)
+            if len(self.pending) < self.BATCH_LINES:
+                self.store.flush_later(self)
+                return
+            self._flush()
+
+    def extend(self, lines):
+        lines = list(lines)
+        super().extend(lines)
+        with self.lock:
+            self.pending.extend(lines)
+            self._flush()
+
+    def flush(self):
+        """Writes pending lines to the store."""
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        """Writes pending lines to the store. Holds lock."""
+        if self.pending:
+            lines, self.pending = self.pending, []
+            self.store.append_lines(self.name, self.stream, lines)
+
+    def clear(self):
+        with self.lock:
+            self.pending = []
+            super().clear()
+            self.store.clear_lines(self.name, self.stream)
+
+    # Lists aren't hashable, but the store keeps a set of outputs to flush.
+    __hash__ = object.__hash__
+
+
+class SharedProcInfoVessel(ProcInfoVessel):
+    """
+    ProcInfoVessel whose fields are written through to a SqliteProcInfoStore.
+    Drop in replacement for ProcInfoVessel in run_cmd_popen() & run_cmd_ssh().
+    """
+
+    FIELDS = ("pid", "process_lock", "exit_status")
+
+    def __init__(self, store, name, row=None, stdout=(), stderr=()):
+        object.__setattr__(self, "_store", None)
+        super().__init__()
+        self.stdout = SharedOutput(store, name, "stdout", stdout)
+        self.stderr = SharedOutput(store, name, "stderr", stderr)
+        if row:
+            self.pid, self.process_lock, self.exit_status = row
+        object.__setattr__(self, "_store", store)
+        object.__setattr__(self, "_name", name)
+
+    def __setattr__(self, attr, value):
+        object.__setattr__(self, attr, value)
+        if self._store and attr in self.FIELDS:
+            # Output first, so a finished cmd is never missing its last lines.
+            self.flush()
+            self._store.set_field(self._name, attr, value)
+
+    def flush(self):
+        """Writes pending output lines to the store."""
+        self.stdout.flush()
+        self.stderr.flush()
+
+    def toJSON(self):
+        return json.dumps(
+            {
+                "stdout": list(self.stdout),
+                "stderr": list(self.stderr),
+                "process_lock": self.process_lock,
+                "pid": self.pid,
+                "exit_status": self.exit_status,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+
+
+class SqliteProcInfoStore:
+    """
+    Class used to create objects that keep command output & process state in a
+    SQLite WAL database shared by all gunicorn workers. A command started in
+    one worker is visible to /api/cmd-output served by any other worker.
+
+    Output lines are written in batches, see SharedOutput. A flusher thread
+    writes out partial batches every FLUSH_INTERVAL seconds, so output that
+    goes quiet still shows up.
+    """
+
+    FLUSH_INTERVAL = 0.25
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS proc_info (
+            name TEXT PRIMARY KEY,
+            worker_pid INTEGER,
+            pid INTEGER,
+            process_lock INTEGER,
+            exit_status INTEGER,
+            updated REAL,
+            version INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS proc_output (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            stream TEXT,
+            line TEXT
+        );
+        CREATE INDEX IF NOT EXISTS proc_output_name
+            ON proc_output (name, stream, id);
+    """
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path (str): Path to SQLite database file.
+        """
+        self.db_path = db_path
+        self.local = threading.local()
+        # Outputs with pending lines, for the flusher thread.
+        self.unflushed = set()
+        self.flush_lock = threading.Lock()
+        self.flusher = None
+        self.flusher_pid = None
+        conn = self.conn()
+        conn.executescript(self.SCHEMA)
+        # Added after the table, stores made before need the column.
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(proc_info)")]
+        if "version" not in columns:
+            conn.execute("ALTER TABLE proc_info ADD COLUMN version INTEGER DEFAULT 0")
+        conn.commit()
+
+    def conn(self):
+        """Returns this thread's connection, opening one if needed."""
+        conn = getattr(self.local, "conn", None)
+        if conn == None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def bump(self, conn, name):
+        """Moves name's version on, in the same transaction as the change."""
+        conn.execute(
+            "UPDATE proc_info SET version = version + 1 WHERE name = ?", (name,)
+        )
+
+    def append_lines(self, name, stream, lines):
+        """Writes lines, with one version bump & commit for all of them."""
+        conn = self.conn()
+        conn.executemany(
+            "INSERT INTO proc_output (name, stream, line) VALUES (?, ?, ?)",
+            [(name, stream, line) for line in lines],
+        )
+        self.bump(conn, name)
+        conn.commit()
+
+    def flush_later(self, output):
+        """Has the flusher thread write output's pending lines soon."""
+        with self.flush_lock:
+            self.unflushed.add(output)
+            # Threads don't survive a fork, ex. gunicorn's preload.
+            if self.flusher == None or self.flusher_pid != os.getpid():
+                self.flusher = threading.Thread(
+                    target=self._flush_loop, daemon=True, name="ProcStoreFlusher"
+                )
+                self.flusher_pid = os.getpid()
+                self.flusher.start()
+
+    def _flush_loop(self):
+        """Flusher thread main loop."""
+        while True:
+            time.sleep(self.FLUSH_INTERVAL)
+            with self.flush_lock:
+                outputs, self.unflushed = self.unflushed, set()
+                # Nothing came in, stop until flush_later() is next called.
+                if not outputs:
+                    self.flusher = None
+                    return
+            for output in outputs:
+                output.flush()
+
+    def clear_lines(self, name, stream):
+        conn = self.conn()
+        conn.execute(
+            "DELETE FROM proc_output WHERE name = ? AND stream = ?", (name, stream)
+        )
+        self.bump(conn, name)
+        conn.commit()
+
+    def set_field(self, name, field, value):
+        # Field names come from SharedProcInfoVessel.FIELDS only.
+        conn = self.conn()
+        conn.execute(
+            f"UPDATE proc_info SET {field} = ?, worker_pid = ?, updated = ?, version = version + 1 WHERE name = ?",
+            (value, os.getpid(), time.time(), name),
+        )
+        conn.commit()
+
+    def create(self, name):
+        """Creates a fresh shared vessel for name, clobbering any old one."""
+        conn = self.conn()
+        with conn:
+            conn.execute("DELETE FROM proc_output WHERE name = ?", (name,))
+            # Versions start from the time, so a recreated name doesn't reuse
+            # versions clients may have cached.
+            conn.execute(
+                "INSERT OR REPLACE INTO proc_info (name, worker_pid, updated, version) VALUES (?, ?, ?, ?)",
+                (name, os.getpid(), time.time(), time.time_ns() // 1000),
+            )
+        return SharedProcInfoVessel(self, name)
+
+    def _load(self, name):
+        """Loads row & output lines for name. None if never seen."""
+        conn = self.conn()
+        row = conn.execute(
+            "SELECT pid, process_lock, exit_status, worker_pid FROM proc_info WHERE name = ?",
+            (name,),
+        ).fetchone()
+        if row == None:
+            return None
+
+        pid, process_lock, exit_status, worker_pid = row
+        # Worker that was running the cmd died, it's not running anymore.
+        if process_lock and not pid_alive(worker_pid):
+            process_lock = False
+        if process_lock != None:
+            process_lock = bool(process_lock)
+
+        lines = {"stdout": [], "stderr": []}
+        for stream, line in conn.execute(
+            "SELECT stream, line FROM proc_output WHERE name = ? ORDER BY id", (name,)
+        ):
+            lines[stream].append(line)
+
+        return (pid, process_lock, exit_status), lines
+
+    def get(self, name):
+        """Returns shared vessel for name, None if never seen."""
+        loaded = self._load(name)
+        if loaded == None:
+            return None
+
+        row, lines = loaded
+        return SharedProcInfoVessel(
+            self, name, row, lines["stdout"], lines["stderr"]
+        )
+
+    def get_or_create(self, name):
+        """Returns existing shared vessel for name or creates one."""
+        proc_info = self.get(name)
+        if proc_info == None:
+            return self.create(name)
+
+        return proc_info
+
+    def delete(self, name):
+        """Forgets everything about name."""
+        conn = self.conn()
+        with conn:
+            conn.execute("DELETE FROM proc_output WHERE name = ?", (name,))
+            conn.execute("DELETE FROM proc_info WHERE name = ?", (name,))
+
+    def to_json(self, name):
+        """Returns json for /api/cmd-output, None if name never seen."""
+        proc_info = self.get(name)
+        if proc_info == None:
+            return None
+
+        return proc_info.toJSON()
+
+    def version(self, name):
+        """
+        Returns:
+            str: Changes whenever name's output or state does, None if name
+                 never seen.
+        """
+        row = self.conn().execute(
+            "SELECT version, process_lock, worker_pid FROM proc_info WHERE name = ?",
+            (name,),
+        ).fetchone()
+        if row == None:
+            return None
+
+        version, process_lock, worker_pid = row
+        # _load() reports a dead worker's cmd as not running, a change too.
+        if process_lock and not pid_alive(worker_pid):
+            return f"{version}-dead"
+        return str(version)
+
+    def __contains__(self, name):
+        row = self.conn().execute(
+            "SELECT 1 FROM proc_info WHERE name = ?", (name,)
+        ).fetchone()
+        return row != None
+
+    def __str__(self):
+        return f"SqliteProcInfoStore(db_path='{self.db_path}')"
+
+    def __repr__(self):
+        return f"SqliteProcInfoStore(db_path='{self.db_path}')"
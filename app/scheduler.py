@@ -0,0 +1,181 @@
+import random
+import threading
+
+from datetime import datetime, timedelta
+
+from . import db
+from .cron import CronExpr
+from .models import Job, Schedule, GameServer
+from .job_manager import ACTIVE_STATUSES
+from .proc_store import pid_alive
+
+# Missed-run policies.
+MISSED_POLICIES = ("skip", "run_once")
+
+
+def next_run_time(schedule, after):
+    """
+    Works out when a schedule is next due, jitter included.
+
+    Args:
+        schedule (Schedule): Schedule to work out next run of.
+        after (datetime): Time to search from, server local time.
+
+    Returns:
+        datetime: Next due time.
+    """
+    next_run = CronExpr(schedule.cron).next_after(after)
+    if schedule.jitter:
+        next_run += timedelta(seconds=random.randint(0, schedule.jitter))
+    return next_run
+
+
+class Scheduler:
+    """
+    Class used to create objects that run LinuxGSM commands (update, backup,
+    monitor, etc.) on cron schedules kept in the schedule table. Due schedules
+    are submitted through the same command path as the control buttons, so
+    runs show up as jobs with their duration & exit status.
+
+    Each gunicorn worker may run a scheduler. A schedule is claimed by moving
+    its next_run forward with a conditional update, so only one worker gets
+    to run it.
+    """
+
+    def __init__(self, app, submit, max_jobs=2, interval=30):
+        """
+        Args:
+            app (Flask): App to push contexts for in scheduler thread.
+            submit (callable): Called with (GameServer, short_cmd, schedule_id)
+                               to run a command. Returns job id.
+            max_jobs (int): Max scheduled jobs queued or running at once.
+            interval (float): Seconds between checks for due schedules.
+        """
+        self.app = app
+        self.submit = submit
+        self.max_jobs = max(1, max_jobs)
+        self.interval = interval
+        # Runs that came due this long before startup were missed while the
+        # app was down. Runs held back by max_jobs don't count as missed.
+        self.missed_before = datetime.now() - timedelta(seconds=interval * 2)
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        """Starts scheduler thread."""
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self._run, daemon=True, name="Scheduler"
+        )
+        self.thread.start()
+
+    def stop(self):
+        """Stops scheduler thread."""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def active_jobs(self):
+        """Number of scheduled jobs queued or running in live workers."""
+        jobs = Job.query.filter(
+            Job.schedule_id != None, Job.status.in_(ACTIVE_STATUSES)
+        ).all()
+        return len([job for job in jobs if pid_alive(job.worker_pid)])
+
+    def _claim(self, schedule_id, due_at, next_run):
+        """
+        Moves schedule's next_run forward, if no other worker beat us to it.
+
+        Returns:
+            bool: True if this worker now owns the run.
+        """
+        result = db.session.execute(
+            db.update(Schedule)
+            .where(Schedule.id == schedule_id, Schedule.next_run == due_at)
+            .values(next_run=next_run)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def tick(self, now=None):
+        """
+        Submits every due schedule, up to max_jobs. Needs an app context.
+
+        Args:
+            now (datetime): Current server local time, for tests.
+
+        Returns:
+            list: Ids of jobs submitted.
+        """
+        now = now or datetime.now()
+        submitted = []
+
+        due = (
+            Schedule.query.filter(Schedule.enabled == True, Schedule.next_run <= now)
+            .order_by(Schedule.next_run)
+            .all()
+        )
+
+        # Grab what we need up front, commits below expire the objects.
+        due = [
+            {
+                "id": schedule.id,
+                "due_at": schedule.next_run,
+                "policy": schedule.missed_policy,
+                "server_name": schedule.server_name,
+                "short_cmd": schedule.short_cmd,
+                "next_run": next_run_time(schedule, now),
+            }
+            for schedule in due
+        ]
+        if not due:
+            return submitted
+
+        slots = self.max_jobs - self.active_jobs()
+
+        for entry in due:
+            claim = (entry["id"], entry["due_at"], entry["next_run"])
+
+            # Skip policy just moves missed runs forward.
+            if entry["due_at"] < self.missed_before and entry["policy"] != "run_once":
+                self._claim(*claim)
+                self.app.logger.info(f"Skipped missed run of schedule {entry['id']}")
+                continue
+
+            # Full up, leave it due & try again next tick.
+            if slots <= 0:
+                continue
+
+            server = GameServer.query.filter_by(
+                install_name=entry["server_name"]
+            ).first()
+            if server == None or not server.install_finished:
+                self._claim(*claim)
+                continue
+
+            if not self._claim(*claim):
+                continue
+
+            db.session.get(Schedule, entry["id"]).last_run = now
+            db.session.commit()
+
+            submitted.append(self.submit(server, entry["short_cmd"], entry["id"]))
+            slots -= 1
+
+        return submitted
+
+    def _run(self):
+        """Scheduler thread main loop."""
+        while not self.stop_event.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    self.tick()
+            except Exception as e:
+                with self.app.app_context():
+                    self.app.logger.info(f"Scheduler tick failed: {e}")
+
+    def __str__(self):
+        return f"Scheduler(max_jobs='{self.max_jobs}', interval='{self.interval}')"
+
+    def __repr__(self):
+        return f"Scheduler(max_jobs='{self.max_jobs}', interval='{self.interval}')"
@@ -0,0 +1,307 @@
+import os
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    String,
+    Table,
+    create_engine,
+)
+from sqlalchemy.orm import Session, declarative_base, object_session, relationship
+from sqlalchemy.sql import func
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.db")
+
+# Database tables, on plain SQLAlchemy so they can be used without Flask. The
+# ansible connector imports this directly. The app hands this same base to
+# Flask-SQLAlchemy (see app.db), which adds Model.query & db.session.
+Base = declarative_base()
+
+
+def connect(db_path=DB_PATH):
+    """
+    Opens a session on the app's database, for use outside of the app.
+
+    Args:
+        db_path (str): Path to sqlite database file.
+
+    Returns:
+        Session: New session, use as a context manager.
+    """
+    return Session(create_engine(f"sqlite:///{db_path}"))
+
+
+class User(Base):
+    __tablename__ = "user"
+
+    id = Column(Integer, primary_key=True)
+    username = Column(String(150), unique=True)
+    password = Column(String(150))
+    role = Column(String(150))
+    permissions = Column(String(600))
+    date_created = Column(DateTime(timezone=True), default=func.now())
+
+    def __repr__(self):
+        return f"<User(id={self.id}, username='{self.username}', role='{self.role}', date_created='{self.date_created}')>"
+
+    def __str__(self):
+        return f"User {self.username} (ID: {self.id}, Role: {self.role}, Created: {self.date_created})"
+
+    # Flask-Login's user interface, in place of its UserMixin so this module
+    # doesn't need flask_login.
+    @property
+    def is_active(self):
+        return True
+
+    @property
+    def is_authenticated(self):
+        return self.is_active
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def get_id(self):
+        return str(self.id)
+
+
+# Links game servers & tags. The primary key indexes a server's tags, the
+# tag_id index goes the other way, a tag's servers.
+game_server_tag = Table(
+    "game_server_tag",
+    Base.metadata,
+    Column(
+        "game_server_id",
+        Integer,
+        ForeignKey("game_server.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column(
+        "tag_id",
+        Integer,
+        ForeignKey("tag.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    ),
+)
+
+
+class Tag(Base):
+    __tablename__ = "tag"
+
+    id = Column(Integer, primary_key=True)
+    # Unique, lowercase name. For example, 'eu-west' or 'tournament'.
+    name = Column(String(64), unique=True, index=True)
+
+    servers = relationship(
+        "GameServer", secondary=game_server_tag, back_populates="tags"
+    )
+
+    def __repr__(self):
+        return f"<Tag(id={self.id}, name='{self.name}')>"
+
+    def __str__(self):
+        return f"Tag {self.name} (ID: {self.id})"
+
+
+class GameServer(Base):
+    __tablename__ = "game_server"
+
+    id = Column(Integer, primary_key=True)
+    # Unique name.
+    install_name = Column(String(150), unique=True)
+    # Install path.
+    install_path = Column(String(150))
+    # The name of the lgsm game server script. For example, 'gmodserver'.
+    script_name = Column(String(150))
+    # Username of game server user.
+    username = Column(String(150))
+    # Is game server in a docker container or not.
+    is_container = Column(Boolean())
+    # Can be either local, remote, or docker.
+    install_type = Column(String(150))
+    # Hostname of remote installs.
+    install_host = Column(String(150))
+    # Has the game server installation finished.
+    install_finished = Column(Boolean())
+    # Private ssh keyfile path.
+    keyfile_path = Column(String(150))
+
+    tags = relationship(
+        "Tag", secondary=game_server_tag, back_populates="servers", order_by="Tag.name"
+    )
+
+    def __repr__(self):
+        return (
+            f"<GameServer(id={self.id}, install_name='{self.install_name}', script_name='{self.script_name}', "
+            + f"install_type='{self.install_type}', install_finished={self.install_finished} keyfile_path={self.keyfile_path})>"
+        )
+
+    def __str__(self):
+        return (
+            f"GameServer '{self.install_name}' (ID: {self.id}, Script: {self.script_name}, "
+            + f"Type: {self.install_type}, Finished: {self.install_finished}, Keyfile Path: {self.keyfile_path})"
+        )
+
+    def delete(self):
+        """
+        Removes the GameServer entry, its schedules & tag links from the
+        database.
+        """
+        session = object_session(self)
+        session.query(Schedule).filter_by(server_name=self.install_name).delete()
+        session.delete(self)
+        session.commit()
+
+
+class Job(Base):
+    __tablename__ = "job"
+
+    id = Column(Integer, primary_key=True)
+    # Job name. For example, 'Install_Minecraft' or 'Command'.
+    name = Column(String(150))
+    # Install name of game server the job is for. None for app level jobs.
+    server_name = Column(String(150), index=True)
+    # Host the job runs against, used for per host concurrency limits.
+    install_host = Column(String(150))
+    # Command being run, shell quoted.
+    command = Column(String(600))
+    # Can be queued, running, finished, failed, canceled, or interrupted.
+    status = Column(String(20), index=True)
+    # Exit status of command, None until finished.
+    exit_status = Column(Integer)
+    # Pid of the gunicorn worker that owns the job.
+    worker_pid = Column(Integer)
+    # Id shared by all jobs started together by a bulk action. None otherwise.
+    batch_id = Column(String(32), index=True)
+    # Id of schedule that started the job. None otherwise.
+    schedule_id = Column(Integer, index=True)
+    date_created = Column(DateTime(timezone=True), default=func.now())
+    date_started = Column(DateTime(timezone=True))
+    date_finished = Column(DateTime(timezone=True))
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, name='{self.name}', server_name='{self.server_name}', status='{self.status}', exit_status={self.exit_status})>"
+
+    def __str__(self):
+        return f"Job {self.name} (ID: {self.id}, Server: {self.server_name}, Status: {self.status}, Exit Status: {self.exit_status})"
+
+    def duration(self):
+        """Returns how long job ran for in seconds, None if not finished."""
+        if self.date_started and self.date_finished:
+            return (self.date_finished - self.date_started).total_seconds()
+        return None
+
+    def to_dict(self):
+        """Returns job as a json serializable dict for the /api/jobs route."""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "server_name": self.server_name,
+            "install_host": self.install_host,
+            "command": self.command,
+            "status": self.status,
+            "exit_status": self.exit_status,
+            "batch_id": self.batch_id,
+            "schedule_id": self.schedule_id,
+            "date_created": str(self.date_created) if self.date_created else None,
+            "date_started": str(self.date_started) if self.date_started else None,
+            "date_finished": str(self.date_finished) if self.date_finished else None,
+            "duration": self.duration(),
+        }
+
+
+class Schedule(Base):
+    __tablename__ = "schedule"
+
+    id = Column(Integer, primary_key=True)
+    # Install name of game server to run command for.
+    server_name = Column(String(150), index=True)
+    # LinuxGSM long command name. For example, 'update'.
+    command = Column(String(50))
+    # LinuxGSM short command. For example, 'u'.
+    short_cmd = Column(String(10))
+    # Five field cron expression, in server local time.
+    cron = Column(String(150))
+    # Max random seconds added to each run, so servers don't all go at once.
+    jitter = Column(Integer, default=0)
+    # What to do about runs missed while the app was down, skip or run_once.
+    missed_policy = Column(String(20), default="skip")
+    enabled = Column(Boolean(), default=True)
+    # Next time the schedule is due, server local time.
+    next_run = Column(DateTime, index=True)
+    last_run = Column(DateTime)
+    date_created = Column(DateTime(timezone=True), default=func.now())
+
+    def __repr__(self):
+        return f"<Schedule(id={self.id}, server_name='{self.server_name}', command='{self.command}', cron='{self.cron}', next_run='{self.next_run}')>"
+
+    def __str__(self):
+        return f"Schedule {self.command} (ID: {self.id}, Server: {self.server_name}, Cron: {self.cron}, Next Run: {self.next_run})"
+
+    def to_dict(self):
+        """Returns schedule as a json serializable dict for the api."""
+        return {
+            "id": self.id,
+            "server_name": self.server_name,
+            "command": self.command,
+            "cron": self.cron,
+            "jitter": self.jitter,
+            "missed_policy": self.missed_policy,
+            "enabled": self.enabled,
+            "next_run": str(self.next_run) if self.next_run else None,
+            "last_run": str(self.last_run) if self.last_run else None,
+        }
+
+
+class Deletion(Base):
+    __tablename__ = "deletion"
+
+    id = Column(Integer, primary_key=True)
+    # Install name of the deleted game server.
+    server_name = Column(String(150))
+    # Host & user the files live on, for remote installs.
+    install_host = Column(String(150))
+    username = Column(String(150))
+    # Original install path & the trash path it was renamed to.
+    path = Column(String(300))
+    trash_path = Column(String(300))
+    # Can be queued, deleting, finished, or failed.
+    status = Column(String(20), index=True, default="queued")
+    # Size of the tree when deletion started & bytes removed so far. Unknown
+    # for remote installs.
+    bytes_total = Column(BigInteger)
+    bytes_freed = Column(BigInteger, default=0)
+    # Pid of the gunicorn worker doing the deletion.
+    worker_pid = Column(Integer)
+    date_created = Column(DateTime(timezone=True), default=func.now())
+    date_finished = Column(DateTime(timezone=True))
+
+    def __repr__(self):
+        return f"<Deletion(id={self.id}, server_name='{self.server_name}', trash_path='{self.trash_path}', status='{self.status}')>"
+
+    def __str__(self):
+        return f"Deletion {self.server_name} (ID: {self.id}, Path: {self.trash_path}, Status: {self.status})"
+
+    def to_dict(self):
+        """Returns deletion as a json serializable dict for the api."""
+        percent = None
+        if self.bytes_total:
+            percent = round(100 * (self.bytes_freed or 0) / self.bytes_total, 1)
+
+        return {
+            "id": self.id,
+            "server_name": self.server_name,
+            "install_host": self.install_host,
+            "path": self.path,
+            "trash_path": self.trash_path,
+            "status": self.status,
+            "bytes_total": self.bytes_total,
+            "bytes_freed": self.bytes_freed,
+            "percent": percent,
+            "date_created": str(self.date_created) if self.date_created else None,
+            "date_finished": str(self.date_finished) if self.date_finished else None,
+        }
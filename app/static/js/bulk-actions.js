@@ -0,0 +1,84 @@
+// Checks or unchecks every server on the bulk actions page.
+function toggleAllServers(source) {
+  document.querySelectorAll('.bulk-server').forEach(function(checkbox) {
+    checkbox.checked = source.checked;
+  });
+}
+
+// Checks every server with a tag, or unchecks them if they're all checked.
+function toggleTaggedServers(tag) {
+  const tagged = Array.from(document.querySelectorAll('.bulk-server')).filter(
+    (checkbox) => checkbox.dataset.tags.split(' ').includes(tag)
+  );
+  const isChecked = tagged.every((checkbox) => checkbox.checked);
+  tagged.forEach((checkbox) => checkbox.checked = !isChecked);
+}
+
+// Renders aggregated progress & the per server outcome table.
+function renderBulkProgress(data) {
+  const percent = Math.round((data.completed / data.total) * 100);
+  const bar = document.getElementById('bulk-progress-bar');
+  bar.style.width = `${percent}%`;
+  bar.textContent = `${percent}%`;
+
+  const counts = Object.entries(data.counts)
+    .map(([status, count]) => `${status}: ${count}`)
+    .join(', ');
+  document.getElementById('bulk-summary').textContent =
+    `${data.completed} of ${data.total} done (${counts})`;
+
+  const tbody = document.getElementById('bulk-outcomes');
+  tbody.innerHTML = '';
+  data.servers.forEach(function(row) {
+    const tr = document.createElement('tr');
+    const duration = row.duration === null ? '' : `${row.duration.toFixed(1)}s`;
+    const exitStatus = row.exit_status === null ? '' : row.exit_status;
+    [row.server, row.host, row.status, exitStatus, duration].forEach(function(value) {
+      const td = document.createElement('td');
+      td.textContent = value;
+      tr.appendChild(td);
+    });
+    tbody.appendChild(tr);
+  });
+}
+
+// Polls bulk action progress until every server is done.
+function pollBulkProgress(batchId) {
+  fetch(`/api/bulk?batch=${batchId}`)
+    .then(response => response.json())
+    .then(function(data) {
+      if (data.Error) {
+        return;
+      }
+      renderBulkProgress(data);
+      if (!data.done) {
+        setTimeout(function() { pollBulkProgress(batchId); }, 2000);
+      }
+    });
+}
+
+// Submits bulk action form to the api & starts polling for progress.
+function startBulkAction() {
+  const form = document.getElementById('bulk-form');
+  const action = document.getElementById('action').value;
+  if (!confirm(`Are you sure you want to ${action} the selected servers?`)) {
+    return false;
+  }
+
+  fetch('/api/bulk', { method: 'POST', body: new FormData(form) })
+    .then(response => response.json())
+    .then(function(data) {
+      if (data.Error) {
+        alert(`Error: ${data.Error}`);
+        return;
+      }
+      const skipped = Object.entries(data.skipped);
+      if (skipped.length > 0) {
+        alert('Skipped: ' + skipped.map(([name, why]) => `${name} (${why})`).join(', '));
+      }
+      document.getElementById('bulk-progress').style.display = 'block';
+      pollBulkProgress(data.batch_id);
+    });
+
+  return false;
+}
@@ -27,6 +27,14 @@ function applyUserPermissions() {
       checkbox.checked = true;
     }
   });
+
+  // Check the tags checkboxes, users from before tags have none.
+  const tagCheckboxes = document.querySelectorAll('.tag-checkbox');
+  tagCheckboxes.forEach(checkbox => {
+    if ((userPerms.tags || []).includes(checkbox.value)) {
+      checkbox.checked = true;
+    }
+  });
 }
 
 function toggleViewUserPassFields() {
@@ -0,0 +1,174 @@
+// Virtual game server list for the home page. Only rows in view are in the
+// DOM & have their status checked, the rest are fetched from /api/servers a
+// page at a time as they're scrolled to.
+
+// Every row & host header is the same height, so positions are just math.
+const ROW_HEIGHT = 42;
+// Extra rows rendered above & below the view, so fast scrolls don't flash.
+const OVERSCAN = 10;
+
+const listData = JSON.parse($('#server-list-data').text());
+const serverList = $('#server-list');
+const perPage = listData.per_page;
+
+// Page number -> list of server dicts, or null while being fetched.
+const pages = {};
+pages[listData.page] = listData.servers;
+
+// Checked server names, rows scrolled out of view lose their checkbox.
+const selected = new Set();
+
+// Flat list of items, host headers & server slots in api order. Servers are
+// sorted by host, so each host's header goes before its count of servers.
+const items = [];
+let serverIndex = 0;
+listData.hosts.forEach(function([host, count]) {
+  items.push({host: host});
+  for (let i = 0; i < count; i++) {
+    items.push({index: serverIndex++});
+  }
+});
+
+// Fetches the page holding a server index, if not already fetched.
+function fetchPage(page) {
+  if (page in pages) {
+    return;
+  }
+  pages[page] = null;
+
+  const query = $.param(Object.assign({}, listData.query, {page: page, per_page: perPage}));
+  $.getJSON(`/api/servers?${query}`, function(data) {
+    pages[page] = data.servers;
+    renderRows();
+  }).fail(function() {
+    // Try again next scroll.
+    delete pages[page];
+  });
+}
+
+// Gets server dict for an index, null if its page isn't here yet.
+function getServer(index) {
+  const page = Math.floor(index / perPage) + 1;
+  fetchPage(page);
+  const servers = pages[page];
+  // Undefined if servers were deleted since the list was loaded.
+  return servers ? servers[index % perPage] || null : null;
+}
+
+function buildHost(host) {
+  return $('<div class="list-group-item bg-secondary text-white server-host"></div>').text(host);
+}
+
+function buildRow(server) {
+  const row = $('<div class="list-group-item list-group-item-action server-row"><div class="d-flex align-items-center"></div></div>');
+  const link = $('<a class="game_server_link text-decoration-none flex-grow-1"></a>');
+  const indicator = $('<span class="status-indicator" style="font-size:125%;color:grey;text-shadow: 0 0 5px grey, 0 0 10px black">● </span>');
+  link.append(indicator);
+  const gap = '\u00a0\u00a0\u00a0 ';
+  link.append(document.createTextNode(
+    `\u00a0\u00a0${server.install_name}${gap}${server.username}${gap}${server.install_type}`
+  ));
+
+  server.tags.forEach(function(tag) {
+    link.append($('<span class="badge bg-secondary ms-1"></span>').text(tag));
+  });
+
+  if (server.install_finished) {
+    link.attr('href', `/controls?server=${encodeURIComponent(server.install_name)}`);
+    indicator.attr('id', server.id);
+  } else {
+    link.attr('href', `/install?server=${encodeURIComponent(server.install_name)}`);
+    link.append(document.createTextNode(gap), $('<b>Installation Not Finished!</b>'));
+  }
+
+  const checkbox = $('<input class="form-check-input" type="checkbox" />')
+    .prop('checked', selected.has(server.install_name))
+    .on('change', function() {
+      if (this.checked) {
+        selected.add(server.install_name);
+      } else {
+        selected.delete(server.install_name);
+      }
+    });
+
+  row.children().append(link, $('<div class="form-check"></div>').append(checkbox));
+  return row;
+}
+
+// Renders just the items in view, then checks the status of those servers.
+function renderRows() {
+  const viewport = serverList[0];
+  const first = Math.max(0, Math.floor(viewport.scrollTop / ROW_HEIGHT) - OVERSCAN);
+  const last = Math.min(
+    items.length,
+    Math.ceil((viewport.scrollTop + viewport.clientHeight) / ROW_HEIGHT) + OVERSCAN
+  );
+
+  const rendered = [];
+  const visible = [];
+  for (let i = first; i < last; i++) {
+    const item = items[i];
+    let element;
+    if ('host' in item) {
+      element = buildHost(item.host);
+    } else {
+      const server = getServer(item.index);
+      if (server === null) {
+        element = $('<div class="list-group-item text-muted">Loading...</div>');
+      } else {
+        element = buildRow(server);
+        if (server.install_finished) {
+          visible.push(server);
+        }
+      }
+    }
+    element.addClass('virtual-item').css('top', i * ROW_HEIGHT);
+    rendered.push(element);
+  }
+
+  serverList.children('.virtual-item').remove();
+  serverList.append(rendered);
+
+  // Statuses already known to the server paint before the checks finish.
+  visible.forEach(function(server) {
+    if (!(server.id in serverStatuses)) {
+      updateStatusIndicator(server.id, server.status);
+    }
+  });
+  getServerStatus(visible.map((server) => server.id));
+}
+
+// Swap the server rendered page for the virtual list.
+serverList.empty().addClass('virtual-list');
+serverList.append($('<div class="virtual-spacer"></div>').css('height', items.length * ROW_HEIGHT));
+$('#server-pages').remove();
+
+// Open at the page the server rendered, ex. /home?page=3.
+const firstServer = (listData.page - 1) * perPage;
+const firstItem = items.findIndex((item) => item.index === firstServer);
+serverList.scrollTop(Math.max(0, firstItem - 1) * ROW_HEIGHT);
+
+let scheduled = false;
+serverList.on('scroll', function() {
+  if (scheduled) {
+    return;
+  }
+  scheduled = true;
+  window.requestAnimationFrame(function() {
+    scheduled = false;
+    renderRows();
+  });
+});
+renderRows();
+
+// Rows out of view aren't in the form, so send the selection instead.
+$('#delete-servers').on('submit', function() {
+  const form = $(this);
+  form.find('input[type=hidden].selected-server').remove();
+  Array.from(selected).forEach(function(name, i) {
+    form.append($('<input type="hidden" class="selected-server" />').attr('name', `server_${i}`).val(name));
+  });
+});
+
+// Re-check servers in view every STATUS_MAX_AGE.
+setInterval(renderRows, STATUS_MAX_AGE);
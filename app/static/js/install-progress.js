@@ -0,0 +1,77 @@
+// Turns a byte count into a human readable string.
+function humanBytes(bytes) {
+  const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+  let i = 0;
+  while (bytes >= 1024 && i < units.length - 1) {
+    bytes /= 1024;
+    i++;
+  }
+  return `${bytes.toFixed(1)} ${units[i]}`;
+}
+
+// Turns a number of seconds into a short duration string.
+function humanDuration(secs) {
+  const hours = Math.floor(secs / 3600);
+  const mins = Math.floor((secs % 3600) / 60);
+  if (hours > 0) {
+    return `${hours}h ${mins}m`;
+  }
+  return `${mins}m ${secs % 60}s`;
+}
+
+// Polls structured install progress & updates the progress bar.
+function updateInstallProgress() {
+  $.getJSON('/api/install-progress', { 'server': serverName }, function(data) {
+    const container = document.getElementById('install-progress');
+    const bar = document.getElementById('install-progress-bar');
+    const text = document.getElementById('install-progress-text');
+    container.style.display = 'block';
+
+    if (data.status === 'queued') {
+      bar.style.width = '0%';
+      bar.textContent = '';
+      let msg = 'Queued';
+      if (data.queue_position) {
+        msg += `, position ${data.queue_position}`;
+      }
+      if (data.waiting_on) {
+        msg += ` (${data.waiting_on})`;
+      }
+      text.textContent = msg;
+      return;
+    }
+
+    const percent = data.percent === null ? 0 : data.percent;
+    bar.style.width = `${percent}%`;
+    bar.textContent = `${percent.toFixed(1)}%`;
+
+    let msg = data.stage ? data.stage : data.status;
+    if (data.bytes_total) {
+      msg += `, ${humanBytes(data.bytes_done)} of ${humanBytes(data.bytes_total)}`;
+    }
+    if (data.rate) {
+      msg += `, ${humanBytes(data.rate)}/s`;
+    }
+    if (data.eta !== null) {
+      msg += `, ETA ${humanDuration(data.eta)}`;
+    }
+    text.textContent = msg;
+
+    if (data.status !== 'running') {
+      clearInterval(installProgressInterval);
+      if (data.status === 'finished') {
+        bar.style.width = '100%';
+        bar.textContent = '100%';
+        bar.classList.add('bg-success');
+      } else {
+        bar.classList.add('bg-danger');
+      }
+    }
+  }).fail(function() {
+    // No install for server, nothing to show.
+    clearInterval(installProgressInterval);
+  });
+}
+
+updateInstallProgress();
+var installProgressInterval = setInterval(updateInstallProgress, 2000);
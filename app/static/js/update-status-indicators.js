@@ -4,12 +4,12 @@ function updateStatusIndicator(serverId, status) {
   let statusColor = '#00FF11';
   if (status === false) {
      statusColor = 'red';
-  } else if (status === null) { 
+  } else if (status === null || status === undefined) {
     // If explicitly null, stay grey. Aka problem with ssh conn.
     return;
-  } 
+  }
 
-  const indicator = $(`#${serverId}`);
+  const indicator = $(`[id="${serverId}"].status-indicator`);
 
   // Set the style of the status indicator.
   indicator.css({
@@ -21,23 +21,48 @@ function updateStatusIndicator(serverId, status) {
   });
 }
 
+// Checks are ssh/tmux calls server side, so only a few at a time.
+const MAX_STATUS_REQUESTS = 4;
+// Refresh every 300000 milliseconds (aka 5 minutes).
+const STATUS_MAX_AGE = 300000;
+
+// Server id -> {status, time} of last check, so scrolling back doesn't re-check.
+const serverStatuses = {};
+const statusQueue = [];
+let statusRequests = 0;
+
 // Function to get the server status via the API and update the indicator.
-function getServerStatus() {
-  $('.status-indicator').each(function() {
-    // Get the server id from the span element.
-    const serverId = $(this).attr('id');
+function fetchNextStatus() {
+  while (statusRequests < MAX_STATUS_REQUESTS && statusQueue.length > 0) {
+    const serverId = statusQueue.shift();
+    statusRequests++;
 
     // Make an API request to get the server status.
     $.getJSON(`/api/server-status?id=${serverId}`, function(data) {
-      // Update the indicator based on the status.
+      serverStatuses[serverId] = {status: data.status, time: Date.now()};
+      // Update the indicator based on the status, if it's still on screen.
       updateStatusIndicator(serverId, data.status);
+    }).always(function() {
+      statusRequests--;
+      fetchNextStatus();
     });
-  });
+  }
 }
 
-// Initial call to update the indicators when the page loads.
-getServerStatus();
-
-// Refresh every 300000 milliseconds (aka 5 minutes).
-setInterval(getServerStatus, 300000);
-
+// Queues status checks for servers not checked in the last STATUS_MAX_AGE.
+function getServerStatus(serverIds) {
+  const now = Date.now();
+  serverIds.forEach(function(serverId) {
+    const known = serverStatuses[serverId];
+    if (known) {
+      updateStatusIndicator(serverId, known.status);
+      if (now - known.time < STATUS_MAX_AGE) {
+        return;
+      }
+    }
+    // Counts as checked from now, so it's only queued once.
+    serverStatuses[serverId] = {status: known ? known.status : null, time: now};
+    statusQueue.push(serverId);
+  });
+  fetchNextStatus();
+}
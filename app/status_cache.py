@@ -0,0 +1,76 @@
+import time
+import threading
+
+
+class StatusCache:
+    """
+    Class used to create objects that hold the last known on/off status of
+    game servers. Filled in by get_server_status() and the inotify
+    StatusWatcher, so that other parts of the app can read game server status
+    without having to fork tmux or connect over ssh.
+    """
+
+    def __init__(self):
+        """
+        Args:
+            statuses (dict): Maps game server ids to (status, timestamp) tuples.
+            lock (threading.Lock): Guards statuses across request threads and
+                                   the watcher thread.
+        """
+        self.statuses = dict()
+        self.lock = threading.Lock()
+
+    def set(self, server_id, status):
+        """
+        Records a status for a game server.
+
+        Args:
+            server_id (int): Id of game server.
+            status (bool|None): True if on, False if off, None if unknown.
+        """
+        with self.lock:
+            self.statuses[int(server_id)] = (status, time.time())
+
+    def get(self, server_id, max_age=None):
+        """
+        Fetches the last known status for a game server.
+
+        Args:
+            server_id (int): Id of game server.
+            max_age (float): Optional max age in seconds of cached entry.
+
+        Returns:
+            bool|None: Cached status, None if not cached or too old.
+        """
+        with self.lock:
+            entry = self.statuses.get(int(server_id))
+
+        if entry == None:
+            return None
+
+        status, timestamp = entry
+        if max_age != None and time.time() - timestamp > max_age:
+            return None
+
+        return status
+
+    def remove(self, server_id):
+        """Drops a game server from the cache."""
+        with self.lock:
+            self.statuses.pop(int(server_id), None)
+
+    def snapshot(self):
+        """
+        Returns a copy of the whole cache.
+
+        Returns:
+            dict: Game server ids to (status, timestamp) tuples.
+        """
+        with self.lock:
+            return dict(self.statuses)
+
+    def __str__(self):
+        return f"StatusCache(statuses='{self.statuses}')"
+
+    def __repr__(self):
+        return f"StatusCache(statuses='{self.statuses}')"
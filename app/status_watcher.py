@@ -0,0 +1,347 @@
+import os
+import time
+import errno
+import select
+import socket
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+# Inotify constants, from <sys/inotify.h>.
+IN_MODIFY = 0x00000002
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def load_inotify():
+    """
+    Loads libc's inotify functions via ctypes. No extra pip package needed.
+
+    Returns:
+        ctypes.CDLL: Handle to libc, None if inotify isn't available.
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+def get_tmux_socket_dir():
+    """
+    Gets the directory tmux keeps its server sockets in for the current user.
+    Same logic as tmux itself, aka $TMUX_TMPDIR or /tmp, then tmux-<uid>.
+
+    Returns:
+        str: Path to tmux socket dir.
+    """
+    tmpdir = os.environ.get("TMUX_TMPDIR", "/tmp")
+    return os.path.join(tmpdir, f"tmux-{os.getuid()}")
+
+
+class StatusWatcher:
+    """
+    Class used to create objects that watch local same user game servers for
+    start/stop transitions via inotify, instead of forking tmux on every status
+    poll. Watches the tmux socket dir (socket created on start, removed on
+    stop) and each game server's lgsm/lock dir (LinuxGSM writes a
+    <script>-started.lock on start). Transitions are pushed into a StatusCache.
+
+    A periodic reconciliation pass probes every watched socket as a safety net
+    for missed events. Probes just connect to the tmux unix socket, so status
+    stays fork free in the steady state. Dirs that are missing, or deleted out
+    from under their watch, are re-watched once they (re)appear & their
+    servers probed, since events in between were missed.
+    """
+
+    def __init__(self, cache, reconcile_interval=60, tmux_dir=None):
+        """
+        Args:
+            cache (StatusCache): Cache to push status transitions into.
+            reconcile_interval (float): Seconds between reconciliation passes.
+            tmux_dir (str): Optional tmux socket dir override (for tests).
+        """
+        self.cache = cache
+        self.reconcile_interval = reconcile_interval
+        self.tmux_dir = tmux_dir or get_tmux_socket_dir()
+        self.libc = load_inotify()
+        self.fd = None
+        self.thread = None
+        self.running = False
+        self.lock = threading.Lock()
+        # Server id -> dict(socket, lock_name, lock_dir, lock_wd). Lock_wd is
+        # None while the lock dir isn't watched.
+        self.servers = dict()
+        # Watch descriptor -> path, for the tmux dir & lock dirs. Servers,
+        # wds & tmux_wd are only changed holding lock.
+        self.wds = dict()
+        self.tmux_wd = None
+
+    def available(self):
+        """Returns True if inotify is usable on this system."""
+        return self.libc != None
+
+    def start(self):
+        """
+        Opens inotify fd, adds tmux socket dir watch, and starts watcher thread.
+
+        Returns:
+            bool: True if watcher started, False if inotify unavailable.
+        """
+        if not self.available():
+            return False
+
+        fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return False
+        self.fd = fd
+
+        # Tmux creates this dir 0700 on first use. Create it the same way so
+        # we can watch it before any game server has been started.
+        try:
+            os.makedirs(self.tmux_dir, mode=0o700, exist_ok=True)
+        except OSError:
+            pass
+
+        with self.lock:
+            self.tmux_wd = self._add_watch(self.tmux_dir)
+
+        self.running = True
+        self.thread = threading.Thread(
+            target=self._run, daemon=True, name="StatusWatcher"
+        )
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """Stops watcher thread and closes inotify fd."""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+        if self.fd != None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _add_watch(self, path):
+        """
+        Adds an inotify watch for path, reusing an existing one. Holds lock.
+
+        Returns:
+            int: Watch descriptor, None on failure.
+        """
+        for wd, watched_path in self.wds.items():
+            if watched_path == path:
+                return wd
+
+        if self.fd == None or not os.path.isdir(path):
+            return None
+
+        wd = self.libc.inotify_add_watch(self.fd, path.encode(), WATCH_MASK)
+        if wd < 0:
+            return None
+
+        self.wds[wd] = path
+        return wd
+
+    def is_watching(self, server_id):
+        """Returns True if server is registered with the watcher."""
+        with self.lock:
+            return server_id in self.servers
+
+    def watch(self, server_id, socket_name, install_path, script_name):
+        """
+        Registers a local same user game server with the watcher, or updates
+        its socket name if it's changed (aka after a re-install). Probes
+        current status on first registration.
+
+        Args:
+            server_id (int): Id of game server.
+            socket_name (str): Tmux socket name of game server.
+            install_path (str): Game server install dir.
+            script_name (str): LinuxGSM script name (ex. mcserver).
+
+        Returns:
+            bool|None: Current cached status for server.
+        """
+        if not self.running:
+            return None
+
+        with self.lock:
+            entry = self.servers.get(server_id)
+            if entry and entry["socket"] == socket_name:
+                return self.cache.get(server_id)
+
+            # Lock dir may not exist yet, _rewatch() picks it up once it does.
+            lock_dir = os.path.join(install_path, "lgsm/lock")
+            self.servers[server_id] = {
+                "socket": socket_name,
+                "lock_name": f"{script_name}-started.lock",
+                "lock_dir": lock_dir,
+                "lock_wd": self._add_watch(lock_dir),
+            }
+
+        status = self.probe(socket_name)
+        self.cache.set(server_id, status)
+        return status
+
+    def unwatch(self, server_id):
+        """Removes a game server from the watcher & the status cache."""
+        with self.lock:
+            self.servers.pop(server_id, None)
+        self.cache.remove(server_id)
+
+    def probe(self, socket_name):
+        """
+        Checks if a tmux server is listening on socket. Same answer as `tmux -L
+        <socket> list-session` for LinuxGSM's one session per socket setup,
+        without the fork.
+
+        Args:
+            socket_name (str): Name of tmux socket to check.
+
+        Returns:
+            bool|None: True if listening, False if not, None if indeterminate.
+        """
+        sock_path = os.path.join(self.tmux_dir, socket_name)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(0.5)
+        try:
+            sock.connect(sock_path)
+            return True
+        except (FileNotFoundError, ConnectionRefusedError):
+            return False
+        except OSError:
+            return None
+        finally:
+            sock.close()
+
+    def reconcile(self):
+        """Re-probes all watched servers. Safety net for missed events."""
+        with self.lock:
+            watched = [(sid, entry["socket"]) for sid, entry in self.servers.items()]
+
+        for server_id, socket_name in watched:
+            self.cache.set(server_id, self.probe(socket_name))
+
+    def _rewatch(self):
+        """
+        Watches the tmux dir & any lock dirs that weren't watchable before,
+        ex. not made yet or deleted & made again. Probes the servers they
+        cover, since their events were missed while unwatched.
+        """
+        with self.lock:
+            stale = set()
+            if self.tmux_wd == None:
+                # Tmux makes this again on next start, same as start() does.
+                try:
+                    os.makedirs(self.tmux_dir, mode=0o700, exist_ok=True)
+                except OSError:
+                    pass
+                self.tmux_wd = self._add_watch(self.tmux_dir)
+                if self.tmux_wd != None:
+                    stale.update(self.servers)
+
+            for server_id, entry in self.servers.items():
+                if entry["lock_wd"] == None:
+                    entry["lock_wd"] = self._add_watch(entry["lock_dir"])
+                    if entry["lock_wd"] != None:
+                        stale.add(server_id)
+
+            probes = [(sid, self.servers[sid]["socket"]) for sid in stale]
+
+        for server_id, socket_name in probes:
+            self.cache.set(server_id, self.probe(socket_name))
+
+    def _unwatched(self):
+        """Returns True if the tmux dir or any lock dir isn't being watched."""
+        with self.lock:
+            return self.tmux_wd == None or any(
+                entry["lock_wd"] == None for entry in self.servers.values()
+            )
+
+    def _handle_event(self, wd, mask, name):
+        """Maps a single inotify event to a status transition."""
+        if mask & IN_IGNORED:
+            # Dir deleted (IN_DELETE_SELF) or watch removed, _rewatch() adds
+            # it back if the dir comes back.
+            with self.lock:
+                self.wds.pop(wd, None)
+                if wd == self.tmux_wd:
+                    self.tmux_wd = None
+                for entry in self.servers.values():
+                    if entry["lock_wd"] == wd:
+                        entry["lock_wd"] = None
+            return
+
+        created = bool(mask & (IN_CREATE | IN_MOVED_TO))
+
+        with self.lock:
+            tmux_wd = self.tmux_wd
+            watched = [(sid, dict(entry)) for sid, entry in self.servers.items()]
+
+        for server_id, entry in watched:
+            if wd == tmux_wd and name == entry["socket"]:
+                self.cache.set(server_id, created)
+
+            elif wd == entry["lock_wd"] and name == entry["lock_name"]:
+                # Lock file is just a hint, socket decides.
+                self.cache.set(server_id, self.probe(entry["socket"]))
+
+    def _read_events(self):
+        """Reads & dispatches all pending inotify events."""
+        try:
+            buf = os.read(self.fd, 65536)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return
+            raise
+
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buf):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(buf, offset)
+            offset += EVENT_HEADER.size
+            name = buf[offset : offset + name_len].rstrip(b"\0").decode()
+            offset += name_len
+            self._handle_event(wd, mask, name)
+
+    def _run(self):
+        """Watcher thread main loop."""
+        next_reconcile = time.monotonic() + self.reconcile_interval
+
+        while self.running:
+            timeout = max(0, min(1.0, next_reconcile - time.monotonic()))
+            try:
+                ready, _, _ = select.select([self.fd], [], [], timeout)
+            except (OSError, ValueError, TypeError):
+                break
+
+            if ready:
+                self._read_events()
+
+            if self._unwatched():
+                self._rewatch()
+
+            if time.monotonic() >= next_reconcile:
+                self.reconcile()
+                next_reconcile = time.monotonic() + self.reconcile_interval
+
+    def __str__(self):
+        return f"StatusWatcher(tmux_dir='{self.tmux_dir}', servers='{self.servers}', running='{self.running}')"
+
+    def __repr__(self):
+        return f"StatusWatcher(tmux_dir='{self.tmux_dir}', servers='{self.servers}', running='{self.running}')"
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# Deletes game server trees moved to trash by the /delete route. Run as its
+# own low priority process (nice & ionice) by the app, prints progress lines
+# as '<bytes freed> <bytes total>' for the app to pick up.
+
+import os
+import sys
+import time
+import uuid
+
+# Seconds between progress lines.
+PROGRESS_INTERVAL = 1.0
+
+
+def trash_path_for(path):
+    """
+    Works out a trash path for path. Trash lives next to the original in the
+    same dir, so moving to it is a rename on the same filesystem.
+
+    Args:
+        path (str): Dir to be deleted.
+
+    Returns:
+        str: Hidden, unique sibling path, ex. '/x/.Minecraft.trash-<hex>'.
+    """
+    path = os.path.normpath(path)
+    parent, name = os.path.split(path)
+    return os.path.join(parent, f".{name}.trash-{uuid.uuid4().hex}")
+
+
+def move_to_trash(path):
+    """
+    Renames path to a trash path. Atomic, so the install is either still
+    there whole or gone from its old path.
+
+    Args:
+        path (str): Dir to be deleted.
+
+    Returns:
+        str: Trash path files now live at.
+    """
+    trash_path = trash_path_for(path)
+    os.rename(path, trash_path)
+    return trash_path
+
+
+def tree_size(path):
+    """
+    Adds up the size of every file under path, without following symlinks.
+
+    Args:
+        path (str): Dir to size up.
+
+    Returns:
+        int: Total bytes.
+    """
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def delete_tree(path, progress=None, interval=PROGRESS_INTERVAL):
+    """
+    Deletes path bottom up, file by file, reporting bytes freed as it goes.
+    Safe to run again on a partially deleted tree, it just carries on.
+
+    Args:
+        path (str): Dir to delete.
+        progress (callable): Called with bytes freed so far, at most once per
+                             interval & once at the end.
+        interval (float): Seconds between progress calls.
+
+    Returns:
+        int: Bytes freed.
+    """
+    freed = 0
+    last_report = time.monotonic()
+
+    if not os.path.lexists(path):
+        if progress:
+            progress(freed)
+        return freed
+
+    for root, dirs, files in os.walk(path, topdown=False):
+        for name in files:
+            file_path = os.path.join(root, name)
+            try:
+                size = os.lstat(file_path).st_size
+                os.unlink(file_path)
+                freed += size
+            except FileNotFoundError:
+                pass
+
+        # Symlinks to dirs show up as dirs but need unlinking.
+        for name in dirs:
+            dir_path = os.path.join(root, name)
+            if os.path.islink(dir_path):
+                os.unlink(dir_path)
+            elif os.path.isdir(dir_path):
+                os.rmdir(dir_path)
+
+        if progress and time.monotonic() - last_report >= interval:
+            progress(freed)
+            last_report = time.monotonic()
+
+    os.rmdir(path)
+    if progress:
+        progress(freed)
+    return freed
+
+
+def main(argv):
+    if len(argv) != 1:
+        print(f"Usage: {os.path.basename(__file__)} <trash_path>", file=sys.stderr)
+        return 2
+
+    path = argv[0]
+    # Only ever delete trash, never a live install.
+    if ".trash-" not in os.path.basename(os.path.normpath(path)):
+        print(f"Error: {path} is not a trash path!", file=sys.stderr)
+        return 3
+
+    total = tree_size(path)
+    print(f"0 {total}", flush=True)
+    delete_tree(path, lambda freed: print(f"{freed} {total}", flush=True))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
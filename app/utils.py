@@ -4,28 +4,44 @@ import sys
 import pwd
 import json
 import glob
+import uuid
 import time
 import shlex
 import string
 import logging
-import psutil
 import shutil
 import socket
 import getpass
-import paramiko
-import requests
+import tempfile
 import subprocess
 import threading
 import configparser
 
 from datetime import datetime, timedelta
 from threading import Thread
-from flask import flash, current_app
+from flask import flash, current_app, g, has_request_context
 
 from . import db
-from .models import GameServer
+from .models import GameServer, Tag, Job, Deletion, game_server_tag
 from .proc_info_vessel import ProcInfoVessel
 from .cmd_descriptor import CmdDescriptor
+from .status_cache import StatusCache
+from .status_watcher import StatusWatcher
+from .proc_store import ProcInfoStore, SqliteProcInfoStore, pid_alive
+from .job_manager import JobManager, utc_now
+from .scheduler import Scheduler, next_run_time
+from .install_progress import InstallProgress
+from .artifact_cache import ArtifactCache
+from .trash import trash_path_for, move_to_trash
+from .backups import (
+    DEFAULT_EXCLUDES,
+    create_backup,
+    list_backups,
+    prune_backups,
+)
+from .dedup_store import DedupStore
+from .perf import init_perf, timed, perf_stats, list_profiles
+from .metrics import render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
 
 # Constants.
 CWD = os.getcwd()
@@ -40,18 +56,52 @@ PATHS = {
     "find": "/usr/bin/find",
     "ssh-keygen": "/usr/bin/ssh-keygen",
     "rm": "/usr/bin/rm",
+    "mv": "/usr/bin/mv",
+    "test": "/usr/bin/test",
+    "nice": "/usr/bin/nice",
+    "ionice": "/usr/bin/ionice",
 }
+TRASH_SCRIPT = os.path.join(CWD, "app/trash.py")
+# Most of a failed local deletion's stderr to log.
+DELETE_STDERR_LOG_BYTES = 8192
 CONNECTOR_CMD = [
     PATHS["sudo"],
     "-n",
     os.path.join(CWD, "venv/bin/python"),
     ANSIBLE_CONNECTOR,
 ]
+LGSMSH_URL = "https://linuxgsm.sh"
+# Bulk action names to LinuxGSM short commands.
+BULK_ACTIONS = {
+    "update": "u",
+    "restart": "r",
+    "backup": "b",
+}
+
+# Network stats globals, primed by the first get_network_stats() call.
+prev_bytes_sent = None
+prev_bytes_recv = None
+prev_time = None
+
+# Game server status globals.
+status_cache = StatusCache()
+status_watcher = None  # Set by start_status_watcher() if enabled.
+
+# Command output store global, see get_proc_store().
+proc_store = None
 
-# Network stats globals.
-prev_bytes_sent = psutil.net_io_counters().bytes_sent
-prev_bytes_recv = psutil.net_io_counters().bytes_recv
-prev_time = time.time()
+# Background job manager global, see get_job_manager().
+job_manager = None
+job_manager_lock = threading.Lock()
+
+# Scheduled commands global, see start_scheduler().
+scheduler = None
+
+# Install server names to InstallProgress objects, see get_install_progress().
+install_trackers = dict()
+
+# Held while linuxgsm.sh is being refreshed in the background.
+lgsmsh_refresh_lock = threading.Lock()
 
 
 def log_wrap(item_name, item):
@@ -175,6 +225,10 @@ def process_popen_output(proc, proc_info, output_type):
         config, "settings", "end_in_newlines", True, True
     )
 
+    # Checked once up front, so per line logging is free when debug is off.
+    logger = current_app.logger
+    log_lines = logger.isEnabledFor(logging.DEBUG)
+
     while True:
         if output_type == "stdout":
             out_line = proc.stdout.read1().decode("utf-8")
@@ -207,15 +261,16 @@ def process_popen_output(proc, proc_info, output_type):
 
                 if output_type == "stdout":
                     proc_info.stdout.append(line)
-                    log_msg = log_wrap("stdout", line.replace("\n", ""))
-                    current_app.logger.debug(log_msg)
+                    if log_lines:
+                        logger.debug("stdout: %r", line)
 
                 else:
                     proc_info.stderr.append(line)
-                    log_msg = log_wrap("stderr", line.replace("\n", ""))
-                    current_app.logger.debug(log_msg)
+                    if log_lines:
+                        logger.debug("stderr: %r", line)
 
 
+@timed()
 def run_cmd_popen(cmd, proc_info=ProcInfoVessel(), app_context=False):
     """
     General purpose subprocess.Popen wrapper function. Keeps track of processes
@@ -248,7 +303,7 @@ def run_cmd_popen(cmd, proc_info=ProcInfoVessel(), app_context=False):
     if app_context:
         app_context.push()
 
-    current_app.logger.info(log_wrap("cmd", cmd))
+    current_app.logger.info("cmd: %s", cmd)
 
     # Subprocess call, Bytes mode, not buffered.
     proc = subprocess.Popen(
@@ -466,167 +521,1274 @@ def get_tmux_socket_name_from_cache(server, gs_id_file_path):
     # Check if cache has expired.
     cache_mtime = os.path.getmtime(cache_file)
 
-    # Convert the mtime to a datetime object.
-    cache_time = datetime.fromtimestamp(cache_mtime)
+    # Convert the mtime to a datetime object.
+    cache_time = datetime.fromtimestamp(cache_mtime)
+
+    current_time = datetime.now()
+    one_week_ago = current_time - timedelta(weeks=1)
+
+    # Time comparisons always confuse me. With Epoch time, bigger number ==
+    # more recent. Aka if the epoch time of one week ago is larger than the
+    # epoch timestamp of cache file than the cache must be older than a week.
+    if cache_time < one_week_ago:
+        if server.install_type == "docker":
+            socket_name = get_tmux_socket_name_docker(server, gs_id_file_path)
+        else:
+            socket_name = get_tmux_socket_name_over_ssh(server, gs_id_file_path)
+
+        update_tmux_socket_name_cache(server.id, socket_name)
+        return socket_name
+
+    with open(cache_file, "r") as file:
+        cache_data = json.load(file)
+
+    if str(server.id) not in cache_data:
+        if server.install_type == "docker":
+            socket_name = get_tmux_socket_name_docker(server, gs_id_file_path)
+        else:
+            socket_name = get_tmux_socket_name_over_ssh(server, gs_id_file_path)
+
+        update_tmux_socket_name_cache(server.id, socket_name)
+        return socket_name
+
+    socket_name = cache_data[str(server.id)]
+    return socket_name
+
+
+def get_tmux_socket_name(server):
+    """
+    Get's the tmux socket file name for a given game server. Will call
+    get_tmux_socket_name_from_cache() for remote, docker, & non-same user
+    installs, otherwise will just read the gs_id value from the local file
+    system to build the socket name.
+
+    Args:
+        server (GameServer): Game Server to get tmux socket name for.
+
+    Returns:
+        str: Returns the socket name for game server. None if can't get socket
+             name.
+    """
+    gs_id_file_path = os.path.join(
+        server.install_path, f"lgsm/data/{server.script_name}.uid"
+    )
+
+    if should_use_ssh(server) or server.install_type == "docker":
+        return get_tmux_socket_name_from_cache(server, gs_id_file_path)
+
+    if not os.path.isfile(gs_id_file_path):
+        return None
+
+    with open(gs_id_file_path, "r") as file:
+        gs_id = file.read()
+
+    return server.script_name + "-" + gs_id.rstrip()
+
+
+@timed()
+def get_server_status(server):
+    """
+    Get's the game server status (on/off) for a specific game server. For
+    install_type local same user, does so by running tmux cmd locally. For
+    install_type remote and local not same user, fetches status by running tmux
+    cmd over SSH. For install_type docker, uses docker cmd to fetch status.
+
+    Args:
+        server (GameServer): Game server object to check status of.
+    Returns:
+        bool|None: True if game server is active, False if inactive, None if
+                   indeterminate.
+    """
+    proc_info = ProcInfoVessel()
+
+    socket = get_tmux_socket_name(server)
+    if socket == None:
+        return None
+
+    # Local same user installs get their status pushed into the cache by the
+    # inotify watcher, if enabled. No need to fork tmux.
+    is_local = not should_use_ssh(server) and server.install_type != "docker"
+    if status_watcher and is_local:
+        status = status_watcher.watch(
+            server.id, socket, server.install_path, server.script_name
+        )
+        if status != None:
+            return status
+
+    cmd = [PATHS["tmux"], "-L", socket, "list-session"]
+
+    if should_use_ssh(server):
+        gs_id_file_path = os.path.join(
+            server.install_path, f"lgsm/data/{server.script_name}.uid"
+        )
+        keyfile = get_ssh_key_file(server.username, server.install_host)
+        success = run_cmd_ssh(
+            cmd, server.install_host, server.username, keyfile, proc_info
+        )
+
+        # If the ssh connection itself fails return None.
+        if not success:
+            current_app.logger.info(proc_info)
+            return None
+
+    elif server.install_type == "docker":
+        cmd = [
+            PATHS["sudo"],
+            "-n",
+            PATHS["docker"],
+            "exec",
+            "--user",
+            server.username,
+            server.script_name,
+        ] + cmd
+        run_cmd_popen(cmd, proc_info)
+
+    # Else type local same user.
+    else:
+        run_cmd_popen(cmd, proc_info)
+
+    current_app.logger.info(proc_info)
+    status = True
+    if proc_info.exit_status > 0:
+        status = False
+
+    status_cache.set(server.id, status)
+
+    return status
+
+
+def start_status_watcher():
+    """
+    Starts the inotify status watcher for local same user installs, if enabled
+    in the main.conf. Falls back to plain tmux polling if inotify unavailable.
+
+    Returns:
+        bool: True if watcher started, False otherwise.
+    """
+    global status_watcher
+
+    # Already running in this process.
+    if status_watcher:
+        return True
+
+    config_options = read_config("app")
+    if not config_options["status_watcher"]:
+        return False
+
+    try:
+        reconcile_interval = float(config_options["status_reconcile_interval"])
+    except ValueError:
+        reconcile_interval = 60
+
+    watcher = StatusWatcher(status_cache, reconcile_interval)
+    if not watcher.start():
+        return False
+
+    status_watcher = watcher
+    return True
+
+
+def forget_server_status(server_id):
+    """
+    Drops a deleted game server from the status cache & inotify watcher.
+
+    Args:
+        server_id (int): Id of deleted game server.
+    """
+    if status_watcher:
+        status_watcher.unwatch(server_id)
+
+    status_cache.remove(server_id)
+
+
+def get_all_server_statuses(all_game_servers):
+    """
+    Get's a list of game server statuses (on/off) for all installed game
+    servers. Does so by wrapping get_server_status().
+
+    Args:
+        all_game_servers (list): List of all installed/added game servers.
+
+    Returns:
+        dict: Dictionary of game server names to status (on/off = True/False).
+    """
+
+    server_statuses = dict()
+
+    for server in all_game_servers:
+        # Initialize all servers False (aka inactive) to start with.
+        server_statuses[server.install_name] = False
+        server_statuses[server.install_name] = get_server_status(server)
+
+    return server_statuses
+
+
+def permitted_server_names(current_user):
+    """
+    Gets the names of game servers a user has access to, granted by name or by
+    tag. Looked up once per request.
+
+    Args:
+        current_user (LocalProxy): Currently logged in flask user object.
+
+    Returns:
+        list: Game server names, None for admins who can access them all.
+    """
+    if current_user.role == "admin":
+        return None
+
+    if has_request_context() and "permitted_server_names" in g:
+        return g.permitted_server_names
+
+    user_perms = json.loads(current_user.permissions)
+    server_names = set(user_perms["servers"])
+    tags = user_perms.get("tags", [])
+    if tags:
+        rows = (
+            db.session.query(GameServer.install_name)
+            .join(game_server_tag, game_server_tag.c.game_server_id == GameServer.id)
+            .join(Tag, Tag.id == game_server_tag.c.tag_id)
+            .filter(Tag.name.in_(tags))
+            .all()
+        )
+        server_names.update(name for name, in rows)
+
+    server_names = sorted(server_names)
+    if has_request_context():
+        g.permitted_server_names = server_names
+    return server_names
+
+
+def parse_tags(tags):
+    """
+    Normalizes user supplied tags. Tags are lowercase letters, numbers, dots,
+    dashes & underscores, up to 64 characters.
+
+    Args:
+        tags (str|list): Comma or space separated tags, or a list of tags.
+
+    Returns:
+        list: Sorted, unique tag names.
+
+    Raises:
+        ValueError: If any tag isn't valid.
+    """
+    if isinstance(tags, str):
+        tags = re.split(r"[,\s]+", tags)
+    if not isinstance(tags, list):
+        raise ValueError("Invalid tags")
+
+    names = set()
+    for tag in tags:
+        tag = str(tag).strip().lower()
+        if not tag:
+            continue
+        if not re.fullmatch(r"[a-z0-9][a-z0-9._-]{0,63}", tag):
+            raise ValueError(f"Invalid tag: {tag}")
+        names.add(tag)
+    return sorted(names)
+
+
+def set_server_tags(server, tags):
+    """
+    Replaces a game server's tags, creating any tags that don't exist yet.
+
+    Args:
+        server (GameServer): Game server to tag.
+        tags (str|list): Tags, see parse_tags().
+
+    Returns:
+        list: Game server's tag names.
+
+    Raises:
+        ValueError: If any tag isn't valid.
+    """
+    names = parse_tags(tags)
+    existing = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(names))}
+    server.tags = [existing.get(name) or Tag(name=name) for name in names]
+    db.session.commit()
+    return names
+
+
+def tag_summaries(current_user):
+    """
+    Counts game servers on, off & unknown per tag, from the status cache. One
+    query over the tag link table, no game server rows are loaded or probed.
+
+    Args:
+        current_user (LocalProxy): Currently logged in flask user object.
+
+    Returns:
+        list: Dicts of tag name, servers, on, off & unknown counts, by name.
+    """
+    query = db.session.query(Tag.name, game_server_tag.c.game_server_id).outerjoin(
+        game_server_tag, game_server_tag.c.tag_id == Tag.id
+    )
+
+    # Non-admins only count servers they can see, tags stay listed for filters.
+    server_names = permitted_server_names(current_user)
+    if server_names != None:
+        visible = {
+            server_id
+            for server_id, in db.session.query(GameServer.id).filter(
+                GameServer.install_name.in_(server_names)
+            )
+        }
+
+    statuses = status_cache.snapshot()
+    summaries = dict()
+    for name, server_id in query.order_by(Tag.name).all():
+        summary = summaries.setdefault(
+            name, {"tag": name, "servers": 0, "on": 0, "off": 0, "unknown": 0}
+        )
+        if server_id == None or (server_names != None and server_id not in visible):
+            continue
+
+        status = statuses.get(server_id, (None, None))[0]
+        summary["servers"] += 1
+        if status == True:
+            summary["on"] += 1
+        elif status == False:
+            summary["off"] += 1
+        else:
+            summary["unknown"] += 1
+
+    return list(summaries.values())
+
+
+def tagged_server_names(current_user, tags):
+    """
+    Gets the names of game servers with any of the tags, that the user has
+    access to. Servers the user can't see are left out entirely, so their
+    names don't leak.
+
+    Args:
+        current_user (LocalProxy): Currently logged in flask user object.
+        tags (list): Tag names.
+
+    Returns:
+        list: Game server names, by name.
+    """
+    query = GameServer.query.filter(GameServer.tags.any(Tag.name.in_(tags)))
+    server_names = permitted_server_names(current_user)
+    if server_names != None:
+        query = query.filter(GameServer.install_name.in_(server_names))
+
+    return [server.install_name for server in query.order_by(GameServer.install_name)]
+
+
+def server_list_args(args, per_page=50):
+    """
+    Collects list_game_servers() filters & paging from request args. Blank
+    filters are dropped, so an empty filter form matches everything.
+
+    Args:
+        args (MultiDict): Request args.
+        per_page (int): Default servers per page.
+
+    Returns:
+        dict: Keyword args for list_game_servers().
+
+    Raises:
+        ValueError: If page or per_page aren't positive numbers, or status
+                    isn't 'on', 'off', or 'unknown'.
+    """
+    list_args = dict()
+    for key in ("host", "install_type", "status", "prefix", "tag"):
+        value = args.get(key, "").strip()
+        if value:
+            list_args[key] = value
+
+    if list_args.get("status") not in (None, "on", "off", "unknown"):
+        raise ValueError("Invalid status")
+
+    try:
+        list_args["page"] = int(args.get("page", 1))
+        list_args["per_page"] = min(int(args.get("per_page", per_page)), 500)
+    except ValueError:
+        raise ValueError("Invalid page")
+    if list_args["page"] < 1 or list_args["per_page"] < 1:
+        raise ValueError("Invalid page")
+
+    return list_args
+
+
+def list_game_servers(
+    current_user,
+    host=None,
+    install_type=None,
+    status=None,
+    prefix=None,
+    tag=None,
+    page=1,
+    per_page=50,
+):
+    """
+    Gets one page of the game servers a user can see, grouped by host & then
+    sorted by name. Filtering & paging are done by the database, and status
+    comes from the status cache, so no game server is probed.
+
+    Args:
+        current_user (LocalProxy): Currently logged in flask user object.
+        host (str): Only servers on this host.
+        install_type (str): Only local, remote, or docker servers.
+        status (str): Only servers last seen 'on', 'off', or 'unknown'.
+        prefix (str): Only servers whose name starts with this.
+        tag (str): Only servers with this tag.
+        page (int): Page number, starting from 1.
+        per_page (int): Servers per page.
+
+    Returns:
+        dict: Page of server dicts, total matching, per host counts in page
+              order & paging info.
+    """
+    from sqlalchemy import func, or_
+    from sqlalchemy.orm import selectinload
+
+    host_col = func.coalesce(GameServer.install_host, "127.0.0.1")
+    query = GameServer.query
+
+    # Non-admins see servers they have access to, plus unfinished installs.
+    server_names = permitted_server_names(current_user)
+    if server_names != None:
+        query = query.filter(
+            or_(
+                GameServer.install_finished.isnot(True),
+                GameServer.install_name.in_(server_names),
+            )
+        )
+
+    if host:
+        query = query.filter(host_col == host)
+    if install_type:
+        query = query.filter(GameServer.install_type == install_type)
+    if tag:
+        query = query.filter(GameServer.tags.any(Tag.name == tag))
+    if prefix:
+        escaped = re.sub(r"([\\%_])", r"\\\1", prefix)
+        query = query.filter(GameServer.install_name.like(f"{escaped}%", escape="\\"))
+
+    statuses = {
+        server_id: cached for server_id, (cached, _) in status_cache.snapshot().items()
+    }
+    if status in ("on", "off"):
+        want = status == "on"
+        ids = [server_id for server_id, cached in statuses.items() if cached == want]
+        query = query.filter(GameServer.id.in_(ids))
+    elif status == "unknown":
+        ids = [server_id for server_id, cached in statuses.items() if cached != None]
+        query = query.filter(GameServer.id.notin_(ids))
+
+    hosts = (
+        query.with_entities(host_col, func.count(GameServer.id))
+        .group_by(host_col)
+        .order_by(host_col)
+        .all()
+    )
+    total = sum(count for _, count in hosts)
+
+    servers = (
+        query.options(selectinload(GameServer.tags))
+        .order_by(host_col, GameServer.install_name)
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+        .all()
+    )
+
+    return {
+        "servers": [
+            {
+                "id": server.id,
+                "install_name": server.install_name,
+                "username": server.username,
+                "install_type": server.install_type,
+                "install_host": server.install_host or "127.0.0.1",
+                "install_finished": bool(server.install_finished),
+                "status": statuses.get(server.id),
+                "tags": [server_tag.name for server_tag in server.tags],
+            }
+            for server in servers
+        ],
+        "total": total,
+        "hosts": [[host_name, count] for host_name, count in hosts],
+        "page": page,
+        "per_page": per_page,
+        "pages": max(1, -(-total // per_page)),
+    }
+
+
+def get_proc_store():
+    """
+    Gets the store holding ProcInfoVessel objects for commands run by the app.
+    Backend is set by the proc_store option in the main.conf. The memory
+    backend only works with a single gunicorn worker, the sqlite backend shares
+    command output & running job state across all workers.
+
+    Returns:
+        ProcInfoStore|SqliteProcInfoStore: Command output store.
+    """
+    global proc_store
+
+    if proc_store == None:
+        config_options = read_config("app")
+        if config_options["proc_store"] == "sqlite":
+            db_path = os.path.join(CWD, "app/proc_store.db")
+            proc_store = SqliteProcInfoStore(db_path)
+        else:
+            proc_store = ProcInfoStore()
+
+    return proc_store
+
+
+def get_job_manager():
+    """
+    Gets the app's JobManager, creating it on first use. Limits are set by the
+    [jobs] section of the main.conf.
+
+    Returns:
+        JobManager: Job manager all background commands are submitted to.
+    """
+    global job_manager
+
+    with job_manager_lock:
+        if job_manager == None:
+            config_options = read_config("app")
+            job_manager = JobManager(
+                current_app._get_current_object(),
+                int(config_options["max_jobs"]),
+                int(config_options["max_jobs_per_host"]),
+            )
+
+    return job_manager
+
+
+def submit_server_command(
+    server,
+    short_cmd,
+    batch_id=None,
+    batch_limit=None,
+    host_limit=None,
+    schedule_id=None,
+):
+    """
+    Submits a LinuxGSM command for a game server to the job manager. Same
+    command path as the control buttons on the controls page, ssh for remote &
+    new user installs, docker exec for containers, popen otherwise.
+
+    Args:
+        server (GameServer): Game server to run command for.
+        short_cmd (str): LinuxGSM short command, ex. 'u' for update.
+        batch_id (str): Optional bulk action batch id.
+        batch_limit (int): Optional max jobs running at once for batch.
+        host_limit (int): Optional max jobs running at once per host for batch.
+        schedule_id (int): Optional id of schedule running the command.
+
+    Returns:
+        int: Id of submitted job.
+    """
+    # Purge socket file name cache on game server start. Fixes post install,
+    # null socket name cache bug.
+    if short_cmd == "st":
+        purge_tmux_socket_cache()
+
+    proc_info = get_proc_store().get_or_create(server.install_name)
+    script_path = os.path.join(server.install_path, server.script_name)
+    cmd = [script_path, short_cmd]
+
+    if should_use_ssh(server):
+        pub_key_file = get_ssh_key_file(server.username, server.install_host)
+        target = run_cmd_ssh
+        args = (cmd, server.install_host, server.username, pub_key_file, proc_info)
+    else:
+        if server.install_type == "docker":
+            cmd = docker_cmd_build(server) + cmd
+        target = run_cmd_popen
+        args = (cmd, proc_info)
+
+    return get_job_manager().submit(
+        "Command",
+        target,
+        args=args,
+        proc_info=proc_info,
+        server_name=server.install_name,
+        install_host=server.install_host,
+        cmd=cmd,
+        batch_id=batch_id,
+        batch_limit=batch_limit,
+        host_limit=host_limit,
+        schedule_id=schedule_id,
+    )
+
+
+def start_bulk_action(servers, action, concurrency, per_host):
+    """
+    Runs a bulk action (update, restart, backup) across many game servers at
+    once, bounded by the given concurrency & per host limits.
+
+    Args:
+        servers (list): GameServer objects to run action on.
+        action (str): Key of BULK_ACTIONS.
+        concurrency (int): Max servers being worked on at once.
+        per_host (int): Max servers being worked on at once per install host.
+
+    Returns:
+        str: Id of new batch, used to look up progress.
+    """
+    batch_id = uuid.uuid4().hex
+    short_cmd = BULK_ACTIONS[action]
+
+    for server in servers:
+        submit_server_command(server, short_cmd, batch_id, concurrency, per_host)
+
+    return batch_id
+
+
+def get_bulk_progress(batch_id, server_names=None):
+    """
+    Builds aggregated progress & per server outcome table for a bulk action.
+
+    Args:
+        batch_id (str): Id of bulk action batch.
+        server_names (list): Optional install names to limit results to.
+
+    Returns:
+        dict: Progress counts & per server outcomes, None if no such batch.
+    """
+    jobs = get_job_manager().batch_jobs(batch_id)
+    if server_names != None:
+        jobs = [job for job in jobs if job.server_name in server_names]
+
+    if not jobs:
+        return None
+
+    counts = {"queued": 0, "running": 0, "finished": 0, "failed": 0}
+    servers = []
+    for job in jobs:
+        counts[job.status] = counts.get(job.status, 0) + 1
+        servers.append(
+            {
+                "server": job.server_name,
+                "host": job.install_host,
+                "job_id": job.id,
+                "status": job.status,
+                "exit_status": job.exit_status,
+                "duration": job.duration(),
+            }
+        )
+
+    done = counts["queued"] == 0 and counts["running"] == 0
+    return {
+        "batch_id": batch_id,
+        "total": len(jobs),
+        "completed": len(jobs) - counts["queued"] - counts["running"],
+        "done": done,
+        "counts": counts,
+        "servers": servers,
+    }
+
+
+def start_scheduler(app):
+    """
+    Starts the scheduler thread for recurring game server commands, if enabled
+    in the main.conf.
+
+    Args:
+        app (Flask): App to run scheduled commands in.
+
+    Returns:
+        bool: True if scheduler is running, False otherwise.
+    """
+    global scheduler
+
+    if scheduler != None:
+        return True
+
+    config_options = read_config("app")
+    if not config_options["scheduler"]:
+        return False
+
+    def submit(server, short_cmd, schedule_id):
+        return submit_server_command(server, short_cmd, schedule_id=schedule_id)
+
+    scheduler = Scheduler(
+        app,
+        submit,
+        int(config_options["max_scheduled_jobs"]),
+        float(config_options["scheduler_interval"]),
+    )
+    scheduler.start()
+    return True
+
+
+def start_perf(app):
+    """
+    Registers request timing hooks & the opt-in request profiler, if enabled
+    in the main.conf. Stats are served by /api/perf.
+
+    Args:
+        app (Flask): App to time.
+
+    Returns:
+        bool: True if requests are being timed, False otherwise.
+    """
+    config_options = read_config("perf")
+    if not config_options["request_timing"]:
+        return False
+
+    init_perf(
+        app,
+        profile_every=int(config_options["profile_every"]),
+        profile_dir=os.path.join(CWD, config_options["profile_dir"]),
+        profile_keep=int(config_options["profile_keep"]),
+    )
+    return True
+
+
+def get_schedulable_commands(server, current_user):
+    """
+    Gets commands a user may put on a schedule for a game server. Same as the
+    control buttons, minus console & send which make no sense unattended.
+
+    Args:
+        server (GameServer): Game server to get commands for.
+        current_user (LocalProxy): Currently logged in flask user object.
+
+    Returns:
+        dict: Long command names to short commands.
+    """
+    commands = get_commands(server.script_name, False, current_user)
+    return {
+        cmd.long_cmd: cmd.short_cmd
+        for cmd in commands
+        if cmd.short_cmd not in ("c", "sd")
+    }
+
+
+def get_schedule_history(schedule_id, limit=10):
+    """
+    Gets recent runs of a schedule, so slow or failing runs stand out.
+
+    Args:
+        schedule_id (int): Id of schedule.
+        limit (int): Max number of runs to return.
+
+    Returns:
+        list: Job dicts, newest first.
+    """
+    jobs = (
+        Job.query.filter_by(schedule_id=schedule_id)
+        .order_by(Job.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [job.to_dict() for job in jobs]
+
+
+def install_admission(running):
+    """
+    Checks if another install can start right now. Installs are capped by the
+    max_installs option and held back while disk space is low or the cpu is
+    busy. The cpu check only applies while another install is running, so the
+    queue always makes progress.
+
+    Args:
+        running (list): Job dicts running in this process (see JobManager).
+
+    Returns:
+        str: Reason install has to wait, None if it can start.
+    """
+    config_options = read_config("app")
+
+    installs = len([e for e in running if e["name"].startswith("Install_")])
+    # Plus installs running in other gunicorn workers.
+    others = Job.query.filter(
+        Job.status == "running",
+        Job.name.startswith("Install_"),
+        Job.worker_pid != os.getpid(),
+    ).all()
+    installs += len([job for job in others if pid_alive(job.worker_pid)])
+
+    if installs >= int(config_options["max_installs"]):
+        return "Max concurrent installs running"
+
+    min_free = float(config_options["install_min_free_gb"]) * 1024**3
+    for path in ("/home", CWD):
+        if os.path.isdir(path) and shutil.disk_usage(path).free < min_free:
+            return f"Low disk space on {path}"
+
+    load_per_cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+    if installs and load_per_cpu > float(config_options["install_max_load"]):
+        return "CPU busy"
+
+    return None
+
+
+def install_gate(running):
+    """JobManager gate for installs, see install_admission()."""
+    return install_admission(running) == None
+
+
+def get_install_progress(server_name):
+    """
+    Gets structured progress for the latest install of a game server. Parses
+    steamcmd progress out of the install output, so the page can show a real
+    progress bar without pulling every line.
+
+    Args:
+        server_name (str): Install name of game server.
+
+    Returns:
+        dict: Job status, queue position, stage, percent, bytes, rate & eta.
+              None if server has never been installed via the app.
+    """
+    job = (
+        Job.query.filter_by(name=f"Install_{server_name}")
+        .order_by(Job.id.desc())
+        .first()
+    )
+    if job == None:
+        return None
+
+    progress = {
+        "server": server_name,
+        "job_id": job.id,
+        "status": job.status,
+        "queue_position": None,
+        "waiting_on": None,
+    }
+
+    if job.status == "queued":
+        manager = get_job_manager()
+        progress["queue_position"] = manager.queue_position(job.id)
+        progress["waiting_on"] = install_admission(list(manager.running.values()))
+
+    tracker = install_trackers.setdefault(server_name, InstallProgress())
+    proc_info = get_proc_store().get(server_name)
+    lines = list(proc_info.stdout) if proc_info else []
+    progress.update(tracker.update(lines))
+
+    # Done, no more samples coming.
+    if job.status not in ("queued", "running"):
+        install_trackers.pop(server_name, None)
+
+    return progress
+
+
+def get_running_installs():
+    """
+    Gets list of running install job names, if any are currently running.
+
+    Returns:
+        job_names (list): List of currently queued or running install jobs.
+    """
+    jobs = get_job_manager().active_jobs(name_prefix="Install_")
+    return [job.name for job in jobs]
+
+
+def queue_deletion(server_name, trash_path, path, install_host=None, username=None):
+    """
+    Records a trashed game server tree & submits a background job to delete
+    it. Local trees are deleted by app/trash.py, remote ones by rm over ssh,
+    both at lowest cpu & io priority.
+
+    Args:
+        server_name (str): Install name of deleted game server.
+        trash_path (str): Path install was moved to.
+        path (str): Original install path.
+        install_host (str): Host files are on, for remote installs.
+        username (str): User to ssh in as, for remote installs.
+
+    Returns:
+        int: Deletion id.
+    """
+    deletion = Deletion(
+        server_name=server_name,
+        install_host=install_host,
+        username=username,
+        path=path,
+        trash_path=trash_path,
+        status="queued",
+    )
+    db.session.add(deletion)
+    db.session.commit()
+
+    submit_deletion(deletion.id, server_name, install_host)
+    return deletion.id
+
+
+def submit_deletion(deletion_id, server_name, install_host=None):
+    """Submits the job that deletes a trashed tree."""
+    get_job_manager().submit(
+        f"Delete_{server_name}",
+        run_deletion,
+        args=(deletion_id,),
+        install_host=install_host or "127.0.0.1",
+    )
+
+
+def claim_deletion(deletion_id):
+    """
+    Takes ownership of a deletion for this worker, unless another live worker
+    already has it.
+
+    Returns:
+        Deletion: Claimed deletion, None if not ours to run.
+    """
+    deletion = db.session.get(Deletion, deletion_id)
+    if deletion == None or deletion.status in ("finished", "failed"):
+        return None
+
+    owner = deletion.worker_pid
+    if owner not in (None, os.getpid()) and pid_alive(owner):
+        return None
+
+    result = db.session.execute(
+        db.update(Deletion)
+        .where(Deletion.id == deletion_id, Deletion.worker_pid == owner)
+        .values(worker_pid=os.getpid(), status="deleting")
+    )
+    db.session.commit()
+    if result.rowcount != 1:
+        return None
+
+    db.session.refresh(deletion)
+    return deletion
+
+
+def run_deletion(deletion_id):
+    """
+    Job target that deletes a trashed game server tree, recording bytes freed
+    as it goes. Picks up where it left off if a previous run was cut short.
+
+    Args:
+        deletion_id (int): Id of Deletion to run.
+
+    Raises:
+        RuntimeError: If deletion fails, so the job is marked failed.
+    """
+    deletion = claim_deletion(deletion_id)
+    if deletion == None:
+        return
+
+    if deletion.install_host and deletion.install_host != "127.0.0.1":
+        proc_info = ProcInfoVessel()
+        keyfile = get_ssh_key_file(deletion.username, deletion.install_host)
+        # No ionice, it may not be installed on the remote host. Without an
+        # io class set, the kernel derives io priority from the nice value,
+        # so nice 19 gets the lowest best effort io priority anyway.
+        cmd = [PATHS["nice"], "-n", "19", PATHS["rm"], "-rf", deletion.trash_path]
+        success = run_cmd_ssh(
+            cmd,
+            deletion.install_host,
+            deletion.username,
+            keyfile,
+            proc_info,
+            timeout=None,
+        )
+        ok = success and proc_info.exit_status == 0
+    else:
+        # Bytes freed by earlier interrupted runs.
+        base = deletion.bytes_freed or 0
+        cmd = [PATHS["nice"], "-n", "19"]
+        if os.path.isfile(PATHS["ionice"]):
+            cmd = [PATHS["ionice"], "-c", "3"] + cmd
+        cmd += [sys.executable, TRASH_SCRIPT, deletion.trash_path]
+
+        # Stderr goes to a file, not a pipe. Nothing reads a pipe until stdout
+        # is done, so lots of errors (ex. one per unremovable file) would fill
+        # it & block trash.py forever.
+        with tempfile.TemporaryFile() as stderr_file:
+            proc = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=stderr_file, text=True
+            )
+            for line in proc.stdout:
+                try:
+                    freed, total = [int(field) for field in line.split()]
+                except ValueError:
+                    continue
+                deletion.bytes_total = base + total
+                deletion.bytes_freed = base + freed
+                db.session.commit()
+
+            ok = proc.wait() == 0
+            if not ok:
+                # Just the tail, could be an error per file.
+                stderr_file.seek(0, os.SEEK_END)
+                stderr_file.seek(max(0, stderr_file.tell() - DELETE_STDERR_LOG_BYTES))
+                stderr = stderr_file.read().decode(errors="replace")
+                current_app.logger.info(log_wrap("delete stderr", stderr))
+
+    deletion.status = "finished" if ok else "failed"
+    deletion.date_finished = utc_now()
+    db.session.commit()
+
+    if not ok:
+        raise RuntimeError(f"Deleting {deletion.trash_path} failed")
+
+
+def resume_deletions(app):
+    """
+    Resubmits deletions cut short by an app restart or crash.
+
+    Args:
+        app (Flask): App to look up & run deletions in.
+
+    Returns:
+        int: Number of deletions resumed.
+    """
+    resumed = 0
+    with app.app_context():
+        pending = Deletion.query.filter(
+            Deletion.status.in_(("queued", "deleting"))
+        ).all()
+        for deletion in pending:
+            if deletion.worker_pid and pid_alive(deletion.worker_pid):
+                continue
+            submit_deletion(deletion.id, deletion.server_name, deletion.install_host)
+            resumed += 1
+
+    return resumed
+
+
+def get_deletions(server_names=None, limit=50):
+    """
+    Gets recent deletions, newest first.
+
+    Args:
+        server_names (list): Only get deletions for these servers. None for
+                             all.
+        limit (int): Max deletions to return.
+
+    Returns:
+        list: Deletion dicts.
+    """
+    query = Deletion.query
+    if server_names != None:
+        query = query.filter(Deletion.server_name.in_(server_names))
+    deletions = query.order_by(Deletion.id.desc()).limit(limit).all()
+    return [deletion.to_dict() for deletion in deletions]
+
 
-    current_time = datetime.now()
-    one_week_ago = current_time - timedelta(weeks=1)
+def get_backup_options():
+    """
+    Gets backup settings from main.conf, with excludes split into a list &
+    the backup dir made absolute.
 
-    # Time comparisons always confuse me. With Epoch time, bigger number ==
-    # more recent. Aka if the epoch time of one week ago is larger than the
-    # epoch timestamp of cache file than the cache must be older than a week.
-    if cache_time < one_week_ago:
-        if server.install_type == "docker":
-            socket_name = get_tmux_socket_name_docker(server, gs_id_file_path)
-        else:
-            socket_name = get_tmux_socket_name_over_ssh(server, gs_id_file_path)
+    Returns:
+        dict: backup_dir, compression, threads, keep, excludes, snapshot_dir
+              & snapshot_keep.
+    """
+    config_options = read_config("backups")
+    excludes = [
+        pattern.strip()
+        for pattern in config_options["backup_excludes"].split(",")
+        if pattern.strip()
+    ]
+    return {
+        "backup_dir": os.path.join(CWD, config_options["backup_dir"]),
+        "compression": config_options["backup_compression"],
+        "threads": int(config_options["backup_threads"]),
+        "keep": int(config_options["backup_keep"]),
+        "excludes": excludes,
+        "snapshot_dir": os.path.join(CWD, config_options["snapshot_dir"]),
+        "snapshot_keep": int(config_options["snapshot_keep"]),
+    }
 
-        update_tmux_socket_name_cache(server.id, socket_name)
-        return socket_name
 
-    with open(cache_file, "r") as file:
-        cache_data = json.load(file)
+def run_backup(server_name, incremental=False):
+    """
+    Job target that backs up a local game server install & enforces
+    retention.
 
-    if str(server.id) not in cache_data:
-        if server.install_type == "docker":
-            socket_name = get_tmux_socket_name_docker(server, gs_id_file_path)
-        else:
-            socket_name = get_tmux_socket_name_over_ssh(server, gs_id_file_path)
+    Args:
+        server_name (str): Install name of game server to back up.
+        incremental (bool): Only back up changes since last backup.
 
-        update_tmux_socket_name_cache(server.id, socket_name)
-        return socket_name
+    Returns:
+        dict: Backup summary from create_backup().
+    """
+    server = GameServer.query.filter_by(install_name=server_name).first()
+    if server == None:
+        raise ValueError(f"No game server named {server_name}")
+
+    options = get_backup_options()
+    summary = create_backup(
+        server.install_path,
+        options["backup_dir"],
+        server_name,
+        excludes=options["excludes"],
+        compression=options["compression"],
+        threads=options["threads"],
+        incremental=incremental,
+    )
+    current_app.logger.info(log_wrap("backup", summary))
 
-    socket_name = cache_data[str(server.id)]
-    return socket_name
+    removed = prune_backups(options["backup_dir"], server_name, options["keep"])
+    if removed:
+        current_app.logger.info(log_wrap("pruned backups", removed))
 
+    return summary
 
-def get_tmux_socket_name(server):
+
+def start_backup(server, incremental=False):
     """
-    Get's the tmux socket file name for a given game server. Will call
-    get_tmux_socket_name_from_cache() for remote, docker, & non-same user
-    installs, otherwise will just read the gs_id value from the local file
-    system to build the socket name.
+    Submits a backup job for a game server. Runs through the job manager so it
+    never overlaps a LinuxGSM command on the same server.
 
     Args:
-        server (GameServer): Game Server to get tmux socket name for.
+        server (GameServer): Game server to back up.
+        incremental (bool): Only back up changes since last backup.
 
     Returns:
-        str: Returns the socket name for game server. None if can't get socket
-             name.
-    """
-    gs_id_file_path = os.path.join(
-        server.install_path, f"lgsm/data/{server.script_name}.uid"
+        int: Job id.
+    """
+    return get_job_manager().submit(
+        f"Backup_{server.install_name}",
+        run_backup,
+        args=(server.install_name, incremental),
+        server_name=server.install_name,
+        install_host=server.install_host,
     )
 
-    if should_use_ssh(server) or server.install_type == "docker":
-        return get_tmux_socket_name_from_cache(server, gs_id_file_path)
-
-    if not os.path.isfile(gs_id_file_path):
-        return None
 
-    with open(gs_id_file_path, "r") as file:
-        gs_id = file.read()
+def get_dedup_store():
+    """
+    Gets the deduplicated snapshot store.
 
-    return server.script_name + "-" + gs_id.rstrip()
+    Returns:
+        DedupStore: Store configured in main.conf.
+    """
+    return DedupStore(get_backup_options()["snapshot_dir"])
 
 
-def get_server_status(server):
+def run_snapshot(server_name):
     """
-    Get's the game server status (on/off) for a specific game server. For
-    install_type local same user, does so by running tmux cmd locally. For
-    install_type remote and local not same user, fetches status by running tmux
-    cmd over SSH. For install_type docker, uses docker cmd to fetch status.
+    Job target that takes a deduplicated snapshot of a local game server
+    install, drops snapshots past retention & garbage collects their chunks.
 
     Args:
-        server (GameServer): Game server object to check status of.
+        server_name (str): Install name of game server to snapshot.
+
     Returns:
-        bool|None: True if game server is active, False if inactive, None if
-                   indeterminate.
+        dict: Snapshot summary from DedupStore.snapshot().
     """
-    proc_info = ProcInfoVessel()
+    server = GameServer.query.filter_by(install_name=server_name).first()
+    if server == None:
+        raise ValueError(f"No game server named {server_name}")
 
-    socket = get_tmux_socket_name(server)
-    if socket == None:
-        return None
+    options = get_backup_options()
+    store = get_dedup_store()
+    summary = store.snapshot(
+        server.install_path, server_name, excludes=options["excludes"]
+    )
+    current_app.logger.info(log_wrap("snapshot", summary))
 
-    cmd = [PATHS["tmux"], "-L", socket, "list-session"]
+    dropped = store.prune(server_name, options["snapshot_keep"])
+    if dropped:
+        current_app.logger.info(log_wrap("gc", store.gc()))
 
-    if should_use_ssh(server):
-        gs_id_file_path = os.path.join(
-            server.install_path, f"lgsm/data/{server.script_name}.uid"
-        )
-        keyfile = get_ssh_key_file(server.username, server.install_host)
-        success = run_cmd_ssh(
-            cmd, server.install_host, server.username, keyfile, proc_info
-        )
+    return summary
 
-        # If the ssh connection itself fails return None.
-        if not success:
-            current_app.logger.info(proc_info)
-            return None
 
-    elif server.install_type == "docker":
-        cmd = [
-            PATHS["sudo"],
-            "-n",
-            PATHS["docker"],
-            "exec",
-            "--user",
-            server.username,
-            server.script_name,
-        ] + cmd
-        run_cmd_popen(cmd, proc_info)
+def start_snapshot(server):
+    """
+    Submits a deduplicated snapshot job for a game server. Shares the Backup_
+    job name, so it never overlaps a backup of the same server.
 
-    # Else type local same user.
-    else:
-        run_cmd_popen(cmd, proc_info)
+    Args:
+        server (GameServer): Game server to snapshot.
 
-    current_app.logger.info(proc_info)
-    if proc_info.exit_status > 0:
-        return False
+    Returns:
+        int: Job id.
+    """
+    return get_job_manager().submit(
+        f"Backup_{server.install_name}",
+        run_snapshot,
+        args=(server.install_name,),
+        server_name=server.install_name,
+        install_host=server.install_host,
+    )
 
-    return True
 
+def restore_target_for(server, snapshot_id):
+    """Dir snapshots get restored into, next to the live install."""
+    return f"{os.path.normpath(server.install_path)}.restore-{snapshot_id}"
 
-def get_all_server_statuses(all_game_servers):
+
+def run_restore_snapshot(server_name, snapshot_id):
     """
-    Get's a list of game server statuses (on/off) for all installed game
-    servers. Does so by wrapping get_server_status().
+    Job target that restores a snapshot next to the live install, for the
+    user to swap in once the game server is stopped.
 
     Args:
-        all_game_servers (list): List of all installed/added game servers.
+        server_name (str): Install name of game server.
+        snapshot_id (int): Snapshot to restore.
 
     Returns:
-        dict: Dictionary of game server names to status (on/off = True/False).
+        str: Dir restored into.
     """
+    server = GameServer.query.filter_by(install_name=server_name).first()
+    if server == None:
+        raise ValueError(f"No game server named {server_name}")
 
-    server_statuses = dict()
+    target = restore_target_for(server, snapshot_id)
+    files = get_dedup_store().restore(snapshot_id, target)
+    current_app.logger.info(log_wrap("restored", f"{files} files to {target}"))
+    return target
 
-    for server in all_game_servers:
-        # Initialize all servers False (aka inactive) to start with.
-        server_statuses[server.install_name] = False
-        server_statuses[server.install_name] = get_server_status(server)
 
-    return server_statuses
+def start_restore_snapshot(server, snapshot_id):
+    """
+    Submits a snapshot restore job for a game server.
 
+    Args:
+        server (GameServer): Game server snapshot belongs to.
+        snapshot_id (int): Snapshot to restore.
 
-def get_running_installs():
+    Returns:
+        int: Job id.
+    """
+    return get_job_manager().submit(
+        f"Backup_{server.install_name}",
+        run_restore_snapshot,
+        args=(server.install_name, snapshot_id),
+        server_name=server.install_name,
+        install_host=server.install_host,
+    )
+
+
+def get_snapshots(server_name):
     """
-    Gets list of running install thread names, if any are currently running.
+    Lists a game server's deduplicated snapshots, newest first.
+
+    Args:
+        server_name (str): Install name of game server.
 
     Returns:
-        thread_names (list): List of currently running install threads.
+        list: Snapshot dicts (id, created, files, size, new_bytes).
+    """
+    if not os.path.isdir(get_backup_options()["snapshot_dir"]):
+        return []
+    return get_dedup_store().snapshots(server_name)
+
+
+def get_backups(server_name):
     """
-    threads = threading.enumerate()
-    # Get all active threads.
-    thread_names = []
-    for thread in threads:
-        if thread.is_alive() and thread.name.startswith("Install_"):
-            thread_names.append(thread.name)
+    Lists a game server's backups, newest first.
+
+    Args:
+        server_name (str): Install name of game server.
 
-    return thread_names
+    Returns:
+        list: Backup dicts (archive, stamp, kind, size).
+    """
+    backups = list_backups(get_backup_options()["backup_dir"], server_name)
+    for backup in backups:
+        backup.pop("path")
+    return list(reversed(backups))
 
 
+@timed()
 def find_cfg_paths(server):
     """
     Finds a list of all valid cfg files for a given game server. Works for
@@ -726,6 +1888,26 @@ def normalize_path(path):
     return path
 
 
+def remote_path_missing(server, keyfile):
+    """
+    Checks if a remote game server's install path no longer exists.
+
+    Args:
+        server (GameServer): Remote game server to check.
+        keyfile (str): Ssh key file for the server's user & host.
+
+    Returns:
+        Bool: True if the path is gone, False if it exists or the check
+              couldn't be run.
+    """
+    proc_info = ProcInfoVessel()
+    cmd = [PATHS["test"], "-e", server.install_path]
+    success = run_cmd_ssh(
+        cmd, server.install_host, server.username, keyfile, proc_info
+    )
+    return success and proc_info.exit_status == 1
+
+
 def delete_server(server, remove_files, delete_user):
     """
     Does the actual deletions for the /delete route.
@@ -756,8 +1938,14 @@ def delete_server(server, remove_files, delete_user):
                 )
                 return False
 
+            # Move files out of the way now & delete them in the background.
             if os.path.isdir(server.install_path):
-                shutil.rmtree(server.install_path)
+                trash_path = move_to_trash(server.install_path)
+                server_name, install_path = server.install_name, server.install_path
+                server.delete()
+                queue_deletion(server_name, trash_path, install_path)
+                flash(f"Game server, {server_name} deleted! Removing files...")
+                return True
 
         if delete_user and server.username != USER:
             cmd = CONNECTOR_CMD + ["--delete", str(server.id)]
@@ -779,7 +1967,9 @@ def delete_server(server, remove_files, delete_user):
 
         proc_info = ProcInfoVessel()
         keyfile = get_ssh_key_file(server.username, server.install_host)
-        cmd = [PATHS["rm"], "-rf", server.install_path]
+        trash_path = trash_path_for(server.install_path)
+        # Rename is instant, the actual rm happens in a background job.
+        cmd = [PATHS["mv"], "-T", server.install_path, trash_path]
 
         success = run_cmd_ssh(
             cmd, server.install_host, server.username, keyfile, proc_info
@@ -793,9 +1983,22 @@ def delete_server(server, remove_files, delete_user):
 
         if proc_info.exit_status > 0:
             current_app.logger.info(proc_info)
+            # Already gone, ex. removed by hand. Nothing left to trash.
+            if remote_path_missing(server, keyfile):
+                flash(f"Game server, {server.install_name} deleted!")
+                server.delete()
+                return True
+
             flash("Delete command failed! Check logs for more info.", category="error")
             return False
 
+        server_name, install_path = server.install_name, server.install_path
+        install_host, username = server.install_host, server.username
+        server.delete()
+        queue_deletion(server_name, trash_path, install_path, install_host, username)
+        flash(f"Game server, {server_name} deleted! Removing files...")
+        return True
+
     flash(f"Game server, {server.install_name} deleted!")
     server.delete()
     return True
@@ -825,6 +2028,7 @@ def valid_cfg_name(cfg_file):
     return False
 
 
+@timed()
 def get_commands(server, send_cmd, current_user):
     """
     Turns data in commands.json into list of command objects that implement the
@@ -999,10 +2203,26 @@ def valid_server_name(server_name):
     return False
 
 
+def get_artifact_cache():
+    """
+    Gets the linuxgsm.sh & game script artifact cache.
+
+    Returns:
+        ArtifactCache: Cache configured in main.conf.
+    """
+    config_options = read_config("artifacts")
+    return ArtifactCache(
+        os.path.join(CWD, config_options["artifact_cache_dir"]),
+        int(config_options["artifact_versions_keep"]),
+    )
+
+
 def get_lgsmsh(lgsmsh):
     """
     Function for pulling down the latest linuxgsm.sh script from their URL when
-    needed. Fakes wget's user agent to get requests to work.
+    needed. Fakes wget's user agent to get requests to work. Uses a conditional
+    request against the cached copy, so an unchanged script isn't downloaded
+    again, and falls back to the cached copy when offline.
 
     Args:
         lgsmsh (str): Path to linuxgsm.sh script file (aka web-lgsm/scripts/).
@@ -1010,36 +2230,71 @@ def get_lgsmsh(lgsmsh):
     Returns:
         None: Just fetches latest file if needed, returns nothing.
     """
+    cache = get_artifact_cache()
     try:
         headers = {"User-Agent": "Wget/1.20.3 (linux-gnu)"}
-        response = requests.get("https://linuxgsm.sh", headers=headers)
-        with open(lgsmsh, "wb") as f:
-            f.write(response.content)
-        os.chmod(lgsmsh, 0o755)
+        if cache.refresh("linuxgsm.sh", LGSMSH_URL, headers):
+            current_app.logger.info("Latest linuxgsm.sh script fetched!")
+        else:
+            current_app.logger.info("Cached linuxgsm.sh script is up to date!")
     except Exception as e:
         # For debug.
         current_app.logger.debug(e)
 
-    current_app.logger.info("Latest linuxgsm.sh script fetched!")
+    cache.install("linuxgsm.sh", lgsmsh)
+
+
+def refresh_lgsmsh_background(app, lgsmsh):
+    """
+    Refreshes linuxgsm.sh in a background thread. Does nothing if a refresh
+    is already running.
+
+    Args:
+        app (Flask): App to push context for in thread.
+        lgsmsh (str): Path to linuxgsm.sh script file.
+    """
+    if not lgsmsh_refresh_lock.acquire(blocking=False):
+        return
+
+    def refresh():
+        try:
+            with app.app_context():
+                get_lgsmsh(lgsmsh)
+        finally:
+            lgsmsh_refresh_lock.release()
+
+    Thread(target=refresh, daemon=True, name="RefreshLgsmsh").start()
 
 
-def check_and_get_lgsmsh(lgsmsh):
+def check_and_get_lgsmsh(lgsmsh, background=False):
     """
-    Checks if linuxgsm.sh already exists and if not, gets it. Also checks if
-    current version is older than 3 weeks old and if so get's a fresh copy.
+    Checks if linuxgsm.sh already exists and if not, gets it, from the
+    artifact cache if possible. Also checks if the cached copy is due a
+    refresh and if so checks upstream for a new version.
 
     Args:
         lgsmsh (str): Path to linuxgsm.sh script file (aka web-lgsm/scripts/).
+        background (bool): Do due refreshes in a background thread, so the
+                           caller never waits on upstream. Only blocks if
+                           there's no copy of linuxgsm.sh at all yet.
 
     Returns:
         None: Just fetches latest file if needed, returns nothing.
     """
-    if not os.path.isfile(lgsmsh):
+    cache = get_artifact_cache()
+    refresh_interval = int(read_config("artifacts")["lgsmsh_refresh_interval"])
+
+    # Nothing cached or on disk yet, have to wait on the fetch.
+    if not cache.install("linuxgsm.sh", lgsmsh) and not os.path.isfile(lgsmsh):
         get_lgsmsh(lgsmsh)
         return
 
-    three_weeks_in_seconds = 1814400
-    if int(time.time() - os.path.getmtime(lgsmsh)) > three_weeks_in_seconds:
+    if not cache.is_stale("linuxgsm.sh", refresh_interval):
+        return
+
+    if background:
+        refresh_lgsmsh_background(current_app._get_current_object(), lgsmsh)
+    else:
         get_lgsmsh(lgsmsh)
 
 
@@ -1119,10 +2374,13 @@ def get_network_stats():
     """
     Gets bytes in/out per second. Stores last got values in globals. Used by
     get_server_stats() to collect network status for /api/system-usage route.
+    The first call has nothing to compare to, so reports rates of zero.
 
     Returns:
         dict: Dictionary containing bytes_sent_rate & bytes_recv_rate.
     """
+    import psutil
+
     global prev_bytes_sent, prev_bytes_recv, prev_time
 
     # Get current counters and timestamp.
@@ -1131,6 +2389,12 @@ def get_network_stats():
     current_bytes_recv = net_io.bytes_recv
     current_time = time.time()
 
+    if prev_time == None or current_time <= prev_time:
+        prev_bytes_sent = current_bytes_sent
+        prev_bytes_recv = current_bytes_recv
+        prev_time = current_time
+        return {"bytes_sent_rate": 0.0, "bytes_recv_rate": 0.0}
+
     # Calculate the rate of bytes sent and received per second.
     bytes_sent_rate = (current_bytes_sent - prev_bytes_sent) / (
         current_time - prev_time
@@ -1147,16 +2411,22 @@ def get_network_stats():
     return {"bytes_sent_rate": bytes_sent_rate, "bytes_recv_rate": bytes_recv_rate}
 
 
-def get_server_stats():
+def get_server_stats(network=True):
     """
     Returns disk, cpu, mem, and network stats which are later turned into json
     for the /api/system-usage route which is used by home page resource usage
     stats charts.
 
+    Args:
+        network (bool): Include network rates. These are worked out from the
+                        last call, so only the system-usage route should ask.
+
     Returns:
         dict: Dictionary containing disk, cpu, mem, and network usage
               statistics.
     """
+    import psutil
+
     stats = dict()
 
     # Disk
@@ -1191,11 +2461,52 @@ def get_server_stats():
     }
 
     # Network
-    stats["network"] = get_network_stats()
+    if network:
+        stats["network"] = get_network_stats()
 
     return stats
 
 
+def get_metrics():
+    """
+    Collects Prometheus metrics for the /metrics route. Game server up/down
+    comes from the status cache & latencies from perf stats, so a scrape never
+    runs anything over ssh, docker or tmux.
+
+    Returns:
+        str: Prometheus text format metrics.
+    """
+    import psutil
+
+    now = time.time()
+    statuses = status_cache.snapshot()
+    servers = []
+    for server in GameServer.query.all():
+        status, checked = statuses.get(server.id, (None, None))
+        servers.append(
+            {
+                "name": server.install_name,
+                "host": server.install_host,
+                "type": server.install_type,
+                "status": status,
+                "age": None if checked == None else round(now - checked, 3),
+            }
+        )
+
+    job_counts = dict(
+        db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all()
+    )
+
+    return render_metrics(
+        get_server_stats(network=False),
+        psutil.net_io_counters(),
+        servers,
+        job_counts,
+        perf_stats,
+        worker=os.getpid() if current_app.config.get("WORKERS", 1) > 1 else None,
+    )
+
+
 def user_has_permissions(current_user, route, server_name=None):
     """
     Check's if current user has permissions to various routes.
@@ -1240,7 +2551,7 @@ def user_has_permissions(current_user, route, server_name=None):
             )
             return False
 
-        if server_name not in user_perms["servers"]:
+        if server_name not in permitted_server_names(current_user):
             flash(
                 "Your user does NOT have permission to delete this game server!",
                 category="error",
@@ -1256,20 +2567,28 @@ def user_has_permissions(current_user, route, server_name=None):
             return False
 
     if route == "controls":
-        if server_name not in user_perms["servers"]:
+        if server_name not in permitted_server_names(current_user):
             flash(
                 "Your user does NOT have permission access this game server!",
                 category="error",
             )
             return False
 
+    # Admin only, restores write over files on the host.
+    if route == "restore":
+        flash(
+            "Your user does NOT have permission to restore backups!",
+            category="error",
+        )
+        return False
+
     # No flash for api routes. They return json.
     if route == "update-console":
         if 'console' not in user_perms["controls"]:
             return False
 
-    if route == "server-statuses" or route == "cmd-output":
-        if server_name not in user_perms["servers"]:
+    if route == "server-statuses" or route == "cmd-output" or route == "bulk":
+        if server_name not in permitted_server_names(current_user):
             return False
 
     return True
@@ -1392,6 +2711,33 @@ def get_ssh_key_file(user, host):
     return keyfile
 
 
+def ssh_connect(client, hostname, username, key_filename, timeout=3):
+    """
+    Connects a paramiko client, recording connect latency & failures per host
+    for /metrics & /api/perf.
+
+    Args:
+        client (paramiko.SSHClient): Client to connect.
+        hostname (str): The hostname or IP address of the server.
+        username (str): The username to use for the SSH connection.
+        key_filename (str): The path to the private key file.
+        timeout (float): Connect timeout in seconds.
+
+    Raises:
+        Exception: Whatever paramiko raised, after it's been counted.
+    """
+    start = time.perf_counter()
+    try:
+        client.connect(
+            hostname, username=username, key_filename=key_filename, timeout=timeout
+        )
+    except Exception:
+        perf_stats.record_ssh_connect(hostname, time.perf_counter() - start, ok=False)
+        raise
+    perf_stats.record_ssh_connect(hostname, time.perf_counter() - start)
+
+
+@timed()
 def run_cmd_ssh(
     cmd,
     hostname,
@@ -1418,6 +2764,8 @@ def run_cmd_ssh(
     Returns:
         bool: True if command runs successfully, False otherwise.
     """
+    import paramiko
+
     config = configparser.ConfigParser()
     config.read("main.conf")
     end_in_newlines = get_config_value(
@@ -1437,14 +2785,12 @@ def run_cmd_ssh(
 
     safe_cmd = shlex.join(cmd)
 
-    # Log info.
-    current_app.logger.info(cmd)
-    current_app.logger.info(safe_cmd)
-    current_app.logger.info(hostname)
-    current_app.logger.info(username)
-    current_app.logger.info(key_filename)
-    current_app.logger.info("pre stdout: " + str(proc_info.stdout))
-    current_app.logger.info("pre stderr: " + str(proc_info.stderr))
+    # Checked once up front, so per line logging is free when debug is off.
+    logger = current_app.logger
+    log_lines = logger.isEnabledFor(logging.DEBUG)
+
+    logger.info("ssh %s@%s: %s", username, hostname, safe_cmd)
+    logger.debug("key file: %s", key_filename)
 
     # Initialize SSH client.
     client = paramiko.SSHClient()
@@ -1452,10 +2798,7 @@ def run_cmd_ssh(
     client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
     try:
-        client.connect(
-            hostname, username=username, key_filename=key_filename, timeout=3
-        )
-        current_app.logger.debug(cmd)
+        ssh_connect(client, hostname, username, key_filename)
 
         proc_info.process_lock = True
         # Open a new session and request a PTY.
@@ -1482,8 +2825,8 @@ def run_cmd_ssh(
                         ):
                             line += "\n"
                         proc_info.stdout.append(line)
-                        log_msg = log_wrap("stdout", line.strip())
-                        current_app.logger.debug(log_msg)
+                        if log_lines:
+                            logger.debug("stdout: %r", line)
 
             if channel.recv_stderr_ready():
                 stderr_chunk = channel.recv_stderr(8192).decode("utf-8")
@@ -1497,8 +2840,8 @@ def run_cmd_ssh(
                         ):
                             line += "\n"
                         proc_info.stderr.append(line)
-                        log_msg = log_wrap("stderr", line.strip())
-                        current_app.logger.debug(log_msg)
+                        if log_lines:
+                            logger.debug("stderr: %r", line)
 
             # Break the loop if the command has finished.
             if channel.exit_status_ready():
@@ -1553,6 +2896,8 @@ def read_file_over_ssh(server, file_path):
     Returns:
         str: Returns the contents of the file as a string.
     """
+    import paramiko
+
     current_app.logger.info(log_wrap("file_path", file_path))
     pub_key_file = get_ssh_key_file(server.username, server.install_host)
 
@@ -1561,12 +2906,7 @@ def read_file_over_ssh(server, file_path):
         with paramiko.SSHClient() as ssh:
             # Automatically add the host key.
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(
-                server.install_host,
-                username=server.username,
-                key_filename=pub_key_file,
-                timeout=3,
-            )
+            ssh_connect(ssh, server.install_host, server.username, pub_key_file)
 
             # Open sftp session.
             with ssh.open_sftp() as sftp:
@@ -1596,6 +2936,8 @@ def write_file_over_ssh(server, file_path, content):
     Returns:
         Bool: True if the write was successful, False otherwise.
     """
+    import paramiko
+
     current_app.logger.info(log_wrap("file_path", file_path))
     pub_key_file = get_ssh_key_file(server.username, server.install_host)
 
@@ -1603,12 +2945,7 @@ def write_file_over_ssh(server, file_path, content):
         with paramiko.SSHClient() as ssh:
             # Automatically add the host key.
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(
-                server.install_host,
-                username=server.username,
-                key_filename=pub_key_file,
-                timeout=3,
-            )
+            ssh_connect(ssh, server.install_host, server.username, pub_key_file)
 
             with ssh.open_sftp() as sftp:
                 with sftp.open(file_path, "w") as file:
@@ -1673,6 +3010,7 @@ def read_changelog():
         return f"Problem reading CHANGELOG.md: {e}"
 
 
+@timed()
 def read_config(route):
     """
     Reads in relevant main config parameters for a given route. Also protects
@@ -1807,3 +3145,123 @@ def read_config(route):
             config, "settings", "cfg_editor", False, True
         )
         return config_options
+
+    if route == "app":
+        config_options["status_watcher"] = get_config_value(
+            config, "settings", "status_watcher", False, True
+        )
+        config_options["status_reconcile_interval"] = get_config_value(
+            config, "settings", "status_reconcile_interval", "60"
+        )
+        config_options["proc_store"] = get_config_value(
+            config, "server", "proc_store", "memory"
+        )
+        config_options["max_jobs"] = get_config_value(
+            config, "jobs", "max_jobs", "8"
+        )
+        config_options["max_jobs_per_host"] = get_config_value(
+            config, "jobs", "max_jobs_per_host", "4"
+        )
+        config_options["scheduler"] = get_config_value(
+            config, "jobs", "scheduler", True, True
+        )
+        config_options["max_scheduled_jobs"] = get_config_value(
+            config, "jobs", "max_scheduled_jobs", "2"
+        )
+        config_options["scheduler_interval"] = get_config_value(
+            config, "jobs", "scheduler_interval", "30"
+        )
+        config_options["max_installs"] = get_config_value(
+            config, "jobs", "max_installs", "2"
+        )
+        config_options["install_min_free_gb"] = get_config_value(
+            config, "jobs", "install_min_free_gb", "10"
+        )
+        config_options["install_max_load"] = get_config_value(
+            config, "jobs", "install_max_load", "1.0"
+        )
+        return config_options
+
+    if route == "bulk":
+        config_options["bulk_concurrency"] = get_config_value(
+            config, "jobs", "bulk_concurrency", "4"
+        )
+        config_options["max_jobs_per_host"] = get_config_value(
+            config, "jobs", "max_jobs_per_host", "4"
+        )
+        return config_options
+
+    if route == "logging":
+        config_options["log_level"] = get_config_value(
+            config, "debug", "log_level", "info"
+        )
+        config_options["log_file"] = get_config_value(
+            config, "debug", "log_file", "logs/web-lgsm.log"
+        )
+        config_options["log_format"] = get_config_value(
+            config, "debug", "log_format", "text"
+        )
+        config_options["log_max_bytes"] = get_config_value(
+            config, "debug", "log_max_bytes", "10485760"
+        )
+        config_options["log_backups"] = get_config_value(
+            config, "debug", "log_backups", "5"
+        )
+        return config_options
+
+    if route == "metrics":
+        config_options["metrics_token"] = get_config_value(
+            config, "metrics", "metrics_token", ""
+        )
+        return config_options
+
+    if route == "perf":
+        config_options["request_timing"] = get_config_value(
+            config, "perf", "request_timing", True, True
+        )
+        config_options["profile_every"] = get_config_value(
+            config, "perf", "profile_every", "0"
+        )
+        config_options["profile_dir"] = get_config_value(
+            config, "perf", "profile_dir", "profiles"
+        )
+        config_options["profile_keep"] = get_config_value(
+            config, "perf", "profile_keep", "20"
+        )
+        return config_options
+
+    if route == "backups":
+        config_options["backup_dir"] = get_config_value(
+            config, "backups", "backup_dir", "backups"
+        )
+        config_options["backup_compression"] = get_config_value(
+            config, "backups", "backup_compression", "auto"
+        )
+        config_options["backup_threads"] = get_config_value(
+            config, "backups", "backup_threads", "0"
+        )
+        config_options["backup_keep"] = get_config_value(
+            config, "backups", "backup_keep", "3"
+        )
+        config_options["backup_excludes"] = get_config_value(
+            config, "backups", "backup_excludes", ", ".join(DEFAULT_EXCLUDES)
+        )
+        config_options["snapshot_dir"] = get_config_value(
+            config, "backups", "snapshot_dir", "backups/snapshots"
+        )
+        config_options["snapshot_keep"] = get_config_value(
+            config, "backups", "snapshot_keep", "24"
+        )
+        return config_options
+
+    if route == "artifacts":
+        config_options["artifact_cache_dir"] = get_config_value(
+            config, "cache", "artifact_cache_dir", "cache/artifacts"
+        )
+        config_options["artifact_versions_keep"] = get_config_value(
+            config, "cache", "artifact_versions_keep", "3"
+        )
+        config_options["lgsmsh_refresh_interval"] = get_config_value(
+            config, "cache", "lgsmsh_refresh_interval", "86400"
+        )
+        return config_options
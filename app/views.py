@@ -2,15 +2,15 @@ import os
 import io
 import re
 import sys
+import hmac
 import json
 import time
 import signal
 import shutil
 import getpass
 import configparser
-import markdown
 
-from threading import Thread
+from datetime import datetime
 from werkzeug.security import generate_password_hash
 from flask_login import login_required, current_user
 from flask import (
@@ -31,6 +31,9 @@ from . import db
 from .utils import *
 from .models import *
 from .proc_info_vessel import ProcInfoVessel
+from .scheduler import MISSED_POLICIES
+from .assets import send_asset
+from .api_response import compact_json, finalize_api_response, not_modified
 
 # Constants.
 CWD = os.getcwd()
@@ -42,13 +45,18 @@ PATHS = {
     "tmux": "/usr/bin/tmux",
 }
 
-# Globals.
-servers = {}  # Holds ProcInfoVessel objects.
-
 # Initialize view blueprint.
 views = Blueprint("views", __name__)
 
 
+@views.after_request
+def api_response(response):
+    # Compact, compressed & conditional responses for the polled json routes.
+    if request.path.startswith("/api/"):
+        return finalize_api_response(response)
+    return response
+
+
 ######### Home Page #########
 
 @views.route("/", methods=["GET"])
@@ -65,14 +73,32 @@ def home():
         log_wrap("current_user.permissions", current_user.permissions)
     )
 
-    installed_servers = GameServer.query.all()
-
-    current_app.logger.info(log_wrap("installed_servers", installed_servers))
+    try:
+        list_args = server_list_args(request.args)
+    except ValueError as e:
+        flash(str(e), category="error")
+        list_args = server_list_args(dict())
+
+    # Just one page, the rest is fetched from /api/servers as it's scrolled to.
+    server_list = list_game_servers(current_user, **list_args)
+    current_app.logger.info(log_wrap("server_list total", server_list["total"]))
+
+    # Every host for the filter form, not just the ones matching the filters.
+    filtered = any(key not in ("page", "per_page") for key in list_args)
+    all_hosts = [host for host, _ in server_list["hosts"]]
+    if filtered:
+        all_hosts = [
+            host for host, _ in list_game_servers(current_user, per_page=1)["hosts"]
+        ]
 
     return render_template(
         "home.html",
         user=current_user,
-        all_game_servers=installed_servers,
+        server_list=server_list,
+        list_args=list_args,
+        filtered=filtered,
+        all_hosts=all_hosts,
+        tags=tag_summaries(current_user),
         config_options=config_options,
     )
 
@@ -137,15 +163,10 @@ def controls():
         flash("Error loading commands.json file!", category="error")
         return redirect(url_for("views.home"))
 
-    # Object to hold process info from cmd in daemon thread.
-    proc_info = ProcInfoVessel()
-
-    # If this is the first time we're ever seeing the server_name then put it
-    # and its associated proc_info in the global servers dictionary.
-    if not server_name in servers:
-        servers[server_name] = proc_info
-
-    proc_info = servers[server_name]
+    # Object to hold process info from cmd in daemon thread. If this is the
+    # first time we're ever seeing the server_name then a new one is put in
+    # the proc store for it.
+    proc_info = get_proc_store().get_or_create(server_name)
 
     script_path = os.path.join(server.install_path, server.script_name)
 
@@ -200,71 +221,41 @@ def controls():
 
             if should_use_ssh(server):
                 pub_key_file = get_ssh_key_file(server.username, server.install_host)
-                daemon = Thread(
-                    target=run_cmd_ssh,
+                get_job_manager().submit(
+                    "send",
+                    run_cmd_ssh,
                     args=(
                         cmd,
                         server.install_host,
                         server.username,
                         pub_key_file,
                         proc_info,
-                        current_app.app_context(),
+                        None,
                         None,
                     ),
-                    daemon=True,
-                    name="send",
+                    proc_info=proc_info,
+                    server_name=server_name,
+                    install_host=server.install_host,
+                    cmd=cmd,
                 )
-                daemon.start()
                 return redirect(url_for("views.controls", server=server_name))
 
             if server.install_type == "docker":
                 cmd = docker_cmd_build(server) + cmd
 
-            daemon = Thread(
-                target=run_cmd_popen,
-                args=(cmd, proc_info, current_app.app_context()),
-                daemon=True,
-                name="ConsoleCMD",
+            get_job_manager().submit(
+                "ConsoleCMD",
+                run_cmd_popen,
+                args=(cmd, proc_info),
+                proc_info=proc_info,
+                server_name=server_name,
+                install_host=server.install_host,
+                cmd=cmd,
             )
-            daemon.start()
             return redirect(url_for("views.controls", server=server_name))
 
         else:
-            # Purge socket file name cache on game server start. Fixes post
-            # install, null socket name cache bug.
-            if short_cmd == "st":
-                purge_tmux_socket_cache()
-
-            cmd = [script_path, short_cmd]
-
-            if should_use_ssh(server):
-                pub_key_file = get_ssh_key_file(server.username, server.install_host)
-                daemon = Thread(
-                    target=run_cmd_ssh,
-                    args=(
-                        cmd,
-                        server.install_host,
-                        server.username,
-                        pub_key_file,
-                        proc_info,
-                        current_app.app_context(),
-                    ),
-                    daemon=True,
-                    name="Command",
-                )
-                daemon.start()
-                return redirect(url_for("views.controls", server=server_name))
-
-            if server.install_type == "docker":
-                cmd = docker_cmd_build(server) + cmd
-
-            daemon = Thread(
-                target=run_cmd_popen,
-                args=(cmd, proc_info, current_app.app_context()),
-                daemon=True,
-                name="Command",
-            )
-            daemon.start()
+            submit_server_command(server, short_cmd)
             return redirect(url_for("views.controls", server=server_name))
 
     current_app.logger.info(log_wrap("server_name", server_name))
@@ -286,8 +277,6 @@ def controls():
 @views.route("/install", methods=["GET", "POST"])
 @login_required
 def install():
-    global servers
-
     # Check if user has permissions to install route.
     if not user_has_permissions(current_user, "install"):
         return redirect(url_for("views.home"))
@@ -306,7 +295,7 @@ def install():
 
     # Check for / install the main linuxgsm.sh script.
     lgsmsh = "linuxgsm.sh"
-    check_and_get_lgsmsh(f"scripts/{lgsmsh}")
+    check_and_get_lgsmsh(f"scripts/{lgsmsh}", background=True)
 
     # Check if any installs are currently running.
     running_installs = get_running_installs()
@@ -322,19 +311,25 @@ def install():
             install_name = server_name
 
             if cancel == "true":
-                # Check if install thread is still running.
-                thread_name = "Install_" + server_name
-                if thread_name not in running_installs:
+                # Check if install job is still queued or running.
+                job_name = "Install_" + server_name
+                if job_name not in running_installs:
                     flash(
                         f"Install for {server_name} not currently running!",
                         category="error",
                     )
                     return redirect(url_for("views.install"))
 
-                proc_info = servers[server_name]
+                # Still waiting in the queue, just drop it.
+                for job in get_job_manager().active_jobs(name_prefix=job_name):
+                    if job.status == "queued" and get_job_manager().cancel(job.id):
+                        flash("Installation Canceled!")
+                        return redirect(url_for("views.install"))
+
+                proc_info = get_proc_store().get(server_name)
                 current_app.logger.info(log_wrap("proc_info", proc_info))
 
-                if proc_info.pid:
+                if proc_info and proc_info.pid:
                     success = cancel_install(proc_info)
                     if success:
                         flash("Installation Canceled!")
@@ -380,8 +375,7 @@ def install():
         # TODO v1.9: Make all this work via game server ID's, more reliable than
         # names.
         # Clobber any previously held proc_info objects for server.
-        servers[server_install_name] = ProcInfoVessel()
-        proc_info = servers[server_install_name]
+        proc_info = get_proc_store().create(server_install_name)
 
         install_exists = GameServer.query.filter_by(
             install_name=server_install_name
@@ -451,15 +445,18 @@ def install():
         ]
 
         current_app.logger.info(log_wrap("cmd", cmd))
-        current_app.logger.info(log_wrap("servers", servers))
-
-        install_daemon = Thread(
-            target=run_cmd_popen,
-            args=(cmd, proc_info, current_app.app_context()),
-            daemon=True,
-            name=f"Install_{server_install_name}",
+        current_app.logger.info(log_wrap("proc_store", get_proc_store()))
+
+        get_job_manager().submit(
+            f"Install_{server_install_name}",
+            run_cmd_popen,
+            args=(cmd, proc_info),
+            proc_info=proc_info,
+            server_name=server_install_name,
+            install_host=server.install_host,
+            cmd=cmd,
+            gate=install_gate,
         )
-        install_daemon.start()
 
         return render_template(
             "install.html",
@@ -476,12 +473,10 @@ def install():
 @views.route("/api/update-console", methods=["POST"])
 @login_required
 def update_console():
-    global servers
-
     if not user_has_permissions(current_user, "update-console"):
         resp_dict = {"Error": "Permission denied!"}
         response = Response(
-            json.dumps(resp_dict, indent=4), status=403, mimetype="application/json"
+            compact_json(resp_dict), status=403, mimetype="application/json"
         )
         return response
 
@@ -492,7 +487,7 @@ def update_console():
     if server_name == None:
         resp_dict = {"Error": "Required var: server"}
         response = Response(
-            json.dumps(resp_dict, indent=4), status=400, mimetype="application/json"
+            compact_json(resp_dict), status=400, mimetype="application/json"
         )
         return response
 
@@ -501,7 +496,7 @@ def update_console():
     if server == None:
         resp_dict = {"Error": "Supplied server does not exist!"}
         response = Response(
-            json.dumps(resp_dict, indent=4), status=400, mimetype="application/json"
+            compact_json(resp_dict), status=400, mimetype="application/json"
         )
         return response
 
@@ -524,11 +519,7 @@ def update_console():
     if server.install_type == "docker":
         cmd = docker_cmd_build(server) + cmd
 
-    if server.install_name in servers:
-        proc_info = servers[server.install_name]
-    else:
-        proc_info = ProcInfoVessel()
-        servers[server.install_name] = proc_info
+    proc_info = get_proc_store().get_or_create(server.install_name)
 
     if should_use_ssh(server):
         pub_key_file = get_ssh_key_file(server.username, server.install_host)
@@ -547,13 +538,86 @@ def update_console():
     if proc_info.exit_status > 0:
         resp_dict = {"Error": "Refresh cmd failed!"}
         response = Response(
-            json.dumps(resp_dict, indent=4), status=503, mimetype="application/json"
+            compact_json(resp_dict), status=503, mimetype="application/json"
         )
         return response
 
     resp_dict = {"Success": "Output updated!"}
     response = Response(
-        json.dumps(resp_dict, indent=4), status=200, mimetype="application/json"
+        compact_json(resp_dict), status=200, mimetype="application/json"
+    )
+    return response
+
+
+######### API Servers #########
+
+@views.route("/api/servers", methods=["GET"])
+@login_required
+def get_servers_api():
+    try:
+        list_args = server_list_args(request.args)
+    except ValueError as e:
+        resp_dict = {"Error": str(e)}
+        response = Response(
+            compact_json(resp_dict), status=400, mimetype="application/json"
+        )
+        return response
+
+    resp_dict = list_game_servers(current_user, **list_args)
+
+    response = Response(
+        compact_json(resp_dict), status=200, mimetype="application/json"
+    )
+    return response
+
+
+######### API Tags #########
+
+@views.route("/api/tags", methods=["GET", "POST"])
+@login_required
+def tags_api():
+    if request.method == "GET":
+        resp_dict = tag_summaries(current_user)
+        response = Response(
+            compact_json(resp_dict), status=200, mimetype="application/json"
+        )
+        return response
+
+    # Tags grant permissions, so only admins get to set them.
+    if current_user.role != "admin":
+        resp_dict = {"Error": "Permission Denied!"}
+        response = Response(
+            compact_json(resp_dict), status=403, mimetype="application/json"
+        )
+        return response
+
+    # Accept either a json body or a regular form post.
+    if request.is_json:
+        data = request.get_json(silent=True) or dict()
+    else:
+        data = request.form
+    server_name = data.get("server")
+    tags = data.get("tags", "")
+
+    server = GameServer.query.filter_by(install_name=server_name).first()
+    if server == None:
+        resp_dict = {"Error": "Invalid game server name"}
+        response = Response(
+            compact_json(resp_dict), status=400, mimetype="application/json"
+        )
+        return response
+
+    try:
+        resp_dict = {"server": server.install_name, "tags": set_server_tags(server, tags)}
+    except ValueError as e:
+        resp_dict = {"Error": str(e)}
+        response = Response(
+            compact_json(resp_dict), status=400, mimetype="application/json"
+        )
+        return response
+
+    response = Response(
+        compact_json(resp_dict), status=200, mimetype="application/json"
     )
     return response
 
@@ -569,7 +633,7 @@ def get_status():
     if server_id == None:
         resp_dict = {"Error": "No id supplied"}
         response = Response(
-            json.dumps(resp_dict, indent=4), status=400, mimetype="application/json"
+            compact_json(resp_dict), status=400, mimetype="application/json"
         )
         return response
 
@@ -577,14 +641,14 @@ def get_status():
     if server == None:
         resp_dict = {"Error": "Invalid id"}
         response = Response(
-            json.dumps(resp_dict, indent=4), status=400, mimetype="application/json"
+            compact_json(resp_dict), status=400, mimetype="application/json"
         )
         return response
 
     if not user_has_permissions(current_user, "server-statuses", server.install_name):
         resp_dict = {"Error": "Permission Denied!"}
         response = Response(
-            json.dumps(resp_dict, indent=4), status=403, mimetype="application/json"
+            compact_json(resp_dict), status=403, mimetype="application/json"
         )
         return response
 
@@ -593,7 +657,7 @@ def get_status():
     current_app.logger.info(log_wrap("resp_dict", resp_dict))
 
     response = Response(
-        json.dumps(resp_dict, indent=4), status=200, mimetype="application/json"
+        compact_json(resp_dict), status=200, mimetype="application/json"
     )
     return response
 
@@ -605,18 +669,45 @@ def get_status():
 def get_stats():
     server_stats = get_server_stats()
     response = Response(
-        json.dumps(server_stats, indent=4), status=200, mimetype="application/json"
+        compact_json(server_stats), status=200, mimetype="application/json"
     )
     return response
 
 
+######### Prometheus Metrics #########
+
+# No login_required, Prometheus authenticates with a bearer token instead.
+@views.route("/metrics", methods=["GET"])
+def metrics():
+    token = read_config("metrics")["metrics_token"]
+    if not token:
+        return Response("Metrics disabled\n", status=404, mimetype="text/plain")
+
+    auth_header = request.headers.get("Authorization", "")
+    scheme, _, given = auth_header.partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        given.strip().encode(), token.encode()
+    ):
+        response = Response("Unauthorized\n", status=401, mimetype="text/plain")
+        response.headers["WWW-Authenticate"] = "Bearer"
+        return response
+
+    return Response(get_metrics(), status=200, content_type=METRICS_CONTENT_TYPE)
+
+
+######### Built Static Assets #########
+
+# No login_required, the login page uses these too.
+@views.route("/static/dist/<path:filename>", methods=["GET"])
+def dist_asset(filename):
+    return send_asset(filename)
+
+
 ######### API CMD Output Page #########
 
 @views.route("/api/cmd-output", methods=["GET"])
 @login_required
 def no_output():
-    global servers
-
     # Collect args from GET request.
     server_name = request.args.get("server")
 
@@ -624,32 +715,579 @@ def no_output():
     if server_name == None:
         resp_dict = {"error": "eer can't load page n'@"}
         response = Response(
-            json.dumps(resp_dict, indent=4), status=200, mimetype="application/json"
+            compact_json(resp_dict), status=200, mimetype="application/json"
         )
         return response
 
     # Can't do anything if we don't recognize the server_name.
-    if server_name not in servers:
+    if server_name not in get_proc_store():
         resp_dict = {"error": "eer never heard of em"}
         response = Response(
-            json.dumps(resp_dict, indent=4), status=200, mimetype="application/json"
+            compact_json(resp_dict), status=200, mimetype="application/json"
         )
         return response
 
     if not user_has_permissions(current_user, "cmd-output", server_name):
         resp_dict = {"Error": "Permission Denied!"}
         response = Response(
-            json.dumps(resp_dict, indent=4), status=403, mimetype="application/json"
+            compact_json(resp_dict), status=403, mimetype="application/json"
         )
         return response
 
-    # If its a server in the servers dict set the output object to the
-    # one from that dictionary.
-    if server_name in servers:
-        output = servers[server_name]
+    # Output only changes while a cmd runs, most polls can skip building it.
+    etag = f"v{get_proc_store().version(server_name)}"
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
+    output = get_proc_store().to_json(server_name)
 
     # Returns json for used by ajax code on /controls route.
-    response = Response(output.toJSON(), status=200, mimetype="application/json")
+    response = Response(output, status=200, mimetype="application/json")
+    response.set_etag(etag, weak=True)
+    return response
+
+
+######### API Jobs #########
+
+@views.route("/api/jobs", methods=["GET"])
+@login_required
+def get_jobs():
+    # Collect args from GET request.
+    server_name = request.args.get("server")
+    status = request.args.get("status")
+    limit = request.args.get("limit", "50")
+
+    try:
+        limit = max(1, min(int(limit), 500))
+    except ValueError:
+        resp_dict = {"Error": "Invalid limit"}
+        response = Response(
+            compact_json(resp_dict), status=400, mimetype="application/json"
+        )
+        return response
+
+    # Non-admins only get to see jobs for servers they have access to.
+    server_names = permitted_server_names(current_user)
+
+    if server_name != None:
+        if server_names != None and server_name not in server_names:
+            resp_dict = {"Error": "Permission Denied!"}
+            response = Response(
+                compact_json(resp_dict), status=403, mimetype="application/json"
+            )
+            return response
+        server_names = [server_name]
+
+    jobs = get_job_manager().list_jobs(server_names, status, limit)
+    resp_dict = [job.to_dict() for job in jobs]
+
+    response = Response(
+        compact_json(resp_dict), status=200, mimetype="application/json"
+    )
+    return response
+
+
+######### API Deletions #########
+
+@views.route("/api/deletions", methods=["GET"])
+@login_required
+def get_deletions_api():
+    limit = request.args.get("limit", "50")
+
+    try:
+        limit = max(1, min(int(limit), 500))
+    except ValueError:
+        resp_dict = {"Error": "Invalid limit"}
+        response = Response(
+            compact_json(resp_dict), status=400, mimetype="application/json"
+        )
+        return response
+
+    # Non-admins only get to see deletions for servers they had access to.
+    server_names = permitted_server_names(current_user)
+
+    resp_dict = get_deletions(server_names, limit)
+
+    response = Response(
+        compact_json(resp_dict), status=200, mimetype="application/json"
+    )
+    return response
+
+
+######### API Install Progress #########
+
+@views.route("/api/install-progress", methods=["GET"])
+@login_required
+def install_progress():
+    # Collect args from GET request.
+    server_name = request.args.get("server")
+
+    if server_name == None:
+        resp_dict = {"Error": "No server supplied"}
+        response = Response(
+            compact_json(resp_dict), status=400, mimetype="application/json"
+        )
+        return response
+
+    if not user_has_permissions(current_user, "cmd-output", server_name):
+        resp_dict = {"Error": "Permission Denied!"}
+        response = Response(
+            compact_json(resp_dict), status=403, mimetype="application/json"
+        )
+        return response
+
+    progress = get_install_progress(server_name)
+    if progress == None:
+        resp_dict = {"Error": "No install found"}
+        response = Response(
+            compact_json(resp_dict), status=404, mimetype="application/json"
+        )
+        return response
+
+    response = Response(
+        compact_json(progress), status=200, mimetype="application/json"
+    )
+    return response
+
+
+######### Bulk Actions Page #########
+
+@views.route("/bulk", methods=["GET"])
+@login_required
+def bulk():
+    config_options = read_config("bulk")
+    current_app.logger.info(log_wrap("config_options", config_options))
+
+    from sqlalchemy.orm import selectinload
+
+    servers = (
+        GameServer.query.filter_by(install_finished=True)
+        .options(selectinload(GameServer.tags))
+        .all()
+    )
+    server_names = permitted_server_names(current_user)
+    if server_names != None:
+        servers = [s for s in servers if s.install_name in server_names]
+    tags = sorted({tag.name for server in servers for tag in server.tags})
+
+    return render_template(
+        "bulk.html",
+        user=current_user,
+        servers=servers,
+        tags=tags,
+        actions=list(BULK_ACTIONS),
+        config_options=config_options,
+    )
+
+
+######### API Bulk Actions #########
+
+@views.route("/api/bulk", methods=["GET", "POST"])
+@login_required
+def bulk_action():
+    # Non-admins only get to see & touch servers they have access to.
+    server_names = permitted_server_names(current_user)
+
+    if request.method == "GET":
+        batch_id = request.args.get("batch")
+        progress = None
+        if batch_id:
+            progress = get_bulk_progress(batch_id, server_names)
+
+        if progress == None:
+            resp_dict = {"Error": "Invalid batch"}
+            response = Response(
+                compact_json(resp_dict), status=404, mimetype="application/json"
+            )
+            return response
+
+        response = Response(
+            compact_json(progress), status=200, mimetype="application/json"
+        )
+        return response
+
+    # Accept either a json body or a regular form post.
+    if request.is_json:
+        data = request.get_json(silent=True) or dict()
+        selected = data.get("servers", [])
+        tags = data.get("tags", [])
+    else:
+        data = request.form
+        selected = request.form.getlist("servers")
+        tags = request.form.getlist("tags")
+
+    # Plus every server with any of the tags the user has access to.
+    if isinstance(selected, list) and isinstance(tags, list) and tags:
+        for server_name in tagged_server_names(current_user, tags):
+            if server_name not in selected:
+                selected.append(server_name)
+
+    config_options = read_config("bulk")
+    action = data.get("action")
+    try:
+        concurrency = int(data.get("concurrency", config_options["bulk_concurrency"]))
+        per_host = int(data.get("per_host", config_options["max_jobs_per_host"]))
+    except (TypeError, ValueError):
+        concurrency = per_host = 0
+
+    error = None
+    if action not in BULK_ACTIONS:
+        error = "Invalid action"
+    elif concurrency < 1 or per_host < 1:
+        error = "Invalid concurrency"
+    elif not isinstance(selected, list) or not selected:
+        error = "No servers supplied"
+
+    if error:
+        resp_dict = {"Error": error}
+        response = Response(
+            compact_json(resp_dict), status=400, mimetype="application/json"
+        )
+        return response
+
+    servers = []
+    skipped = dict()
+    for server_name in selected:
+        server = GameServer.query.filter_by(install_name=server_name).first()
+        if server == None:
+            skipped[server_name] = "Invalid game server name"
+        elif not user_has_permissions(current_user, "bulk", server_name):
+            skipped[server_name] = "Permission denied"
+        elif not server.install_finished:
+            skipped[server_name] = "Installation not finished"
+        elif not valid_command(
+            BULK_ACTIONS[action], server.script_name, False, current_user
+        ):
+            skipped[server_name] = "Command not allowed"
+        else:
+            servers.append(server)
+
+    current_app.logger.info(log_wrap("servers", servers))
+    current_app.logger.info(log_wrap("skipped", skipped))
+
+    if not servers:
+        resp_dict = {"Error": "Nothing to run", "skipped": skipped}
+        response = Response(
+            compact_json(resp_dict), status=400, mimetype="application/json"
+        )
+        return response
+
+    batch_id = start_bulk_action(servers, action, concurrency, per_host)
+    resp_dict = {"batch_id": batch_id, "skipped": skipped}
+    response = Response(
+        compact_json(resp_dict), status=200, mimetype="application/json"
+    )
+    return response
+
+
+######### Schedules Page #########
+
+@views.route("/schedules", methods=["GET", "POST"])
+@login_required
+def schedules():
+    servers = GameServer.query.filter_by(install_finished=True).all()
+    server_names = permitted_server_names(current_user)
+    if server_names != None:
+        servers = [s for s in servers if s.install_name in server_names]
+    server_names = [server.install_name for server in servers]
+
+    if request.method == "GET":
+        all_schedules = (
+            Schedule.query.filter(Schedule.server_name.in_(server_names))
+            .order_by(Schedule.server_name)
+            .all()
+        )
+        history = {
+            schedule.id: get_schedule_history(schedule.id, 5)
+            for schedule in all_schedules
+        }
+        commands = {
+            server.install_name: get_schedulable_commands(server, current_user)
+            for server in servers
+        }
+
+        return render_template(
+            "schedules.html",
+            user=current_user,
+            schedules=all_schedules,
+            history=history,
+            commands=commands,
+            missed_policies=MISSED_POLICIES,
+        )
+
+    # Delete or enable/disable an existing schedule.
+    action = request.form.get("action")
+    if action != None:
+        schedule_id = request.form.get("schedule_id", "")
+        schedule = None
+        if schedule_id.isdigit():
+            schedule = db.session.get(Schedule, int(schedule_id))
+        if (
+            action not in ("delete", "toggle")
+            or schedule == None
+            or schedule.server_name not in server_names
+        ):
+            flash("Invalid schedule!", category="error")
+            return redirect(url_for("views.schedules"))
+
+        if action == "delete":
+            db.session.delete(schedule)
+            flash("Schedule deleted!")
+        else:
+            schedule.enabled = not schedule.enabled
+            # Don't fire a backlog of runs when re-enabled.
+            schedule.next_run = next_run_time(schedule, datetime.now())
+            flash("Schedule updated!")
+        db.session.commit()
+        return redirect(url_for("views.schedules"))
+
+    # Collect form data.
+    server_name = request.form.get("server_name")
+    command = request.form.get("command")
+    cron = request.form.get("cron", "").strip()
+    jitter = request.form.get("jitter", "0")
+    missed_policy = request.form.get("missed_policy", "skip")
+
+    if server_name not in server_names:
+        flash("Invalid game server name!", category="error")
+        return redirect(url_for("views.schedules"))
+
+    server = GameServer.query.filter_by(install_name=server_name).first()
+    commands = get_schedulable_commands(server, current_user)
+    if command not in commands:
+        flash("Invalid command!", category="error")
+        return redirect(url_for("views.schedules"))
+
+    if missed_policy not in MISSED_POLICIES:
+        flash("Invalid missed run policy!", category="error")
+        return redirect(url_for("views.schedules"))
+
+    try:
+        jitter = int(jitter)
+        if jitter < 0:
+            raise ValueError("Jitter can't be negative")
+    except ValueError:
+        flash("Invalid jitter!", category="error")
+        return redirect(url_for("views.schedules"))
+
+    schedule = Schedule(
+        server_name=server_name,
+        command=command,
+        short_cmd=commands[command],
+        cron=cron,
+        jitter=jitter,
+        missed_policy=missed_policy,
+        enabled=True,
+    )
+
+    try:
+        schedule.next_run = next_run_time(schedule, datetime.now())
+    except ValueError as e:
+        flash(f"Invalid cron expression: {e}", category="error")
+        return redirect(url_for("views.schedules"))
+
+    db.session.add(schedule)
+    db.session.commit()
+    current_app.logger.info(log_wrap("schedule", schedule))
+
+    flash(f"Schedule added! Next run: {schedule.next_run}")
+    return redirect(url_for("views.schedules"))
+
+
+######### Backups Page #########
+
+@views.route("/backups", methods=["GET", "POST"])
+@login_required
+def backups():
+    servers = GameServer.query.filter_by(install_finished=True).all()
+    server_names = permitted_server_names(current_user)
+    if server_names != None:
+        servers = [s for s in servers if s.install_name in server_names]
+    # Backups are read straight off disk as the web user, so only local
+    # installs it owns. Other users' installs are only reachable over ssh.
+    servers = [
+        s for s in servers if s.install_type == "local" and not should_use_ssh(s)
+    ]
+    server_names = [server.install_name for server in servers]
+
+    if request.method == "GET":
+        all_backups = {
+            server_name: get_backups(server_name) for server_name in server_names
+        }
+        snapshots = {
+            server_name: get_snapshots(server_name) for server_name in server_names
+        }
+        running = {
+            job.server_name: job.status
+            for job in get_job_manager().active_jobs(name_prefix="Backup_")
+        }
+
+        return render_template(
+            "backups.html",
+            user=current_user,
+            backups=all_backups,
+            snapshots=snapshots,
+            running=running,
+        )
+
+    # Collect form data.
+    server_name = request.form.get("server_name")
+    kind = request.form.get("kind", "full")
+
+    if server_name not in server_names:
+        flash("Invalid game server name!", category="error")
+        return redirect(url_for("views.backups"))
+
+    server = GameServer.query.filter_by(install_name=server_name).first()
+
+    # Restore a snapshot next to the live install.
+    snapshot_id = request.form.get("snapshot_id")
+    if snapshot_id != None:
+        # Restores write a whole tree onto the host, so not just for anyone
+        # who can see the server.
+        if not user_has_permissions(current_user, "restore"):
+            return redirect(url_for("views.backups"))
+
+        snapshot_ids = [snapshot["id"] for snapshot in get_snapshots(server_name)]
+        if not snapshot_id.isdigit() or int(snapshot_id) not in snapshot_ids:
+            flash("Invalid snapshot id!", category="error")
+            return redirect(url_for("views.backups"))
+
+        job_id = start_restore_snapshot(server, int(snapshot_id))
+        current_app.logger.info(log_wrap("restore job_id", job_id))
+        target = restore_target_for(server, int(snapshot_id))
+        flash(f"Restore of snapshot {snapshot_id} to {target} started!")
+        return redirect(url_for("views.backups"))
+
+    if kind not in ("full", "incr", "snap"):
+        flash("Invalid backup type!", category="error")
+        return redirect(url_for("views.backups"))
+
+    # Same check as the controls page's backup button.
+    if not valid_command("b", server.script_name, False, current_user):
+        flash("Invalid Command!", category="error")
+        return redirect(url_for("views.backups"))
+
+    if kind == "snap":
+        job_id = start_snapshot(server)
+    else:
+        job_id = start_backup(server, incremental=kind == "incr")
+    current_app.logger.info(log_wrap("backup job_id", job_id))
+
+    flash(f"Backup of {server_name} started!")
+    return redirect(url_for("views.backups"))
+
+
+######### API Backups #########
+
+@views.route("/api/backups", methods=["GET"])
+@login_required
+def get_backups_api():
+    # Collect args from GET request.
+    server_name = request.args.get("server")
+
+    if server_name == None:
+        resp_dict = {"Error": "Missing server arg"}
+        response = Response(
+            compact_json(resp_dict), status=400, mimetype="application/json"
+        )
+        return response
+
+    server_names = permitted_server_names(current_user)
+    if server_names != None:
+        if server_name not in server_names:
+            resp_dict = {"Error": "Permission Denied!"}
+            response = Response(
+                compact_json(resp_dict), status=403, mimetype="application/json"
+            )
+            return response
+
+    resp_dict = get_backups(server_name)
+
+    response = Response(
+        compact_json(resp_dict), status=200, mimetype="application/json"
+    )
+    return response
+
+
+######### API Snapshots #########
+
+@views.route("/api/snapshots", methods=["GET"])
+@login_required
+def get_snapshots_api():
+    # Collect args from GET request.
+    server_name = request.args.get("server")
+
+    if server_name == None:
+        resp_dict = {"Error": "Missing server arg"}
+        response = Response(
+            compact_json(resp_dict), status=400, mimetype="application/json"
+        )
+        return response
+
+    server_names = permitted_server_names(current_user)
+    if server_names != None:
+        if server_name not in server_names:
+            resp_dict = {"Error": "Permission Denied!"}
+            response = Response(
+                compact_json(resp_dict), status=403, mimetype="application/json"
+            )
+            return response
+
+    resp_dict = get_snapshots(server_name)
+
+    response = Response(
+        compact_json(resp_dict), status=200, mimetype="application/json"
+    )
+    return response
+
+
+######### API Perf #########
+
+@views.route("/api/perf", methods=["GET"])
+@login_required
+def get_perf():
+    if current_user.role != "admin":
+        resp_dict = {"Error": "Permission Denied!"}
+        response = Response(
+            compact_json(resp_dict), status=403, mimetype="application/json"
+        )
+        return response
+
+    resp_dict = perf_stats.summary()
+    profile_dir = os.path.join(CWD, read_config("perf")["profile_dir"])
+    resp_dict["profiles"] = list_profiles(profile_dir)
+
+    response = Response(
+        compact_json(resp_dict), status=200, mimetype="application/json"
+    )
+    return response
+
+
+######### API Schedules #########
+
+@views.route("/api/schedules", methods=["GET"])
+@login_required
+def get_schedules():
+    # Collect args from GET request.
+    server_name = request.args.get("server")
+
+    query = Schedule.query
+    server_names = permitted_server_names(current_user)
+    if server_names != None:
+        query = query.filter(Schedule.server_name.in_(server_names))
+    if server_name != None:
+        query = query.filter_by(server_name=server_name)
+
+    resp_dict = []
+    for schedule in query.order_by(Schedule.id).all():
+        schedule_dict = schedule.to_dict()
+        schedule_dict["history"] = get_schedule_history(schedule.id)
+        resp_dict.append(schedule_dict)
+
+    response = Response(
+        compact_json(resp_dict), status=200, mimetype="application/json"
+    )
     return response
 
 
@@ -809,13 +1447,9 @@ def settings():
         flash(status)
 
         cmd = ["./web-lgsm.py", "--restart"]
-        restart_daemon = Thread(
-            target=run_cmd_popen,
-            args=(cmd, ProcInfoVessel(), current_app.app_context()),
-            daemon=True,
-            name="restart",
+        get_job_manager().submit(
+            "restart", run_cmd_popen, args=(cmd, ProcInfoVessel())
         )
-        restart_daemon.start()
         return redirect(url_for("views.settings"))
 
     flash("Settings Updated!")
@@ -840,6 +1474,8 @@ def about():
 @views.route("/changelog", methods=["GET"])
 @login_required
 def changelog():
+    import markdown
+
     changelog_md = read_changelog()
     changelog_html =  markdown.markdown(changelog_md)
 
@@ -870,6 +1506,7 @@ def add():
         username = request.form.get("username")
         install_type = request.form.get("install_type")
         install_host = request.form.get("install_host")
+        tags = request.form.get("tags", "")
 
         ## Validation Logic.
         # Check all required args are submitted.
@@ -893,6 +1530,15 @@ def add():
             status_code = 400
             return render_template("add.html", user=current_user), status_code
 
+        # Tags grant permissions, so only admins get to set them.
+        if current_user.role != "admin":
+            tags = ""
+        try:
+            tags = parse_tags(tags)
+        except ValueError as e:
+            flash(str(e), category="error")
+            return render_template("add.html", user=current_user), 400
+
         # Set default user if none provided.
         if username == None or username == "":
             username = USER
@@ -984,6 +1630,8 @@ def add():
 
         db.session.add(server)
         db.session.commit()
+        if tags:
+            set_server_tags(server, tags)
 
         flash("Game server added!")
         return redirect(url_for("views.home"))
@@ -996,8 +1644,6 @@ def add():
 @views.route("/delete", methods=["GET", "POST"])
 @login_required
 def delete():
-    global servers
-
     # TODO v1.9: I'm thinking of adding an additional perms check here just to
     # see if user can access route. Will still also keep server specific check
     # below. Idk still have to think about it a bit.
@@ -1033,11 +1679,13 @@ def delete():
 
         current_app.logger.info(server)
 
-        if server_name in servers:
-            del servers[server_name]
+        get_proc_store().delete(server_name)
+
+        # Log to ensure delete from proc store worked.
+        current_app.logger.info(log_wrap("proc_store", get_proc_store()))
 
-        # Log to ensure delete from global servers worked.
-        current_app.logger.info(log_wrap("servers", servers))
+        # Drop server from status cache before its db entry goes away.
+        forget_server_status(server.id)
 
         if not delete_server(
             server, config_options["remove_files"], config_options["delete_user"]
@@ -174,8 +174,8 @@ python3 -m pip install -r requirements.txt
 
 echo -e "${green}####### Installing NPM Requirements...${reset}"
 cd $SCRIPTPATH/app/static/js
-npm install @xterm/xterm
-npm install --save @xterm/addon-fit
+# Versions pinned in package.json. Bundled into app/static/dist on app start.
+npm install
 cd $SCRIPTPATH
 
 # Setup sudoers rules to allow web-lgsm to run multi game server user
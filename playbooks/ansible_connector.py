@@ -7,14 +7,14 @@
 
 import os
 import sys
+import pwd
 import json
 import yaml
 import glob
 import getopt
 import getpass
 import subprocess
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
+import configparser
 
 ## Globals.
 # Plabook dir path.
@@ -25,10 +25,19 @@ JSON_VARS_FILE = os.path.join(CWD, "json/ansible_vars.json")
 PS = '/usr/bin/ps'
 PKILL = '/usr/bin/pkill'
 
-# Use cwd to import db classes from app.
+# Runs as root, so keep bytecode in root's own cache rather than a root owned
+# __pycache__ in the repo. See app.pycache_dir().
+sys.pycache_prefix = os.path.join(
+    pwd.getpwuid(os.getuid()).pw_dir, ".cache/web-lgsm/pycache"
+)
+
+# Use cwd to import db classes from app. The Flask free app.schema, not
+# app.models, so the connector never loads Flask.
 sys.path.append(CWD)
-from app import db
-from app.models import User, GameServer
+from app.schema import GameServer, connect
+from app.depot_cache import DepotCache, read_app_id
+from app.pre_install import NativePreInstall, PreInstallError
+from app.artifact_cache import ArtifactCache
 
 # Global options hash.
 O = {"dry": False, "keep": False}
@@ -61,11 +70,9 @@ def db_get(server_id):
     Returns:
         GameServer: GameServer object matching ID.
     """
-    engine = create_engine('sqlite:///app/database.db')
-    
     # Use new db session context.
     # Can't use app context in ansible connector.
-    with Session(engine) as session:
+    with connect() as session:
         server = session.get(GameServer, server_id)
         if server == None:
             print("Error: No server with ID found.")
@@ -151,6 +158,155 @@ def post_install_cfg_fix(install_path):
     print("Configuration file common.cgf updated!")
 
 
+def read_main_conf():
+    """
+    Reads in the app's main.conf (or main.conf.local override).
+
+    Returns:
+        ConfigParser: Parsed main config.
+    """
+    config = configparser.ConfigParser()
+    config_file = "main.conf"
+    config_local = "main.conf.local"  # Local config override.
+    if os.path.isfile(config_local) and os.access(config_local, os.R_OK):
+        config_file = config_local
+    config.read(config_file)
+    return config
+
+
+def use_native_pre_install():
+    """Checks main.conf for the native_pre_install setting."""
+    config = read_main_conf()
+    try:
+        return config.getboolean("settings", "native_pre_install", fallback=False)
+    except ValueError:
+        return False
+
+
+def run_native_pre_install(server):
+    """
+    Runs the pre-install steps in process instead of via ansible-playbook.
+
+    Args:
+        server (GameServer): Server being installed.
+
+    Returns:
+        bool: True if pre-install finished, False if the playbook should be
+              run instead.
+    """
+    try:
+        pre_install = NativePreInstall(
+            os.path.join(CWD, "playbooks"), artifact_cache=get_artifact_cache()
+        )
+        pre_install.run(server.username, server.install_path, server.script_name)
+    except PreInstallError as e:
+        # Same as a failed validation in the playbook, don't retry.
+        print(f" [!] {e}")
+        exit(77)
+    except (OSError, subprocess.CalledProcessError, yaml.YAMLError) as e:
+        print(f" [!] Native pre-install failed, falling back to ansible: {e}")
+        return False
+
+    print(" [*] Native pre-install finished!")
+    return True
+
+
+def get_artifact_cache():
+    """
+    Gets the app's artifact cache, for reusing generated game scripts.
+
+    Returns:
+        ArtifactCache: Artifact cache, None if the app hasn't made one yet.
+    """
+    config = read_main_conf()
+    cache_dir = os.path.join(
+        CWD, config.get("cache", "artifact_cache_dir", fallback="cache/artifacts")
+    )
+    # Let the app create it, so it's owned by the app's user not root.
+    if not os.path.isdir(cache_dir):
+        return None
+
+    try:
+        keep = config.getint("cache", "artifact_versions_keep", fallback=3)
+    except ValueError:
+        keep = 3
+    return ArtifactCache(cache_dir, keep)
+
+
+def get_depot_cache():
+    """
+    Reads the [cache] section of main.conf and returns a DepotCache, if the
+    shared steamcmd cache is turned on.
+
+    Returns:
+        DepotCache: Cache to seed & store installs with, None if disabled.
+    """
+    config = read_main_conf()
+
+    if not config.has_section("cache"):
+        return None
+
+    try:
+        if not config["cache"].getboolean("steamcmd_cache", False):
+            return None
+        cache_dir = config["cache"].get("steamcmd_cache_dir", "cache/steamcmd")
+        link_mode = config["cache"].get("steamcmd_cache_link", "auto")
+        keep = config["cache"].getint("steamcmd_cache_keep", 1)
+        return DepotCache(os.path.join(CWD, cache_dir), link_mode, keep)
+    except ValueError as e:
+        print(f" [!] Invalid steamcmd cache config: {e}")
+        return None
+
+
+def seed_from_depot_cache(server, cache):
+    """
+    Seeds new install's serverfiles from the shared steamcmd cache, so
+    steamcmd only has to validate & fetch what changed.
+
+    Args:
+        server (GameServer): Server being installed.
+        cache (DepotCache): Shared steamcmd cache.
+    """
+    user = pwd.getpwnam(server.username)
+    serverfiles = os.path.join(server.install_path, "serverfiles")
+    try:
+        build_id = cache.seed(
+            server.script_name, serverfiles, (user.pw_uid, user.pw_gid)
+        )
+    except OSError as e:
+        # Cache is only a speed up, steamcmd can still do a full download.
+        print(f" [!] Could not seed from steamcmd cache: {e}")
+        return
+
+    if build_id:
+        print(f" [*] Seeded serverfiles from cached build {build_id}")
+
+
+def store_in_depot_cache(server, cache):
+    """
+    Stores finished install's serverfiles in the shared steamcmd cache, for
+    later installs of the same game to seed from.
+
+    Args:
+        server (GameServer): Server just installed.
+        cache (DepotCache): Shared steamcmd cache.
+    """
+    app_id = read_app_id(server.install_path, server.script_name)
+    if app_id == None:
+        # Not a steamcmd game.
+        return
+
+    serverfiles = os.path.join(server.install_path, "serverfiles")
+    try:
+        build_id = cache.store(server.script_name, app_id, serverfiles)
+    except OSError as e:
+        print(f" [!] Could not store install in steamcmd cache: {e}")
+        return
+
+    if build_id:
+        print(f" [*] Stored build {build_id} of app {app_id} in steamcmd cache")
+
+
 def append_new_authorized_key(server):
     """
     Add's server's SSH keyfile to new user's ~/.ssh/authorized_keys for new
@@ -211,14 +367,19 @@ def run_install_new_game_server(server_id):
         f"server_script_name={server.script_name}",
     ]
 
-    # Run pre-install playbook.
+    # Run pre-install playbook, unless the native pre-install handled it.
     if O["dry"]:
         print(pre_install_cmd)
-    else:
+    elif not (use_native_pre_install() and run_native_pre_install(server)):
         run_cmd(pre_install_cmd)
 
     install_reqs = [f"{server.install_path}/{server.script_name}", "auto-install"]
 
+    # Seed from shared steamcmd cache, if turned on.
+    cache = get_depot_cache()
+    if cache and not O["dry"]:
+        seed_from_depot_cache(server, cache)
+
     # Then run as user to install actual game server.
     user_prepend = sudo_pre_cmd + ["-u", server.username]
     install_cmd = user_prepend + install_reqs
@@ -232,6 +393,9 @@ def run_install_new_game_server(server_id):
         # Post install cfg fix.
         post_install_cfg_fix(server.install_path)
 
+        if cache:
+            store_in_depot_cache(server, cache)
+
     if O["dry"]:
         print(install_reqs)
         exit()
@@ -244,8 +408,7 @@ def run_install_new_game_server(server_id):
 
     # Mark finished with new session context.
     # Can't use app context in ansible connector.
-    engine = create_engine('sqlite:///app/database.db')
-    with Session(engine) as session:
+    with connect() as session:
         server = session.get(GameServer, server_id)
         server.install_finished = True
         session.commit()
@@ -74,8 +74,7 @@ if [ ! -d "$SCRIPTPATH" ]; then
 
   echo -e "${GREEN}###### Installing NPM Requirements...${RESET}" \ 
     cd $SCRIPTPATH/app/static/js && \
-    sudo npm install @xterm/xterm && \
-    sudo npm install --save @xterm/addon-fit
+    sudo npm install
 
   echo -e "${GREEN}####### Setting up Sudoers Rules...${RESET}"
   export apb="$SCRIPTPATH/venv/bin/ansible-playbook"
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# Gunicorn Worker Model Load Test!
+# Launches the web-lgsm under gunicorn with a given worker model, holds a slow
+# request open (think ssh connect timeout on /controls), and measures how long
+# the polling api routes take to answer while it's in flight. Used to check
+# the [server] worker options in the main.conf actually keep polling
+# responsive.
+
+import os
+import sys
+import time
+import socket
+import getopt
+import threading
+import subprocess
+import configparser
+
+SCRIPTPATH = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(SCRIPTPATH, ".."))
+
+# Global options hash.
+O = {
+    "worker_class": None,
+    "workers": None,
+    "threads": None,
+    "slow": 5.0,
+    "clients": 4,
+    "max_latency": 1.0,
+}
+
+
+def create_app():
+    """
+    Gunicorn app factory. Regular web-lgsm app plus a slow route, with login
+    disabled so the polling clients don't need a user in the db.
+    """
+    sys.path.insert(0, ROOT)
+    from app import main
+
+    app = main()
+    app.config["LOGIN_DISABLED"] = True
+
+    @app.route("/load-test/slow")
+    def slow():
+        time.sleep(float(os.environ.get("LOAD_TEST_SLOW", "5")))
+        return "done"
+
+    return app
+
+
+def print_help():
+    """Help menu"""
+    print(
+        f"""Usage: {os.path.basename(__file__)} [options]
+    Options:
+      -h, --help                Show this help message and exit
+      -k, --worker_class <cls>  Gunicorn worker class (sync|gthread)
+      -w, --workers <n>         Number of gunicorn workers
+      -t, --threads <n>         Threads per gthread worker
+      -s, --slow <secs>         How long the slow request takes (default 5)
+      -c, --clients <n>         Concurrent polling clients (default 4)
+      -m, --max_latency <secs>  Max allowed poll latency (default 1)
+
+    Worker options default to the [server] section of main.conf.
+    """
+    )
+    exit()
+
+
+def read_worker_defaults():
+    """Pulls worker options not given on the cli from the main.conf."""
+    config = configparser.ConfigParser()
+    config_file = os.path.join(ROOT, "main.conf")
+    config_local = os.path.join(ROOT, "main.conf.local")
+    if os.path.isfile(config_local) and os.access(config_local, os.R_OK):
+        config_file = config_local
+    config.read(config_file)
+
+    server_conf = config["server"] if config.has_section("server") else dict()
+    defaults = {"worker_class": "gthread", "workers": "1", "threads": "4"}
+    for option, default in defaults.items():
+        if O[option] == None:
+            O[option] = server_conf.get(option, default)
+
+
+def free_port():
+    """Asks the kernel for a free localhost port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(base_url, timeout=30):
+    """Waits for gunicorn to start answering."""
+    import requests
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(base_url + "/api/system-usage", timeout=1)
+            return True
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    return False
+
+
+def percentile(values, pct):
+    """Nearest rank percentile of values."""
+    values = sorted(values)
+    index = max(0, int(round(pct / 100 * len(values))) - 1)
+    return values[index]
+
+
+def poll(base_url, stop, latencies, errors):
+    """Polling client, hits the same routes as the home & controls pages."""
+    import requests
+
+    routes = ["/api/system-usage", "/api/cmd-output?server=load-test"]
+    session = requests.Session()
+    while not stop.is_set():
+        for route in routes:
+            start = time.monotonic()
+            try:
+                session.get(base_url + route, timeout=O["slow"] * 2)
+                latencies.append(time.monotonic() - start)
+            except Exception as e:
+                errors.append(str(e))
+        time.sleep(0.1)
+
+
+def run_load_test():
+    import requests
+
+    read_worker_defaults()
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    cmd = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        f"--bind=127.0.0.1:{port}",
+        f"--worker-class={O['worker_class']}",
+        f"--workers={O['workers']}",
+        f"--timeout={int(O['slow']) + 30}",
+        "--chdir",
+        ROOT,
+        "--pythonpath",
+        SCRIPTPATH,
+        "load_test_workers:create_app()",
+    ]
+
+    # Gunicorn quietly swaps sync for gthread if threads > 1.
+    if O["worker_class"] == "gthread":
+        cmd.insert(-1, f"--threads={O['threads']}")
+    else:
+        O["threads"] = "1"
+
+    env = dict(os.environ, LOAD_TEST_SLOW=str(O["slow"]))
+    print(
+        f" [*] Worker model: {O['worker_class']} "
+        + f"workers={O['workers']} threads={O['threads']}"
+    )
+    proc = subprocess.Popen(
+        cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    try:
+        if not wait_for_server(base_url):
+            print(" [!] Gunicorn never came up!")
+            return 2
+
+        # Hold one slow request open, then poll while it's in flight.
+        slow = threading.Thread(
+            target=requests.get,
+            args=(base_url + "/load-test/slow",),
+            kwargs={"timeout": O["slow"] * 4},
+            daemon=True,
+        )
+        slow.start()
+        time.sleep(0.2)
+
+        stop = threading.Event()
+        latencies = []
+        errors = []
+        clients = []
+        for _ in range(O["clients"]):
+            client = threading.Thread(
+                target=poll, args=(base_url, stop, latencies, errors), daemon=True
+            )
+            client.start()
+            clients.append(client)
+
+        slow.join()
+        stop.set()
+        for client in clients:
+            client.join()
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    if not latencies:
+        print(" [!] No polls completed!")
+        return 1
+
+    p50 = percentile(latencies, 50)
+    p95 = percentile(latencies, 95)
+    worst = max(latencies)
+    print(f" [*] Polls: {len(latencies)}, errors: {len(errors)}")
+    print(f" [*] Latency p50: {p50:.3f}s p95: {p95:.3f}s max: {worst:.3f}s")
+
+    if errors or worst > O["max_latency"]:
+        print(" [!] FAIL: Polling blocked while slow request in flight.")
+        return 1
+
+    print(" [*] PASS: Polling stayed responsive.")
+    return 0
+
+
+def main(argv):
+    try:
+        longopts = [
+            "help",
+            "worker_class=",
+            "workers=",
+            "threads=",
+            "slow=",
+            "clients=",
+            "max_latency=",
+        ]
+        opts, args = getopt.getopt(argv, "hk:w:t:s:c:m:", longopts)
+    except getopt.GetoptError as e:
+        print(e)
+        print_help()
+
+    try:
+        for opt, arg in opts:
+            if opt in ("-h", "--help"):
+                print_help()
+            elif opt in ("-k", "--worker_class"):
+                O["worker_class"] = arg
+            elif opt in ("-w", "--workers"):
+                O["workers"] = str(int(arg))
+            elif opt in ("-t", "--threads"):
+                O["threads"] = str(int(arg))
+            elif opt in ("-s", "--slow"):
+                O["slow"] = float(arg)
+            elif opt in ("-c", "--clients"):
+                O["clients"] = int(arg)
+            elif opt in ("-m", "--max_latency"):
+                O["max_latency"] = float(arg)
+    except ValueError as e:
+        print(f" [!] Error: {e}")
+        exit(1)
+
+    exit(run_load_test())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,216 @@
+"""
+Bench suite fixtures. Benches only run when WEBLGSM_BENCH is set, so a normal
+pytest run skips the whole dir.
+
+    WEBLGSM_BENCH=1 python -m pytest tests/bench -s
+
+Results are written to tests/bench/results.json. If tests/bench/baseline.json
+exists each result is compared to it & a bench fails if it regressed by more
+than BENCH_TOLERANCE (default 0.25, ie. 25%). Run with BENCH_SAVE=1 to save
+the current results as the new baseline.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+import threading
+import psutil
+import pytest
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(BENCH_DIR, "results.json")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+if not os.environ.get("WEBLGSM_BENCH"):
+    collect_ignore_glob = ["test_*.py"]
+
+# Bench name -> metrics, filled in by the bench fixture.
+results = dict()
+
+
+class RssSampler:
+    """
+    Class used to create objects that sample this process's rss in a thread,
+    to catch the peak of a bench, not just the before & after.
+    """
+
+    def __init__(self, interval=0.01):
+        """
+        Args:
+            interval (float): Seconds between samples.
+        """
+        self.interval = interval
+        self.proc = psutil.Process()
+        self.start_rss = self.proc.memory_info().rss
+        self.peak_rss = self.start_rss
+        self.running = False
+        self.thread = None
+
+    def _sample(self):
+        while self.running:
+            self.peak_rss = max(self.peak_rss, self.proc.memory_info().rss)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.running = False
+        self.thread.join()
+        self.peak_rss = max(self.peak_rss, self.proc.memory_info().rss)
+
+    def __str__(self):
+        return f"RssSampler(start_rss='{self.start_rss}', peak_rss='{self.peak_rss}')"
+
+    def __repr__(self):
+        return f"RssSampler(start_rss='{self.start_rss}', peak_rss='{self.peak_rss}')"
+
+
+class Bench:
+    """
+    Class used to create objects that time a bench function over a few rounds
+    & record throughput, peak rss and latency percentiles for it. Same idea as
+    pytest-benchmark's fixture, cut down to what this suite needs.
+    """
+
+    def __init__(self, name):
+        """
+        Args:
+            name (str): Bench name, the test's node name.
+        """
+        self.name = name
+        self.metrics = dict()
+
+    def __call__(self, func, rounds=3, items=None, setup=None):
+        """
+        Runs func rounds times, keeping the fastest & median round.
+
+        Args:
+            func (callable): Bench body, called with setup()'s return value if
+                             setup is given.
+            rounds (int): Times to run func.
+            items (int|callable): Items handled per round, for an items/sec
+                                  rate. Callable gets func's return value.
+            setup (callable): Untimed per round setup.
+
+        Returns:
+            any: Return value of the last round.
+        """
+        times = []
+        with RssSampler() as rss:
+            for _ in range(rounds):
+                args = (setup(),) if setup else ()
+                start = time.perf_counter()
+                result = func(*args)
+                times.append(time.perf_counter() - start)
+
+        fastest = min(times)
+        self.metrics["seconds"] = round(fastest, 4)
+        self.metrics["median_seconds"] = round(statistics.median(times), 4)
+        if items != None:
+            count = items(result) if callable(items) else items
+            self.metrics["items"] = count
+            self.metrics["items_per_sec"] = round(count / max(fastest, 1e-9), 1)
+        self.metrics["peak_rss_mb"] = round(rss.peak_rss / 1024**2, 1)
+        self.metrics["rss_growth_mb"] = round(
+            (rss.peak_rss - rss.start_rss) / 1024**2, 1
+        )
+        results[self.name] = self.metrics
+        return result
+
+    def latencies(self, samples):
+        """
+        Records p50, p95 & max of a list of per call latencies.
+
+        Args:
+            samples (list): Latencies, in seconds.
+        """
+        samples = sorted(samples)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        self.metrics["polls"] = len(samples)
+        self.metrics["p50_ms"] = round(statistics.median(samples) * 1000, 3)
+        self.metrics["p95_ms"] = round(p95 * 1000, 3)
+        self.metrics["max_ms"] = round(samples[-1] * 1000, 3)
+        results[self.name] = self.metrics
+
+    def __str__(self):
+        return f"Bench(name='{self.name}', metrics='{self.metrics}')"
+
+    def __repr__(self):
+        return f"Bench(name='{self.name}', metrics='{self.metrics}')"
+
+
+@pytest.fixture
+def bench(request):
+    return Bench(request.node.name)
+
+
+def regressions(current, baseline, tolerance):
+    """
+    Compares bench results to a baseline. Rates (*_per_sec) regress when they
+    drop, times (seconds, *_ms) regress when they grow. Rss isn't compared, it
+    depends too much on what ran before.
+
+    Args:
+        current (dict): Bench name -> metrics.
+        baseline (dict): Bench name -> metrics.
+        tolerance (float): Allowed change, as a fraction of the baseline.
+
+    Returns:
+        list: Regression messages, empty if none.
+    """
+    found = []
+    for name, metrics in sorted(current.items()):
+        base = baseline.get(name, dict())
+        for metric, value in sorted(metrics.items()):
+            if metric not in base or not base[metric]:
+                continue
+            change = (value - base[metric]) / base[metric]
+            if metric.endswith("_per_sec") and change < -tolerance:
+                found.append(f"{name} {metric}: {value} vs baseline {base[metric]}")
+            if (metric.endswith("seconds") or metric.endswith("_ms")) and (
+                change > tolerance
+            ):
+                found.append(f"{name} {metric}: {value} vs baseline {base[metric]}")
+    return found
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not results:
+        return
+
+    report = {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(RESULTS_FILE, "w") as f:
+        json.dump(report, f, indent=4, sort_keys=True)
+
+    if os.environ.get("BENCH_SAVE"):
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(report, f, indent=4, sort_keys=True)
+        print(f"\n [*] Bench baseline saved to {BASELINE_FILE}")
+        return
+
+    if not os.path.isfile(BASELINE_FILE):
+        return
+
+    with open(BASELINE_FILE) as f:
+        baseline = json.load(f)["results"]
+    tolerance = float(os.environ.get("BENCH_TOLERANCE", "0.25"))
+    found = regressions(results, baseline, tolerance)
+    if found:
+        print(f"\n [!] Bench regressions over {tolerance:.0%} of baseline:")
+        for msg in found:
+            print(f"     {msg}")
+        session.exitstatus = 1
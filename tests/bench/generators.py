@@ -0,0 +1,81 @@
+"""
+Synthetic output generators for the bench suite. Nothing here needs a network,
+a real game server, or tmux. For ssh see the ssh_server fixture.
+"""
+
+import os
+import sys
+
+
+def progress_cmd(lines, progress_every=10):
+    """
+    Command for a subprocess that prints lines of output, with a steamcmd
+    style '\\r' progress bar redrawn between every progress_every lines.
+
+    Args:
+        lines (int): Newline terminated lines to print.
+        progress_every (int): Lines between progress bar redraws.
+
+    Returns:
+        list: Command to hand to subprocess.Popen.
+    """
+    code = f"""
+import sys
+out = sys.stdout
+for i in range({lines}):
+    if i % {progress_every} == 0:
+        for pct in range(0, 100, 25):
+            out.write(f" Update state (0x61) downloading, progress: {{pct}}.00 ({{i}} / {lines})\\r")
+    out.write(f"[  OK  ] Line {{i}} of fake game server install output\\n")
+out.flush()
+"""
+    return [sys.executable, "-c", code]
+
+
+def write_fake_tmux(path, scrollback_lines):
+    """
+    Writes a fake tmux that ignores its args & prints a big scrollback, like
+    'capture-pane -p -S -' on a long running server console.
+
+    Args:
+        path (str): Where to write the script.
+        scrollback_lines (int): Lines of console output to print.
+
+    Returns:
+        str: Path of executable script.
+    """
+    with open(path, "w") as f:
+        f.write(
+            f"""#!{sys.executable}
+import sys
+out = sys.stdout
+for i in range({scrollback_lines}):
+    out.write(f"[Server thread/INFO]: Player{{i % 50}} moved wrongly! {{i}}\\n")
+"""
+        )
+    os.chmod(path, 0o755)
+    return path
+
+
+def emit_lines(lines):
+    """
+    Ssh test server cmd handler that sends back lines of output in batches.
+
+    Args:
+        lines (int): Lines to send.
+
+    Returns:
+        callable: Handler for SshTestServer.
+    """
+
+    def handler(server, argv):
+        batches = (
+            "".join(
+                f"[  OK  ] Remote line {i} of fake command output\n"
+                for i in range(start, min(start + 100, lines))
+            )
+            for start in range(0, lines, 100)
+        )
+        return batches, "", 0
+
+    return handler
@@ -0,0 +1,75 @@
+import os
+import json
+import pytest
+
+from types import SimpleNamespace
+from app import utils
+from app.proc_info_vessel import ProcInfoVessel
+from generators import emit_lines, progress_cmd, write_fake_tmux
+
+POPEN_LINES = 50000
+SSH_LINES = 3000
+SCROLLBACK_LINES = 20000
+JSON_LINES = 50000
+
+
+def test_popen_progress_output(app, bench):
+    """Local cmd with steamcmd style \\r progress bars, ex. an install."""
+    with app.app_context():
+        proc_info = bench(
+            lambda vessel: utils.run_cmd_popen(progress_cmd(POPEN_LINES), vessel)
+            or vessel,
+            setup=ProcInfoVessel,
+            items=lambda vessel: len(vessel.stdout),
+        )
+    assert proc_info.exit_status == 0
+    assert len(proc_info.stdout) > POPEN_LINES
+
+
+def test_ssh_output(app, bench, ssh_server):
+    """Remote cmd output over ssh, including connect."""
+    ssh_server.handlers["lgsm"] = emit_lines(SSH_LINES)
+
+    def run(vessel):
+        utils.run_cmd_ssh(
+            ["lgsm", "details"], "127.0.0.1", utils.USER, ssh_server.key_file, vessel
+        )
+        return vessel
+
+    with app.app_context():
+        proc_info = bench(
+            run,
+            setup=ProcInfoVessel,
+            items=lambda vessel: len("".join(vessel.stdout).splitlines()),
+        )
+    assert proc_info.exit_status == 0
+    assert len("".join(proc_info.stdout).splitlines()) == SSH_LINES
+
+
+def test_tmux_status_scrollback(app, bench, monkeypatch, tmp_path):
+    """Status check where tmux dumps a big console scrollback."""
+    tmux = write_fake_tmux(str(tmp_path / "tmux"), SCROLLBACK_LINES)
+    monkeypatch.setitem(utils.PATHS, "tmux", tmux)
+    monkeypatch.setattr(utils, "get_tmux_socket_name", lambda server: "bench-1")
+    monkeypatch.setattr(utils, "status_watcher", None)
+    server = SimpleNamespace(
+        id=-1,
+        install_name="BenchServer",
+        install_path=str(tmp_path),
+        script_name="mcserver",
+        install_type="local",
+        install_host="127.0.0.1",
+        username=utils.USER,
+    )
+
+    with app.app_context():
+        status = bench(lambda: utils.get_server_status(server), items=SCROLLBACK_LINES)
+    assert status == True
+
+
+def test_vessel_to_json(bench):
+    """Serializing a long output buffer, done on every /api/cmd-output poll."""
+    vessel = ProcInfoVessel()
+    vessel.stdout = [f"[  OK  ] Line {i} of output\n" for i in range(JSON_LINES)]
+    output = bench(vessel.toJSON, rounds=5, items=JSON_LINES)
+    assert len(json.loads(output)["stdout"]) == JSON_LINES
@@ -0,0 +1,61 @@
+import json
+import time
+import pytest
+
+from app import db
+from app.models import User
+from app.utils import get_proc_store
+
+SERVER_NAME = "BenchServer"
+POLLS = 100
+LINES_PER_POLL = 500
+
+
+@pytest.fixture
+def admin_client(app, client):
+    """Client logged in as a throw away admin, no password hashing needed."""
+    with app.app_context():
+        user = User(
+            username="bench_admin",
+            password="unused",
+            role="admin",
+            permissions=json.dumps({"servers": []}),
+        )
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+    yield client
+
+    with app.app_context():
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+        get_proc_store().delete(SERVER_NAME)
+
+
+def test_cmd_output_poll_latency(app, admin_client, bench):
+    """Per poll latency of /api/cmd-output while a cmd's output keeps growing."""
+    with app.app_context():
+        proc_info = get_proc_store().get_or_create(SERVER_NAME)
+        proc_info.stdout.clear()
+
+    latencies = []
+
+    def poll_all():
+        for i in range(POLLS):
+            proc_info.stdout.extend(
+                f"[  OK  ] Poll {i} line {n}\n" for n in range(LINES_PER_POLL)
+            )
+            start = time.perf_counter()
+            response = admin_client.get(f"/api/cmd-output?server={SERVER_NAME}")
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200
+        return response
+
+    response = bench(poll_all, rounds=1, items=POLLS)
+    bench.latencies(latencies)
+    assert len(json.loads(response.data)["stdout"]) == POLLS * LINES_PER_POLL
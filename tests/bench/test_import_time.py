@@ -0,0 +1,64 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+
+# Generous, it's here to catch an accidental heavy import. Override with
+# IMPORT_BUDGET_MS on slow machines.
+BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "1500"))
+
+
+def import_ms(args, pycache_dir):
+    """
+    Runs python -X importtime & totals up the top level imports.
+
+    Args:
+        args (list): Args for python, after -X importtime.
+        pycache_dir (str): Dir for bytecode, kept out of the tree.
+
+    Returns:
+        float: Total import ms.
+    """
+    # Bytecode writes on, so the timed run has a warm cache like a real start.
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache_dir)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime"] + args,
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        # Nested imports are indented, top level ones hold the full cost.
+        if not name.startswith("  "):
+            total_us += int(cumulative_us)
+    return total_us / 1000
+
+
+def test_app_import_time(bench, tmp_path):
+    """Importing the web app, as every gunicorn worker does on start."""
+    args = ["-c", "import app.utils, app.views"]
+    # Untimed run first, to write the bytecode.
+    import_ms(args, str(tmp_path))
+    times = []
+    bench(lambda: times.append(import_ms(args, str(tmp_path))), rounds=5)
+    bench.metrics["import_ms"] = round(min(times), 1)
+    assert bench.metrics["import_ms"] < BUDGET_MS
+
+
+def test_connector_import_time(bench, tmp_path):
+    """Importing the ansible connector, run by sudo for every install."""
+    args = ["playbooks/ansible_connector.py", "--help"]
+    # Untimed run first, to write the bytecode.
+    import_ms(args, str(tmp_path))
+    times = []
+    bench(lambda: times.append(import_ms(args, str(tmp_path))), rounds=5)
+    bench.metrics["import_ms"] = round(min(times), 1)
+    assert bench.metrics["import_ms"] < BUDGET_MS
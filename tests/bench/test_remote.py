@@ -0,0 +1,80 @@
+import os
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+from app import utils
+from ssh_server import make_remote_install
+
+SERVERS = 8
+CHECKS = 20
+LATENCY = 0.02
+FILE_MB = 4
+
+
+@pytest.fixture
+def installs(ssh_server, tmp_path, monkeypatch):
+    # Keep the tmux socket name cache out of the repo's json dir.
+    (tmp_path / "json").mkdir()
+    monkeypatch.setattr(utils, "CWD", str(tmp_path))
+    monkeypatch.setattr(utils, "status_watcher", None)
+    servers = [
+        make_remote_install(ssh_server.root, f"Server{i}", server_id=9000 + i)
+        for i in range(SERVERS)
+    ]
+    yield servers
+    for server in servers:
+        utils.status_cache.remove(server.id)
+
+
+def test_ssh_status_sequential(app, bench, ssh_server, installs):
+    """Repeat status checks of one remote server, a host with 20ms latency."""
+    ssh_server.latency = LATENCY
+    server = installs[0]
+
+    def check_all():
+        with app.app_context():
+            return [utils.get_server_status(server) for _ in range(CHECKS)]
+
+    statuses = bench(check_all, rounds=1, items=CHECKS)
+    assert statuses == [False] * CHECKS
+    # No connection reuse today, one connect per ssh cmd.
+    bench.metrics["connections_per_check"] = round(ssh_server.connections / CHECKS, 2)
+
+
+def test_ssh_status_fanout(app, bench, ssh_server, installs):
+    """Status of every server at once, like the home page does."""
+    ssh_server.latency = LATENCY
+
+    def check(server):
+        with app.app_context():
+            return utils.get_server_status(server)
+
+    def check_all():
+        with ThreadPoolExecutor(max_workers=SERVERS) as pool:
+            return list(pool.map(check, installs))
+
+    # Warm the tmux socket name cache first, its json file isn't safe to
+    # fill from many threads at once.
+    for server in installs:
+        check(server)
+    statuses = bench(check_all, items=SERVERS)
+    assert statuses == [False] * SERVERS
+
+
+def test_sftp_large_file(app, bench, ssh_server, installs):
+    """Big cfg/log file read & write over sftp, in bytes/sec."""
+    path = os.path.join(installs[0].install_path, "log/console.log")
+    os.makedirs(os.path.dirname(path))
+    line = "[Server thread/INFO]: Done (4.2s)! For help, type help\n"
+    content = line * (FILE_MB * 1024 * 1024 // len(line))
+    with open(path, "w") as f:
+        f.write(content)
+
+    def transfer():
+        with app.app_context():
+            data = utils.read_file_over_ssh(installs[0], path)
+            assert utils.write_file_over_ssh(installs[0], path + ".new", data)
+        return data
+
+    data = bench(transfer, rounds=1, items=2 * len(content))
+    assert data == content
@@ -2,6 +2,8 @@ import os
 import sys
 import time
 import shutil
+import functools
+import paramiko
 import pytest
 from pathlib import Path
 from app import main
@@ -25,6 +27,56 @@ def app():
     yield application
 
 
+@pytest.fixture
+def serving_app():
+    """
+    Same as the web server, with request timing, the status watcher, the
+    scheduler & resumed deletions running. Only for tests of those services,
+    they act on the real database.
+    """
+    application = main(serve=True)
+    application.config.update(
+        {
+            "TESTING": True,
+        }
+    )
+
+    yield application
+
+
 @pytest.fixture
 def client(app):
     return app.test_client()
+
+
+@pytest.fixture
+def serving_client(serving_app):
+    return serving_app.test_client()
+
+
+@pytest.fixture
+def ssh_server(tmp_path, monkeypatch):
+    """
+    Local ssh & sftp server standing in for remote hosts. Every paramiko
+    connect goes to it & every get_ssh_key_file() call gets its client key.
+    Latency & bandwidth can be set on the yielded server at any time.
+    """
+    from ssh_server import SshTestServer
+    from app import utils, views
+
+    root = tmp_path / "remote"
+    root.mkdir()
+    server = SshTestServer(str(root), str(tmp_path)).start()
+
+    monkeypatch.setattr(
+        paramiko.SSHClient,
+        "connect",
+        functools.partialmethod(paramiko.SSHClient.connect, port=server.port),
+    )
+    for module in (utils, views):
+        monkeypatch.setattr(
+            module, "get_ssh_key_file", lambda user, host: server.key_file
+        )
+
+    yield server
+    server.stop()
@@ -1,5 +1,6 @@
 import os
 import pwd
+import gzip
 import time
 import json
 import pytest
@@ -92,6 +93,94 @@ def test_home_responses(app, client):
         assert response.status_code == 405  # Return's 405 to POST requests.
 
 
+# Test home filters & the server listing api behind it.
+def test_home_server_list(app, client):
+    with client:
+        response = client.post(
+            "/login", data={"username": USERNAME, "password": PASSWORD}
+        )
+        assert response.status_code == 302
+
+        response = client.get("/api/servers?per_page=1")
+        assert response.status_code == 200
+        listing = json.loads(response.data)
+        assert listing["per_page"] == 1
+        assert len(listing["servers"]) == min(1, listing["total"])
+        assert listing["total"] == sum(count for _, count in listing["hosts"])
+
+        response = client.get("/api/servers?prefix=no-such-server")
+        assert json.loads(response.data)["total"] == 0
+
+        response = client.get("/api/servers?status=sideways")
+        assert response.status_code == 400
+        response = client.get("/api/servers?page=0")
+        assert response.status_code == 400
+
+        response = client.get("/home?prefix=no-such-server")
+        assert response.status_code == 200
+        assert b"No servers match those filters" in response.data
+
+        # Bad args fall back to the first page.
+        response = client.get("/home?page=abc")
+        assert response.status_code == 200
+        assert b"Invalid page" in response.data
+
+
+# Test tagging servers, filtering by tag & tag status summaries.
+def test_tags(app, client):
+    from app import db
+    from app.models import GameServer
+
+    with app.app_context():
+        db.session.add(
+            GameServer(
+                install_name="Tagcraft",
+                install_path="/home/mcserver/Tagcraft",
+                script_name="mcserver",
+                username="mcserver",
+                install_type="local",
+                install_finished=True,
+            )
+        )
+        db.session.commit()
+
+    with client:
+        response = client.post(
+            "/login", data={"username": USERNAME, "password": PASSWORD}
+        )
+        assert response.status_code == 302
+
+        response = client.post(
+            "/api/tags", json={"server": "Tagcraft", "tags": "EU-West, minecraft"}
+        )
+        assert response.status_code == 200
+        assert json.loads(response.data)["tags"] == ["eu-west", "minecraft"]
+
+        response = client.post(
+            "/api/tags", data={"server": "Tagcraft", "tags": "bad tag!"}
+        )
+        assert response.status_code == 400
+        response = client.post("/api/tags", data={"server": "Nocraft", "tags": "a"})
+        assert response.status_code == 400
+
+        response = client.get("/api/servers?tag=eu-west")
+        listing = json.loads(response.data)
+        assert [s["install_name"] for s in listing["servers"]] == ["Tagcraft"]
+        assert listing["servers"][0]["tags"] == ["eu-west", "minecraft"]
+
+        response = client.get("/api/tags")
+        summaries = {s["tag"]: s for s in json.loads(response.data)}
+        assert summaries["eu-west"]["servers"] == 1
+        assert summaries["minecraft"]["servers"] == 1
+
+        response = client.get("/home?tag=minecraft")
+        assert response.status_code == 200
+        assert b"Tagcraft" in response.data
+
+    with app.app_context():
+        GameServer.query.filter_by(install_name="Tagcraft").first().delete()
+
+
 ### Add page tests.
 # Check basic content matches.
 def test_add_content(app, client):
@@ -878,6 +967,368 @@ def test_system_usage(app, client):
         assert isinstance(network["bytes_recv_rate"], float)
 
 
+### API response tests.
+# Check api json is compact, compressed & answers 304 when unchanged.
+def test_api_responses(app, client):
+    from app.utils import get_proc_store
+
+    with client:
+        response = client.post(
+            "/login", data={"username": USERNAME, "password": PASSWORD}
+        )
+        assert response.status_code == 302
+
+        proc_info = get_proc_store().create("Mockcraft")
+        proc_info.process_lock = False
+        for i in range(100):
+            proc_info.stdout.append(f"line {i} of mock install output\n")
+
+        response = client.get("/api/cmd-output?server=Mockcraft")
+        assert response.status_code == 200
+        assert response.headers.get("Content-Encoding") == None
+        assert b'"process_lock":false' in response.data
+        etag = response.headers["ETag"]
+        assert etag.startswith('W/"v')
+        plain = response.data
+
+        response = client.get(
+            "/api/cmd-output?server=Mockcraft",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+        )
+        assert response.status_code == 304
+        assert response.data == b""
+
+        # New output, new etag.
+        proc_info.stdout.append("Done!\n")
+        response = client.get(
+            "/api/cmd-output?server=Mockcraft",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        output = json.loads(gzip.decompress(response.data))
+        assert output["stdout"] == json.loads(plain)["stdout"] + ["Done!\n"]
+
+        # Routes without their own etag get one from the body.
+        response = client.get("/api/jobs")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        response = client.get("/api/jobs", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        get_proc_store().delete("Mockcraft")
+
+
+### Bulk actions tests.
+# Check bulk page loads & api rejects bad requests.
+def test_bulk_actions(app, client):
+    with client:
+        # Log test user in.
+        response = client.post(
+            "/login", data={"username": USERNAME, "password": PASSWORD}
+        )
+        assert response.status_code == 302
+
+        response = client.get("/bulk")
+        assert response.status_code == 200
+        assert b"Bulk Actions" in response.data
+
+        # Invalid action.
+        response = client.post(
+            "/api/bulk", json={"servers": [TEST_SERVER], "action": "delete"}
+        )
+        assert response.status_code == 400
+        assert json.loads(response.data.decode())["Error"] == "Invalid action"
+
+        # No servers.
+        response = client.post("/api/bulk", data={"action": "update"})
+        assert response.status_code == 400
+        assert json.loads(response.data.decode())["Error"] == "No servers supplied"
+
+        # Bad concurrency.
+        response = client.post(
+            "/api/bulk",
+            json={"servers": [TEST_SERVER], "action": "update", "concurrency": 0},
+        )
+        assert response.status_code == 400
+
+        # Unknown servers are skipped, nothing left to run.
+        response = client.post(
+            "/api/bulk", json={"servers": ["NotARealServer"], "action": "update"}
+        )
+        assert response.status_code == 400
+        resp_dict = json.loads(response.data.decode())
+        assert resp_dict["skipped"] == {"NotARealServer": "Invalid game server name"}
+
+        # Unknown batch.
+        response = client.get("/api/bulk?batch=nope")
+        assert response.status_code == 404
+
+
+### Deletion tests.
+# Check trashed files get deleted in the background & progress is reported.
+def test_deletions(app, client, tmp_path):
+    from app.trash import move_to_trash
+    from app.utils import queue_deletion
+
+    install_path = tmp_path / "TrashTest"
+    (install_path / "serverfiles").mkdir(parents=True)
+    (install_path / "serverfiles/server.jar").write_bytes(b"x" * 4096)
+
+    with client:
+        # Log test user in.
+        response = client.post(
+            "/login", data={"username": USERNAME, "password": PASSWORD}
+        )
+        assert response.status_code == 302
+
+        response = client.get("/api/deletions?limit=nope")
+        assert response.status_code == 400
+
+        with app.app_context():
+            trash_path = move_to_trash(str(install_path))
+            deletion_id = queue_deletion("TrashTest", trash_path, str(install_path))
+
+        # Original path is free straight away.
+        assert not install_path.exists()
+
+        for _ in range(50):
+            response = client.get("/api/deletions")
+            assert response.status_code == 200
+            deletion = [d for d in json.loads(response.data) if d["id"] == deletion_id][0]
+            if deletion["status"] == "finished":
+                break
+            time.sleep(0.2)
+
+        assert deletion["status"] == "finished"
+        assert deletion["bytes_freed"] == 4096
+        assert deletion["percent"] == 100.0
+        assert not os.path.exists(trash_path)
+
+
+### Backups tests.
+# Check backups page loads & api validates its args.
+def test_backups(app, client):
+    with client:
+        # Log test user in.
+        response = client.post(
+            "/login", data={"username": USERNAME, "password": PASSWORD}
+        )
+        assert response.status_code == 302
+
+        response = client.get("/backups")
+        assert response.status_code == 200
+        assert b"Game Server Backups" in response.data
+
+        response = client.get("/api/backups")
+        assert response.status_code == 400
+
+        response = client.get("/api/backups?server=NoSuchServer")
+        assert response.status_code == 200
+        assert json.loads(response.data) == []
+
+        response = client.get("/api/snapshots")
+        assert response.status_code == 400
+
+        response = client.get("/api/snapshots?server=NoSuchServer")
+        assert response.status_code == 200
+        assert json.loads(response.data) == []
+
+        # Can't back up servers that don't exist.
+        response = client.post(
+            "/backups",
+            data={"server_name": "NoSuchServer", "kind": "full"},
+            follow_redirects=True,
+        )
+        assert b"Invalid game server name!" in response.data
+
+
+### Perf tests.
+# Check request timings & span breakdowns show up in perf api.
+def test_perf(serving_app, serving_client):
+    with serving_client:
+        # Log test user in.
+        response = serving_client.post(
+            "/login", data={"username": USERNAME, "password": PASSWORD}
+        )
+        assert response.status_code == 302
+
+        response = serving_client.get("/home")
+        assert response.status_code == 200
+
+        response = serving_client.get("/api/perf")
+        assert response.status_code == 200
+        perf = json.loads(response.data)
+        home = perf["routes"]["GET /home"]
+        assert home["count"] >= 1
+        assert home["p50_ms"] > 0
+        assert "db_query" in home["slowest"]["spans"]
+        assert perf["spans"]["read_config"]["count"] >= 1
+
+
+### Metrics tests.
+# Check metrics are off without a token & need the right bearer token.
+def test_metrics(serving_app, serving_client):
+    with serving_client:
+        response = serving_client.get("/metrics")
+        assert response.status_code == 404
+
+        # Set a metrics token in config file.
+        config = configparser.ConfigParser()
+        config.read("main.conf")
+        config["metrics"]["metrics_token"] = "scrape-token"
+        with open("main.conf", "w") as configfile:
+            config.write(configfile)
+
+        response = serving_client.get("/metrics")
+        assert response.status_code == 401
+
+        response = serving_client.get(
+            "/metrics", headers={"Authorization": "Bearer wrong-token"}
+        )
+        assert response.status_code == 401
+
+        response = serving_client.get(
+            "/metrics", headers={"Authorization": "Bearer scrape-token"}
+        )
+        assert response.status_code == 200
+        assert response.content_type.startswith("text/plain; version=0.0.4")
+        assert b"# TYPE weblgsm_host_load1 gauge" in response.data
+        assert b"weblgsm_http_request_duration_seconds_bucket" in response.data
+
+        # Set it back to default state for sake of idempotency.
+        config["metrics"]["metrics_token"] = ""
+        with open("main.conf", "w") as configfile:
+            config.write(configfile)
+
+
+### Static assets tests.
+# Check built assets are served precompressed & cached forever, no login.
+def test_dist_assets(app, client):
+    from app.assets import asset_urls, manifest
+
+    built = manifest["update-xterm.js"]
+    with client:
+        # Built, or vendor lib fallbacks if npm hasn't installed them.
+        response = client.get("/login")
+        assert asset_urls("base.js")[0].encode() in response.data
+
+        response = client.get(f"/static/dist/{built}")
+        assert response.status_code == 200
+        assert response.headers.get("Content-Encoding") == None
+        assert "immutable" in response.headers["Cache-Control"]
+        assert response.headers["Vary"] == "Accept-Encoding"
+        plain = response.data
+
+        response = client.get(
+            f"/static/dist/{built}", headers={"Accept-Encoding": "gzip, deflate"}
+        )
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.content_type.startswith("text/javascript")
+        assert gzip.decompress(response.data) == plain
+
+        assert client.get("/static/dist/manifest.json").status_code == 404
+        assert client.get("/static/dist/../css/main.css").status_code == 404
+
+
+### Schedules tests.
+# Check schedules page loads & bad schedules are rejected.
+def test_schedules(app, client):
+    with client:
+        # Log test user in.
+        response = client.post(
+            "/login", data={"username": USERNAME, "password": PASSWORD}
+        )
+        assert response.status_code == 302
+
+        response = client.get("/schedules")
+        assert response.status_code == 200
+        assert b"Scheduled Commands" in response.data
+
+        response = client.post(
+            "/schedules",
+            data={"server_name": "NotARealServer", "command": "update", "cron": "@daily"},
+            follow_redirects=True,
+        )
+        assert b"Invalid game server name!" in response.data
+
+        response = client.get("/api/schedules")
+        assert response.status_code == 200
+        assert isinstance(json.loads(response.data.decode()), list)
+
+        response = client.post(
+            "/schedules",
+            data={"schedule_id": "99999", "action": "delete"},
+            follow_redirects=True,
+        )
+        assert b"Invalid schedule!" in response.data
+
+
+# Check schedules are only toggled & deleted by POST.
+def test_schedule_actions(app, client):
+    from app import db
+    from app.models import GameServer, Schedule
+
+    with app.app_context():
+        db.session.add(
+            GameServer(
+                install_name="Cronecraft",
+                install_path="/home/mcserver/Cronecraft",
+                script_name="mcserver",
+                username="mcserver",
+                install_type="local",
+                install_finished=True,
+            )
+        )
+        schedule = Schedule(
+            server_name="Cronecraft",
+            command="update",
+            short_cmd="u",
+            cron="@daily",
+            jitter=0,
+            missed_policy="skip",
+            enabled=True,
+        )
+        db.session.add(schedule)
+        db.session.commit()
+        schedule_id = schedule.id
+
+    with client:
+        response = client.post(
+            "/login", data={"username": USERNAME, "password": PASSWORD}
+        )
+        assert response.status_code == 302
+
+        # Old GET links don't change anything.
+        client.get(f"/schedules?id={schedule_id}&action=delete")
+        with app.app_context():
+            assert db.session.get(Schedule, schedule_id) != None
+
+        response = client.post(
+            "/schedules",
+            data={"schedule_id": schedule_id, "action": "toggle"},
+            follow_redirects=True,
+        )
+        assert b"Schedule updated!" in response.data
+        with app.app_context():
+            assert db.session.get(Schedule, schedule_id).enabled == False
+
+        response = client.post(
+            "/schedules",
+            data={"schedule_id": schedule_id, "action": "delete"},
+            follow_redirects=True,
+        )
+        assert b"Schedule deleted!" in response.data
+        with app.app_context():
+            assert db.session.get(Schedule, schedule_id) == None
+
+    with app.app_context():
+        GameServer.query.filter_by(install_name="Cronecraft").first().delete()
+
+
 ### Edit page tests.
 # Test edit page basic content.
 def test_edit_content(app, client):
@@ -1362,12 +1813,12 @@ def game_server_start_stop(client):
 
     # Sleep until process is finished.
     while (
-        b'"process_lock": true' in client.get("/api/cmd-output?server=Minecraft").data
+        b'"process_lock":true' in client.get("/api/cmd-output?server=Minecraft").data
     ):
 #        print(client.get("/api/cmd-output?server=Minecraft").data.decode("utf8"))
         time.sleep(5)
 
-    assert b'"process_lock": false' in client.get("/api/cmd-output?server=Minecraft").data
+    assert b'"process_lock":false' in client.get("/api/cmd-output?server=Minecraft").data
 #    print(client.get("/api/cmd-output?server=Minecraft").data.decode("utf8"))
 
     #    print("######################## Minecraft Start Log\n")
@@ -1401,13 +1852,13 @@ def game_server_start_stop(client):
 #    print("######################## SEND COMMAND OUTPUT")
     # Sleep until process is finished.
     while (
-        b'"process_lock": true' in client.get("/api/cmd-output?server=Minecraft").data
+        b'"process_lock":true' in client.get("/api/cmd-output?server=Minecraft").data
     ):
 #        print(client.get("/api/cmd-output?server=Minecraft").data.decode("utf8"))
         time.sleep(3)
 
     time.sleep(1)
-    assert b'"process_lock": false' in client.get("/api/cmd-output?server=Minecraft").data
+    assert b'"process_lock":false' in client.get("/api/cmd-output?server=Minecraft").data
 
 #    print(client.get("/api/cmd-output?server=Minecraft").data.decode("utf8"))
     assert (
@@ -1485,12 +1936,12 @@ def console_output(client):
 
     # Run until "process_lock": false (aka proc stopped).
     while (
-        b'"process_lock": true' in client.get("/api/cmd-output?server=Minecraft").data
+        b'"process_lock":true' in client.get("/api/cmd-output?server=Minecraft").data
     ):
         time.sleep(3)
 
     time.sleep(1)
-    assert b'"process_lock": false' in client.get("/api/cmd-output?server=Minecraft").data
+    assert b'"process_lock":false' in client.get("/api/cmd-output?server=Minecraft").data
 
     # Simulate front end js console mode.
     # 1. First POST to /api/update-console
@@ -1572,7 +2023,7 @@ def test_install_newuser(app, client):
 
         # Run until "process_lock": false (aka proc stopped).
         while (
-            b'"process_lock": true'
+            b'"process_lock":true'
             in client.get("/api/cmd-output?server=Minecraft").data
         ):
             time.sleep(3)
@@ -0,0 +1,460 @@
+"""
+In-process paramiko ssh & sftp server, standing in for a remote game server
+host in tests & benches. Listens on localhost, only takes the client key it
+generated, and emulates the few commands web-lgsm runs over ssh (cat, tmux,
+find, mv, test, nice, rm & LinuxGSM scripts). Optional latency & bandwidth shaping make it act
+like a far away host.
+
+Paths aren't remapped, remote paths are local paths. Anything outside of root
+is refused.
+"""
+
+import os
+import time
+import shutil
+import errno
+import shlex
+import socket
+import fnmatch
+import threading
+import paramiko
+
+from types import SimpleNamespace
+from paramiko.sftp import SFTP_OK
+from paramiko.sftp_attr import SFTPAttributes
+from paramiko.sftp_handle import SFTPHandle
+from paramiko.sftp_server import SFTPServer
+from paramiko.sftp_si import SFTPServerInterface
+
+# Bytes per send when shaping bandwidth.
+SEND_CHUNK = 32 * 1024
+
+# Lines a fake LinuxGSM script prints per command.
+LGSM_LINES = 200
+
+
+class SshTestServer:
+    """
+    Class used to create objects that run an ssh & sftp server in a thread on
+    127.0.0.1. Keeps counts of connections, exec requests & sftp sessions so
+    tests can check connection reuse & fan-out.
+    """
+
+    def __init__(self, root, key_dir, latency=0, bandwidth=None, handlers=None):
+        """
+        Args:
+            root (str): Dir remote paths must be under.
+            key_dir (str): Dir to write the client private key to.
+            latency (float): Seconds added to every exec & sftp request.
+            bandwidth (int): Bytes/sec cap for output & sftp transfers, None
+                             for no cap.
+            handlers (dict): Extra cmd name -> handler(server, argv),
+                             returning (stdout, stderr, exit_status). Stdout
+                             can be a str or an iterable of str chunks.
+        """
+        self.root = os.path.realpath(root)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.handlers = {
+            "cat": cmd_cat,
+            "tmux": cmd_tmux,
+            "find": cmd_find,
+            "mv": cmd_mv,
+            "test": cmd_test,
+            "nice": cmd_nice,
+            "rm": cmd_rm,
+        }
+        self.handlers.update(handlers or dict())
+
+        # Tmux socket name -> scrollback lines, for running game servers.
+        self.sessions = dict()
+
+        self.host_key = paramiko.ECDSAKey.generate()
+        client_key = paramiko.ECDSAKey.generate()
+        self.key_file = os.path.join(key_dir, "id_ecdsa")
+        client_key.write_private_key_file(self.key_file)
+        self.authorized_key = client_key.get_base64()
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.execs = []
+        self.sftp_sessions = 0
+        self.transports = []
+        self.thread = None
+
+    def start(self):
+        self.sock.listen(64)
+        self.thread = threading.Thread(target=self._accept, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.sock.close()
+        for transport in self.transports:
+            transport.close()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(client)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler("sftp", SFTPServer, ShapedSFTPServer)
+            with self.lock:
+                self.connections += 1
+                self.transports.append(transport)
+            transport.start_server(server=_Interface(self))
+
+    def allowed(self, path):
+        """True if path is inside of root."""
+        path = os.path.realpath(path)
+        return path == self.root or path.startswith(self.root + os.sep)
+
+    def delay(self, size=0):
+        """Sleeps for latency plus however long size bytes take to send."""
+        wait = self.latency
+        if self.bandwidth:
+            wait += size / self.bandwidth
+        if wait > 0:
+            time.sleep(wait)
+
+    def run(self, channel, command):
+        """Runs an exec request, streaming output back over the channel."""
+        argv = shlex.split(command)
+        with self.lock:
+            self.execs.append(argv)
+        self.delay()
+
+        handler = self.handlers.get(os.path.basename(argv[0]), None)
+        if handler == None and self.allowed(argv[0]) and os.path.isfile(argv[0]):
+            handler = cmd_lgsm_script
+        if handler == None:
+            stdout, stderr, status = "", f"{argv[0]}: command not found\n", 127
+        else:
+            stdout, stderr, status = handler(self, argv)
+
+        try:
+            if isinstance(stdout, str):
+                stdout = [stdout]
+            for chunk in stdout:
+                self._send(channel.sendall, chunk.encode())
+            self._send(channel.sendall_stderr, stderr.encode())
+            channel.send_exit_status(status)
+            # Eof, not close. Closing can beat the exec request's success
+            # reply to the client, which then sees the channel as failed.
+            channel.shutdown_write()
+        except OSError:
+            pass
+
+    def _send(self, send, data):
+        if not self.bandwidth:
+            send(data)
+            return
+        for start in range(0, len(data), SEND_CHUNK):
+            chunk = data[start : start + SEND_CHUNK]
+            time.sleep(len(chunk) / self.bandwidth)
+            send(chunk)
+
+    def __str__(self):
+        return f"SshTestServer(port='{self.port}', root='{self.root}', connections='{self.connections}')"
+
+    def __repr__(self):
+        return f"SshTestServer(port='{self.port}', root='{self.root}', connections='{self.connections}')"
+
+
+class _Interface(paramiko.ServerInterface):
+    """Key auth & channel handling for an SshTestServer."""
+
+    def __init__(self, server):
+        self.server = server
+
+    def get_allowed_auths(self, username):
+        return "publickey"
+
+    def check_auth_publickey(self, username, key):
+        if key.get_base64() == self.server.authorized_key:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        thread = threading.Thread(
+            target=self.server.run, args=(channel, command.decode()), daemon=True
+        )
+        thread.start()
+        return True
+
+    def check_channel_subsystem_request(self, channel, name):
+        if name == "sftp":
+            with self.server.lock:
+                self.server.sftp_sessions += 1
+        return super().check_channel_subsystem_request(channel, name)
+
+
+### Command handlers.
+def cmd_cat(server, argv):
+    stdout, stderr, status = [], "", 0
+    for path in argv[1:]:
+        if not server.allowed(path) or not os.path.isfile(path):
+            stderr += f"cat: {path}: No such file or directory\n"
+            status = 1
+            continue
+        with open(path) as f:
+            stdout.append(f.read())
+    return stdout, stderr, status
+
+
+def cmd_tmux(server, argv):
+    socket_name = argv[argv.index("-L") + 1] if "-L" in argv else "default"
+    if socket_name not in server.sessions:
+        return "", f"no server running on /tmp/tmux-1000/{socket_name}\n", 1
+
+    if "capture-pane" in argv:
+        return "".join(server.sessions[socket_name]), "", 0
+
+    created = time.strftime("%a %b %d %H:%M:%S %Y")
+    script_name = socket_name.rsplit("-", 1)[0]
+    return f"{script_name}: 1 windows (created {created})\n", "", 0
+
+
+def cmd_find(server, argv):
+    """Handles 'find path -name x -prune -type f -name a -o -name b ...'."""
+    path = argv[1]
+    if not server.allowed(path) or not os.path.isdir(path):
+        return "", f"find: '{path}': No such file or directory\n", 1
+
+    prune, names = [], []
+    for i, arg in enumerate(argv):
+        if arg != "-name":
+            continue
+        if i + 2 < len(argv) and argv[i + 2] == "-prune":
+            prune.append(argv[i + 1])
+        else:
+            names.append(argv[i + 1])
+
+    found = []
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [d for d in dirs if not any(fnmatch.fnmatch(d, p) for p in prune)]
+        for file in files:
+            if any(fnmatch.fnmatch(file, name) for name in names):
+                found.append(os.path.join(root, file) + "\n")
+    return found, "", 0
+
+
+def cmd_mv(server, argv):
+    """Handles 'mv -T src dest'."""
+    src, dest = argv[-2], argv[-1]
+    if not (server.allowed(src) and server.allowed(dest)):
+        return "", f"mv: cannot move '{src}': Permission denied\n", 1
+    try:
+        os.rename(src, dest)
+    except OSError as e:
+        return "", f"mv: cannot move '{src}' to '{dest}': {e.strerror}\n", 1
+    return "", "", 0
+
+
+def cmd_test(server, argv):
+    """Handles 'test -e path'."""
+    path = argv[-1]
+    return "", "", 0 if server.allowed(path) and os.path.exists(path) else 1
+
+
+def cmd_nice(server, argv):
+    """Handles 'nice -n N cmd ...', running cmd at normal priority."""
+    argv = argv[3:]
+    handler = server.handlers.get(os.path.basename(argv[0]), None)
+    if handler == None:
+        return "", f"nice: '{argv[0]}': No such file or directory\n", 127
+    return handler(server, argv)
+
+
+def cmd_rm(server, argv):
+    """Handles 'rm -rf path'."""
+    path = argv[-1]
+    if not server.allowed(path):
+        return "", f"rm: cannot remove '{path}': Permission denied\n", 1
+    shutil.rmtree(path, ignore_errors=True)
+    return "", "", 0
+
+
+def cmd_lgsm_script(server, argv):
+    """
+    Fake LinuxGSM script. Start & stop open & close the tmux session named
+    after the script & its lgsm/data uid file, everything else just prints.
+    """
+    script_path = argv[0]
+    script_name = os.path.basename(script_path)
+    command = argv[1] if len(argv) > 1 else ""
+    uid_file = os.path.join(
+        os.path.dirname(script_path), f"lgsm/data/{script_name}.uid"
+    )
+    socket_name = None
+    if os.path.isfile(uid_file):
+        with open(uid_file) as f:
+            socket_name = f"{script_name}-{f.read().strip()}"
+
+    lines = [
+        f"[  OK  ] {script_name}: {command}: step {i} of {LGSM_LINES}\n"
+        for i in range(LGSM_LINES)
+    ]
+    if command in ("st", "start", "r", "restart") and socket_name:
+        server.sessions[socket_name] = lines
+    if command in ("sp", "stop") and socket_name:
+        server.sessions.pop(socket_name, None)
+    return lines, "", 0
+
+
+### Sftp.
+class ShapedSFTPHandle(SFTPHandle):
+    """Sftp file handle that applies the server's latency & bandwidth."""
+
+    def __init__(self, server, flags=0):
+        super().__init__(flags)
+        self.server = server
+
+    def read(self, offset, length):
+        data = super().read(offset, length)
+        if isinstance(data, bytes):
+            self.server.delay(len(data))
+        return data
+
+    def write(self, offset, data):
+        self.server.delay(len(data))
+        return super().write(offset, data)
+
+
+class ShapedSFTPServer(SFTPServerInterface):
+    """Sftp over the local fs, confined to the SshTestServer's root."""
+
+    def __init__(self, server_interface, *args, **kwargs):
+        super().__init__(server_interface, *args, **kwargs)
+        self.server = server_interface.server
+
+    def _check(self, path):
+        self.server.delay()
+        if not self.server.allowed(path):
+            raise PermissionError(errno.EACCES, "Outside of root", path)
+        return path
+
+    def _wrap(self, func, *args):
+        try:
+            return func(*args)
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def list_folder(self, path):
+        def listing():
+            self._check(path)
+            attrs = []
+            for name in os.listdir(path):
+                attr = SFTPAttributes.from_stat(os.lstat(os.path.join(path, name)))
+                attr.filename = name
+                attrs.append(attr)
+            return attrs
+
+        return self._wrap(listing)
+
+    def stat(self, path):
+        return self._wrap(
+            lambda: SFTPAttributes.from_stat(os.stat(self._check(path)))
+        )
+
+    def lstat(self, path):
+        return self._wrap(
+            lambda: SFTPAttributes.from_stat(os.lstat(self._check(path)))
+        )
+
+    def open(self, path, flags, attr):
+        def opener():
+            self._check(path)
+            fd = os.open(path, flags, 0o644)
+            if flags & os.O_WRONLY:
+                mode = "ab" if flags & os.O_APPEND else "wb"
+            elif flags & os.O_RDWR:
+                mode = "a+b" if flags & os.O_APPEND else "r+b"
+            else:
+                mode = "rb"
+            handle = ShapedSFTPHandle(self.server, flags)
+            handle.filename = path
+            handle.readfile = handle.writefile = os.fdopen(fd, mode)
+            return handle
+
+        return self._wrap(opener)
+
+    def remove(self, path):
+        return self._wrap(lambda: os.remove(self._check(path)) or SFTP_OK)
+
+    def rename(self, oldpath, newpath):
+        return self._wrap(
+            lambda: os.rename(self._check(oldpath), self._check(newpath)) or SFTP_OK
+        )
+
+    def mkdir(self, path, attr):
+        return self._wrap(lambda: os.mkdir(self._check(path)) or SFTP_OK)
+
+    def rmdir(self, path):
+        return self._wrap(lambda: os.rmdir(self._check(path)) or SFTP_OK)
+
+    def chattr(self, path, attr):
+        return self._wrap(
+            lambda: SFTPServer.set_file_attr(self._check(path), attr) or SFTP_OK
+        )
+
+
+def make_remote_install(
+    root, name="Mockcraft", script_name="mcserver", uid="ab12cd", server_id=9000
+):
+    """
+    Lays out a minimal LinuxGSM install under root & returns a GameServer
+    like object pointing at it as a remote install on 127.0.0.1.
+
+    Args:
+        root (str): Dir to make the install in.
+        name (str): Install name & dir name.
+        script_name (str): LinuxGSM script name.
+        uid (str): Value for the lgsm/data uid file, used in the tmux socket.
+        server_id (int): Fake db id, keep clear of real ids.
+
+    Returns:
+        SimpleNamespace: Fake GameServer.
+    """
+    install_path = os.path.join(root, name)
+    cfg_dir = os.path.join(install_path, f"lgsm/config-lgsm/{script_name}")
+    os.makedirs(cfg_dir)
+    os.makedirs(os.path.join(install_path, "lgsm/data"))
+
+    script_path = os.path.join(install_path, script_name)
+    with open(script_path, "w") as f:
+        f.write("#!/bin/bash\n")
+    os.chmod(script_path, 0o755)
+    with open(os.path.join(install_path, f"lgsm/data/{script_name}.uid"), "w") as f:
+        f.write(f"{uid}\n")
+    default_dir = os.path.join(install_path, "lgsm/config-default/config-lgsm")
+    os.makedirs(default_dir)
+    for cfg_dir_path in (cfg_dir, default_dir):
+        with open(os.path.join(cfg_dir_path, "common.cfg"), "w") as f:
+            f.write('maxplayers="20"\n')
+
+    return SimpleNamespace(
+        id=server_id,
+        install_name=name,
+        install_path=install_path,
+        script_name=script_name,
+        username="gameserver",
+        install_type="remote",
+        install_host="127.0.0.1",
+        is_container=False,
+        install_finished=True,
+        keyfile_path=None,
+    )
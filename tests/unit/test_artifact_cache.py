@@ -0,0 +1,105 @@
+import os
+import pytest
+import requests
+
+from app.artifact_cache import ArtifactCache, sha256_file
+
+URL = "https://linuxgsm.sh"
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(self.status_code)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fake upstream, records request headers & serves queued responses."""
+    calls = []
+    responses = []
+
+    def get(url, headers=None, timeout=None):
+        calls.append(headers)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(requests, "get", get)
+    return calls, responses
+
+
+def test_put_get_install(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    assert cache.get("linuxgsm.sh") == None
+
+    sha = cache.put("linuxgsm.sh", b"#!/bin/bash\necho v1\n")
+    path = cache.get("linuxgsm.sh")
+    assert os.path.basename(path) == sha
+
+    dest = str(tmp_path / "linuxgsm.sh")
+    assert cache.install("linuxgsm.sh", dest)
+    assert sha256_file(dest) == sha
+    assert os.stat(dest).st_mode & 0o777 == 0o755
+
+    # Corrupt objects are ignored rather than handed out.
+    with open(path, "ab") as f:
+        f.write(b"junk")
+    assert cache.get("linuxgsm.sh") == None
+
+
+def test_versions_pruned(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), keep=2)
+    shas = [cache.put("linuxgsm.sh", f"v{i}".encode()) for i in range(3)]
+
+    versions = [v["sha"] for v in cache.info("linuxgsm.sh")["versions"]]
+    assert versions == [shas[2], shas[1]]
+    objects = os.listdir(tmp_path / "cache/objects")
+    assert shas[0] not in objects
+
+
+def test_generated_artifact_source(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    cache.put("scripts/mcserver", b"mcserver script", source="lgsmsh-v1")
+
+    assert cache.get("scripts/mcserver", source="lgsmsh-v1")
+    # Made by an older linuxgsm.sh, needs regenerating.
+    assert cache.get("scripts/mcserver", source="lgsmsh-v2") == None
+
+
+def test_conditional_refresh(tmp_path, upstream):
+    calls, responses = upstream
+    cache = ArtifactCache(str(tmp_path / "cache"))
+
+    responses.append(FakeResponse(200, b"v1", {"ETag": '"abc"', "Last-Modified": "Mon"}))
+    assert cache.refresh("linuxgsm.sh", URL)
+    assert "If-None-Match" not in calls[-1]
+
+    responses.append(FakeResponse(304))
+    assert not cache.refresh("linuxgsm.sh", URL)
+    assert calls[-1]["If-None-Match"] == '"abc"'
+    assert calls[-1]["If-Modified-Since"] == "Mon"
+    assert not cache.is_stale("linuxgsm.sh", 60)
+
+    responses.append(FakeResponse(200, b"v2", {"ETag": '"def"'}))
+    assert cache.refresh("linuxgsm.sh", URL)
+    assert cache.info("linuxgsm.sh")["etag"] == '"def"'
+
+
+def test_offline_uses_cache(tmp_path, upstream):
+    calls, responses = upstream
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    cache.put("linuxgsm.sh", b"v1")
+
+    responses.append(requests.ConnectionError("offline"))
+    with pytest.raises(requests.ConnectionError):
+        cache.refresh("linuxgsm.sh", URL)
+
+    assert cache.install("linuxgsm.sh", str(tmp_path / "linuxgsm.sh"))
+    assert (tmp_path / "linuxgsm.sh").read_bytes() == b"v1"
@@ -0,0 +1,81 @@
+import os
+import gzip
+import json
+import pytest
+
+from app import assets
+from app.assets import BUNDLES, DIST, build_assets, asset_tags, minify_css
+
+
+def write(static_dir, path, text):
+    path = os.path.join(static_dir, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def static_dir(tmp_path, monkeypatch):
+    static_dir = str(tmp_path)
+    monkeypatch.setattr(assets, "STATIC_DIR", static_dir)
+    monkeypatch.setattr(assets, "manifest", dict())
+    # Install base.js's vendor libs only.
+    for path, _, _ in BUNDLES["base.js"]:
+        write(static_dir, path, f"/* {path} */ var x = 1;\n")
+    write(static_dir, "js/page.js", "function page() {\n    return 1;\n}\n")
+    write(static_dir, "css/main.css", "body {\n  color: white;\n}\n")
+    return static_dir
+
+
+def test_build_assets(static_dir):
+    built = build_assets(static_dir)
+    dist_dir = os.path.join(static_dir, DIST)
+
+    # Only bundles with every source installed get built.
+    assert sorted(built) == ["base.js", "page.js"]
+    assert built["page.js"].startswith("page.") and built["page.js"].endswith(".js")
+    with open(os.path.join(dist_dir, "manifest.json")) as f:
+        assert json.load(f) == built
+
+    path = os.path.join(dist_dir, built["base.js"])
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path + ".gz", "rb") as f:
+        assert gzip.decompress(f.read()) == data
+    for source, _, _ in BUNDLES["base.js"]:
+        assert source.encode() in data
+
+    # Nothing changed, nothing rebuilt.
+    mtime = os.path.getmtime(path)
+    assert build_assets(static_dir) == built
+    assert os.path.getmtime(path) == mtime
+
+    # Changed source gets a new name & the old build is removed.
+    write(static_dir, "js/page.js", "function page() { return 2; }\n")
+    rebuilt = build_assets(static_dir)
+    assert rebuilt["page.js"] != built["page.js"]
+    assert not os.path.exists(os.path.join(dist_dir, built["page.js"]))
+    assert not os.path.exists(os.path.join(dist_dir, built["page.js"] + ".gz"))
+
+
+def test_asset_tags_fallback(static_dir):
+    assets.load_assets(static_dir)
+
+    tags = asset_tags("base.js")
+    assert tags.count("<script") == 1
+    assert f"/static/{DIST}/{assets.manifest['base.js']}" in tags
+
+    # Not installed, so from the CDN or /static as before.
+    tags = asset_tags("base.css")
+    assert "cdn.jsdelivr.net/npm/bootstrap@5.1.0" in tags
+    assert 'href="/static/css/main.css"' in tags
+    assert tags.count("<link") == 3
+    # CDN copies are integrity checked, local ones don't need it.
+    assert tags.count('crossorigin="anonymous"') == 1
+    assert 'integrity="sha384-KyZXEAg3QhqLMpG8r+8fhAXLRk2v' in tags
+    assert "sha384-U1DAWAznBHeqEIlVSCgzq+c9gqGAJn5c" in asset_tags("bootstrap.js")
+
+
+def test_minify_css():
+    css = "/* Comment */\na :hover {\n  color : white;\n  margin: 0 auto;\n}\n"
+    assert minify_css(css) == "a :hover{color :white;margin:0 auto}"
@@ -0,0 +1,164 @@
+import io
+import os
+import time
+import shutil
+import pytest
+import tarfile
+
+from app.backups import (
+    BackupError,
+    PaddedReader,
+    create_backup,
+    list_backups,
+    prune_backups,
+    read_manifest,
+    restore_backup,
+)
+
+
+@pytest.fixture
+def install(tmp_path):
+    """Small fake game server install."""
+    src = tmp_path / "Minecraft"
+    (src / "serverfiles/world").mkdir(parents=True)
+    (src / "serverfiles/steamapps/downloading").mkdir(parents=True)
+    (src / "log").mkdir()
+    (src / "mcserver").write_text("#!/bin/bash\n")
+    (src / "serverfiles/world/level.dat").write_bytes(os.urandom(4096))
+    (src / "serverfiles/server.properties").write_text("motd=hi\n")
+    (src / "serverfiles/steamapps/downloading/chunk").write_bytes(b"x" * 1024)
+    (src / "log/console.log").write_text("log line\n")
+    return src
+
+
+def archive_names(path):
+    with tarfile.open(path, "r:gz") as tar:
+        return set(tar.getnames())
+
+
+def test_full_backup(install, tmp_path):
+    dest = str(tmp_path / "backups")
+    result = create_backup(str(install), dest, "Minecraft", compression="gzip")
+
+    assert result["kind"] == "full"
+    assert result["files"] == 3
+    assert os.path.isfile(result["archive"])
+    # Nothing left behind from writing it.
+    assert not [name for name in os.listdir(dest) if name.endswith(".tmp")]
+
+    names = archive_names(result["archive"])
+    assert "serverfiles/world/level.dat" in names
+    assert "serverfiles/world" in names
+    # Excluded steamcmd caches & logs.
+    assert "serverfiles/steamapps/downloading/chunk" not in names
+    assert "log/console.log" not in names
+    assert "log" not in names
+
+
+def test_incremental_backup(install, tmp_path):
+    dest = str(tmp_path / "backups")
+    create_backup(str(install), dest, "Minecraft", compression="gzip")
+
+    (install / "serverfiles/server.properties").write_text("motd=changed\n")
+    (install / "mcserver").unlink()
+    (install / "serverfiles/world/region.mca").write_bytes(b"r" * 100)
+    time.sleep(0.01)
+
+    result = create_backup(
+        str(install), dest, "Minecraft", compression="gzip", incremental=True
+    )
+    assert result["kind"] == "incr"
+    assert archive_names(result["archive"]) == {
+        "serverfiles/server.properties",
+        "serverfiles/world/region.mca",
+    }
+    assert read_manifest(result["archive"])["deleted"] == ["mcserver"]
+
+    # Restoring replays full then incremental, deletions included.
+    target = tmp_path / "restored"
+    applied = restore_backup(dest, "Minecraft", str(target))
+    assert len(applied) == 2
+    assert (target / "serverfiles/server.properties").read_text() == "motd=changed\n"
+    assert (target / "serverfiles/world/region.mca").exists()
+    assert (target / "serverfiles/world/level.dat").read_bytes() == (
+        install / "serverfiles/world/level.dat"
+    ).read_bytes()
+    assert not (target / "mcserver").exists()
+
+
+def test_incremental_without_full(install, tmp_path):
+    result = create_backup(
+        str(install), str(tmp_path / "backups"), "Minecraft", incremental=True
+    )
+    assert result["kind"] == "full"
+
+
+def test_prune_backups(install, tmp_path):
+    dest = str(tmp_path / "backups")
+    for incremental in (False, True, False, True, False):
+        create_backup(
+            str(install), dest, "Minecraft", compression="gzip", incremental=incremental
+        )
+        time.sleep(0.01)
+
+    removed = prune_backups(dest, "Minecraft", keep=2)
+    assert len(removed) == 2
+    kinds = [backup["kind"] for backup in list_backups(dest, "Minecraft")]
+    assert kinds == ["full", "incr", "full"]
+    manifests = [name for name in os.listdir(dest) if name.endswith(".json")]
+    assert len(manifests) == 3
+
+
+def test_padded_reader():
+    reader = PaddedReader(io.BytesIO(b"abc"), 6)
+    assert reader.read(4) == b"abc\0"
+    assert reader.read() == b"\0\0"
+    assert reader.short
+    assert reader.read() == b""
+
+
+def test_missing_src(tmp_path):
+    with pytest.raises(BackupError):
+        create_backup(str(tmp_path / "nope"), str(tmp_path / "backups"), "nope")
+    with pytest.raises(BackupError):
+        restore_backup(str(tmp_path / "backups"), "nope", str(tmp_path / "target"))
+
+
+def test_unreadable_dir(install, tmp_path, monkeypatch):
+    scandir = os.scandir
+
+    def fake_scandir(path):
+        if str(path).endswith("world"):
+            raise PermissionError(13, "Permission denied", str(path))
+        return scandir(path)
+
+    # Chmod doesn't stop root, so fail the listing directly.
+    monkeypatch.setattr(os, "scandir", fake_scandir)
+    dest = tmp_path / "backups"
+    with pytest.raises(BackupError, match="world"):
+        create_backup(str(install), str(dest), "Minecraft", compression="gzip")
+    assert not dest.exists() or list(dest.iterdir()) == []
+
+
+def test_failed_backup_cleanup(install, tmp_path, monkeypatch):
+    def broken_reader(f, size):
+        raise RuntimeError("disk on fire")
+
+    monkeypatch.setattr("app.backups.PaddedReader", broken_reader)
+    dest = tmp_path / "backups"
+    with pytest.raises(RuntimeError):
+        create_backup(str(install), str(dest), "Minecraft", compression="gzip")
+    # No half written .tmp archive left behind.
+    assert list(dest.iterdir()) == []
+
+
+@pytest.mark.parametrize("compression", ["zstd", "pigz"])
+def test_external_compressors(install, tmp_path, compression):
+    if shutil.which(compression) == None:
+        pytest.skip(f"{compression} not installed")
+
+    dest = str(tmp_path / "backups")
+    result = create_backup(str(install), dest, "Minecraft", compression=compression)
+    target = tmp_path / "restored"
+    restore_backup(dest, "Minecraft", str(target))
+    assert (target / "serverfiles/server.properties").read_text() == "motd=hi\n"
@@ -0,0 +1,43 @@
+import pytest
+from datetime import datetime
+from app.cron import CronExpr
+
+START = datetime(2024, 2, 28, 23, 59, 30)
+
+
+@pytest.mark.parametrize(
+    "expr, expected",
+    [
+        ("*/15 * * * *", datetime(2024, 2, 29, 0, 0)),
+        ("30 4 * * mon-fri", datetime(2024, 2, 29, 4, 30)),
+        ("0 0 29 feb *", datetime(2024, 2, 29, 0, 0)),
+        ("5 4 * * 7", datetime(2024, 3, 3, 4, 5)),
+        ("0 6 1,15 * *", datetime(2024, 3, 1, 6, 0)),
+        ("@hourly", datetime(2024, 2, 29, 0, 0)),
+        ("@weekly", datetime(2024, 3, 3, 0, 0)),
+        # Day & weekday both set, either one matches.
+        ("0 3 1 * sun", datetime(2024, 3, 1, 3, 0)),
+    ],
+)
+def test_next_after(expr, expected):
+    assert CronExpr(expr).next_after(START) == expected
+
+
+def test_next_after_is_exclusive():
+    cron = CronExpr("0 4 * * *")
+    first = cron.next_after(datetime(2024, 1, 1, 3, 0))
+    assert first == datetime(2024, 1, 1, 4, 0)
+    assert cron.next_after(first) == datetime(2024, 1, 2, 4, 0)
+
+
+@pytest.mark.parametrize(
+    "expr", ["* * *", "61 * * * *", "5-1 * * * *", "*/0 * * * *", "a b c d e"]
+)
+def test_invalid_expressions(expr):
+    with pytest.raises(ValueError):
+        CronExpr(expr)
+
+
+def test_never_fires():
+    with pytest.raises(ValueError):
+        CronExpr("0 0 30 2 *").next_after(START)
@@ -0,0 +1,147 @@
+import io
+import os
+import random
+import pytest
+
+from app.backups import BackupError
+from app.dedup_store import MAX_CHUNK, MIN_CHUNK, DedupStore, iter_chunks
+
+
+def random_bytes(size, seed=0):
+    return random.Random(seed).randbytes(size)
+
+
+@pytest.fixture
+def install(tmp_path):
+    """Fake game server install with a 'world' big enough to chunk."""
+    src = tmp_path / "Minecraft"
+    (src / "serverfiles/world").mkdir(parents=True)
+    (src / "log").mkdir()
+    (src / "mcserver").write_text("#!/bin/bash\n")
+    os.chmod(src / "mcserver", 0o750)
+    (src / "serverfiles/world/region.mca").write_bytes(random_bytes(2 * 1024 * 1024))
+    (src / "serverfiles/server.properties").write_text("motd=hi\n")
+    (src / "serverfiles/latest").symlink_to("world")
+    (src / "log/console.log").write_text("log line\n")
+    return src
+
+
+def test_chunk_sizes():
+    data = random_bytes(3 * 1024 * 1024)
+    chunks = list(iter_chunks(io.BytesIO(data)))
+    assert b"".join(chunks) == data
+    assert all(len(chunk) <= MAX_CHUNK for chunk in chunks)
+    assert all(len(chunk) >= MIN_CHUNK for chunk in chunks[:-1])
+
+
+def test_chunks_survive_insert():
+    data = random_bytes(2 * 1024 * 1024)
+    before = set(iter_chunks(io.BytesIO(data)))
+    # Inserting bytes shifts everything after, cut points should follow.
+    after = set(iter_chunks(io.BytesIO(data[:1000] + b"inserted" + data[1000:])))
+    assert len(before & after) >= len(before) - 2
+
+
+def test_snapshot_restore(install, tmp_path):
+    store = DedupStore(str(tmp_path / "store"))
+    summary = store.snapshot(str(install), "Minecraft", excludes=["log/*"])
+    assert summary["new_bytes"] > 0
+
+    target = tmp_path / "restored"
+    assert store.restore(summary["id"], str(target)) == 3
+    assert (target / "serverfiles/world/region.mca").read_bytes() == (
+        install / "serverfiles/world/region.mca"
+    ).read_bytes()
+    assert os.readlink(target / "serverfiles/latest") == "world"
+    assert os.stat(target / "mcserver").st_mode & 0o777 == 0o750
+    assert os.stat(target / "mcserver").st_mtime_ns == os.stat(
+        install / "mcserver"
+    ).st_mtime_ns
+    assert not (target / "log").exists()
+
+
+def test_incremental_cost(install, tmp_path):
+    store = DedupStore(str(tmp_path / "store"))
+    first = store.snapshot(str(install), "Minecraft")
+
+    # Nothing changed, nothing read or stored.
+    second = store.snapshot(str(install), "Minecraft")
+    assert second["new_bytes"] == 0
+    assert second["reused"] == 4
+
+    # Small edit to the world, only chunks around it get stored.
+    region = install / "serverfiles/world/region.mca"
+    data = bytearray(region.read_bytes())
+    data[1024 * 1024 : 1024 * 1024 + 100] = b"\xff" * 100
+    region.write_bytes(bytes(data))
+    third = store.snapshot(str(install), "Minecraft")
+    assert 0 < third["new_bytes"] < first["new_bytes"] / 4
+
+    assert [s["id"] for s in store.snapshots("Minecraft")] == [
+        third["id"],
+        second["id"],
+        first["id"],
+    ]
+
+    target = tmp_path / "restored"
+    store.restore(third["id"], str(target))
+    assert (target / "serverfiles/world/region.mca").read_bytes() == bytes(data)
+
+
+def test_prune_gc(install, tmp_path):
+    store = DedupStore(str(tmp_path / "store"))
+    store.snapshot(str(install), "Minecraft")
+    (install / "serverfiles/world/region.mca").write_bytes(random_bytes(1024 * 1024, 1))
+    latest = store.snapshot(str(install), "Minecraft")
+
+    assert len(store.prune("Minecraft", keep=1)) == 1
+    result = store.gc()
+    assert result["chunks"] > 0
+    # First pack only has the small files left live, so it's rewritten.
+    assert result["packs_rewritten"] == 1
+    assert result["bytes"] > 2 * 1024 * 1024
+    assert len(os.listdir(tmp_path / "store/packs")) == 2
+
+    stats = store.stats()
+    assert stats["snapshots"] == 1
+    target = tmp_path / "restored"
+    store.restore(latest["id"], str(target))
+    assert (target / "serverfiles/world/region.mca").read_bytes() == random_bytes(
+        1024 * 1024, 1
+    )
+
+
+def test_damaged_pack(install, tmp_path):
+    store = DedupStore(str(tmp_path / "store"))
+    summary = store.snapshot(str(install), "Minecraft")
+
+    pack_dir = tmp_path / "store/packs"
+    pack = pack_dir / os.listdir(pack_dir)[0]
+    data = bytearray(pack.read_bytes())
+    data[100] ^= 0xFF
+    pack.write_bytes(bytes(data))
+
+    with pytest.raises(BackupError):
+        store.restore(summary["id"], str(tmp_path / "restored"))
+    with pytest.raises(BackupError):
+        store.restore(summary["id"] + 1, str(tmp_path / "restored"))
+
+
+def test_unreadable_dir(install, tmp_path, monkeypatch):
+    store = DedupStore(str(tmp_path / "store"))
+    scandir = os.scandir
+
+    def fake_scandir(path):
+        if str(path).endswith("world"):
+            raise PermissionError(13, "Permission denied", str(path))
+        return scandir(path)
+
+    # Chmod doesn't stop root, so fail the listing directly.
+    monkeypatch.setattr(os, "scandir", fake_scandir)
+    with pytest.raises(BackupError, match="world"):
+        store.snapshot(str(install), "Minecraft")
+    monkeypatch.undo()
+
+    # Nothing recorded & no orphaned packs.
+    assert store.snapshots("Minecraft") == []
+    assert os.listdir(tmp_path / "store/packs") == []
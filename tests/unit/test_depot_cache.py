@@ -0,0 +1,84 @@
+import os
+import pytest
+
+from app.depot_cache import DepotCache, read_app_id, read_build_id
+
+APP_ID = "896660"
+
+
+def make_install(path, build_id, data="game data"):
+    """Makes a fake finished steamcmd install in path."""
+    os.makedirs(os.path.join(path, "steamapps"))
+    os.makedirs(os.path.join(path, "bin"))
+    with open(os.path.join(path, "bin", "server.bin"), "w") as f:
+        f.write(data)
+    with open(os.path.join(path, "steamapps", f"appmanifest_{APP_ID}.acf"), "w") as f:
+        f.write(f'"AppState"\n{{\n\t"appid"\t\t"{APP_ID}"\n\t"buildid"\t\t"{build_id}"\n}}\n')
+
+
+def test_read_ids(tmp_path):
+    install = tmp_path / "vhserver"
+    cfg_dir = install / "lgsm/config-lgsm/vhserver"
+    cfg_dir.mkdir(parents=True)
+    (cfg_dir / "_default.cfg").write_text(f'## Game Server Settings\nappid="{APP_ID}"\n')
+    assert read_app_id(str(install), "vhserver") == APP_ID
+    assert read_app_id(str(install), "mcserver") == None
+
+    make_install(str(install / "serverfiles"), "100")
+    assert read_build_id(str(install / "serverfiles"), APP_ID) == "100"
+    assert read_build_id(str(install / "serverfiles"), "1") == None
+
+
+@pytest.mark.parametrize("link_mode", ["auto", "copy"])
+def test_store_and_seed(tmp_path, link_mode):
+    cache = DepotCache(str(tmp_path / "cache"), link_mode)
+    first = str(tmp_path / "first/serverfiles")
+    make_install(first, "100")
+
+    # Nothing cached yet.
+    assert cache.seed("vhserver", str(tmp_path / "second/serverfiles")) == None
+
+    assert cache.store("vhserver", APP_ID, first) == "100"
+    assert cache.builds(APP_ID) == ["100"]
+    assert cache.app_id_for("vhserver") == APP_ID
+
+    second = str(tmp_path / "second/serverfiles")
+    owner = (os.getuid(), os.getgid())
+    assert cache.seed("vhserver", second, owner) == "100"
+    seeded = os.path.join(second, "bin", "server.bin")
+    with open(seeded) as f:
+        assert f.read() == "game data"
+    assert (os.stat(seeded).st_uid, os.stat(seeded).st_gid) == owner
+
+    # Seeds never share inodes with the cache.
+    cached = os.path.join(cache.cache_dir, APP_ID, "100", "bin", "server.bin")
+    assert os.stat(cached).st_ino != os.stat(seeded).st_ino
+
+    # Stored files are never linked back to the install they came from.
+    assert os.stat(cached).st_ino != os.stat(os.path.join(first, "bin", "server.bin")).st_ino
+
+    # Don't clobber an install that already has files.
+    assert cache.seed("vhserver", first) == None
+
+
+def test_prune_old_builds(tmp_path):
+    cache = DepotCache(str(tmp_path / "cache"), "copy", keep=1)
+    make_install(str(tmp_path / "a"), "100")
+    make_install(str(tmp_path / "b"), "200", data="newer")
+
+    cache.store("vhserver", APP_ID, str(tmp_path / "a"))
+    os.utime(os.path.join(cache.cache_dir, APP_ID, "100"), (0, 0))
+    cache.store("vhserver", APP_ID, str(tmp_path / "b"))
+    assert cache.builds(APP_ID) == ["200"]
+
+    dest = str(tmp_path / "c")
+    assert cache.seed("vhserver", dest) == "200"
+    with open(os.path.join(dest, "bin", "server.bin")) as f:
+        assert f.read() == "newer"
+
+
+def test_invalid_link_mode(tmp_path):
+    with pytest.raises(ValueError):
+        DepotCache(str(tmp_path), "symlink")
+    with pytest.raises(ValueError):
+        DepotCache(str(tmp_path), "hardlink")
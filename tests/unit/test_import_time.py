@@ -0,0 +1,51 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+
+# Only needed by a few routes, must be imported lazily.
+LAZY_MODULES = ("paramiko", "requests", "psutil", "markdown")
+
+# Connector only needs the db tables, not the web app.
+FLASK_MODULES = ("flask", "flask_login", "flask_sqlalchemy", "dotenv")
+
+
+def imported_modules(args):
+    """
+    Runs python -X importtime & collects what got imported. Timings vary too
+    much by machine for the unit suite, see tests/bench/test_import_time.py.
+
+    Args:
+        args (list): Args for python, after -X importtime.
+
+    Returns:
+        set: Imported module names.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime"] + args,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        modules.add(line.split("|")[-1].strip())
+    return modules
+
+
+def test_app_lazy_imports():
+    modules = imported_modules(["-c", "import app.utils, app.views"])
+    assert "app.utils" in modules
+    for module in LAZY_MODULES:
+        assert module not in modules
+
+
+def test_connector_lazy_imports():
+    modules = imported_modules(["playbooks/ansible_connector.py", "--help"])
+    assert "app.schema" in modules
+    for module in LAZY_MODULES + FLASK_MODULES:
+        assert module not in modules
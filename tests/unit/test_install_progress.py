@@ -0,0 +1,51 @@
+from app.install_progress import InstallProgress, parse_progress_line
+
+LINE = " Update state (0x61) downloading, progress: 43.12 (4000 / 10000)\n"
+
+
+def test_parse_progress_line():
+    assert parse_progress_line(LINE) == {
+        "stage": "downloading",
+        "percent": 43.12,
+        "bytes_done": 4000,
+        "bytes_total": 10000,
+    }
+
+    progress = parse_progress_line(
+        " Update state (0x5) verifying install, progress: 12.50 (1 / 8)\r"
+    )
+    assert progress["stage"] == "verifying install"
+    assert progress["percent"] == 12.5
+
+    # No byte counts on some steamcmd versions.
+    progress = parse_progress_line("Update state (0x11) preallocating, progress: 7.00")
+    assert progress["bytes_total"] == None
+
+    progress = parse_progress_line("Success! App '896660' fully installed.\n")
+    assert progress["stage"] == "installed"
+    assert progress["percent"] == 100.0
+
+    assert parse_progress_line("Installing linuxgsm.sh...\n") == None
+
+
+def test_install_progress_rate_and_eta():
+    tracker = InstallProgress()
+    assert tracker.update(["Starting install\n"], now=0)["percent"] == None
+
+    lines = ["Starting install\n", LINE]
+    first = tracker.update(lines, now=0)
+    assert first["percent"] == 43.12
+    assert first["rate"] == None
+
+    lines.append(" Update state (0x61) downloading, progress: 60.00 (6000 / 10000)\n")
+    lines.append("noise\n")
+    progress = tracker.update(lines, now=10)
+    assert progress["bytes_done"] == 6000
+    assert progress["rate"] == 200
+    assert progress["eta"] == 20
+
+    # Stage change resets the rate window.
+    lines.append(" Update state (0x81) verifying update, progress: 1.00 (10 / 10000)\n")
+    progress = tracker.update(lines, now=11)
+    assert progress["stage"] == "verifying update"
+    assert progress["rate"] == None
@@ -0,0 +1,263 @@
+import os
+import time
+import pytest
+import threading
+import subprocess
+from flask import Flask
+from app import db
+from app.models import Job
+from app.job_manager import JobManager
+from app.proc_info_vessel import ProcInfoVessel
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path}/jobs.db"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def wait_for(check, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if check():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def job_status(app, job_id):
+    with app.app_context():
+        return db.session.get(Job, job_id).status
+
+
+def blocking_target(started, release, name):
+    started.append(name)
+    release.wait(5)
+
+
+def test_job_lifecycle(app):
+    manager = JobManager(app)
+
+    def target(proc_info, exit_status):
+        proc_info.exit_status = exit_status
+
+    good = ProcInfoVessel()
+    bad = ProcInfoVessel()
+    good_id = manager.submit("Command", target, (good, 0), good, "Mockcraft")
+    bad_id = manager.submit("Command", target, (bad, 1), bad, "Mockcraft")
+    assert wait_for(lambda: job_status(app, bad_id) == "failed")
+    assert job_status(app, good_id) == "finished"
+
+    with app.app_context():
+        jobs = manager.list_jobs(["Mockcraft"])
+        assert [job.id for job in jobs] == [bad_id, good_id]
+        assert jobs[0].exit_status == 1
+        assert jobs[0].to_dict()["date_finished"] != None
+        assert manager.list_jobs(["Other"]) == []
+
+
+def test_one_job_per_server(app):
+    manager = JobManager(app)
+    started = []
+    release = threading.Event()
+
+    manager.submit("update", blocking_target, (started, release, 1), None, "Mockcraft")
+    second = manager.submit(
+        "restart", blocking_target, (started, release, 2), None, "Mockcraft"
+    )
+    manager.submit("update", blocking_target, (started, release, 3), None, "Othercraft")
+
+    assert wait_for(lambda: sorted(started) == [1, 3])
+    assert job_status(app, second) == "queued"
+
+    release.set()
+    assert wait_for(lambda: job_status(app, second) == "finished")
+    assert started[-1] == 2
+
+
+def test_per_host_limit(app):
+    manager = JobManager(app, max_jobs=8, max_jobs_per_host=2)
+    started = []
+    release = threading.Event()
+
+    for i in range(4):
+        args = (started, release, i)
+        manager.submit("update", blocking_target, args, None, f"gs{i}", "10.0.0.5")
+
+    assert wait_for(lambda: len(started) == 2)
+    time.sleep(0.2)
+    assert len(started) == 2
+
+    release.set()
+    assert wait_for(lambda: len(started) == 4)
+
+
+def test_batch_limits(app):
+    manager = JobManager(app)
+    started = []
+    release = threading.Event()
+
+    hosts = ["10.0.0.5", "10.0.0.5", "10.0.0.5", "10.0.0.6", "10.0.0.7"]
+    for i, host in enumerate(hosts):
+        args = (started, release, i)
+        manager.submit(
+            "Command",
+            blocking_target,
+            args,
+            server_name=f"gs{i}",
+            install_host=host,
+            batch_id="batch1",
+            batch_limit=3,
+            host_limit=1,
+        )
+
+    # One per host, three total.
+    assert wait_for(lambda: len(started) == 3)
+    time.sleep(0.2)
+    assert sorted(started) == [0, 3, 4]
+
+    release.set()
+    assert wait_for(lambda: len(started) == 5)
+    with app.app_context():
+        assert wait_for(
+            lambda: all(job.status == "finished" for job in manager.batch_jobs("batch1"))
+        )
+        assert len(manager.batch_jobs("batch1")) == 5
+
+
+def test_gate_holds_job(app):
+    manager = JobManager(app)
+    started = []
+    release = threading.Event()
+    gate_open = threading.Event()
+
+    def gate(running):
+        return gate_open.is_set()
+
+    job_id = manager.submit(
+        "Install_Mockcraft", blocking_target, (started, release, 1), gate=gate
+    )
+    time.sleep(0.2)
+    assert started == []
+    assert manager.queue_position(job_id) == 1
+
+    gate_open.set()
+    assert wait_for(lambda: started == [1])
+    assert manager.queue_position(job_id) == None
+    release.set()
+
+
+def test_cancel_queued_job(app):
+    manager = JobManager(app)
+    started = []
+    release = threading.Event()
+
+    manager.submit("update", blocking_target, (started, release, 1), None, "Mockcraft")
+    queued = manager.submit(
+        "update", blocking_target, (started, release, 2), None, "Mockcraft"
+    )
+    assert wait_for(lambda: started == [1])
+
+    assert manager.cancel(queued) == True
+    assert manager.cancel(queued) == False
+    assert job_status(app, queued) == "canceled"
+
+    release.set()
+    time.sleep(0.2)
+    assert started == [1]
+
+
+def test_recover_interrupted_jobs(app):
+    # Pretend a worker died mid install.
+    proc = subprocess.Popen(["true"])
+    proc.wait()
+    with app.app_context():
+        job = Job(name="Install_Mockcraft", status="running", worker_pid=proc.pid)
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+
+    manager = JobManager(app)
+    assert job_status(app, job_id) == "interrupted"
+    with app.app_context():
+        assert manager.active_jobs(name_prefix="Install_") == []
+
+
+def test_busy_check_outside_lock(app):
+    manager = JobManager(app)
+    checking = threading.Event()
+    release = threading.Event()
+    started = []
+
+    def busy_elsewhere():
+        checking.set()
+        release.wait(5)
+        return {"Othercraft"}
+
+    manager._busy_elsewhere = busy_elsewhere
+    job_id = manager.submit(
+        "update", blocking_target, (started, release, 1), None, "Mockcraft"
+    )
+    other_id = manager.submit(
+        "update", blocking_target, (started, release, 2), None, "Othercraft"
+    )
+    assert checking.wait(5)
+
+    # Dispatcher is mid db check, but the queue isn't locked while it is.
+    start = time.monotonic()
+    assert manager.queue_position(other_id) == 2
+    assert time.monotonic() - start < 1
+
+    release.set()
+    assert wait_for(lambda: job_status(app, job_id) == "finished")
+    # Running in another worker, so it waits.
+    assert job_status(app, other_id) == "queued"
+
+
+def test_claim_loses_to_other_worker(app):
+    manager = JobManager(app)
+    started = []
+    release = threading.Event()
+    busy_elsewhere = manager._busy_elsewhere
+    checks = []
+
+    def stale_busy_elsewhere():
+        # Other worker claims its job right after the first check.
+        checks.append(1)
+        if len(checks) == 1:
+            with app.app_context():
+                db.session.add(
+                    Job(
+                        name="update",
+                        server_name="Mockcraft",
+                        status="running",
+                        worker_pid=os.getppid(),
+                    )
+                )
+                db.session.commit()
+            return set()
+        return busy_elsewhere()
+
+    manager._busy_elsewhere = stale_busy_elsewhere
+    job_id = manager.submit(
+        "update", blocking_target, (started, release, 1), None, "Mockcraft"
+    )
+
+    # Lost the claim, so it's back in the queue rather than running.
+    assert wait_for(lambda: len(checks) > 2)
+    assert started == []
+    assert job_status(app, job_id) == "queued"
+    assert manager.queue_position(job_id) == 1
+
+    with app.app_context():
+        other = Job.query.filter_by(status="running").one()
+        other.status = "finished"
+        db.session.commit()
+    release.set()
+    assert wait_for(lambda: job_status(app, job_id) == "finished")
+    assert started == [1]
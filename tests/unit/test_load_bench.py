@@ -0,0 +1,82 @@
+import json
+import threading
+import pytest
+
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import make_server
+from app import db
+from app.models import User, GameServer
+from app.load_bench import (
+    STUB_SERVER,
+    EndpointStats,
+    HttpTarget,
+    LocalTarget,
+    format_report,
+    run_load_bench,
+)
+
+
+def test_endpoint_stats():
+    stats = EndpointStats("cmd-output")
+    for ms in range(1, 101):
+        stats.record(ms / 1000, 200)
+    stats.record(0.5, 503)
+    stats.record(0.5, "ConnectionError")
+
+    summary = stats.summary(duration=10)
+    assert summary["requests"] == 102
+    assert summary["rps"] == 10.2
+    assert summary["errors"] == 2
+    assert summary["statuses"] == {"200": 100, "503": 1, "ConnectionError": 1}
+    assert summary["p50_ms"] == 51
+    assert summary["max_ms"] == 500
+
+    assert EndpointStats("empty").summary(1)["p99_ms"] == None
+
+
+def test_local_target(app):
+    target = LocalTarget(app, scrollback_lines=50)
+    try:
+        report = run_load_bench(target, clients=3, duration=2)
+    finally:
+        target.close()
+
+    endpoints = report["endpoints"]
+    assert all(e["errors"] == 0 for e in endpoints.values())
+    # 2 polls/sec/client for cmd-output, give or take a tick.
+    assert 9 <= endpoints["cmd-output"]["requests"] <= 15
+    assert "cmd-output" in format_report(report)
+
+    with app.app_context():
+        assert GameServer.query.filter_by(install_name=STUB_SERVER).first() == None
+
+
+def test_http_target(app):
+    with app.app_context():
+        user = User(
+            username="load_bench_http",
+            password=generate_password_hash("Bench12345!!", method="pbkdf2:sha256"),
+            role="admin",
+            permissions=json.dumps({"servers": []}),
+        )
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        with pytest.raises(RuntimeError):
+            HttpTarget(base_url, "load_bench_http", "wrong", "x").client()
+
+        target = HttpTarget(base_url, "load_bench_http", "Bench12345!!", "x")
+        report = run_load_bench(target, clients=2, duration=1, endpoints=["system-usage"])
+        assert report["endpoints"]["system-usage"]["requests"] >= 2
+        assert report["endpoints"]["system-usage"]["errors"] == 0
+    finally:
+        server.shutdown()
+        with app.app_context():
+            db.session.delete(db.session.get(User, user_id))
+            db.session.commit()
@@ -0,0 +1,102 @@
+import json
+import logging
+import threading
+import pytest
+
+from app.log_config import log_fields, rotate_log, setup_logging
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    level = root.level
+    yield root
+    # Drop test handlers & stop their listener.
+    setup_logging()
+    root.setLevel(level)
+
+
+def test_json_log_fields(root_logger, tmp_path):
+    log_file = tmp_path / "logs/web-lgsm.log"
+    setup_logging(level="debug", log_file=str(log_file), log_format="json")
+    logger = logging.getLogger("app")
+
+    logger.info("no fields")
+    with log_fields(job_id=7, server="Minecraft"):
+        logger.debug("line: %r", "Done!\n")
+        with log_fields(server_id=3):
+            logger.info("nested")
+
+    # Context doesn't leak into other threads.
+    thread = threading.Thread(target=logger.warning, args=("other thread",))
+    with log_fields(job_id=8):
+        thread.start()
+        thread.join()
+
+    listener = setup_logging()
+    assert listener == None
+
+    lines = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert [line["msg"] for line in lines] == [
+        "no fields",
+        "line: 'Done!\\n'",
+        "nested",
+        "other thread",
+    ]
+    assert "job_id" not in lines[0]
+    assert lines[1]["job_id"] == 7
+    assert lines[1]["server"] == "Minecraft"
+    assert lines[1]["level"] == "DEBUG"
+    assert lines[2]["server_id"] == 3
+    assert "job_id" not in lines[3]
+
+
+def test_level_and_rotation(root_logger, tmp_path):
+    log_file = tmp_path / "web-lgsm.log"
+    setup_logging(level="info", log_file=str(log_file), max_bytes=200, backups=2)
+    logger = logging.getLogger("app")
+    assert not logger.isEnabledFor(logging.DEBUG)
+
+    for i in range(20):
+        logger.info("line %d", i)
+    setup_logging()
+
+    assert log_file.exists()
+    assert (tmp_path / "web-lgsm.log.2").exists()
+    assert not (tmp_path / "web-lgsm.log.3").exists()
+
+
+def test_rotate_log(tmp_path):
+    log = tmp_path / "access.log"
+    assert rotate_log(str(log), 10, 2) == False
+
+    for i in range(4):
+        log.write_text(f"run {i}\n" * 5)
+        assert rotate_log(str(log), 10, 2) == True
+        assert not log.exists()
+
+    assert (tmp_path / "access.log.1").read_text().startswith("run 3")
+    assert (tmp_path / "access.log.2").read_text().startswith("run 2")
+    assert not (tmp_path / "access.log.3").exists()
+
+    log.write_text("small\n")
+    assert rotate_log(str(log), 10, 2) == False
+    assert rotate_log(str(log), 0, 2) == False
+
+
+def test_shared_log_file(root_logger, tmp_path):
+    log_file = tmp_path / "web-lgsm.log"
+    setup_logging(log_file=str(log_file), max_bytes=200, backups=2, shared=True)
+    logger = logging.getLogger("app")
+
+    # Never rotated by a worker, only reopened once rotated elsewhere.
+    for i in range(20):
+        logger.info("line %d", i)
+    setup_logging(log_file=str(log_file), max_bytes=200, backups=2, shared=True)
+    assert not (tmp_path / "web-lgsm.log.1").exists()
+
+    assert rotate_log(str(log_file), 200, 2)
+    logger.info("after rotate")
+    setup_logging()
+    assert "line 19" in (tmp_path / "web-lgsm.log.1").read_text()
+    assert "after rotate" in log_file.read_text()
@@ -0,0 +1,81 @@
+from collections import namedtuple
+
+from app.metrics import MetricsBuilder, escape_label, render_metrics
+from app.perf import PerfStats
+
+NetIO = namedtuple("NetIO", ["bytes_sent", "bytes_recv"])
+
+HOST_STATS = {
+    "disk": {"total": 100, "used": 40, "free": 60, "percent_used": 44.0},
+    "cpu": {"load1": 0.5, "load5": 0.25, "load15": 0.1, "cpu_usage": 12.5},
+    "mem": {"total": 1000, "used": 250, "free": 750, "percent_used": 25.0},
+}
+
+
+def test_escape_label():
+    assert escape_label('a"b') == 'a\\"b'
+    assert escape_label("a\nb") == "a\\nb"
+    assert escape_label("a\\b") == "a\\\\b"
+
+
+def test_histogram():
+    metrics = MetricsBuilder()
+    stats = PerfStats()
+    for seconds in (0.0005, 0.003, 0.2, 20):
+        stats.record_route("GET /home", seconds)
+
+    metrics.histogram(
+        "http_request_duration_seconds",
+        "Latency.",
+        stats.histograms("routes")["GET /home"],
+        {"route": "/home"},
+    )
+    text = metrics.render()
+    assert text.count("# TYPE weblgsm_http_request_duration_seconds histogram") == 1
+    assert 'weblgsm_http_request_duration_seconds_bucket{route="/home",le="0.001"} 1' in text
+    assert 'weblgsm_http_request_duration_seconds_bucket{route="/home",le="0.005"} 2' in text
+    assert 'weblgsm_http_request_duration_seconds_bucket{route="/home",le="10"} 3' in text
+    assert 'weblgsm_http_request_duration_seconds_bucket{route="/home",le="+Inf"} 4' in text
+    assert 'weblgsm_http_request_duration_seconds_count{route="/home"} 4' in text
+
+
+def test_render_metrics():
+    stats = PerfStats()
+    stats.record_ssh_connect("10.0.0.2", 0.05)
+    stats.record_ssh_connect("10.0.0.2", 3, ok=False)
+    stats.record_job("Install", "finished", 120)
+    servers = [
+        {"name": "Minecraft", "host": "127.0.0.1", "type": "local", "status": True, "age": 2},
+        {"name": "Valheim", "host": "10.0.0.2", "type": "remote", "status": None, "age": None},
+    ]
+
+    text = render_metrics(
+        HOST_STATS, NetIO(10, 20), servers, {"finished": 3, "failed": 1}, stats
+    )
+    assert "weblgsm_host_load1 0.5\n" in text
+    assert "weblgsm_host_network_received_bytes_total 20\n" in text
+    assert "weblgsm_host_disk_total_bytes 100\n" in text
+    assert 'weblgsm_game_server_up{server="Minecraft",host="127.0.0.1",type="local"} 1' in text
+    # Unknown status is left out rather than reported as down.
+    assert 'server="Valheim"' not in text
+    assert 'weblgsm_jobs{status="failed"} 1' in text
+    assert 'weblgsm_jobs_completed_total{kind="Install",status="finished"} 1' in text
+    assert 'weblgsm_ssh_connect_failures_total{host="10.0.0.2"} 1' in text
+    assert 'weblgsm_ssh_connect_duration_seconds_count{host="10.0.0.2"} 1' in text
+    # Each family's HELP & TYPE only once.
+    assert text.count("# TYPE weblgsm_game_server_up gauge") == 1
+
+
+def test_render_metrics_worker():
+    stats = PerfStats()
+    stats.record_ssh_connect("10.0.0.2", 0.05)
+    servers = [
+        {"name": "Minecraft", "host": "127.0.0.1", "type": "local", "status": True, "age": 2},
+    ]
+
+    text = render_metrics(HOST_STATS, NetIO(10, 20), servers, {"finished": 3}, stats, worker=42)
+    # Per process series are labeled, shared ones aren't.
+    assert 'weblgsm_game_server_up{server="Minecraft",host="127.0.0.1",type="local",worker="42"} 1' in text
+    assert 'weblgsm_ssh_connect_failures_total{host="10.0.0.2",worker="42"} 0' in text
+    assert 'weblgsm_jobs{status="finished"} 3' in text
+    assert "weblgsm_host_load1 0.5\n" in text
@@ -34,3 +34,23 @@ def test_new_game_server(new_game_server):
     assert new_game_server.install_name == TEST_SERVER
     assert new_game_server.install_path == TEST_SERVER_PATH
     assert new_game_server.script_name == TEST_SERVER_NAME
+
+
+def test_schema_without_flask(tmp_path):
+    from app.schema import Base, Schedule, connect
+
+    with connect(str(tmp_path / "test.db")) as session:
+        Base.metadata.create_all(session.get_bind())
+        server = GameServer(install_name=TEST_SERVER, script_name=TEST_SERVER_NAME)
+        schedule = Schedule(server_name=TEST_SERVER, command="update", cron="@daily")
+        session.add_all([server, schedule])
+        session.commit()
+        server_id = server.id
+
+    # Fresh session, like the ansible connector's db_get().
+    with connect(str(tmp_path / "test.db")) as session:
+        server = session.get(GameServer, server_id)
+        assert server.script_name == TEST_SERVER_NAME
+        server.delete()
+        assert session.query(Schedule).count() == 0
+        assert session.get(GameServer, server_id) == None
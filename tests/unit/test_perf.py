@@ -0,0 +1,68 @@
+import os
+import time
+import cProfile
+
+from app.perf import PerfStats, dump_profile, list_profiles, percentile, span, timed
+from app import perf
+
+
+def test_percentile():
+    samples = list(range(1, 101))
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile([7], 95) == 7
+    assert percentile([], 50) == None
+
+
+def test_perf_stats():
+    stats = PerfStats(window=10)
+    for ms in range(1, 21):
+        stats.record_route("GET /controls", ms / 1000, {"run_cmd_ssh": ms / 2})
+
+    route = stats.summary()["routes"]["GET /controls"]
+    assert route["count"] == 20
+    assert route["max_ms"] == 20
+    assert route["mean_ms"] == 10.5
+    # Percentiles come from the last 10 samples only.
+    assert route["p50_ms"] == 15
+    assert sum(route["histogram"].values()) == 20
+    assert route["histogram"]["le_1ms"] == 1
+    assert route["slowest"] == {"ms": 20, "spans": {"run_cmd_ssh": 10}}
+
+    stats.reset()
+    assert stats.summary()["routes"] == {}
+
+
+def test_spans(monkeypatch):
+    stats = PerfStats()
+    monkeypatch.setattr(perf, "perf_stats", stats)
+
+    @timed()
+    def slow():
+        time.sleep(0.01)
+        return "done"
+
+    assert slow() == "done"
+    assert slow.__name__ == "slow"
+    with span("walk"):
+        pass
+
+    spans = stats.summary()["spans"]
+    assert spans["slow"]["count"] == 1
+    assert spans["slow"]["max_ms"] >= 10
+    assert spans["walk"]["count"] == 1
+
+
+def test_dump_profile(tmp_path):
+    profile_dir = str(tmp_path / "profiles")
+    for _ in range(3):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        sum(range(100))
+        profiler.disable()
+        path = dump_profile(profiler, profile_dir, "GET /controls", 0.05, keep=2)
+        assert os.path.isfile(path)
+
+    profiles = list_profiles(profile_dir)
+    assert len(profiles) == 2
+    assert profiles[0].endswith("GET__controls-50ms.prof")
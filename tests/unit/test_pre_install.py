@@ -0,0 +1,138 @@
+import os
+import shutil
+import pytest
+
+import app.pre_install as pre_install_mod
+from app.pre_install import NativePreInstall, PreInstallError
+from app.artifact_cache import ArtifactCache
+
+PLAYBOOK_DIR = os.path.join(os.path.dirname(__file__), "../../playbooks")
+
+
+@pytest.fixture
+def pre_install(tmp_path, monkeypatch):
+    """NativePreInstall in a scratch tree, with commands recorded not run."""
+    playbooks = tmp_path / "playbooks"
+    (playbooks / "vars").mkdir(parents=True)
+    (tmp_path / "scripts").mkdir()
+    (tmp_path / "scripts/linuxgsm.sh").write_text("#!/bin/bash\n")
+    shutil.copy(
+        os.path.join(PLAYBOOK_DIR, "vars/accepted_usernames.yml"), playbooks / "vars"
+    )
+    (playbooks / "vars/web_lgsm_user.yml").write_text("web_lgsm_user: web-lgsm\n")
+
+    commands = []
+
+    def runner(cmd, cwd=None):
+        commands.append(cmd)
+        # Stand in for linuxgsm.sh writing out the game server script.
+        if cmd[-2] == "./linuxgsm.sh":
+            with open(os.path.join(cwd, cmd[-1]), "w") as f:
+                f.write("#!/bin/bash\n")
+
+    pre_install = NativePreInstall(
+        str(playbooks),
+        runner=runner,
+        home_root=str(tmp_path / "home"),
+        artifact_cache=ArtifactCache(str(tmp_path / "cache")),
+    )
+    pre_install.commands = commands
+    # Can't chown to users that don't exist.
+    monkeypatch.setattr(pre_install, "_set_perms", lambda path, owner, mode: None)
+    monkeypatch.setattr(pre_install, "create_user", lambda username: None)
+    return pre_install
+
+
+def test_validate_username(pre_install):
+    pre_install.validate_username("mcserver")
+
+    for username in ("root", "ALL", "web-lgsm", "mcserver; rm -rf /"):
+        with pytest.raises(PreInstallError):
+            pre_install.validate_username(username)
+
+
+def test_native_pre_install(pre_install, tmp_path):
+    install_path = str(tmp_path / "home/mcserver/GameServers/Minecraft")
+    pre_install.run("mcserver", install_path, "mcserver")
+
+    assert os.path.isfile(os.path.join(install_path, "mcserver"))
+    # Script is moved, not left behind in scripts dir.
+    assert not os.path.exists(tmp_path / "scripts/mcserver")
+    assert os.path.isfile(tmp_path / "home/mcserver/.ssh/authorized_keys")
+    assert ["/usr/sbin/usermod", "-g", "mcserver", "mcserver"] in pre_install.commands
+
+    # Rejected usernames stop before anything is touched.
+    with pytest.raises(PreInstallError):
+        pre_install.run("root", str(tmp_path / "root_install"), "mcserver")
+    assert not os.path.exists(tmp_path / "root_install")
+
+
+def test_game_script_from_cache(pre_install, tmp_path):
+    pre_install.run("mcserver", str(tmp_path / "one"), "mcserver")
+    lgsmsh_runs = [cmd for cmd in pre_install.commands if "./linuxgsm.sh" in cmd]
+    assert len(lgsmsh_runs) == 1
+
+    # Second install of same game reuses generated script.
+    pre_install.run("mcserver", str(tmp_path / "two"), "mcserver")
+    lgsmsh_runs = [cmd for cmd in pre_install.commands if "./linuxgsm.sh" in cmd]
+    assert len(lgsmsh_runs) == 1
+    assert (tmp_path / "two/mcserver").read_text() == "#!/bin/bash\n"
+
+    # New linuxgsm.sh, script gets regenerated.
+    (tmp_path / "scripts/linuxgsm.sh").write_text("#!/bin/bash\n# v2\n")
+    pre_install.run("mcserver", str(tmp_path / "three"), "mcserver")
+    lgsmsh_runs = [cmd for cmd in pre_install.commands if "./linuxgsm.sh" in cmd]
+    assert len(lgsmsh_runs) == 2
+
+
+def fake_lookup(existing):
+    """Stand in for grp.getgrnam / pwd.getpwnam knowing only existing names."""
+
+    def lookup(name):
+        if name not in existing:
+            raise KeyError(name)
+        return name
+
+    return lookup
+
+
+def test_create_user(pre_install, monkeypatch):
+    # Group left over from an old install, user doesn't exist yet.
+    monkeypatch.setattr(pre_install_mod.grp, "getgrnam", fake_lookup({"mcserver"}))
+    monkeypatch.setattr(pre_install_mod.pwd, "getpwnam", fake_lookup(set()))
+    NativePreInstall.create_user(pre_install, "mcserver")
+    assert pre_install.commands == [
+        [
+            "/usr/sbin/useradd",
+            "--create-home",
+            "--shell",
+            "/bin/bash",
+            "-g",
+            "mcserver",
+            "mcserver",
+        ]
+    ]
+
+    # Brand new user, group is made first then given to useradd.
+    pre_install.commands.clear()
+    monkeypatch.setattr(pre_install_mod.grp, "getgrnam", fake_lookup(set()))
+    NativePreInstall.create_user(pre_install, "vhserver")
+    assert pre_install.commands[0] == ["/usr/sbin/groupadd", "vhserver"]
+    assert pre_install.commands[1][-3:] == ["-g", "vhserver", "vhserver"]
+    assert "--groups" not in pre_install.commands[1]
+
+    # Existing user & group, nothing to run.
+    pre_install.commands.clear()
+    monkeypatch.setattr(pre_install_mod.grp, "getgrnam", fake_lookup({"mcserver"}))
+    monkeypatch.setattr(pre_install_mod.pwd, "getpwnam", fake_lookup({"mcserver"}))
+    NativePreInstall.create_user(pre_install, "mcserver")
+    assert pre_install.commands == []
+
+
+def test_native_pre_install_commands(pre_install, tmp_path):
+    """Native pre-install runs only its own commands, never ansible."""
+    pre_install.run("vhserver", str(tmp_path / "vhserver"), "vhserver")
+    assert pre_install.commands == [
+        ["/usr/sbin/usermod", "-g", "vhserver", "vhserver"],
+        ["/usr/bin/sudo", "-n", "-u", "web-lgsm", "./linuxgsm.sh", "vhserver"],
+    ]
@@ -0,0 +1,168 @@
+import os
+import json
+import sys
+import time
+import pytest
+import subprocess
+from app.proc_info_vessel import ProcInfoVessel
+from app.proc_store import ProcInfoStore, SqliteProcInfoStore
+
+
+def test_memory_proc_store():
+    store = ProcInfoStore()
+    assert "Mockcraft" not in store
+    assert store.to_json("Mockcraft") == None
+
+    proc_info = store.get_or_create("Mockcraft")
+    assert isinstance(proc_info, ProcInfoVessel)
+    assert store.get_or_create("Mockcraft") is proc_info
+
+    proc_info.stdout.append("hello\n")
+    assert json.loads(store.to_json("Mockcraft"))["stdout"] == ["hello\n"]
+
+    # Create clobbers old output.
+    assert store.create("Mockcraft").stdout == []
+
+    store.delete("Mockcraft")
+    assert "Mockcraft" not in store
+
+
+def test_sqlite_proc_store_shared_between_workers(tmp_path):
+    db_path = str(tmp_path / "proc_store.db")
+
+    # Two stores on the same db act like two gunicorn workers.
+    worker_a = SqliteProcInfoStore(db_path)
+    worker_b = SqliteProcInfoStore(db_path)
+
+    proc_info = worker_a.create("Mockcraft")
+    proc_info.process_lock = True
+    proc_info.pid = 1234
+    proc_info.stdout.append("Installing...\n")
+    proc_info.stderr.append("warning\n")
+    proc_info.flush()
+
+    assert "Mockcraft" in worker_b
+    output = json.loads(worker_b.to_json("Mockcraft"))
+    assert output["stdout"] == ["Installing...\n"]
+    assert output["stderr"] == ["warning\n"]
+    assert output["pid"] == 1234
+    assert output["process_lock"] == True
+
+    # Same keys as the plain in-memory vessel json.
+    assert set(output) == set(json.loads(ProcInfoVessel().toJSON()))
+
+    proc_info.stdout.clear()
+    proc_info.exit_status = 0
+    proc_info.process_lock = False
+    output = json.loads(worker_b.to_json("Mockcraft"))
+    assert output["stdout"] == []
+    assert output["exit_status"] == 0
+
+    worker_b.delete("Mockcraft")
+    assert "Mockcraft" not in worker_a
+
+
+def test_sqlite_proc_store_dead_worker(tmp_path):
+    store = SqliteProcInfoStore(str(tmp_path / "proc_store.db"))
+    proc_info = store.create("Mockcraft")
+    proc_info.process_lock = True
+
+    # Pretend the worker running the install died.
+    proc = subprocess.Popen(["true"])
+    proc.wait()
+    conn = store.conn()
+    conn.execute("UPDATE proc_info SET worker_pid = ?", (proc.pid,))
+    conn.commit()
+
+    assert store.get("Mockcraft").process_lock == False
+    assert store.version("Mockcraft").endswith("-dead")
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_proc_store_version(backend, tmp_path):
+    if backend == "sqlite":
+        store = SqliteProcInfoStore(str(tmp_path / "proc_store.db"))
+    else:
+        store = ProcInfoStore()
+    assert store.version("Mockcraft") == None
+
+    proc_info = store.create("Mockcraft")
+    seen = {store.version("Mockcraft")}
+    assert store.version("Mockcraft") in seen
+
+    # Every kind of change moves the version on. Shared output is written in
+    # batches, extend writes straight away.
+    for change in (
+        lambda: proc_info.stdout.extend(["Installing...\n"]),
+        lambda: proc_info.stderr.extend(["warning\n"]),
+        lambda: setattr(proc_info, "process_lock", True),
+        lambda: proc_info.stdout.clear(),
+        lambda: setattr(proc_info, "exit_status", 0),
+    ):
+        change()
+        version = store.version("Mockcraft")
+        assert version not in seen
+        seen.add(version)
+
+    # Recreating doesn't bring back an old version.
+    store.create("Mockcraft")
+    assert store.version("Mockcraft") not in seen
+
+
+def test_proc_store_version_survives_restart():
+    # A fresh worker must not reuse versions from before a restart.
+    code = (
+        "from app.proc_store import ProcInfoStore;"
+        "store = ProcInfoStore(); store.create('Mockcraft');"
+        "print(store.version('Mockcraft'))"
+    )
+    versions = [
+        subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        for _ in range(2)
+    ]
+    assert versions[0] != versions[1]
+    assert int(versions[1].split("-")[1]) > int(versions[0].split("-")[1])
+
+
+def test_sqlite_proc_store_batches_output(tmp_path):
+    db_path = str(tmp_path / "proc_store.db")
+    worker_a = SqliteProcInfoStore(db_path)
+    worker_b = SqliteProcInfoStore(db_path)
+    proc_info = worker_a.create("Mockcraft")
+
+    def version():
+        return int(worker_b.version("Mockcraft"))
+
+    def stdout():
+        return json.loads(worker_b.to_json("Mockcraft"))["stdout"]
+
+    # Extend is one write.
+    start = version()
+    proc_info.stdout.extend(f"line {i}\n" for i in range(1000))
+    assert version() == start + 1
+    assert len(stdout()) == 1000
+
+    # Appends are written a batch at a time. Long interval, so the flusher
+    # can't get in part way through.
+    worker_a.FLUSH_INTERVAL = 1
+    start = version()
+    for i in range(250):
+        proc_info.stdout.append(f"more {i}\n")
+    assert version() == start + 2
+    assert len(stdout()) == 1200
+
+    # The rest show up after the flush interval, without any more output.
+    deadline = time.time() + 5
+    while len(stdout()) < 1250 and time.time() < deadline:
+        time.sleep(0.05)
+    assert stdout()[-1] == "more 249\n"
+    assert version() == start + 3
+
+    # Setting state writes any pending output first.
+    proc_info.stderr.append("error\n")
+    proc_info.exit_status = 1
+    output = json.loads(worker_b.to_json("Mockcraft"))
+    assert output["stderr"] == ["error\n"]
+    assert output["exit_status"] == 1
@@ -0,0 +1,153 @@
+import os
+import pytest
+from datetime import datetime, timedelta
+from flask import Flask
+from app import db
+from app.models import Job, Schedule, GameServer
+from app.scheduler import Scheduler, next_run_time
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path}/schedules.db"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        for name in ("Mockcraft", "Othercraft", "Thirdcraft"):
+            db.session.add(GameServer(install_name=name, install_finished=True))
+        db.session.commit()
+    return app
+
+
+class FakeSubmit:
+    """Records submitted commands as queued jobs, instead of running them."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, server, short_cmd, schedule_id):
+        self.calls.append((server.install_name, short_cmd, schedule_id))
+        job = Job(
+            name="Command",
+            status="queued",
+            schedule_id=schedule_id,
+            worker_pid=os.getpid(),
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+
+def add_schedule(server_name, next_run, policy="skip", cron="0 4 * * *"):
+    schedule = Schedule(
+        server_name=server_name,
+        command="update",
+        short_cmd="u",
+        cron=cron,
+        jitter=0,
+        missed_policy=policy,
+        enabled=True,
+        next_run=next_run,
+    )
+    db.session.add(schedule)
+    db.session.commit()
+    return schedule.id
+
+
+def test_due_schedule_runs_once(app):
+    submit = FakeSubmit()
+    scheduler = Scheduler(app, submit)
+    now = datetime.now()
+
+    with app.app_context():
+        schedule_id = add_schedule("Mockcraft", now - timedelta(seconds=5))
+        add_schedule("Othercraft", now + timedelta(hours=1))
+
+        assert len(scheduler.tick(now)) == 1
+        assert submit.calls == [("Mockcraft", "u", schedule_id)]
+
+        # Moved on to the next run, not due again.
+        schedule = db.session.get(Schedule, schedule_id)
+        assert schedule.next_run > now
+        assert schedule.last_run == now
+        assert scheduler.tick(now) == []
+
+
+def test_max_scheduled_jobs(app):
+    submit = FakeSubmit()
+    scheduler = Scheduler(app, submit, max_jobs=2)
+    now = datetime.now()
+
+    with app.app_context():
+        for name in ("Mockcraft", "Othercraft", "Thirdcraft"):
+            add_schedule(name, now - timedelta(seconds=5))
+
+        assert len(scheduler.tick(now)) == 2
+        # Third stays due until a slot frees up.
+        assert scheduler.tick(now) == []
+        for job in Job.query.all():
+            job.status = "finished"
+        db.session.commit()
+        assert len(scheduler.tick(now)) == 1
+
+
+def test_missed_run_policies(app):
+    submit = FakeSubmit()
+    scheduler = Scheduler(app, submit)
+    now = datetime.now()
+    # Due while the app was down.
+    missed = now - timedelta(hours=3)
+
+    with app.app_context():
+        skip_id = add_schedule("Mockcraft", missed, "skip")
+        run_id = add_schedule("Othercraft", missed, "run_once")
+
+        scheduler.tick(now)
+        assert [call[2] for call in submit.calls] == [run_id]
+        assert db.session.get(Schedule, skip_id).next_run > now
+        assert db.session.get(Schedule, run_id).next_run > now
+
+
+def test_claim_only_once(app):
+    now = datetime.now()
+    with app.app_context():
+        schedule_id = add_schedule("Mockcraft", now - timedelta(seconds=5))
+
+    # Two workers, each with their own scheduler.
+    submit = FakeSubmit()
+    worker_a = Scheduler(app, submit)
+    worker_b = Scheduler(app, submit)
+    with app.app_context():
+        due_at = db.session.get(Schedule, schedule_id).next_run
+        assert worker_a._claim(schedule_id, due_at, now + timedelta(days=1))
+        assert not worker_b._claim(schedule_id, due_at, now + timedelta(days=2))
+
+
+def test_jitter():
+    schedule = Schedule(cron="0 4 * * *", jitter=600)
+    after = datetime(2024, 1, 1)
+    for _ in range(20):
+        next_run = next_run_time(schedule, after)
+        assert datetime(2024, 1, 1, 4) <= next_run <= datetime(2024, 1, 1, 4, 10)
+
+
+def test_cli_app_starts_no_services():
+    # Cli runs build the app too, they mustn't claim schedules or deletions.
+    import subprocess
+    import sys
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import app.utils as utils; from app import main; main(); "
+            "print(utils.scheduler, utils.status_watcher)",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-1] == "None None"
+    assert "Scheduler Started" not in result.stdout
@@ -0,0 +1,159 @@
+import json
+import pytest
+from types import SimpleNamespace
+from flask import Flask
+from werkzeug.datastructures import MultiDict
+from app import db
+from app.models import GameServer, Tag, game_server_tag
+from app.status_cache import StatusCache
+import app.utils as utils
+
+ADMIN = SimpleNamespace(role="admin", permissions="{}")
+
+HOSTS = ("10.0.0.5", "10.0.0.6", None)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path}/servers.db"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        # 210 servers over 3 hosts, every 7th install unfinished.
+        for i in range(210):
+            db.session.add(
+                GameServer(
+                    install_name=f"mc{i:03d}" if i % 2 else f"rust{i:03d}",
+                    username="mcserver",
+                    install_type="remote" if HOSTS[i % 3] else "local",
+                    install_host=HOSTS[i % 3],
+                    install_finished=i % 7 != 0,
+                )
+            )
+        db.session.commit()
+
+    # Ids 1-10 last seen on, 11-20 off, the rest never checked.
+    cache = StatusCache()
+    for server_id in range(1, 21):
+        cache.set(server_id, server_id <= 10)
+    monkeypatch.setattr(utils, "status_cache", cache)
+    return app
+
+
+def test_list_game_servers(app):
+    with app.app_context():
+        listing = utils.list_game_servers(ADMIN, per_page=50)
+        assert listing["total"] == 210
+        assert listing["pages"] == 5
+        assert listing["hosts"] == [["10.0.0.5", 70], ["10.0.0.6", 70], ["127.0.0.1", 70]]
+        assert len(listing["servers"]) == 50
+        # Grouped by host, then by name.
+        names = [s["install_name"] for s in listing["servers"]]
+        assert names == sorted(names)
+        assert {s["install_host"] for s in listing["servers"]} == {"10.0.0.5"}
+
+        last = utils.list_game_servers(ADMIN, page=5, per_page=50)
+        assert len(last["servers"]) == 10
+        assert last["servers"][-1]["install_host"] == "127.0.0.1"
+
+        listing = utils.list_game_servers(
+            ADMIN, host="10.0.0.6", prefix="rust", per_page=500
+        )
+        assert listing["total"] == 35
+        assert all(s["install_name"].startswith("rust") for s in listing["servers"])
+
+        # Like wildcards are matched literally.
+        assert utils.list_game_servers(ADMIN, prefix="%")["total"] == 0
+
+        assert utils.list_game_servers(ADMIN, install_type="local")["total"] == 70
+        assert utils.list_game_servers(ADMIN, status="on")["total"] == 10
+        assert utils.list_game_servers(ADMIN, status="off")["total"] == 10
+        assert utils.list_game_servers(ADMIN, status="unknown")["total"] == 190
+        on = utils.list_game_servers(ADMIN, status="on")["servers"]
+        assert all(s["status"] == True for s in on)
+
+
+def test_list_game_servers_permissions(app):
+    with app.app_context():
+        user = SimpleNamespace(
+            role="user", permissions=json.dumps({"servers": ["mc001", "rust002"]})
+        )
+        listing = utils.list_game_servers(user, per_page=500)
+        names = {s["install_name"] for s in listing["servers"]}
+        # Plus unfinished installs, same as the old home page.
+        assert {"mc001", "rust002"} <= names
+        assert all(
+            s["install_name"] in ("mc001", "rust002") or not s["install_finished"]
+            for s in listing["servers"]
+        )
+        assert listing["total"] == len(names) == 32
+
+
+def test_server_list_args():
+    args = utils.server_list_args(MultiDict({"host": " ", "status": "on", "page": "2"}))
+    assert args == {"status": "on", "page": 2, "per_page": 50}
+    assert utils.server_list_args(MultiDict({"per_page": "9999"}))["per_page"] == 500
+
+    for bad in ({"page": "0"}, {"per_page": "x"}, {"status": "sideways"}):
+        with pytest.raises(ValueError):
+            utils.server_list_args(MultiDict(bad))
+
+
+def test_tags(app):
+    with app.app_context():
+        servers = GameServer.query.order_by(GameServer.id).all()
+        for server in servers[:30]:
+            utils.set_server_tags(server, "EU-West, minecraft")
+        assert utils.set_server_tags(servers[0], ["eu-west", "tournament", ""]) == [
+            "eu-west",
+            "tournament",
+        ]
+        assert [tag.name for tag in servers[0].tags] == ["eu-west", "tournament"]
+        assert Tag.query.count() == 3
+
+        with pytest.raises(ValueError):
+            utils.parse_tags("eu west!")
+        with pytest.raises(ValueError):
+            utils.parse_tags(5)
+
+        listing = utils.list_game_servers(ADMIN, tag="minecraft", per_page=500)
+        assert listing["total"] == 29
+        assert all("minecraft" in s["tags"] for s in listing["servers"])
+
+        # Ids 1-10 on, 11-20 off, so the first 30 servers are 10/10/10.
+        summaries = {s["tag"]: s for s in utils.tag_summaries(ADMIN)}
+        assert summaries["eu-west"] == {
+            "tag": "eu-west",
+            "servers": 30,
+            "on": 10,
+            "off": 10,
+            "unknown": 10,
+        }
+        assert summaries["minecraft"]["on"] == 9
+        assert summaries["tournament"]["servers"] == 1
+
+        # Access to tagged servers, plus ones granted by name.
+        user = SimpleNamespace(
+            role="user",
+            permissions=json.dumps({"servers": ["mc199"], "tags": ["tournament"]}),
+        )
+        assert utils.permitted_server_names(user) == sorted(
+            ["mc199", servers[0].install_name]
+        )
+        summaries = {s["tag"]: s for s in utils.tag_summaries(user)}
+        assert summaries["tournament"]["servers"] == 1
+        assert summaries["eu-west"]["servers"] == 1
+        assert summaries["minecraft"]["servers"] == 0
+
+        # Bulk actions by tag only pick up servers the user can see.
+        assert len(utils.tagged_server_names(ADMIN, ["eu-west"])) == 30
+        assert utils.tagged_server_names(user, ["eu-west", "minecraft"]) == [
+            servers[0].install_name
+        ]
+        assert utils.tagged_server_names(user, ["nope"]) == []
+
+        # Deleting a server drops its tag links.
+        servers[0].delete()
+        assert db.session.query(game_server_tag).count() == 29 * 2
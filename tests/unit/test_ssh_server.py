@@ -0,0 +1,149 @@
+import os
+import time
+import paramiko
+import pytest
+
+from app import utils
+from app.proc_info_vessel import ProcInfoVessel
+from ssh_server import make_remote_install
+
+
+@pytest.fixture
+def install(ssh_server, tmp_path, monkeypatch):
+    # Keep the tmux socket name cache out of the repo's json dir.
+    (tmp_path / "json").mkdir()
+    monkeypatch.setattr(utils, "CWD", str(tmp_path))
+    monkeypatch.setattr(utils, "status_watcher", None)
+    server = make_remote_install(ssh_server.root)
+    yield server
+    utils.status_cache.remove(server.id)
+
+
+def run(server, cmd, key_file):
+    proc_info = ProcInfoVessel()
+    ok = utils.run_cmd_ssh(cmd, server.install_host, server.username, key_file, proc_info)
+    return ok, proc_info
+
+
+def test_run_cmd_ssh(app, ssh_server, install):
+    uid_file = os.path.join(install.install_path, "lgsm/data/mcserver.uid")
+    with app.app_context():
+        ok, proc_info = run(install, ["/usr/bin/cat", uid_file], ssh_server.key_file)
+        assert ok
+        assert proc_info.exit_status == 0
+        assert proc_info.stdout == ["ab12cd\n"]
+
+        ok, proc_info = run(install, ["/usr/bin/cat", "/etc/passwd"], ssh_server.key_file)
+        assert ok
+        assert proc_info.exit_status == 1
+        assert proc_info.stdout == []
+
+    assert ssh_server.execs[0] == ["/usr/bin/cat", uid_file]
+    assert ssh_server.connections == 2
+
+
+def test_remote_status(app, ssh_server, install):
+    script = os.path.join(install.install_path, install.script_name)
+    with app.app_context():
+        assert utils.get_server_status(install) == False
+
+        ok, proc_info = run(install, [script, "st"], ssh_server.key_file)
+        assert ok
+        assert len(proc_info.stdout) == 200
+        assert utils.get_server_status(install) == True
+
+        run(install, [script, "sp"], ssh_server.key_file)
+        assert utils.get_server_status(install) == False
+
+
+def test_find_cfg_paths(app, ssh_server, install):
+    with app.app_context():
+        cfg_paths = utils.find_cfg_paths(install)
+    assert cfg_paths == [
+        os.path.join(install.install_path, "lgsm/config-lgsm/mcserver/common.cfg")
+    ]
+
+
+def test_sftp_read_write(app, ssh_server, install):
+    cfg = os.path.join(install.install_path, "lgsm/config-lgsm/mcserver/common.cfg")
+    with app.app_context():
+        assert utils.read_file_over_ssh(install, cfg) == 'maxplayers="20"\n'
+        assert utils.write_file_over_ssh(install, cfg, 'maxplayers="64"\n')
+        assert utils.read_file_over_ssh(install, cfg) == 'maxplayers="64"\n'
+
+        # Outside of the fake host's root.
+        assert utils.read_file_over_ssh(install, "/etc/hostname") == None
+    assert ssh_server.sftp_sessions == 4
+
+
+def test_wrong_key(app, ssh_server, install, tmp_path):
+    other_key = str(tmp_path / "other_key")
+    paramiko.ECDSAKey.generate().write_private_key_file(other_key)
+    with app.app_context():
+        ok, proc_info = run(install, ["/usr/bin/cat", "x"], other_key)
+    assert not ok
+    assert ssh_server.execs == []
+
+
+def test_latency(app, ssh_server, install):
+    ssh_server.latency = 0.2
+    uid_file = os.path.join(install.install_path, "lgsm/data/mcserver.uid")
+    start = time.perf_counter()
+    with app.app_context():
+        ok, proc_info = run(install, ["/usr/bin/cat", uid_file], ssh_server.key_file)
+    assert ok
+    assert time.perf_counter() - start >= 0.2
+
+
+def test_delete_remote_server(app, ssh_server, install, monkeypatch):
+    deleted, queued = [], []
+    install.delete = lambda: deleted.append(install.install_name)
+    monkeypatch.setattr(utils, "queue_deletion", lambda *args: queued.append(args))
+
+    with app.test_request_context():
+        assert utils.delete_server(install, True, False)
+        trash_path = queued[0][1]
+        assert os.path.isdir(trash_path)
+        assert not os.path.exists(install.install_path)
+
+        # Dir already removed by hand, just drop the db entry.
+        assert utils.delete_server(install, True, False)
+    assert deleted == ["Mockcraft", "Mockcraft"]
+    assert len(queued) == 1
+    assert ssh_server.execs[-1] == ["/usr/bin/test", "-e", install.install_path]
+
+
+def test_remote_deletion(app, ssh_server, install):
+    from app import db
+    from app.models import Deletion
+
+    trash_path = os.path.join(ssh_server.root, ".Mockcraft.trash-abc")
+    os.rename(install.install_path, trash_path)
+    with app.app_context():
+        # Any host but 127.0.0.1, which is deleted locally.
+        deletion = Deletion(
+            server_name=install.install_name,
+            install_host="localhost",
+            username=install.username,
+            path=install.install_path,
+            trash_path=trash_path,
+            status="queued",
+        )
+        db.session.add(deletion)
+        db.session.commit()
+
+        utils.run_deletion(deletion.id)
+        assert deletion.status == "finished"
+        db.session.delete(deletion)
+        db.session.commit()
+
+    assert not os.path.exists(trash_path)
+    # Just nice, ionice may not be on the remote host.
+    assert ssh_server.execs[-1] == [
+        "/usr/bin/nice",
+        "-n",
+        "19",
+        "/usr/bin/rm",
+        "-rf",
+        trash_path,
+    ]
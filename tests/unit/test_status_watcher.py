@@ -0,0 +1,136 @@
+import os
+import time
+import shutil
+import socket
+import pytest
+from app.status_cache import StatusCache
+from app.status_watcher import StatusWatcher
+
+
+def wait_for_status(cache, server_id, status, timeout=3):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cache.get(server_id) == status:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_status_cache():
+    cache = StatusCache()
+    assert cache.get(1) == None
+
+    cache.set(1, True)
+    assert cache.get(1) == True
+    assert cache.get("1") == True
+    assert 1 in cache.snapshot()
+
+    # Stale entries are ignored when max_age given.
+    time.sleep(0.05)
+    assert cache.get(1, max_age=0.01) == None
+
+    cache.remove(1)
+    assert cache.get(1) == None
+
+
+def test_status_watcher_socket_events(tmp_path):
+    tmux_dir = tmp_path / "tmux-test"
+    install_path = tmp_path / "Mockcraft"
+    os.makedirs(install_path / "lgsm/lock")
+
+    cache = StatusCache()
+    watcher = StatusWatcher(cache, reconcile_interval=60, tmux_dir=str(tmux_dir))
+    if not watcher.available():
+        pytest.skip("inotify not available")
+
+    assert watcher.start()
+    try:
+        # No socket yet, server is off.
+        assert watcher.watch(1, "mcserver-abc", str(install_path), "mcserver") == False
+        assert watcher.is_watching(1)
+
+        # Game server start, tmux creates & listens on its socket.
+        sock_path = str(tmux_dir / "mcserver-abc")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(sock_path)
+        sock.listen()
+        assert wait_for_status(cache, 1, True)
+        assert watcher.probe("mcserver-abc") == True
+
+        # Game server stop, tmux removes its socket.
+        sock.close()
+        os.remove(sock_path)
+        assert wait_for_status(cache, 1, False)
+
+        watcher.unwatch(1)
+        assert not watcher.is_watching(1)
+        assert cache.get(1) == None
+    finally:
+        watcher.stop()
+
+
+def test_status_watcher_reconcile(tmp_path):
+    tmux_dir = tmp_path / "tmux-test"
+    os.makedirs(tmux_dir)
+
+    cache = StatusCache()
+    watcher = StatusWatcher(cache, reconcile_interval=60, tmux_dir=str(tmux_dir))
+    if not watcher.available():
+        pytest.skip("inotify not available")
+
+    assert watcher.start()
+    try:
+        watcher.watch(2, "vhserver-xyz", str(tmp_path), "vhserver")
+
+        # Stale socket left behind by a crashed tmux reads as off.
+        sock_path = str(tmux_dir / "vhserver-xyz")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(sock_path)
+        sock.close()
+
+        watcher.reconcile()
+        assert cache.get(2) == False
+    finally:
+        watcher.stop()
+
+
+def test_status_watcher_rewatch(tmp_path):
+    tmux_dir = tmp_path / "tmux-test"
+    install_path = tmp_path / "Mockcraft"
+
+    cache = StatusCache()
+    watcher = StatusWatcher(cache, reconcile_interval=60, tmux_dir=str(tmux_dir))
+    if not watcher.available():
+        pytest.skip("inotify not available")
+
+    def rewatched():
+        with watcher.lock:
+            return tmux_dir.is_dir() and watcher.tmux_wd != None
+
+    assert watcher.start()
+    try:
+        # Never started, so no lock dir yet.
+        assert watcher.watch(3, "mcserver-abc", str(install_path), "mcserver") == False
+        assert watcher.servers[3]["lock_wd"] == None
+
+        # Tmux dir removed out from under the watch, ex. by a tmp cleaner.
+        shutil.rmtree(tmux_dir)
+        deadline = time.time() + 3
+        while not rewatched() and time.time() < deadline:
+            time.sleep(0.05)
+        assert rewatched()
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(str(tmux_dir / "mcserver-abc"))
+        sock.listen()
+        assert wait_for_status(cache, 3, True)
+        sock.close()
+
+        # Lock dir made by the first start gets watched once it's there.
+        os.makedirs(install_path / "lgsm/lock")
+        deadline = time.time() + 3
+        while watcher.servers[3]["lock_wd"] == None and time.time() < deadline:
+            time.sleep(0.05)
+        assert watcher.servers[3]["lock_wd"] != None
+    finally:
+        watcher.stop()
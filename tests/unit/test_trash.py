@@ -0,0 +1,118 @@
+import os
+import pytest
+import threading
+
+from app import db, utils
+from app.models import Deletion
+from app.trash import trash_path_for, move_to_trash, tree_size, delete_tree, main
+
+
+def make_tree(path):
+    """Makes a small fake game server install, 3000 bytes of files."""
+    os.makedirs(os.path.join(path, "serverfiles/world"))
+    for rel_path, size in [
+        ("mcserver", 500),
+        ("serverfiles/server.jar", 1500),
+        ("serverfiles/world/level.dat", 1000),
+    ]:
+        with open(os.path.join(path, rel_path), "wb") as f:
+            f.write(b"x" * size)
+    os.symlink("/etc", os.path.join(path, "serverfiles/etc_link"))
+
+
+def test_move_to_trash(tmp_path):
+    install = str(tmp_path / "Minecraft")
+    make_tree(install)
+
+    trash_path = move_to_trash(install)
+    assert not os.path.exists(install)
+    assert os.path.dirname(trash_path) == str(tmp_path)
+    assert os.path.basename(trash_path).startswith(".Minecraft.trash-")
+    assert tree_size(trash_path) == 3000
+
+    # Trailing slashes don't end up in the trash name.
+    assert os.path.dirname(trash_path_for(install + "/")) == str(tmp_path)
+
+
+def test_delete_tree_progress(tmp_path):
+    trash_path = str(tmp_path / ".Minecraft.trash-abc")
+    make_tree(trash_path)
+
+    reports = []
+    assert delete_tree(trash_path, reports.append, interval=0) == 3000
+    assert reports[-1] == 3000
+    assert reports == sorted(reports)
+    assert not os.path.exists(trash_path)
+    # Symlinked dirs are unlinked, not followed.
+    assert os.path.isdir("/etc")
+
+
+def test_delete_tree_resumes(tmp_path):
+    trash_path = str(tmp_path / ".Minecraft.trash-abc")
+    make_tree(trash_path)
+
+    # Pretend an earlier run got partway through.
+    os.remove(os.path.join(trash_path, "serverfiles/server.jar"))
+    assert delete_tree(trash_path) == 1500
+    assert not os.path.exists(trash_path)
+
+    # Nothing left is fine too.
+    assert delete_tree(trash_path) == 0
+
+
+def test_main_only_deletes_trash(tmp_path, capsys):
+    install = str(tmp_path / "Minecraft")
+    make_tree(install)
+    assert main([install]) == 3
+    assert os.path.isdir(install)
+
+    trash_path = move_to_trash(install)
+    assert main([trash_path]) == 0
+    assert not os.path.exists(trash_path)
+    lines = capsys.readouterr().out.split("\n")
+    assert lines[0] == "0 3000"
+    assert "3000 3000" in lines
+
+
+def test_run_deletion_lots_of_stderr(app, tmp_path, monkeypatch):
+    # Stand in for trash.py failing on more files than a pipe buffer holds.
+    script = tmp_path / "trash.py"
+    script.write_text(
+        "import sys\n"
+        "for i in range(20000):\n"
+        "    print(f'cannot remove file{i}: Permission denied', file=sys.stderr)\n"
+        "sys.exit(1)\n"
+    )
+    monkeypatch.setattr(utils, "TRASH_SCRIPT", str(script))
+
+    with app.app_context():
+        deletion = Deletion(
+            server_name="Mockcraft",
+            path=str(tmp_path / "Mockcraft"),
+            trash_path=str(tmp_path / ".Mockcraft.trash-abc"),
+            status="queued",
+        )
+        db.session.add(deletion)
+        db.session.commit()
+        deletion_id = deletion.id
+
+    errors = []
+
+    def run():
+        with app.app_context():
+            try:
+                utils.run_deletion(deletion_id)
+            except RuntimeError as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert len(errors) == 1
+
+    with app.app_context():
+        deletion = db.session.get(Deletion, deletion_id)
+        assert deletion.status == "failed"
+        db.session.delete(deletion)
+        db.session.commit()
@@ -1,6 +1,7 @@
 import os
 import pytest
 import json
+from flask import Flask
 from app.utils import *
 
 
@@ -95,6 +96,18 @@ def test_valid_command():
         assert valid_command(cmd, "mcserver", "no", current_user2) == True
 
 
+def test_restore_permissions():
+    app = Flask(__name__)
+    app.secret_key = "test"
+
+    admin = ModCurrentUser("admin", json.dumps({"admin": True}))
+    user = ModCurrentUser("user", json.dumps({"controls": ["backup"]}))
+    with app.test_request_context():
+        assert user_has_permissions(admin, "restore") == True
+        # Backup control alone isn't enough to restore.
+        assert user_has_permissions(user, "restore") == False
+
+
 def test_valid_install_options():
     servers_json = open("json/game_servers.json", "r")
     json_data = json.load(servers_json)
@@ -216,3 +229,14 @@ def test_get_server_stats():
     # Ensure the result can be serialized to JSON
     json_string = json.dumps(stats)
     assert isinstance(json_string, str)
+
+
+def test_network_stats_first_call(monkeypatch):
+    # Counters are primed on first call, not at import.
+    import app.utils as utils
+
+    monkeypatch.setattr(utils, "prev_time", None)
+    assert get_network_stats() == {"bytes_sent_rate": 0.0, "bytes_recv_rate": 0.0}
+    assert utils.prev_time != None
+    rates = get_network_stats()
+    assert rates["bytes_sent_rate"] >= 0
@@ -83,18 +83,46 @@ if os.getenv("VIRTUAL_ENV") is None:
 
 
 # Continue imports once we know we're in a venv.
+import pwd
+
+# Keep bytecode out of the repo, in a per user cache. Set before importing
+# app so it's cached there too, and exported for gunicorn. See
+# app.pycache_dir().
+PYCACHE_DIR = os.path.join(
+    pwd.getpwuid(os.getuid()).pw_dir, ".cache/web-lgsm/pycache"
+)
+sys.pycache_prefix = PYCACHE_DIR
+os.environ.setdefault("PYTHONPYCACHEPREFIX", PYCACHE_DIR)
+
 import json
 import time
 import getopt
 import shutil
 import string
+import tarfile
 import getpass
 import configparser
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash
 from app import db, main as appmain
-from app.models import User
-from app.utils import contains_bad_chars, check_and_get_lgsmsh
+from app.models import User, GameServer
+from app.utils import (
+    contains_bad_chars,
+    check_and_get_lgsmsh,
+    get_backup_options,
+    get_dedup_store,
+    restore_target_for,
+    should_use_ssh,
+)
+from app.backups import (
+    BackupError,
+    create_backup,
+    list_backups,
+    prune_backups,
+    restore_backup,
+)
+from app.load_bench import HttpTarget, LocalTarget, format_report, run_load_bench
+from app.log_config import rotate_log
 
 # Import config data.
 CONFIG_FILE = "main.conf"
@@ -117,8 +145,33 @@ except KeyError as e:
 
 os.environ["LOG_LEVEL"] = LOG_LEVEL
 
+# Gunicorn worker model defaults. A handful of threads in one worker keeps
+# polling routes responsive while a slow request (ssh timeout, os.walk) is in
+# flight, without needing a shared proc_store.
+WORKER_DEFAULTS = {
+    "worker_class": "gthread",
+    "workers": "1",
+    "threads": "4",
+    "keepalive": "2",
+    "timeout": "30",
+    "max_requests": "0",
+    "max_requests_jitter": "0",
+}
+WORKER_CLASSES = ("sync", "gthread")
+
 # Global options hash.
-O = {"verbose": False, "check": False, "auto": False, "test_full": False}
+O = {
+    "verbose": False,
+    "check": False,
+    "auto": False,
+    "test_full": False,
+    "incremental": False,
+    "snapshot_id": None,
+    "stamp": None,
+    "clients": 10,
+    "duration": 30,
+    "url": None,
+}
 
 def stop_server():
     result = subprocess.run(["pkill", "gunicorn"], capture_output=True)
@@ -170,6 +223,94 @@ def print_start_banner():
     )
 
 
+def get_worker_options():
+    """
+    Reads & validates the gunicorn worker model options from the [server]
+    section of the main.conf. Exits on invalid values.
+
+    Returns:
+        dict: Validated worker options.
+    """
+    opts = dict()
+    server_conf = CONFIG["server"] if CONFIG.has_section("server") else dict()
+
+    for option, default in WORKER_DEFAULTS.items():
+        opts[option] = server_conf.get(option, default).strip()
+
+    if opts["worker_class"] not in WORKER_CLASSES:
+        print(
+            f" [!] Error: Invalid worker_class: {opts['worker_class']} "
+            + f"(must be one of: {', '.join(WORKER_CLASSES)})",
+            file=sys.stderr,
+        )
+        exit(17)
+
+    # Option name -> minimum allowed value.
+    int_options = {
+        "workers": 1,
+        "threads": 1,
+        "keepalive": 0,
+        "timeout": 0,
+        "max_requests": 0,
+        "max_requests_jitter": 0,
+    }
+    for option, minimum in int_options.items():
+        try:
+            opts[option] = int(opts[option])
+        except ValueError:
+            opts[option] = None
+
+        if opts[option] == None or opts[option] < minimum:
+            print(
+                f" [!] Error: Invalid {option}: must be an int >= {minimum}",
+                file=sys.stderr,
+            )
+            exit(17)
+
+    # Threads only mean anything to the gthread worker.
+    if opts["worker_class"] == "sync" and opts["threads"] > 1:
+        print(" [!] Warning: threads ignored for sync workers, use gthread.")
+        opts["threads"] = 1
+
+    # Command output lives in worker memory unless using the sqlite store.
+    proc_store = server_conf.get("proc_store", "memory").strip()
+    if opts["workers"] > 1 and proc_store != "sqlite":
+        print(
+            " [!] Warning: workers > 1 requires proc_store = sqlite. "
+            + "Falling back to a single worker."
+        )
+        opts["workers"] = 1
+
+    return opts
+
+
+def build_worker_args(opts):
+    """
+    Turns validated worker options into gunicorn cli args.
+
+    Args:
+        opts (dict): Output of get_worker_options().
+
+    Returns:
+        list: Gunicorn cli args.
+    """
+    args = [
+        f"--worker-class={opts['worker_class']}",
+        f"--workers={opts['workers']}",
+        f"--keep-alive={opts['keepalive']}",
+        f"--timeout={opts['timeout']}",
+    ]
+
+    if opts["worker_class"] == "gthread":
+        args.append(f"--threads={opts['threads']}")
+
+    if opts["max_requests"]:
+        args.append(f"--max-requests={opts['max_requests']}")
+        args.append(f"--max-requests-jitter={opts['max_requests_jitter']}")
+
+    return args
+
+
 def start_server():
     status_result = subprocess.run(
         ["pgrep", "-f", "gunicorn.*web-lgsm"], capture_output=True
@@ -183,6 +324,25 @@ def start_server():
     access_log = os.path.join(SCRIPTPATH, "logs/access.log")
     error_log = os.path.join(SCRIPTPATH, "logs/error.log")
 
+    # Gunicorn never rotates its own logs, so roll them over between starts.
+    debug_conf = CONFIG["debug"] if CONFIG.has_section("debug") else dict()
+    try:
+        max_bytes = int(debug_conf.get("log_max_bytes", "10485760"))
+        backups = int(debug_conf.get("log_backups", "5"))
+    except ValueError:
+        max_bytes = 10485760
+        backups = 5
+    # Same for the app log when workers share it, see main().
+    worker_opts = get_worker_options()
+    logs = [access_log, error_log]
+    app_log = debug_conf.get("log_file", "logs/web-lgsm.log").strip()
+    if app_log and worker_opts["workers"] > 1:
+        logs.append(os.path.join(SCRIPTPATH, app_log))
+    for log in logs:
+        if rotate_log(log, max_bytes, backups):
+            print(f" [*] Rotated {os.path.basename(log)}")
+    worker_args = build_worker_args(worker_opts)
+
     try:
         cmd = [
             "gunicorn",
@@ -195,7 +355,9 @@ def start_server():
             LOG_LEVEL,
             f"--bind={HOST}:{PORT}",
             "--daemon",
-            "app:main()",
+        ] + worker_args + [
+            # Only the server starts the scheduler & co, not cli runs.
+            f"app:main(serve=True, workers={worker_opts['workers']})",
         ]
 
         cert = None
@@ -262,7 +424,7 @@ def start_debug():
 
     # For clean ctrl + c handling.
     signal.signal(signal.SIGINT, signalint_handler)
-    app = main()
+    app = main(serve=True)
     app.run(debug=True, host=HOST, port=PORT)
 
 
@@ -442,27 +604,206 @@ def backup_file(filename):
 
 
 def backup_dir(dirname, tar=None):
-    """Back's up directories using shutil.copydirtree, optionally tar's them too"""
+    """
+    Back's up directories using shutil.copytree, or if tar is set streams them
+    straight into a compressed tar next to the dir instead (no copy first).
+    """
     if not os.path.isdir(dirname):
         print(
             f" [!] Warning: The directory '{dirname}' does not exist. No backup created!"
         )
         return None
 
+    if tar:
+        dirname = os.path.abspath(dirname)
+        # Game server backups & caches can be rebuilt, no need to keep them.
+        summary = create_backup(
+            dirname,
+            os.path.dirname(dirname),
+            os.path.basename(dirname),
+            excludes=["backups/*", "cache/*"],
+        )
+        print(f" [*] Backing up {dirname} to {summary['archive']}")
+        return summary["archive"]
+
     epoc = int(time.time())
     backup_dirname = f"{dirname}.{epoc}.bak"
     shutil.copytree(dirname, backup_dirname)
     print(f" [*] Backing up {dirname} to {backup_dirname}")
+    return backup_dirname
 
-    if tar:
-        tar_filename = f"{backup_dirname}.tar.gz"
-        with tarfile.open(tar_filename, "w:gz") as tar_handle:
-            tar_handle.add(backup_dirname, arcname=os.path.basename(backup_dirname))
-        print(f" [*] Creating tar file {tar_filename}")
-        shutil.rmtree(backup_dirname)
-        return tar_filename
 
-    return backup_dirname
+def backup_server(server_name):
+    """Backs up a game server install, per the [backups] main.conf settings"""
+    server = get_local_server(server_name)
+    options = get_backup_options()
+    try:
+        summary = create_backup(
+            server.install_path,
+            options["backup_dir"],
+            server_name,
+            excludes=options["excludes"],
+            compression=options["compression"],
+            threads=options["threads"],
+            incremental=O["incremental"],
+        )
+    except (BackupError, OSError) as e:
+        print(f" [!] Backup failed: {e}")
+        exit(1)
+
+    print(f" [*] Created {summary['kind']} backup {summary['archive']}")
+    print(
+        f" [*] {summary['files']} files, {summary['bytes']} bytes in, "
+        f"{summary['archive_size']} bytes out, {summary['seconds']}s"
+    )
+    for skipped in summary["skipped"]:
+        print(f" [!] Skipped {skipped}, changed during backup")
+
+    for removed in prune_backups(options["backup_dir"], server_name, options["keep"]):
+        print(f" [*] Removed old backup {removed}")
+
+
+def get_local_server(server_name):
+    """Gets a local game server by name, exits if there isn't one."""
+    server = GameServer.query.filter_by(install_name=server_name).first()
+    if server == None:
+        print(f" [!] No game server named {server_name}!")
+        exit(1)
+
+    if server.install_type != "local" or should_use_ssh(server):
+        print(" [!] Only local game server installs owned by this user can be backed up!")
+        exit(1)
+
+    return server
+
+
+def snapshot_server(server_name):
+    """Takes a deduplicated snapshot of a game server install"""
+    server = get_local_server(server_name)
+    options = get_backup_options()
+    store = get_dedup_store()
+    try:
+        summary = store.snapshot(
+            server.install_path, server_name, excludes=options["excludes"]
+        )
+    except (BackupError, OSError) as e:
+        print(f" [!] Snapshot failed: {e}")
+        exit(1)
+
+    print(f" [*] Created snapshot {summary['id']} of {server_name}")
+    print(
+        f" [*] {summary['files']} files, {summary['size']} bytes, "
+        f"{summary['new_bytes']} new bytes stored, {summary['seconds']}s"
+    )
+
+    dropped = store.prune(server_name, options["snapshot_keep"])
+    if dropped:
+        print(f" [*] Dropped old snapshots {dropped}")
+        gc = store.gc()
+        print(f" [*] Freed {gc['bytes']} bytes from {gc['chunks']} chunks")
+
+
+def list_snapshots(server_name):
+    """Prints a game server's deduplicated snapshots"""
+    snapshots = get_dedup_store().snapshots(server_name)
+    if not snapshots:
+        print(f" [!] No snapshots of {server_name}!")
+        return
+
+    for snapshot in snapshots:
+        print(
+            f" [*] {snapshot['id']:>5}  {snapshot['created'][:19]}  "
+            f"{snapshot['files']} files  {snapshot['size']} bytes  "
+            f"{snapshot['new_bytes']} new bytes"
+        )
+
+
+def restore_server(server_name):
+    """Restores a snapshot next to a game server's install dir"""
+    server = get_local_server(server_name)
+    store = get_dedup_store()
+    snapshot_id = O["snapshot_id"]
+    if snapshot_id == None:
+        snapshots = store.snapshots(server_name)
+        if not snapshots:
+            print(f" [!] No snapshots of {server_name}!")
+            exit(1)
+        snapshot_id = snapshots[0]["id"]
+
+    if snapshot_id not in [s["id"] for s in store.snapshots(server_name)]:
+        print(f" [!] Snapshot {snapshot_id} isn't a snapshot of {server_name}!")
+        exit(1)
+
+    target = restore_target_for(server, snapshot_id)
+    try:
+        files = store.restore(snapshot_id, target)
+    except (BackupError, OSError) as e:
+        print(f" [!] Restore failed: {e}")
+        exit(1)
+
+    print(f" [*] Restored {files} files from snapshot {snapshot_id} to {target}")
+    print(" [*] Stop the game server & swap it in place of the install dir.")
+
+
+def restore_server_backup(server_name):
+    """Restores a tar backup next to a game server's install dir"""
+    server = get_local_server(server_name)
+    backup_dir = get_backup_options()["backup_dir"]
+    stamps = [backup["stamp"] for backup in list_backups(backup_dir, server_name)]
+    stamp = O["stamp"]
+    if stamp == None:
+        if not stamps:
+            print(f" [!] No backups of {server_name}!")
+            exit(1)
+        stamp = stamps[-1]
+
+    if stamp not in stamps:
+        print(f" [!] {stamp} isn't a backup of {server_name}!")
+        exit(1)
+
+    target = restore_target_for(server, stamp)
+    try:
+        applied = restore_backup(backup_dir, server_name, target, stamp=stamp)
+    except (BackupError, OSError, tarfile.TarError) as e:
+        print(f" [!] Restore failed: {e}")
+        exit(1)
+
+    for archive in applied:
+        print(f" [*] Applied {archive}")
+    print(f" [*] Restored backup {stamp} to {target}")
+    print(" [*] Stop the game server & swap it in place of the install dir.")
+
+
+def load_bench():
+    """Polls the api routes like open controls pages would & reports latency"""
+    if O["url"]:
+        username = input("Enter username: ")
+        password = getpass.getpass("Enter password: ")
+        server_name = input("Enter game server to poll: ")
+        target = HttpTarget(O["url"], username, password, server_name)
+    else:
+        app = appmain()
+        target = LocalTarget(app)
+
+    print(
+        f" [*] Simulating {O['clients']} open controls pages against {target} "
+        f"for {O['duration']}s..."
+    )
+    try:
+        report = run_load_bench(target, O["clients"], O["duration"])
+    except RuntimeError as e:
+        print(f" [!] Bench failed: {e}")
+        exit(1)
+    finally:
+        target.close()
+
+    print(format_report(report))
+    if O["verbose"]:
+        print(json.dumps(report, indent=4))
+
+    if any(e["errors"] for e in report["endpoints"].values()):
+        print(" [!] Some requests failed!")
+        exit(1)
 
 
 def update_weblgsm():
@@ -625,6 +966,18 @@ def print_help():
   ║   -t, --test          Run project's pytest tests (short) ║
   ║   -x, --test_full     Run ALL project's pytest tests     ║
   ║   -j, --valid [user]  Add valid gs_user to allow list    ║
+  ║   -b, --backup [name] Backup game server install         ║
+  ║   -i, --incremental   Only backup changes since last     ║
+  ║   -n, --snapshot [name] Deduplicated snapshot of install ║
+  ║   -l, --list_snapshots [name] List install's snapshots   ║
+  ║   -e, --restore [name] Restore snapshot next to install  ║
+  ║   -k, --snapshot_id [id] Snapshot to restore (newest)    ║
+  ║   -y, --restore_backup [name] Restore backup next to it  ║
+  ║   -Y, --stamp [stamp] Backup to restore (newest)         ║
+  ║   -g, --bench         Load test the polling api routes   ║
+  ║   -w, --clients [n]   Controls pages to simulate (10)    ║
+  ║   -z, --duration [s]  Seconds to run bench for (30)      ║
+  ║   -o, --url [url]     Bench running instance, not local  ║
   ╚══════════════════════════════════════════════════════════╝
     """
     )
@@ -649,8 +1002,22 @@ def main(argv):
             "test",
             "test_full",
             "valid=",
+            "backup=",
+            "incremental",
+            "snapshot=",
+            "list_snapshots=",
+            "restore=",
+            "snapshot_id=",
+            "restore_backup=",
+            "stamp=",
+            "bench",
+            "clients=",
+            "duration=",
+            "url=",
         ]
-        opts, args = getopt.getopt(argv, "hsmrqdvpucaftxj:", longopts)
+        opts, args = getopt.getopt(
+            argv, "hsmrqdvpucaftxj:b:in:l:e:k:y:Y:gw:z:o:", longopts
+        )
     except getopt.GetoptError as e:
         print(e)
         print_help()
@@ -661,7 +1028,7 @@ def main(argv):
         return
 
     # Push required opts to global dict.
-    for opt, _ in opts:
+    for opt, arg in opts:
         if opt in ("-v", "--verbose"):
             O["verbose"] = True
         if opt in ("-c", "--check"):
@@ -670,6 +1037,27 @@ def main(argv):
             O["auto"] = True
         if opt in ("-x", "--test_full"):
             O["test_full"] = True
+        if opt in ("-i", "--incremental"):
+            O["incremental"] = True
+        if opt in ("-k", "--snapshot_id"):
+            if not arg.isdigit():
+                print(" [!] Snapshot id must be a number!")
+                exit(1)
+            O["snapshot_id"] = int(arg)
+        if opt in ("-Y", "--stamp"):
+            O["stamp"] = arg
+        if opt in ("-w", "--clients"):
+            if not arg.isdigit() or int(arg) < 1:
+                print(" [!] Clients must be a number above zero!")
+                exit(1)
+            O["clients"] = int(arg)
+        if opt in ("-z", "--duration"):
+            if not arg.isdigit() or int(arg) < 1:
+                print(" [!] Duration must be a number of seconds!")
+                exit(1)
+            O["duration"] = int(arg)
+        if opt in ("-o", "--url"):
+            O["url"] = arg
 
     # Do the needful based on opts.
     for opt, arg in opts:
@@ -704,6 +1092,34 @@ def main(argv):
         elif opt in ("-t", "--test", "-x", "--test_full"):
             run_tests()
             return
+        elif opt in ("-b", "--backup"):
+            app = appmain()
+            with app.app_context():
+                backup_server(arg)
+            return
+        elif opt in ("-n", "--snapshot"):
+            app = appmain()
+            with app.app_context():
+                snapshot_server(arg)
+            return
+        elif opt in ("-l", "--list_snapshots"):
+            app = appmain()
+            with app.app_context():
+                list_snapshots(arg)
+            return
+        elif opt in ("-e", "--restore"):
+            app = appmain()
+            with app.app_context():
+                restore_server(arg)
+            return
+        elif opt in ("-y", "--restore_backup"):
+            app = appmain()
+            with app.app_context():
+                restore_server_backup(arg)
+            return
+        elif opt in ("-g", "--bench"):
+            load_bench()
+            return
         elif opt in ("-j", "--valid"):
             print(opt)
             print(arg)